@@ -9,9 +9,14 @@ Backup & Restore
 """
 
 from __future__ import print_function
+import collections
 import copy
 import filecmp
 import fileinput
+import gzip
+import hashlib
+import io
+import json
 import os
 import glob
 import shutil
@@ -20,7 +25,12 @@ import subprocess
 import tarfile
 import tempfile
 import textwrap
+import threading
 import time
+import zlib
+
+from bisect import bisect_right
+from multiprocessing.pool import ThreadPool
 
 from fm_api import constants as fm_constants
 from fm_api import fm_api
@@ -71,6 +81,17 @@ kube_cmd_prefix += 'exec -i %s -n openstack -- bash -c ' % mariadb_pod
 mysql_prefix = '\'exec mysql -uroot -p"$MYSQL_ROOT_PASSWORD" '
 mysqldump_prefix = '\'exec mysqldump -uroot -p"$MYSQL_ROOT_PASSWORD" '
 
+# The system archive is a gzip stream made of separately compressed members:
+# the manifest, one member per backup section and the end of archive marker.
+# Concatenated, they decompress to a regular tar archive.
+BACKUP_MANIFEST = 'backup_manifest.json'
+BACKUP_MANIFEST_VERSION = 1
+BACKUP_MANIFEST_MAX_SIZE = 16 * 1024 * 1024
+# Number of backup sections written concurrently
+BACKUP_PARALLEL_SECTIONS = 4
+# Database dumps larger than this are spooled to the staging directory
+DUMP_SPOOL_SIZE = 64 * 1024 * 1024
+
 
 def get_backup_databases():
     """
@@ -218,7 +239,12 @@ def file_exists_in_archive(archive, file_path):
 
 
 def filter_directory(archive, directory):
-    for tarinfo in archive:
+    if isinstance(archive, BackupArchive):
+        # Only read the sections holding the directory
+        members = archive.getmembers_by_prefix(directory)
+    else:
+        members = archive
+    for tarinfo in members:
         if tarinfo.name.split('/')[0] == directory:
             yield tarinfo
 
@@ -277,8 +303,9 @@ def restore_etc_ssl_dir(archive, configpath=constants.CONFIG_WORKDIR):
         # restoration is only done for the first controller and TPM
         # will need to be reconfigured once duplex controller (if any)
         # is restored.
-        archive.extractall(path='/',
-                           members=filter_etc_ssl_private(archive))
+        archive.extractall(
+            path='/',
+            members=filter_etc_ssl_private(filter_directory(archive, 'etc')))
 
 
 def restore_ceph_external_config_files(archive, staging_dir):
@@ -400,7 +427,7 @@ def restore_configuration(archive, staging_dir):
 
 
 def filter_pxelinux(archive):
-    for tarinfo in archive:
+    for tarinfo in filter_directory(archive, 'config'):
         if tarinfo.name.find('config/pxelinux.cfg') == 0:
             yield tarinfo
 
@@ -622,6 +649,38 @@ def cleanup_prefetched_keyring():
         raise RestoreFail("Failed to cleanup fetched keyring")
 
 
+def add_command_output(archive, arcname, command, spool_dir):
+    """ Add the output of a shell command to the archive as a file """
+    # The size of a tar member must be known before its data is written, so
+    # the output is buffered in memory and only spooled to disk if large.
+    spool = tempfile.SpooledTemporaryFile(max_size=DUMP_SPOOL_SIZE,
+                                          dir=spool_dir)
+    try:
+        proc = subprocess.Popen([command], shell=True,
+                                stdout=subprocess.PIPE, stderr=DEVNULL)
+        shutil.copyfileobj(proc.stdout, spool)
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, command)
+
+        tarinfo = tarfile.TarInfo(arcname)
+        tarinfo.size = spool.tell()
+        tarinfo.mode = 0o644
+        tarinfo.mtime = int(time.time())
+        spool.seek(0)
+        archive.addfile(tarinfo, spool)
+    finally:
+        spool.close()
+
+
+def add_directory_entry(archive, arcname):
+    """ Add a directory entry to the archive """
+    tarinfo = tarfile.TarInfo(arcname)
+    tarinfo.type = tarfile.DIRTYPE
+    tarinfo.mode = 0o755
+    tarinfo.mtime = int(time.time())
+    archive.addfile(tarinfo)
+
+
 def backup_ldap_size():
     """ Backup ldap size estimate """
     try:
@@ -647,16 +706,12 @@ def backup_ldap_size():
 def backup_ldap(archive, staging_dir):
     """ Backup ldap configuration """
     try:
-        ldap_staging_dir = staging_dir + '/ldap'
-        os.mkdir(ldap_staging_dir, 0o655)
-
-        subprocess.check_call([
-            'slapcat', '-d', '0', '-F', '/etc/openldap/schema',
-            '-l', (ldap_staging_dir + '/ldap.db')], stdout=DEVNULL)
-
-        archive.add(ldap_staging_dir + '/ldap.db', arcname='ldap.db')
+        add_command_output(archive, 'ldap.db',
+                           'slapcat -d 0 -F /etc/openldap/schema',
+                           staging_dir)
 
-    except (OSError, subprocess.CalledProcessError, tarfile.TarError):
+    except (IOError, OSError, subprocess.CalledProcessError,
+            tarfile.TarError):
         LOG.error("Failed to backup ldap database.")
         raise BackupFail("Failed to backup ldap configuration")
 
@@ -713,22 +768,20 @@ def backup_mariadb_size():
 def backup_mariadb(archive, staging_dir):
     """ Backup MariaDB data """
     try:
-        mariadb_staging_dir = staging_dir + '/mariadb'
-        os.mkdir(mariadb_staging_dir, 0o655)
+        add_directory_entry(archive, 'mariadb')
 
         os_backup_dbs = get_os_backup_databases()
 
         # Backup data for databases.
         for db_elem in os_backup_dbs:
             db_cmd = kube_cmd_prefix + mysqldump_prefix
-            db_cmd += ' %s\' > %s/%s.sql.data' % (db_elem,
-                                                  mariadb_staging_dir, db_elem)
+            db_cmd += ' %s\'' % db_elem
 
-            subprocess.check_call([db_cmd], shell=True, stderr=DEVNULL)
-
-        archive.add(mariadb_staging_dir, arcname='mariadb')
+            add_command_output(archive, 'mariadb/%s.sql.data' % db_elem,
+                               db_cmd, staging_dir)
 
-    except (OSError, subprocess.CalledProcessError, tarfile.TarError):
+    except (IOError, OSError, subprocess.CalledProcessError,
+            tarfile.TarError):
         LOG.error("Failed to backup MariaDB databases.")
         raise BackupFail("Failed to backup MariaDB database.")
 
@@ -840,15 +893,12 @@ def backup_postgres_size():
 def backup_postgres(archive, staging_dir):
     """ Backup postgres configuration """
     try:
-        postgres_staging_dir = staging_dir + '/postgres'
-        os.mkdir(postgres_staging_dir, 0o655)
+        add_directory_entry(archive, 'postgres')
 
         # Backup roles, table spaces and schemas for databases.
-        subprocess.check_call([('sudo -u postgres pg_dumpall --clean ' +
-                                '--schema-only' +
-                                '> %s/%s' % (postgres_staging_dir,
-                                             'postgres.sql.config'))],
-                              shell=True, stderr=DEVNULL)
+        add_command_output(archive, 'postgres/postgres.sql.config',
+                           'sudo -u postgres pg_dumpall --clean '
+                           '--schema-only', staging_dir)
 
         # get backup database
         backup_databases, backup_db_skip_tables = get_backup_databases()
@@ -862,13 +912,11 @@ def backup_postgres(archive, staging_dir):
             for _, table_elem in enumerate(backup_db_skip_tables[db_elem]):
                 db_cmd += '--exclude-table=%s ' % table_elem
 
-            db_cmd += '> %s/%s.sql.data' % (postgres_staging_dir, db_elem)
+            add_command_output(archive, 'postgres/%s.sql.data' % db_elem,
+                               db_cmd, staging_dir)
 
-            subprocess.check_call([db_cmd], shell=True, stderr=DEVNULL)
-
-        archive.add(postgres_staging_dir, arcname='postgres')
-
-    except (OSError, subprocess.CalledProcessError, tarfile.TarError):
+    except (IOError, OSError, subprocess.CalledProcessError,
+            tarfile.TarError):
         LOG.error("Failed to backup postgres databases.")
         raise BackupFail("Failed to backup database configuration")
 
@@ -904,7 +952,7 @@ def restore_postgres(archive, staging_dir):
 
 
 def filter_config_dir(archive, directory):
-    for tarinfo in archive:
+    for tarinfo in filter_directory(archive, 'config'):
         if tarinfo.name.find('config/' + directory) == 0:
             yield tarinfo
 
@@ -1019,26 +1067,364 @@ def restore_ceph_crush_map(archive):
         raise RestoreFail('Failed to restore crush map file')
 
 
+class _ChecksumWriter(object):
+    """ File wrapper recording the size and checksum of the written data """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.checksum = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.checksum.update(data)
+        self.size += len(data)
+        self.fileobj.write(data)
+
+    def flush(self):
+        self.fileobj.flush()
+
+
+def backup_section(section_path, backup_func, args):
+    """ Backup a section into its own compressed archive member """
+    with open(section_path, 'wb') as section_file:
+        writer = _ChecksumWriter(section_file)
+        compressor = gzip.GzipFile(filename='', mode='wb', fileobj=writer)
+        try:
+            archive = tarfile.open(fileobj=compressor, mode='w')
+            backup_func(archive, *args)
+            # NOTE: The section archive is not closed, as that would add
+            # the end of archive marker: sections are concatenated into
+            # the system archive.
+        finally:
+            compressor.close()
+
+    names = archive.getnames()
+    return {'file': section_path,
+            'size': writer.size,
+            'raw_size': archive.offset,
+            'sha256': writer.checksum.hexdigest(),
+            'members': len(names),
+            'prefixes': sorted(set(name.split('/')[0] for name in names))}
+
+
+def backup_sections(staging_dir, sections, total_steps):
+    """ Backup the sections concurrently
+
+    Each section is a (name, backup function, arguments) tuple, whose
+    backup function adds its files to the archive passed as first
+    argument. Returns the details of the compressed section files, in the
+    order of the sections.
+    """
+    abort = threading.Event()
+
+    def run(index):
+        if abort.is_set():
+            return index, None
+        _name, backup_func, args = sections[index]
+        section_path = os.path.join(staging_dir, 'section-%02d.tgz' % index)
+        try:
+            return index, backup_section(section_path, backup_func, args)
+        except Exception:
+            # Do not start the remaining sections
+            abort.set()
+            raise
+
+    results = [None] * len(sections)
+    pool = ThreadPool(min(len(sections), BACKUP_PARALLEL_SECTIONS))
+    try:
+        for step, (index, result) in enumerate(
+                pool.imap_unordered(run, range(len(sections))), 1):
+            results[index] = result
+            utils.progress(total_steps, step,
+                           'backup %s' % sections[index][0], 'DONE')
+    finally:
+        pool.close()
+        pool.join()
+
+    return results
+
+
+def _write_archive_member(archive_file, data):
+    compressor = gzip.GzipFile(filename='', mode='wb', fileobj=archive_file)
+    compressor.write(data)
+    compressor.close()
+
+
+def write_backup_archive(archive_path, sections, results):
+    """ Write the system archive from the compressed section files """
+    manifest = {'version': BACKUP_MANIFEST_VERSION,
+                'sections': []}
+    # Offsets are relative to the end of the manifest member
+    offset = 0
+    for (name, _backup_func, _args), result in zip(sections, results):
+        manifest['sections'].append({'name': name,
+                                     'offset': offset,
+                                     'size': result['size'],
+                                     'raw_size': result['raw_size'],
+                                     'sha256': result['sha256'],
+                                     'members': result['members'],
+                                     'prefixes': result['prefixes']})
+        offset += result['size']
+
+    data = json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8')
+    tarinfo = tarfile.TarInfo(BACKUP_MANIFEST)
+    tarinfo.size = len(data)
+    tarinfo.mode = 0o644
+    tarinfo.mtime = int(time.time())
+    buf = io.BytesIO()
+    # The manifest header is written in GNU format, so that the archive can
+    # be recognized from the name of its first member.
+    tarfile.open(fileobj=buf, mode='w',
+                 format=tarfile.GNU_FORMAT).addfile(tarinfo,
+                                                    io.BytesIO(data))
+
+    with open(archive_path, 'wb') as archive_file:
+        _write_archive_member(archive_file, buf.getvalue())
+        for result in results:
+            with open(result['file'], 'rb') as section_file:
+                shutil.copyfileobj(section_file, archive_file)
+            os.remove(result['file'])
+        # End of archive marker
+        _write_archive_member(archive_file, b'\0' * (2 * tarfile.BLOCKSIZE))
+
+
+def read_backup_manifest(archive_file):
+    """ Read the manifest of a system archive
+
+    Returns the manifest and the offset of the first section in the archive
+    file, or (None, None) if the archive has no manifest.
+    """
+    archive_file.seek(0)
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    data = b''
+    consumed = 0
+    while not decompressor.unused_data:
+        chunk = archive_file.read(io.DEFAULT_BUFFER_SIZE)
+        if not chunk:
+            break
+        consumed += len(chunk)
+        data += decompressor.decompress(chunk)
+        if len(data) >= tarfile.BLOCKSIZE and not data.startswith(
+                BACKUP_MANIFEST.encode('utf-8') + b'\0'):
+            # Not an archive with a manifest, avoid decompressing it all
+            return None, None
+        if len(data) > BACKUP_MANIFEST_MAX_SIZE:
+            return None, None
+
+    if not decompressor.unused_data:
+        # The manifest is not in a member of its own, e.g. the archive was
+        # recompressed as a whole, so its offsets cannot be relied upon.
+        return None, None
+
+    try:
+        archive = tarfile.open(fileobj=io.BytesIO(data), mode='r')
+        member = archive.next()
+        if member is None or member.name != BACKUP_MANIFEST:
+            return None, None
+        manifest = json.loads(archive.extractfile(member).read().decode(
+            'utf-8'))
+    except (tarfile.TarError, ValueError):
+        return None, None
+
+    return manifest, consumed - len(decompressor.unused_data)
+
+
+class _SectionReader(object):
+    """ File-like view of the decompressed sections of a system archive
+
+    The sections are read as one stream, as they are laid out in the tar
+    archive. Seeking to a position only decompresses the section holding
+    it, from its start or from the current position.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, fileobj, base, sections):
+        self._fileobj = fileobj
+        # (raw start, compressed offset, compressed size) of each section
+        self._sections = []
+        raw_start = 0
+        for section in sections:
+            self._sections.append((raw_start, base + section['offset'],
+                                   section['size']))
+            raw_start += section['raw_size']
+        self._starts = [section[0] for section in self._sections]
+        self._size = raw_start
+        self._pos = 0
+        self._index = None
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            pos += self._pos
+        elif whence == os.SEEK_END:
+            pos += self._size
+        self._pos = max(pos, 0)
+        return self._pos
+
+    def _open(self, index):
+        self._index = index
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._consumed = 0
+        # The buffer holds the decompressed data from _buffer_start
+        self._buffer = b''
+        self._buffer_start = self._sections[index][0]
+
+    def _fill(self):
+        _raw_start, offset, size = self._sections[self._index]
+        self._buffer_start += len(self._buffer)
+        self._buffer = b''
+        if self._consumed >= size:
+            return False
+        self._fileobj.seek(offset + self._consumed)
+        data = self._fileobj.read(min(self.CHUNK_SIZE,
+                                      size - self._consumed))
+        if not data:
+            return False
+        self._consumed += len(data)
+        self._buffer = self._decompressor.decompress(data)
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._size - self._pos
+        chunks = []
+        while size > 0 and self._pos < self._size:
+            index = bisect_right(self._starts, self._pos) - 1
+            if index != self._index or self._pos < self._buffer_start:
+                self._open(index)
+            while self._pos >= self._buffer_start + len(self._buffer):
+                if not self._fill():
+                    raise IOError("Truncated backup archive section")
+            start = self._pos - self._buffer_start
+            chunk = self._buffer[start:start + size]
+            chunks.append(chunk)
+            self._pos += len(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+
+class BackupArchive(tarfile.TarFile):
+    """ System archive indexed by its manifest
+
+    The members of a section are only read when a member of that section
+    is looked up, and extracting a member only decompresses its section.
+    """
+
+    def __init__(self, archive_file, manifest, base):
+        self._archive_file = archive_file
+        sections = manifest['sections']
+        super(BackupArchive, self).__init__(
+            fileobj=_SectionReader(archive_file, base, sections), mode='r')
+        # Discard the first member read by the constructor, members are
+        # read per section.
+        self.members = []
+        self.firstmember = None
+        self._loaded = False
+
+        self._section_ranges = []
+        self._section_members = {}
+        self._prefixes = {}
+        raw_start = 0
+        for index, section in enumerate(sections):
+            self._section_ranges.append(
+                (raw_start, raw_start + section['raw_size']))
+            raw_start += section['raw_size']
+            for prefix in section['prefixes']:
+                self._prefixes.setdefault(prefix, []).append(index)
+
+    def _load_section(self, index):
+        """ Read the members of a section, once """
+        if index in self._section_members:
+            return self._section_members[index]
+
+        raw_start, raw_end = self._section_ranges[index]
+        members = collections.OrderedDict()
+        self.offset = raw_start
+        self.fileobj.seek(raw_start)
+        while self.offset < raw_end:
+            tarinfo = self.next()
+            if tarinfo is None:
+                break
+            members[tarinfo.name] = tarinfo
+        self._section_members[index] = members
+        return members
+
+    def _load(self):
+        self.members = []
+        for index in range(len(self._section_ranges)):
+            self.members.extend(self._load_section(index).values())
+        self._loaded = True
+
+    def __iter__(self):
+        return iter(self.getmembers())
+
+    def getmember(self, name):
+        name = name.rstrip('/')
+        for index in self._prefixes.get(name.split('/')[0], []):
+            tarinfo = self._load_section(index).get(name)
+            if tarinfo is not None:
+                return tarinfo
+        raise KeyError("filename %r not found" % name)
+
+    def getmembers_by_prefix(self, prefix):
+        """ Return the members of the sections holding a top level name """
+        members = []
+        for index in self._prefixes.get(prefix, []):
+            members.extend(self._load_section(index).values())
+        return members
+
+    def close(self):
+        super(BackupArchive, self).close()
+        self._archive_file.close()
+
+
+def open_backup_archive(backup_file):
+    """ Open a system archive for restore
+
+    Archives with a manifest are indexed by section. Older archives are
+    opened as a plain tar archive.
+    """
+    archive_file = open(backup_file, 'rb')
+    try:
+        manifest, base = read_backup_manifest(archive_file)
+        if manifest is not None:
+            return BackupArchive(archive_file, manifest, base)
+    except Exception:
+        archive_file.close()
+        raise
+
+    archive_file.close()
+    return tarfile.open(backup_file)
+
+
 def check_size(archive_dir):
     """Check if there is enough space to create backup."""
     backup_overhead_bytes = 1024 ** 3  # extra GB for staging directory
 
+    section_sizes = [backup_etc_size(),
+                     backup_config_size(tsconfig.CONFIG_PATH),
+                     backup_puppet_data_size(constants.HIERADATA_PERMDIR),
+                     backup_keyring_size(keyring_permdir),
+                     backup_ldap_size(),
+                     backup_postgres_size(),
+                     backup_std_dir_size(home_permdir),
+                     backup_std_dir_size(patching_permdir),
+                     backup_std_dir_size(patching_repo_permdir),
+                     backup_std_dir_size(extension_permdir),
+                     backup_std_dir_size(patch_vault_permdir),
+                     backup_armada_manifest_size(constants.ARMADA_PERMDIR),
+                     backup_std_dir_size(constants.HELM_CHARTS_PERMDIR),
+                     backup_mariadb_size()]
+
+    # The sections are staged in the archive directory and each staged
+    # section is only removed once copied into the archive, so the largest
+    # section is on disk twice at the end of the archive creation.
     backup_size = (backup_overhead_bytes +
-                   backup_etc_size() +
-                   backup_config_size(tsconfig.CONFIG_PATH) +
-                   backup_puppet_data_size(constants.HIERADATA_PERMDIR) +
-                   backup_keyring_size(keyring_permdir) +
-                   backup_ldap_size() +
-                   backup_postgres_size() +
-                   backup_std_dir_size(home_permdir) +
-                   backup_std_dir_size(patching_permdir) +
-                   backup_std_dir_size(patching_repo_permdir) +
-                   backup_std_dir_size(extension_permdir) +
-                   backup_std_dir_size(patch_vault_permdir) +
-                   backup_armada_manifest_size(constants.ARMADA_PERMDIR) +
-                   backup_std_dir_size(constants.HELM_CHARTS_PERMDIR) +
-                   backup_mariadb_size()
-                   )
+                   sum(section_sizes) +
+                   max(section_sizes))
 
     archive_dir_free_space = \
         utils.filesystem_get_free_space(archive_dir)
@@ -1099,95 +1485,47 @@ def backup(backup_name, archive_dir, clone=False):
 
         system_tar_path = os.path.join(archive_dir,
                                        backup_name + '_system.tgz')
-        system_archive = tarfile.open(system_tar_path, "w:gz")
-
-        step = 1
-        total_steps = 16
-
-        # Step 1: Backup etc
-        backup_etc(system_archive)
-        utils.progress(total_steps, step, 'backup etc', 'DONE')
-        step += 1
-
-        # Step 2: Backup configuration
-        backup_config(system_archive, tsconfig.CONFIG_PATH)
-        utils.progress(total_steps, step, 'backup configuration', 'DONE')
-        step += 1
-
-        # Step 3: Backup puppet data
-        backup_puppet_data(system_archive, constants.HIERADATA_PERMDIR)
-        utils.progress(total_steps, step, 'backup puppet data', 'DONE')
-        step += 1
-
-        # Step 4: Backup armada data
-        backup_armada_manifest_data(system_archive, constants.ARMADA_PERMDIR)
-        utils.progress(total_steps, step, 'backup armada data', 'DONE')
-        step += 1
-
-        # Step 5: Backup helm charts data
-        backup_std_dir(system_archive, constants.HELM_CHARTS_PERMDIR)
-        utils.progress(total_steps, step, 'backup helm charts', 'DONE')
-        step += 1
 
-        # Step 6: Backup keyring
-        backup_keyring(system_archive, keyring_permdir)
-        utils.progress(total_steps, step, 'backup keyring', 'DONE')
-        step += 1
-
-        # Step 7: Backup ldap
-        backup_ldap(system_archive, staging_dir)
-        utils.progress(total_steps, step, 'backup ldap', 'DONE')
-        step += 1
-
-        # Step 8: Backup postgres
-        backup_postgres(system_archive, staging_dir)
-        utils.progress(total_steps, step, 'backup postgres', 'DONE')
-        step += 1
-
-        # Step 9: Backup mariadb
-        backup_mariadb(system_archive, staging_dir)
-        utils.progress(total_steps, step, 'backup mariadb', 'DONE')
-        step += 1
-
-        # Step 10: Backup home
-        backup_std_dir(system_archive, home_permdir)
-        utils.progress(total_steps, step, 'backup home directory', 'DONE')
-        step += 1
-
-        # Step 11: Backup patching
+        # The sections are independent, so they are backed up and
+        # compressed concurrently.
+        sections = [
+            ('etc', backup_etc, ()),
+            ('configuration', backup_config, (tsconfig.CONFIG_PATH,)),
+            ('puppet data', backup_puppet_data,
+             (constants.HIERADATA_PERMDIR,)),
+            ('armada data', backup_armada_manifest_data,
+             (constants.ARMADA_PERMDIR,)),
+            ('helm charts', backup_std_dir,
+             (constants.HELM_CHARTS_PERMDIR,)),
+            ('keyring', backup_keyring, (keyring_permdir,)),
+            ('ldap', backup_ldap, (staging_dir,)),
+            ('postgres', backup_postgres, (staging_dir,)),
+            ('mariadb', backup_mariadb, (staging_dir,)),
+            ('home directory', backup_std_dir, (home_permdir,)),
+        ]
         if not clone:
-            backup_std_dir(system_archive, patching_permdir)
-            utils.progress(total_steps, step, 'backup patching', 'DONE')
-        step += 1
-
-        # Step 12: Backup patching repo
-        if not clone:
-            backup_std_dir(system_archive, patching_repo_permdir)
-            utils.progress(total_steps, step, 'backup patching repo', 'DONE')
-        step += 1
-
-        # Step 13: Backup extension filesystem
-        backup_std_dir(system_archive, extension_permdir)
-        utils.progress(total_steps, step, 'backup extension filesystem '
-                                          'directory', 'DONE')
-        step += 1
-
-        # Step 14: Backup patch-vault filesystem
+            sections.append(('patching', backup_std_dir,
+                             (patching_permdir,)))
+            sections.append(('patching repo', backup_std_dir,
+                             (patching_repo_permdir,)))
+        sections.append(('extension filesystem directory', backup_std_dir,
+                         (extension_permdir,)))
         if os.path.exists(patch_vault_permdir):
-            backup_std_dir(system_archive, patch_vault_permdir)
-            utils.progress(total_steps, step, 'backup patch-vault filesystem '
-                                              'directory', 'DONE')
-        step += 1
+            sections.append(('patch-vault filesystem directory',
+                             backup_std_dir, (patch_vault_permdir,)))
+        sections.append(('ceph crush map', backup_ceph_crush_map,
+                         (staging_dir,)))
 
-        # Step 15: Backup ceph crush map
-        backup_ceph_crush_map(system_archive, staging_dir)
-        utils.progress(total_steps, step, 'backup ceph crush map', 'DONE')
-        step += 1
+        total_steps = len(sections) + 1
+        results = backup_sections(staging_dir, sections, total_steps)
 
-        # Step 16: Create archive
-        system_archive.close()
-        utils.progress(total_steps, step, 'create archive', 'DONE')
-        step += 1
+        # Final step: Create archive
+        try:
+            write_backup_archive(system_tar_path, sections, results)
+        except (IOError, OSError, tarfile.TarError):
+            LOG.error("Failed to create backup archive.")
+            raise BackupFail("Failed to create backup archive")
+        utils.progress(total_steps, total_steps, 'create archive', 'DONE')
 
     except Exception:
         if system_tar_path and os.path.isfile(system_tar_path):
@@ -1270,7 +1608,7 @@ def restore_system(backup_file, include_storage_reinstall=False, clone=False):
 
         # Step 1: Open archive and verify installed load matches backup
         try:
-            archive = tarfile.open(backup_file)
+            archive = open_backup_archive(backup_file)
         except tarfile.TarError as e:
             LOG.exception(e)
             raise RestoreFail("Error opening backup file. Invalid backup "
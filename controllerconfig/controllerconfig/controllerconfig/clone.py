@@ -17,8 +17,9 @@ import time
 import shutil
 import netaddr
 import tempfile
-import fileinput
 import subprocess
+import collections
+import multiprocessing
 
 from controllerconfig.common import constants
 from sysinv.common import constants as si_const
@@ -41,6 +42,7 @@ RESULT = "result"
 IN_PROGRESS = "in-progress"
 FAIL = "failed"
 OK = "ok"
+REWRITE_PROCESSES = 4
 
 
 def clone_status():
@@ -461,53 +463,144 @@ def create_iso(iso_name, archive_dir):
             shutil.rmtree(tmpdir, ignore_errors=True)
 
 
-def find_and_replace_in_file(target, find, replace):
-    """ Find and replace a string in a file. """
-    found = None
-    try:
-        for line in fileinput.FileInput(target, inplace=1):
-            if find in line:
-                # look for "find" string within word boundaries
-                fpat = r'\b' + find + r'\b'
-                line = re.sub(fpat, replace, line)
-                found = True
-            print(line, end='')
+def _compile_matcher(finds):
+    """ Compile find strings into one regex matching any of them. """
+    # Longest first, so that a find string that is a prefix of another
+    # one does not shadow it.
+    alternatives = sorted(set(finds), key=lambda f: (-len(f), f))
+    return re.compile(br'\b(?:' + b'|'.join(
+        re.escape(f.encode('utf-8')) for f in alternatives) + br')\b')
+
+
+_rewrite_matchers = {}
+_rewrite_replacements = {}
+
+
+def _rewrite_init(matchers, replacements):
+    """ Set the matchers and replacements of a rewrite worker process. """
+    global _rewrite_matchers, _rewrite_replacements
+    _rewrite_matchers = matchers
+    _rewrite_replacements = replacements
+
 
+def _rewrite_file(task):
+    """ Rewrite a file in a single pass over its lines.
+
+    Returns the file and the number of times each find string was
+    replaced in it, or None if the file could not be rewritten.
+    """
+    target, key = task
+    matcher = _rewrite_matchers[key]
+    hits = collections.Counter()
+
+    def replace(match):
+        find = match.group(0)
+        hits[find] += 1
+        return _rewrite_replacements[find]
+
+    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target),
+                                        prefix='.rewrite')
+    try:
+        with open(target, 'rb') as src, os.fdopen(tmp_fd, 'wb') as dst:
+            for line in src:
+                dst.write(matcher.sub(replace, line))
+        if hits:
+            stat = os.stat(target)
+            os.chmod(tmp_path, stat.st_mode)
+            os.chown(tmp_path, stat.st_uid, stat.st_gid)
+            os.rename(tmp_path, target)
+        else:
+            os.remove(tmp_path)
     except Exception as e:
-        LOG.error("Failed to replace [{}] with [{}] in [{}]: {}"
-                  .format(find, replace, target, str(e)))
-        found = None
-    finally:
-        fileinput.close()
-    return found
+        LOG.error("Failed to rewrite [{}]: {}".format(target, str(e)))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+    return target, dict((find.decode('utf-8'), count)
+                        for find, count in hits.items())
+
+
+def _target_files(target):
+    """ List the regular files of a target file or directory. """
+    if os.path.isfile(target):
+        return [target]
+    files = []
+    for root, dirs, names in os.walk(target):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.isfile(path) and not os.path.islink(path):
+                files.append(path)
+    return files
+
+
+def find_and_replace_all(replacements):
+    """ Find and replace many strings in files in a single pass.
+
+    The replacements are (target_list, find, replace) tuples. The files of
+    each target are rewritten once, in parallel, matching all the find
+    strings which apply to them at the same time, so a replaced string is
+    never matched again by another find string.
+
+    Returns the number of times each find string was replaced.
+    """
+    replace_map = {}
+    file_finds = collections.defaultdict(set)
+    for target_list, find, replace in replacements:
+        if find not in replace_map:
+            replace_map[find] = replace
+        for target in target_list:
+            for path in _target_files(target):
+                file_finds[path].add(find)
+
+    # Files sharing the same find strings share a matcher, which the
+    # tasks refer to by key to keep them small
+    keys = {}
+    matchers = {}
+    tasks = []
+    for path, finds in sorted(file_finds.items()):
+        finds = frozenset(finds)
+        if finds not in keys:
+            keys[finds] = len(keys)
+            matchers[keys[finds]] = _compile_matcher(finds)
+        tasks.append((path, keys[finds]))
+    byte_map = dict((find.encode('utf-8'), replace.encode('utf-8'))
+                    for find, replace in replace_map.items())
+
+    if len(tasks) > 1:
+        pool = multiprocessing.Pool(min(len(tasks), REWRITE_PROCESSES),
+                                    initializer=_rewrite_init,
+                                    initargs=(matchers, byte_map))
+        try:
+            results = pool.map(_rewrite_file, tasks, chunksize=16)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        _rewrite_init(matchers, byte_map)
+        results = [_rewrite_file(task) for task in tasks]
+
+    counts = dict((find, 0) for find in replace_map)
+    file_lists = collections.defaultdict(list)
+    for result in results:
+        if not result:
+            continue
+        target, hits = result
+        for find, count in hits.items():
+            counts[find] += count
+            file_lists[find].append(target)
+
+    for find, replace in replace_map.items():
+        if not counts[find]:
+            LOG.error("[{}] not found in backup".format(find))
+        else:
+            LOG.info("Replaced [{}] with [{}] {} times in {}".format(
+                     find, replace, counts[find], file_lists[find]))
+    return counts
 
 
 def find_and_replace(target_list, find, replace):
     """ Find and replace a string in all files in a directory. """
-    found = False
-    file_list = []
-    for target in target_list:
-        if os.path.isfile(target):
-            if find_and_replace_in_file(target, find, replace):
-                found = True
-                file_list.append(target)
-        elif os.path.isdir(target):
-            try:
-                output = subprocess.check_output(
-                    ['grep', '-rl', find, target])
-                if output:
-                    for line in output.split('\n'):
-                        if line and find_and_replace_in_file(
-                           line, find, replace):
-                            found = True
-                            file_list.append(line)
-            except Exception:
-                pass  # nothing found in that directory
-    if not found:
-        LOG.error("[{}] not found in backup".format(find))
-    else:
-        LOG.info("Replaced [{}] with [{}] in {}".format(
-                 find, replace, file_list))
+    find_and_replace_all([(target_list, find, replace)])
 
 
 def remove_from_archive(archive, unwanted):
@@ -521,11 +614,24 @@ def remove_from_archive(archive, unwanted):
         raise CloneFail("Failed to modify backup archive")
 
 
-def update_oamip_in_archive(tmpdir):
-    """ Update OAM IP in system archive file. """
+def get_oamip_replacements(tmpdir):
+    """ Get the OAM IP replacements in system archive file. """
     oam_list = sysinv_api.get_oam_ip()
     if not oam_list:
         raise CloneFail("Failed to get OAM IP")
+    targets = [os.path.join(tmpdir, 'etc/hosts'),
+               os.path.join(tmpdir, 'etc/sysconfig/network-scripts'),
+               os.path.join(tmpdir, 'etc/nfv/vim/config.ini'),
+               os.path.join(tmpdir, 'etc/haproxy/haproxy.cfg'),
+               os.path.join(tmpdir, 'etc/heat/heat.conf'),
+               os.path.join(tmpdir, 'etc/keepalived/keepalived.conf'),
+               os.path.join(tmpdir, 'etc/vswitch/vswitch.ini'),
+               os.path.join(tmpdir, 'etc/nova/nova.conf'),
+               os.path.join(tmpdir, 'config/hosts'),
+               os.path.join(tmpdir, 'hieradata'),
+               os.path.join(tmpdir, 'postgres/keystone.sql.data'),
+               os.path.join(tmpdir, 'postgres/sysinv.sql.data')]
+    replacements = []
     for oamfind in [oam_list.oam_start_ip, oam_list.oam_end_ip,
                     oam_list.oam_subnet, oam_list.oam_floating_ip,
                     oam_list.oam_c0_ip, oam_list.oam_c1_ip]:
@@ -548,70 +654,53 @@ def update_oamip_in_archive(tmpdir):
             ipstr_list[1] = 'db8'
             repl_ipstr = ":".join(ipstr_list)
         if repl_ipstr:
-            find_and_replace(
-                [os.path.join(tmpdir, 'etc/hosts'),
-                 os.path.join(tmpdir, 'etc/sysconfig/network-scripts'),
-                 os.path.join(tmpdir, 'etc/nfv/vim/config.ini'),
-                 os.path.join(tmpdir, 'etc/haproxy/haproxy.cfg'),
-                 os.path.join(tmpdir, 'etc/heat/heat.conf'),
-                 os.path.join(tmpdir, 'etc/keepalived/keepalived.conf'),
-                 os.path.join(tmpdir, 'etc/vswitch/vswitch.ini'),
-                 os.path.join(tmpdir, 'etc/nova/nova.conf'),
-                 os.path.join(tmpdir, 'config/hosts'),
-                 os.path.join(tmpdir, 'hieradata'),
-                 os.path.join(tmpdir, 'postgres/keystone.sql.data'),
-                 os.path.join(tmpdir, 'postgres/sysinv.sql.data')],
-                find_str, repl_ipstr)
+            replacements.append((targets, find_str, repl_ipstr))
         else:
             LOG.error("Failed to modify OAM IP:[{}]"
                       .format(oamfind))
             raise CloneFail("Failed to modify OAM IP")
+    return replacements
 
 
-def update_mac_in_archive(tmpdir):
-    """ Update MAC addresses in system archive file. """
-    hostname = utils.get_controller_hostname()
-    macs = sysinv_api.get_mac_addresses(hostname)
-    for intf, mac in macs.items():
-        find_and_replace(
-            [os.path.join(tmpdir, 'postgres/sysinv.sql.data')],
-            mac, "CLONEISOMAC_{}{}".format(hostname, intf))
-
+def get_controller_hostnames():
+    """ Get the hostnames of the controllers of the system. """
+    hostnames = [utils.get_controller_hostname()]
     if (tsconfig.system_mode == si_const.SYSTEM_MODE_DUPLEX or
             tsconfig.system_mode == si_const.SYSTEM_MODE_DUPLEX_DIRECT):
-        hostname = utils.get_mate_controller_hostname()
+        hostnames.append(utils.get_mate_controller_hostname())
+    return hostnames
+
+
+def get_mac_replacements(tmpdir):
+    """ Get the MAC address replacements in system archive file. """
+    targets = [os.path.join(tmpdir, 'postgres/sysinv.sql.data')]
+    replacements = []
+    for hostname in get_controller_hostnames():
         macs = sysinv_api.get_mac_addresses(hostname)
         for intf, mac in macs.items():
-            find_and_replace(
-                [os.path.join(tmpdir, 'postgres/sysinv.sql.data')],
-                mac, "CLONEISOMAC_{}{}".format(hostname, intf))
-
+            replacements.append(
+                (targets, mac, "CLONEISOMAC_{}{}".format(hostname, intf)))
+    return replacements
 
-def update_disk_serial_id_in_archive(tmpdir):
-    """ Update disk serial id in system archive file. """
-    hostname = utils.get_controller_hostname()
-    disk_sids = sysinv_api.get_disk_serial_ids(hostname)
-    for d_dnode, d_sid in disk_sids.items():
-        find_and_replace(
-            [os.path.join(tmpdir, 'postgres/sysinv.sql.data')],
-            d_sid, "CLONEISODISKSID_{}{}".format(hostname, d_dnode))
 
-    if (tsconfig.system_mode == si_const.SYSTEM_MODE_DUPLEX or
-            tsconfig.system_mode == si_const.SYSTEM_MODE_DUPLEX_DIRECT):
-        hostname = utils.get_mate_controller_hostname()
+def get_disk_serial_id_replacements(tmpdir):
+    """ Get the disk serial id replacements in system archive file. """
+    targets = [os.path.join(tmpdir, 'postgres/sysinv.sql.data')]
+    replacements = []
+    for hostname in get_controller_hostnames():
         disk_sids = sysinv_api.get_disk_serial_ids(hostname)
         for d_dnode, d_sid in disk_sids.items():
-            find_and_replace(
-                [os.path.join(tmpdir, 'postgres/sysinv.sql.data')],
-                d_sid, "CLONEISODISKSID_{}{}".format(hostname, d_dnode))
+            replacements.append(
+                (targets, d_sid,
+                 "CLONEISODISKSID_{}{}".format(hostname, d_dnode)))
+    return replacements
 
 
-def update_sysuuid_in_archive(tmpdir):
-    """ Update system uuid in system archive file. """
+def get_sysuuid_replacements(tmpdir):
+    """ Get the system uuid replacement in system archive file. """
     sysuuid = sysinv_api.get_system_uuid()
-    find_and_replace(
-        [os.path.join(tmpdir, 'postgres/sysinv.sql.data')],
-        sysuuid, "CLONEISO_SYSTEM_UUID")
+    return [([os.path.join(tmpdir, 'postgres/sysinv.sql.data')],
+             sysuuid, "CLONEISO_SYSTEM_UUID")]
 
 
 def update_backup_archive(backup_name, archive_dir):
@@ -627,6 +716,10 @@ def update_backup_archive(backup_name, archive_dir):
         # the stale file from original side.
         remove_from_archive(path_to_archive + '.tar',
                             'etc/udev/rules.d/70-persistent-net.rules')
+        # The archive is recompressed as a whole below, so the manifest
+        # indexing its compressed sections no longer applies.
+        remove_from_archive(path_to_archive + '.tar',
+                            backup_restore.BACKUP_MANIFEST)
         # Extract only a subset of directories which have files to be
         # updated for oam-ip and MAC addresses. After updating the files
         # these directories are added back to the archive.
@@ -637,10 +730,12 @@ def update_backup_archive(backup_name, archive_dir):
              'etc', 'postgres', 'config',
              'hieradata'],
             stdout=DEVNULL, stderr=DEVNULL)
-        update_oamip_in_archive(tmpdir)
-        update_mac_in_archive(tmpdir)
-        update_disk_serial_id_in_archive(tmpdir)
-        update_sysuuid_in_archive(tmpdir)
+        # Update the oam-ip, MAC addresses, disk serial ids and system
+        # uuid in a single pass over the extracted files.
+        find_and_replace_all(get_oamip_replacements(tmpdir) +
+                             get_mac_replacements(tmpdir) +
+                             get_disk_serial_id_replacements(tmpdir) +
+                             get_sysuuid_replacements(tmpdir))
         subprocess.check_call(
             ['tar', '--update',
              '--directory=' + tmpdir,
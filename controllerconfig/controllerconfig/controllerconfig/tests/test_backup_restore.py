@@ -0,0 +1,198 @@
+"""
+Copyright (c) 2019 Wind River Systems, Inc.
+
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+import gzip
+import hashlib
+import io
+import mock
+import os
+import pytest
+import sys
+import tarfile
+
+from controllerconfig.common.exceptions import BackupFail
+
+sys.modules['fm_core'] = mock.Mock()
+
+import controllerconfig.backup_restore as br  # noqa: E402
+
+
+def _create_dir(tmpdir, name, num_files):
+    directory = tmpdir.mkdir(name)
+    for i in range(num_files):
+        directory.join('file%d' % i).write('%s data %d\n' % (name, i) * 100)
+    return str(directory)
+
+
+def _backup_dump(archive, staging_dir):
+    br.add_directory_entry(archive, 'postgres')
+    br.add_command_output(archive, 'postgres/sysinv.sql.data',
+                          'echo dump; seq 1 1000', staging_dir)
+
+
+def _create_backup(tmpdir):
+    staging_dir = str(tmpdir.mkdir('staging'))
+    sections = [
+        ('etc', br.backup_std_dir, (_create_dir(tmpdir, 'etc', 20),)),
+        ('home directory', br.backup_std_dir,
+         (_create_dir(tmpdir, 'home', 10),)),
+        ('postgres', _backup_dump, (staging_dir,)),
+    ]
+    results = br.backup_sections(staging_dir, sections, len(sections) + 1)
+    archive_path = str(tmpdir.join('backup_system.tgz'))
+    br.write_backup_archive(archive_path, sections, results)
+
+    # The section files are removed once copied into the archive
+    assert os.listdir(staging_dir) == []
+    return archive_path
+
+
+def test_backup_archive(tmpdir):
+    """ Test that the backup sections make up a regular tar archive """
+    archive_path = _create_backup(tmpdir)
+
+    archive = tarfile.open(archive_path, 'r:gz')
+    names = archive.getnames()
+    assert names[0] == br.BACKUP_MANIFEST
+    assert 'etc/file19' in names
+    assert 'home/file9' in names
+    data = archive.extractfile('postgres/sysinv.sql.data').read()
+    assert data.startswith(b'dump\n1\n2\n')
+
+
+def test_backup_manifest(tmpdir):
+    """ Test that the manifest describes each compressed section """
+    archive_path = _create_backup(tmpdir)
+
+    with open(archive_path, 'rb') as archive_file:
+        manifest, base = br.read_backup_manifest(archive_file)
+        assert manifest['version'] == br.BACKUP_MANIFEST_VERSION
+        assert ([s['name'] for s in manifest['sections']] ==
+                ['etc', 'home directory', 'postgres'])
+        assert ([s['prefixes'] for s in manifest['sections']] ==
+                [['etc'], ['home'], ['postgres']])
+
+        for section in manifest['sections']:
+            archive_file.seek(base + section['offset'])
+            data = archive_file.read(section['size'])
+            assert hashlib.sha256(data).hexdigest() == section['sha256']
+            raw = gzip.GzipFile(fileobj=io.BytesIO(data)).read()
+            assert len(raw) == section['raw_size']
+
+
+def test_backup_manifest_missing(tmpdir):
+    """ Test reading the manifest of an archive without one """
+    archive_path = str(tmpdir.join('old_system.tgz'))
+    archive = tarfile.open(archive_path, 'w:gz')
+    archive.add(_create_dir(tmpdir, 'etc', 5), arcname='etc')
+    archive.close()
+
+    with open(archive_path, 'rb') as archive_file:
+        assert br.read_backup_manifest(archive_file) == (None, None)
+
+
+def test_backup_manifest_recompressed(tmpdir):
+    """ Test that the manifest is ignored once the archive is recompressed """
+    archive_path = _create_backup(tmpdir)
+    with gzip.open(archive_path, 'rb') as archive_file:
+        data = archive_file.read()
+    with gzip.open(archive_path, 'wb') as archive_file:
+        archive_file.write(data)
+
+    with open(archive_path, 'rb') as archive_file:
+        assert br.read_backup_manifest(archive_file) == (None, None)
+    archive = br.open_backup_archive(archive_path)
+    try:
+        assert not isinstance(archive, br.BackupArchive)
+        assert br.file_exists_in_archive(archive, 'home/file3')
+    finally:
+        archive.close()
+
+
+def test_backup_section_failure(tmpdir):
+    """ Test that a failing section fails the backup """
+    staging_dir = str(tmpdir.mkdir('staging'))
+    sections = [
+        ('etc', br.backup_std_dir, (_create_dir(tmpdir, 'etc', 5),)),
+        ('missing', br.backup_std_dir, (str(tmpdir.join('missing')),)),
+    ]
+    with pytest.raises((BackupFail, OSError)):
+        br.backup_sections(staging_dir, sections, len(sections) + 1)
+
+
+def test_check_size_accounts_for_staged_section(tmpdir):
+    """ Test that the largest section is budgeted twice """
+    gib = 1024 ** 3
+    sizes = {'backup_etc_size': gib,
+             'backup_config_size': 0,
+             'backup_puppet_data_size': 0,
+             'backup_keyring_size': 0,
+             'backup_ldap_size': 0,
+             'backup_postgres_size': 3 * gib,
+             'backup_std_dir_size': 0,
+             'backup_armada_manifest_size': 0,
+             'backup_mariadb_size': 0}
+    patches = [mock.patch.object(br, name, return_value=size)
+               for name, size in sizes.items()]
+    for patch in patches:
+        patch.start()
+    try:
+        # overhead + sections + staged copy of the postgres section
+        with mock.patch.object(br.utils, 'filesystem_get_free_space',
+                               return_value=8 * gib):
+            br.check_size(str(tmpdir))
+        with mock.patch.object(br.utils, 'filesystem_get_free_space',
+                               return_value=8 * gib - 1):
+            with pytest.raises(BackupFail):
+                br.check_size(str(tmpdir))
+    finally:
+        for patch in patches:
+            patch.stop()
+
+
+def test_restore_indexed_archive(tmpdir):
+    """ Test that restore only reads the sections it extracts """
+    archive_path = _create_backup(tmpdir)
+
+    archive = br.open_backup_archive(archive_path)
+    try:
+        assert isinstance(archive, br.BackupArchive)
+        assert br.file_exists_in_archive(archive, 'home/file3')
+        assert not br.file_exists_in_archive(archive, 'home/missing')
+        assert not br.file_exists_in_archive(archive, 'missing/file')
+
+        dest_dir = tmpdir.mkdir('restore')
+        members = list(br.filter_directory(archive, 'postgres'))
+        assert ([m.name for m in members] ==
+                ['postgres', 'postgres/sysinv.sql.data'])
+        archive.extractall(path=str(dest_dir), members=members)
+        assert (dest_dir.join('postgres', 'sysinv.sql.data').read()
+                .startswith('dump\n'))
+
+        # The etc section was never read
+        assert sorted(archive._section_members) == [1, 2]
+
+        br.restore_etc_file(archive, str(dest_dir), 'file7')
+        assert dest_dir.join('file7').read().startswith('etc data 7\n')
+        assert len(archive.getmembers()) == 21 + 11 + 2
+    finally:
+        archive.close()
+
+
+def test_restore_archive_without_manifest(tmpdir):
+    """ Test that archives without a manifest are opened as tar archives """
+    archive_path = str(tmpdir.join('old_system.tgz'))
+    archive = tarfile.open(archive_path, 'w:gz')
+    archive.add(_create_dir(tmpdir, 'etc', 5), arcname='etc')
+    archive.close()
+
+    archive = br.open_backup_archive(archive_path)
+    try:
+        assert not isinstance(archive, br.BackupArchive)
+        assert len(list(br.filter_directory(archive, 'etc'))) == 6
+    finally:
+        archive.close()
@@ -0,0 +1,82 @@
+"""
+Copyright (c) 2019 Wind River Systems, Inc.
+
+SPDX-License-Identifier: Apache-2.0
+
+"""
+
+import mock
+import os
+import sys
+
+sys.modules['fm_core'] = mock.Mock()
+
+import controllerconfig.clone as clone  # noqa: E402
+
+
+def _create_tree(tmpdir, num_files):
+    etc_dir = tmpdir.mkdir('etc').mkdir('hosts.d')
+    for i in range(num_files):
+        etc_dir.join('host%d' % i).write(
+            '10.10.10.3 controller\n10.10.10.30 floating\n'
+            'x10.10.10.3x 10a10b10c3\n')
+    postgres_dir = tmpdir.mkdir('postgres')
+    postgres_dir.join('sysinv.sql.data').write(
+        'mac 08:00:27:d4:45:1e uuid 2a6d3f2e\n10.10.10.3 10.10.10.30\n')
+    return str(etc_dir), str(postgres_dir.join('sysinv.sql.data'))
+
+
+def test_find_and_replace_all(tmpdir):
+    """ Test that all the replacements are made in a single pass """
+    etc_dir, sql_file = _create_tree(tmpdir, 10)
+    os.chmod(os.path.join(etc_dir, 'host0'), 0o640)
+
+    counts = clone.find_and_replace_all([
+        ([etc_dir, sql_file], '10.10.10.3', '192.0.10.3'),
+        ([etc_dir, sql_file], '10.10.10.30', '192.0.10.30'),
+        ([sql_file], '08:00:27:d4:45:1e', 'CLONEISOMAC_controller-0eth0'),
+        ([sql_file], '2a6d3f2e', 'CLONEISO_SYSTEM_UUID'),
+        ([sql_file], 'missing', 'unused'),
+    ])
+    assert counts == {'10.10.10.3': 11,
+                      '10.10.10.30': 11,
+                      '08:00:27:d4:45:1e': 1,
+                      '2a6d3f2e': 1,
+                      'missing': 0}
+
+    host0 = os.path.join(etc_dir, 'host0')
+    with open(host0) as f:
+        assert f.read() == ('192.0.10.3 controller\n192.0.10.30 floating\n'
+                            'x10.10.10.3x 10a10b10c3\n')
+    assert os.stat(host0).st_mode & 0o777 == 0o640
+    with open(sql_file) as f:
+        assert f.read() == ('mac CLONEISOMAC_controller-0eth0 '
+                            'uuid CLONEISO_SYSTEM_UUID\n'
+                            '192.0.10.3 192.0.10.30\n')
+    assert sorted(os.listdir(etc_dir)) == sorted(
+        'host%d' % i for i in range(10))
+
+
+def test_find_and_replace_single_pass(tmpdir):
+    """ Test that a replaced string is not matched again """
+    etc_dir, sql_file = _create_tree(tmpdir, 1)
+
+    counts = clone.find_and_replace_all([
+        ([sql_file], '2a6d3f2e', '10.10.10.3'),
+        ([sql_file], '10.10.10.3', '2a6d3f2e'),
+    ])
+    assert counts == {'2a6d3f2e': 1, '10.10.10.3': 1}
+    with open(sql_file) as f:
+        assert f.read() == ('mac 08:00:27:d4:45:1e uuid 10.10.10.3\n'
+                            '2a6d3f2e 10.10.10.30\n')
+
+
+def test_find_and_replace(tmpdir):
+    """ Test replacing a single string in a directory """
+    etc_dir, sql_file = _create_tree(tmpdir, 3)
+
+    clone.find_and_replace([etc_dir], 'controller', 'controller-0')
+    with open(os.path.join(etc_dir, 'host2')) as f:
+        assert f.readline() == '10.10.10.3 controller-0\n'
+    with open(sql_file) as f:
+        assert 'controller' not in f.read()
@@ -14,6 +14,7 @@
 import os
 import pyudev
 import re
+import six
 import subprocess
 import sys
 
@@ -27,11 +28,20 @@ from sysinv.openstack.common import context
 
 LOG = logging.getLogger(__name__)
 
+SYS_BLOCK_PATH = '/sys/block'
+
+# Size of the GPT partition entries array: 128 entries of 128 bytes
+GPT_PARTITION_ENTRIES_BYTES = 128 * 128
+
+# Unit of the sizes reported by sysfs, regardless of the sector size
+SYSFS_SECTOR_BYTES = 512
+
 
 class DiskOperator(object):
     '''Class to encapsulate Disk operations for System Inventory'''
 
-    def __init__(self):
+    def __init__(self, sys_block=SYS_BLOCK_PATH):
+        self._sys_block = sys_block
 
         self.num_cpus = 0
         self.num_nodes = 0
@@ -130,7 +140,99 @@ class DiskOperator(object):
                                          avail_space_sectors_output)[0].rstrip()
 
         # Free space in MiB.
-        avail_space_mib = (int(sector_size_bytes) * int(avail_space_sectors) /
+        avail_space_mib = (int(sector_size_bytes) * int(avail_space_sectors) //
+                           (1024 ** 2))
+
+        # Keep 2 MiB for partition table.
+        if avail_space_mib >= 2:
+            avail_space_mib = avail_space_mib - 2
+        else:
+            avail_space_mib = 0
+
+        return avail_space_mib
+
+    def _read_sys_block(self, device_name, attribute):
+        """Read a sysfs attribute of a block device, None if missing"""
+        try:
+            with open(os.path.join(self._sys_block, device_name,
+                                   attribute), 'r') as f:
+                return f.read().strip()
+        except (IOError, OSError):
+            return None
+
+    def get_pv_names(self):
+        """Return the set of physical volume names, None on failure.
+
+        A single pvs call replaces the per disk checks done by
+        get_disk_available_mib.
+        """
+        pvs_process = subprocess.Popen(
+            ['pvs', '--noheadings', '-o', 'pv_name'],
+            stdout=subprocess.PIPE, universal_newlines=True)
+        pvs_output = pvs_process.communicate()[0]
+        if pvs_process.returncode != 0:
+            return None
+        return set(pvs_output.split())
+
+    def get_disk_size_mib_sysfs(self, device_name):
+        """Return the size of a disk from sysfs, None if not available"""
+        size = self._read_sys_block(device_name, 'size')
+        if size is None:
+            return None
+        return int(size) * SYSFS_SECTOR_BYTES // (1024 ** 2)
+
+    def get_disk_available_mib_sysfs(self, device, pv_names):
+        """Compute the free space of a GPT disk from sysfs.
+
+        The free space is the size of the usable area of the GPT disk, minus
+        the size of its partitions, as reported by sgdisk.
+
+        :param device: the pyudev device of the disk
+        :param pv_names: set of physical volume names, see get_pv_names
+        :returns: the free space in MiB, None if not available from sysfs
+        """
+        if pv_names is None:
+            return None
+
+        # The partition table type is probed by udev (blkid)
+        if device.get('ID_PART_TABLE_TYPE') != 'gpt':
+            LOG.debug("Format of disk node %s is not GPT." %
+                      device.device_node)
+            return 0
+
+        if device.device_node in pv_names:
+            LOG.debug("Disk %s is completely used by a PV => 0 available mib."
+                      % device.device_node)
+            return 0
+
+        device_name = os.path.basename(device.device_node)
+        size = self._read_sys_block(device_name, 'size')
+        sector_size = self._read_sys_block(device_name,
+                                           'queue/logical_block_size')
+        if size is None or sector_size is None:
+            return None
+        sector_size = int(sector_size)
+
+        used_bytes = 0
+        for entry in os.listdir(os.path.join(self._sys_block, device_name)):
+            if not entry.startswith(device_name):
+                continue
+            partition_size = self._read_sys_block(
+                device_name, os.path.join(entry, 'size'))
+            if partition_size is not None and os.path.exists(os.path.join(
+                    self._sys_block, device_name, entry, 'partition')):
+                used_bytes += int(partition_size) * SYSFS_SECTOR_BYTES
+
+        # The protective MBR, the GPT headers and the partition entries
+        # arrays at both ends of the disk are not usable
+        entries_sectors = -(-GPT_PARTITION_ENTRIES_BYTES // sector_size)
+        reserved_sectors = 3 + 2 * entries_sectors
+        total_sectors = int(size) * SYSFS_SECTOR_BYTES // sector_size
+        avail_space_sectors = (total_sectors - reserved_sectors -
+                               used_bytes // sector_size)
+
+        # Free space in MiB.
+        avail_space_mib = (sector_size * max(avail_space_sectors, 0) //
                            (1024 ** 2))
 
         # Keep 2 MiB for partition table.
@@ -141,6 +243,79 @@ class DiskOperator(object):
 
         return avail_space_mib
 
+    @staticmethod
+    def _decode_udev_string(value):
+        """Decode the \\xNN escapes of an udev _ENC property
+
+        The escapes encode the bytes of an UTF-8 string, so the property is
+        rebuilt as bytes and decoded once.
+        """
+        if isinstance(value, six.binary_type):
+            value = value.decode('utf-8', 'replace')
+        data = bytearray()
+        parts = re.split(r'\\x([0-9a-fA-F]{2})', value)
+        for index, part in enumerate(parts):
+            if index % 2:
+                data.append(int(part, 16))
+            else:
+                data.extend(part.encode('utf-8'))
+        return data.decode('utf-8', 'replace').strip()
+
+    def get_disk_model(self, device):
+        """Return the model of a disk from udev or sysfs.
+
+        ID_MODEL received from udev is not correct for disks that are used
+        entirely for LVM, as LVM replaces it with its own identifier that
+        starts with "LVM PV". ID_MODEL_ENC is not replaced, and holds the
+        full ATA model, unlike the SCSI model found in sysfs.
+
+        :returns: the model, None if not available
+        """
+        model_num = device.get('ID_MODEL_ENC')
+        if model_num:
+            model_num = self._decode_udev_string(model_num)
+        if not model_num:
+            model_num = self._read_sys_block(
+                os.path.basename(device.device_node), 'device/model')
+        return model_num or None
+
+    def get_disk_model_by_command(self, device):
+        """Return the model of a disk using the hdparm or lsblk commands"""
+        # ID_MODEL received from udev is not correct for disks that
+        # are used entirely for LVM. LVM replaced the model ID with
+        # its own identifier that starts with "LVM PV".For this
+        # reason we will attempt to retrieve the correct model ID
+        # by using 2 different commands: hdparm and lsblk and
+        # hdparm. If one of them fails, the other one can attempt
+        # to retrieve the information. Else we use udev.
+
+        # try hdparm command first
+        hdparm_command = 'hdparm -I %s |grep Model' % (
+            device.get('DEVNAME'))
+        hdparm_process = subprocess.Popen(
+            hdparm_command,
+            stdout=subprocess.PIPE,
+            shell=True)
+        hdparm_output = hdparm_process.communicate()[0]
+        if hdparm_process.returncode == 0:
+            second_half = hdparm_output.split(':')[1]
+            model_num = second_half.strip()
+        else:
+            # try lsblk command
+            lsblk_command = 'lsblk -dn --output MODEL %s' % (
+                                 device.get('DEVNAME'))
+            lsblk_process = subprocess.Popen(
+                                lsblk_command,
+                                stdout=subprocess.PIPE,
+                                shell=True)
+            lsblk_output = lsblk_process.communicate()[0]
+            if lsblk_process.returncode == 0:
+                model_num = lsblk_output.strip()
+            else:
+                # both hdparm and lsblk commands failed, try udev
+                model_num = device.get('ID_MODEL')
+        return model_num
+
     def disk_format_gpt(self, host_uuid, idisk_dict, is_cinder_device):
         disk_node = idisk_dict.get('device_path')
 
@@ -184,17 +359,9 @@ class DiskOperator(object):
 
         # Obtain the path to the rotational file for the current device.
         device = device_name['DEVNAME'].split('/')[-1]
-        rotational_path = "/sys/block/{device}/queue/rotational"\
-                          .format(device=device)
 
-        rotational = None
         # Read file and remove trailing whitespaces.
-        if os.path.isfile(rotational_path):
-            with open(rotational_path, 'r') as rot_file:
-                rotational = rot_file.read()
-            rotational = rotational.rstrip()
-
-        return rotational
+        return self._read_sys_block(device, 'queue/rotational')
 
     def get_device_id_wwn(self, device):
         """Determine the ID and WWN of a disk from the value of the DEVLINKS
@@ -231,11 +398,21 @@ class DiskOperator(object):
     def idisk_get(self):
         """Enumerate disk topology based on:
 
+        udev properties and sysfs attributes, the commands forked for each
+        disk are only used when sysfs lacks an attribute.
+
         :param self
         :returns list of disk and attributes
         """
         idisk = []
         context = pyudev.Context()
+        rootfs_node = self.get_rootfs_node()
+        try:
+            pv_names = self.get_pv_names()
+        except Exception as e:
+            self.handle_exception("Could not retrieve physical volumes - %s"
+                                  % e)
+            pv_names = None
 
         for device in context.list_devices(DEVTYPE='disk'):
             if not utils.is_system_usable_block_device(device):
@@ -265,52 +442,29 @@ class DiskOperator(object):
                 serial_id = ''
 
                 # Can merge all try/except in one block but this allows at least attributes with no exception to be filled
+                device_name = os.path.basename(device.device_node)
                 try:
-                    size_mib = utils.get_disk_capacity_mib(device.device_node)
+                    size_mib = self.get_disk_size_mib_sysfs(device_name)
+                    if size_mib is None:
+                        size_mib = utils.get_disk_capacity_mib(
+                            device.device_node)
                 except Exception as e:
                     self.handle_exception("Could not retrieve disk size - %s "
                                           % e)
 
                 try:
-                    available_mib = self.get_disk_available_mib(
-                        device_node=device.device_node)
+                    available_mib = self.get_disk_available_mib_sysfs(
+                        device, pv_names)
+                    if available_mib is None:
+                        available_mib = self.get_disk_available_mib(
+                            device_node=device.device_node)
                 except Exception as e:
                     self.handle_exception("Could not retrieve disk %s free space" % e)
 
                 try:
-                    # ID_MODEL received from udev is not correct for disks that
-                    # are used entirely for LVM. LVM replaced the model ID with
-                    # its own identifier that starts with "LVM PV".For this
-                    # reason we will attempt to retrieve the correct model ID
-                    # by using 2 different commands: hdparm and lsblk and
-                    # hdparm. If one of them fails, the other one can attempt
-                    # to retrieve the information. Else we use udev.
-
-                    # try hdparm command first
-                    hdparm_command = 'hdparm -I %s |grep Model' % (
-                        device.get('DEVNAME'))
-                    hdparm_process = subprocess.Popen(
-                        hdparm_command,
-                        stdout=subprocess.PIPE,
-                        shell=True)
-                    hdparm_output = hdparm_process.communicate()[0]
-                    if hdparm_process.returncode == 0:
-                        second_half = hdparm_output.split(':')[1]
-                        model_num = second_half.strip()
-                    else:
-                        # try lsblk command
-                        lsblk_command = 'lsblk -dn --output MODEL %s' % (
-                                             device.get('DEVNAME'))
-                        lsblk_process = subprocess.Popen(
-                                            lsblk_command,
-                                            stdout=subprocess.PIPE,
-                                            shell=True)
-                        lsblk_output = lsblk_process.communicate()[0]
-                        if lsblk_process.returncode == 0:
-                            model_num = lsblk_output.strip()
-                        else:
-                            # both hdparm and lsblk commands failed, try udev
-                            model_num = device.get('ID_MODEL')
+                    model_num = self.get_disk_model(device)
+                    if model_num is None:
+                        model_num = self.get_disk_model_by_command(device)
                     if not model_num:
                         model_num = constants.DEVICE_MODEL_UNKNOWN
                 except Exception as e:
@@ -330,18 +484,18 @@ class DiskOperator(object):
                 if model_num:
                     capabilities.update({'model_num': model_num})
 
-                if self.get_rootfs_node() == device.device_node:
+                if rootfs_node == device.device_node:
                     capabilities.update({'stor_function': 'rootfs'})
 
                 rotational = self.is_rotational(device)
                 device_type = device.device_type
 
                 rotation_rate = constants.DEVICE_TYPE_UNDETERMINED
-                if rotational is '1':
+                if rotational == '1':
                     device_type = constants.DEVICE_TYPE_HDD
                     if 'ID_ATA_ROTATION_RATE_RPM' in device:
                         rotation_rate = device['ID_ATA_ROTATION_RATE_RPM']
-                elif rotational is '0':
+                elif rotational == '0':
                     if constants.DEVICE_NAME_NVME in device.device_node:
                         device_type = constants.DEVICE_TYPE_NVME
                     else:
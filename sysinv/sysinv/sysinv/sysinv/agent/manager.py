@@ -64,6 +64,7 @@ from sysinv.objects import base as objects_base
 from sysinv.puppet import common as puppet
 from sysinv.conductor import rpcapi as conductor_rpcapi
 from sysinv.openstack.common import context as mycontext
+from sysinv.openstack.common import excutils
 from sysinv.openstack.common import log
 from sysinv.openstack.common import periodic_task
 from sysinv.openstack.common.rpc.common import Timeout
@@ -88,6 +89,10 @@ agent_opts = [
        cfg.IntOpt('audit_interval',
                   default=60,
                   help='Maximum time since the last check-in of a agent'),
+       cfg.IntOpt('inventory_full_sync_interval',
+                  default=600,
+                  help=('Interval in seconds between reports of the full '
+                        'inventory, including unchanged categories')),
               ]
 
 CONF = cfg.CONF
@@ -148,10 +153,8 @@ class AgentManager(service.PeriodicService):
         self._ihost_uuid = ""
         self._agent_throttle = 0
         self._mgmt_ip = None
-        self._prev_disk = None
-        self._prev_partition = None
-        self._prev_lvg = None
-        self._prev_pv = None
+        self._inventory_hashes = {}
+        self._inventory_full_sync = time.time()
         self._subfunctions = None
         self._subfunctions_configured = False
         self._notify_subfunctions_alarm_clear = False
@@ -365,7 +368,8 @@ class AgentManager(service.PeriodicService):
 
         return config_uuid
 
-    def host_lldp_get_and_report(self, context, rpcapi, host_uuid):
+    def _get_lldp_inventory(self):
+        """Return the lists of LLDP agents and neighbours of the host"""
         neighbour_dict_array = []
         agent_dict_array = []
         neighbours = []
@@ -403,16 +407,6 @@ class AgentManager(service.PeriodicService):
             }
             neighbour_dict_array.append(neighbour_dict)
 
-        if neighbour_dict_array:
-            try:
-                rpcapi.lldp_neighbour_update_by_host(context,
-                                                     host_uuid,
-                                                     neighbour_dict_array)
-            except exception.SysinvException:
-                LOG.exception("Sysinv Agent exception updating lldp neighbours.")
-                self._lldp_operator.lldp_neighbours_clear()
-                pass
-
         try:
             agents = self._lldp_operator.lldp_agents_list()
         except Exception as e:
@@ -437,6 +431,21 @@ class AgentManager(service.PeriodicService):
             }
             agent_dict_array.append(agent_dict)
 
+        return agent_dict_array, neighbour_dict_array
+
+    def host_lldp_get_and_report(self, context, rpcapi, host_uuid):
+        agent_dict_array, neighbour_dict_array = self._get_lldp_inventory()
+
+        if neighbour_dict_array:
+            try:
+                rpcapi.lldp_neighbour_update_by_host(context,
+                                                     host_uuid,
+                                                     neighbour_dict_array)
+            except exception.SysinvException:
+                LOG.exception("Sysinv Agent exception updating lldp neighbours.")
+                self._lldp_operator.lldp_neighbours_clear()
+                pass
+
         if agent_dict_array:
             try:
                 rpcapi.lldp_agent_update_by_host(context,
@@ -568,8 +577,11 @@ class AgentManager(service.PeriodicService):
     def _get_ports_inventory(self):
         """Collect ports inventory for this host"""
 
+        # scan the pci devices once for both the nics and the devices
+        pci_devices = self._ipci_operator.pci_devices_list()
+
         # find list of network related inics for this host
-        inics = self._ipci_operator.inics_get()
+        inics = self._ipci_operator.inics_get(pci_devices)
 
         # create an array of ports for each net entry of the NIC device
         iports = []
@@ -585,7 +597,7 @@ class AgentManager(service.PeriodicService):
                 iports.append(pci.Port(inic, **net))
 
         # find list of pci devices for this host
-        pci_devices = self._ipci_operator.pci_devices_get()
+        pci_devices = self._ipci_operator.pci_devices_get(pci_devices)
 
         # create an array of pci_devs for each net entry of the device
         pci_devs = []
@@ -793,6 +805,99 @@ class AgentManager(service.PeriodicService):
                           "conductor.")
             pass
 
+        if not self._report_inventory_snapshot(icontext, rpcapi,
+                                               port_list, pci_device_list):
+            self._report_inventory_by_category(icontext, rpcapi, ihost,
+                                               port_list, pci_device_list)
+
+        if constants.WORKER in self.subfunctions_list_get():
+            platform_interfaces = []
+            # retrieve the mgmt interfaces and associated numa nodes
+            try:
+                platform_interfaces = rpcapi.get_platform_interfaces(icontext,
+                                                                     ihost['id'])
+            except exception.SysinvException:
+                LOG.exception("Sysinv Agent exception getting platform interfaces.")
+                pass
+            self._update_interface_irq_affinity(self, platform_interfaces)
+
+        # Ensure subsequent unlocks are faster
+        nova_lvgs = rpcapi.ilvg_get_nova_ilvg_by_ihost(icontext, self._ihost_uuid)
+        if self._ihost_uuid and \
+           os.path.isfile(tsc.INITIAL_CONFIG_COMPLETE_FLAG):
+            if not self._report_to_conductor_iplatform_avail_flag and \
+               not self._wait_for_nova_lvg(icontext, rpcapi, self._ihost_uuid, nova_lvgs):
+                imsg_dict = {'availability': constants.AVAILABILITY_AVAILABLE}
+
+                config_uuid = self.iconfig_read_config_applied()
+                imsg_dict.update({'config_applied': config_uuid})
+
+                iscsi_initiator_name = self.get_host_iscsi_initiator_name()
+                if iscsi_initiator_name is not None:
+                    imsg_dict.update({'iscsi_initiator_name': iscsi_initiator_name})
+
+                self.platform_update_by_host(rpcapi,
+                                             icontext,
+                                             self._ihost_uuid,
+                                             imsg_dict)
+
+                self._report_to_conductor_iplatform_avail()
+                self._iconfig_read_config_reported = config_uuid
+
+    @utils.synchronized(constants.PARTITION_MANAGE_LOCK)
+    def _report_inventory_snapshot(self, icontext, rpcapi,
+                                   port_list, pci_device_list):
+        """Report the full inventory of the host with a single request.
+
+        :returns: False if the conductor does not support the request yet
+        """
+        inumas, icpus = self._inode_operator.inodes_get_inumas_icpus()
+        inventory = {
+            'iport': port_list,
+            'pci_device': pci_device_list,
+            'inuma': inumas,
+            'icpu': icpus,
+            'imemory': self._inode_operator.inodes_get_imemory(),
+            'idisk': self._idisk_operator.idisk_get(),
+            'ipartition': self._ipartition_operator.ipartition_get(),
+            'ipv': self._ipv_operator.ipv_get(),
+            'ilvg': self._ilvg_operator.ilvg_get(),
+        }
+        if self._is_config_complete():
+            inventory['lldp_agent'], inventory['lldp_neighbour'] = \
+                self._get_lldp_inventory()
+
+        # The full inventory is reported, record it so that the audit only
+        # reports the categories changing afterwards
+        self._inventory_reset()
+        self._inventory_full_sync = time.time()
+        for category in ['imemory', 'idisk', 'ipartition', 'ipv', 'ilvg']:
+            self._inventory_changed(category, inventory[category])
+
+        inventory['force_grub_update'] = self._force_grub_update()
+        try:
+            rpcapi.inventory_report_by_ihost(icontext, self._ihost_uuid,
+                                             inventory)
+        except RemoteError as e:
+            self._inventory_reset()
+            if e.exc_type == 'UnsupportedRpcVersion':
+                LOG.info("Conductor does not support inventory snapshots, "
+                         "reporting the inventory by category.")
+                self._first_grub_update = False
+                return False
+            LOG.error("inventory_report_by_ihost RemoteError exc_type=%s" %
+                      e.exc_type)
+            # report the inventory again at the next audit
+            self._report_to_conductor = False
+        except exception.SysinvException:
+            LOG.exception("Sysinv Agent exception reporting inventory.")
+            self._inventory_reset()
+            self._report_to_conductor = False
+        return True
+
+    def _report_inventory_by_category(self, icontext, rpcapi, ihost,
+                                      port_list, pci_device_list):
+        """Report the inventory of the host with a request per category"""
         self._report_port_inventory(icontext, rpcapi,
                                     port_list, pci_device_list)
 
@@ -837,8 +942,14 @@ class AgentManager(service.PeriodicService):
             LOG.exception("Sysinv Agent uncaught exception updating icpus conductor.")
             pass
 
+        # The full inventory is reported, record it so that the audit only
+        # reports the categories changing afterwards
+        self._inventory_reset()
+        self._inventory_full_sync = time.time()
+
         imemory = self._inode_operator.inodes_get_imemory()
         if imemory:
+            self._inventory_changed('imemory', imemory)
             try:
                 # may get duplicate key if already sent on earlier init
                 rpcapi.imemory_update_by_ihost(icontext,
@@ -848,13 +959,16 @@ class AgentManager(service.PeriodicService):
                 LOG.error("imemory_update_by_ihost RemoteError exc_type=%s" %
                           e.exc_type)
                 # Allow the audit to update
+                self._inventory_reset('imemory')
                 pass
             except exception.SysinvException:
                 LOG.exception("Sysinv Agent exception updating imemory "
                               "conductor.")
+                self._inventory_reset('imemory')
                 pass
 
         idisk = self._idisk_operator.idisk_get()
+        self._inventory_changed('idisk', idisk)
         try:
             rpcapi.idisk_update_by_ihost(icontext,
                                          ihost['uuid'],
@@ -867,65 +981,37 @@ class AgentManager(service.PeriodicService):
                          "Upgrade in progress?")
             else:
                 LOG.exception("Sysinv Agent exception updating idisk conductor.")
+            self._inventory_reset('idisk')
         except exception.SysinvException:
             LOG.exception("Sysinv Agent exception updating idisk conductor.")
+            self._inventory_reset('idisk')
             pass
 
         self._update_disk_partitions(rpcapi, icontext,
                                      ihost['uuid'], force_update=True)
 
         ipv = self._ipv_operator.ipv_get()
+        self._inventory_changed('ipv', ipv)
         try:
             rpcapi.ipv_update_by_ihost(icontext,
                                        ihost['uuid'],
                                        ipv)
         except exception.SysinvException:
             LOG.exception("Sysinv Agent exception updating ipv conductor.")
+            self._inventory_reset('ipv')
             pass
 
         ilvg = self._ilvg_operator.ilvg_get()
+        self._inventory_changed('ilvg', ilvg)
         try:
             rpcapi.ilvg_update_by_ihost(icontext,
                                         ihost['uuid'],
                                         ilvg)
         except exception.SysinvException:
             LOG.exception("Sysinv Agent exception updating ilvg conductor.")
+            self._inventory_reset('ilvg')
             pass
 
-        if constants.WORKER in self.subfunctions_list_get():
-            platform_interfaces = []
-            # retrieve the mgmt interfaces and associated numa nodes
-            try:
-                platform_interfaces = rpcapi.get_platform_interfaces(icontext,
-                                                                     ihost['id'])
-            except exception.SysinvException:
-                LOG.exception("Sysinv Agent exception getting platform interfaces.")
-                pass
-            self._update_interface_irq_affinity(self, platform_interfaces)
-
-        # Ensure subsequent unlocks are faster
-        nova_lvgs = rpcapi.ilvg_get_nova_ilvg_by_ihost(icontext, self._ihost_uuid)
-        if self._ihost_uuid and \
-           os.path.isfile(tsc.INITIAL_CONFIG_COMPLETE_FLAG):
-            if not self._report_to_conductor_iplatform_avail_flag and \
-               not self._wait_for_nova_lvg(icontext, rpcapi, self._ihost_uuid, nova_lvgs):
-                imsg_dict = {'availability': constants.AVAILABILITY_AVAILABLE}
-
-                config_uuid = self.iconfig_read_config_applied()
-                imsg_dict.update({'config_applied': config_uuid})
-
-                iscsi_initiator_name = self.get_host_iscsi_initiator_name()
-                if iscsi_initiator_name is not None:
-                    imsg_dict.update({'iscsi_initiator_name': iscsi_initiator_name})
-
-                self.platform_update_by_host(rpcapi,
-                                             icontext,
-                                             self._ihost_uuid,
-                                             imsg_dict)
-
-                self._report_to_conductor_iplatform_avail()
-                self._iconfig_read_config_reported = config_uuid
-
     def subfunctions_get(self):
         """ returns subfunctions on this host.
         """
@@ -1035,14 +1121,31 @@ class AgentManager(service.PeriodicService):
                 return False
         return True
 
+    def _inventory_changed(self, category, inventory):
+        """Check whether an inventory category changed since last reported.
+
+        The hash of the inventory is recorded as reported when it changed.
+        """
+        digest = utils.hash_inventory(inventory)
+        if self._inventory_hashes.get(category) == digest:
+            LOG.debug("Inventory %s unchanged, not reported" % category)
+            return False
+        self._inventory_hashes[category] = digest
+        return True
+
+    def _inventory_reset(self, *categories):
+        """Force the next report of the inventory categories, or of all
+        categories if none are given."""
+        for category in categories or list(self._inventory_hashes):
+            self._inventory_hashes.pop(category, None)
+
     @utils.synchronized(constants.PARTITION_MANAGE_LOCK)
     def _update_disk_partitions(self, rpcapi, icontext,
                                 host_uuid, force_update=False):
         ipartition = self._ipartition_operator.ipartition_get()
-        if not force_update:
-            if self._prev_partition == ipartition:
-                return
-            self._prev_partition = ipartition
+        if (not self._inventory_changed('ipartition', ipartition) and
+                not force_update):
+            return
         try:
             rpcapi.ipartition_update_by_ihost(
                 icontext, host_uuid, ipartition)
@@ -1053,8 +1156,7 @@ class AgentManager(service.PeriodicService):
         except exception.SysinvException:
             LOG.exception("Sysinv Agent exception updating "
                           "ipartition conductor.")
-            if not force_update:
-                self._prev_partition = None
+            self._inventory_reset('ipartition')
 
     @periodic_task.periodic_task(spacing=CONF.agent.audit_interval,
                                  run_immediately=True)
@@ -1160,14 +1262,27 @@ class AgentManager(service.PeriodicService):
                 LOG.debug("SysInv Agent Audit force updates: (%s)" %
                           (', '.join(force_updates)))
 
+            if (time.time() - self._inventory_full_sync >
+                    CONF.agent.inventory_full_sync_interval):
+                # periodically report the full inventory, in case the
+                # conductor missed an update
+                LOG.info("SysInv Agent Audit reporting full inventory.")
+                self._inventory_reset()
+                self._inventory_full_sync = time.time()
+
             self._update_ttys_dcd_status(icontext, self._ihost_uuid)
             if self._agent_throttle > 5:
                 # throttle updates
                 self._agent_throttle = 0
                 imemory = self._inode_operator.inodes_get_imemory()
-                rpcapi.imemory_update_by_ihost(icontext,
-                                               self._ihost_uuid,
-                                               imemory)
+                if self._inventory_changed('imemory', imemory):
+                    try:
+                        rpcapi.imemory_update_by_ihost(icontext,
+                                                       self._ihost_uuid,
+                                                       imemory)
+                    except Exception:
+                        with excutils.save_and_reraise_exception():
+                            self._inventory_reset('imemory')
                 if self._is_config_complete():
                     self.host_lldp_get_and_report(icontext, rpcapi, self._ihost_uuid)
                 else:
@@ -1179,25 +1294,23 @@ class AgentManager(service.PeriodicService):
                 # node personalities
                 self._audit_tpm_device(icontext, self._ihost_uuid)
                 # Force disk update
-                self._prev_disk = None
+                self._inventory_reset('idisk')
 
             # if this audit is requested by conductor, clear
             # previous states for disk, lvg and pv to force an update
             if force_updates:
                 if constants.DISK_AUDIT_REQUEST in force_updates:
-                    self._prev_disk = None
+                    self._inventory_reset('idisk')
                 if constants.LVG_AUDIT_REQUEST in force_updates:
-                    self._prev_lvg = None
+                    self._inventory_reset('ilvg')
                 if constants.PV_AUDIT_REQUEST in force_updates:
-                    self._prev_pv = None
+                    self._inventory_reset('ipv')
                 if constants.PARTITION_AUDIT_REQUEST in force_updates:
-                    self._prev_partition = None
+                    self._inventory_reset('ipartition')
 
             # Update disks
             idisk = self._idisk_operator.idisk_get()
-            if ((self._prev_disk is None) or
-                    (self._prev_disk != idisk)):
-                self._prev_disk = idisk
+            if self._inventory_changed('idisk', idisk):
                 try:
                     rpcapi.idisk_update_by_ihost(icontext,
                                                  self._ihost_uuid,
@@ -1214,7 +1327,7 @@ class AgentManager(service.PeriodicService):
                 except exception.SysinvException:
                     LOG.exception("Sysinv Agent exception updating idisk"
                                   "conductor.")
-                    self._prev_disk = None
+                    self._inventory_reset('idisk')
 
             # Update disk partitions
             if self._ihost_personality != constants.STORAGE:
@@ -1222,9 +1335,7 @@ class AgentManager(service.PeriodicService):
 
             # Update physical volumes
             ipv = self._ipv_operator.ipv_get(cinder_device=cinder_device)
-            if ((self._prev_pv is None) or
-                    (self._prev_pv != ipv)):
-                self._prev_pv = ipv
+            if self._inventory_changed('ipv', ipv):
                 try:
                     rpcapi.ipv_update_by_ihost(icontext,
                                                self._ihost_uuid,
@@ -1232,14 +1343,12 @@ class AgentManager(service.PeriodicService):
                 except exception.SysinvException:
                     LOG.exception("Sysinv Agent exception updating ipv"
                                   "conductor.")
-                    self._prev_pv = None
+                    self._inventory_reset('ipv')
                     pass
 
             # Update local volume groups
             ilvg = self._ilvg_operator.ilvg_get(cinder_device=cinder_device)
-            if ((self._prev_lvg is None) or
-                    (self._prev_lvg != ilvg)):
-                self._prev_lvg = ilvg
+            if self._inventory_changed('ilvg', ilvg):
                 try:
                     rpcapi.ilvg_update_by_ihost(icontext,
                                                 self._ihost_uuid,
@@ -1247,7 +1356,7 @@ class AgentManager(service.PeriodicService):
                 except exception.SysinvException:
                     LOG.exception("Sysinv Agent exception updating ilvg"
                                   "conductor.")
-                    self._prev_lvg = None
+                    self._inventory_reset('ilvg')
                     pass
 
             self._report_config_applied(icontext)
@@ -12,6 +12,7 @@
 """ inventory pci Utilities and helper functions."""
 
 import glob
+import io
 import os
 import shlex
 import subprocess
@@ -80,6 +81,94 @@ IFF_PORTSEL = 1 << 13
 IFF_AUTOMEDIA = 1 << 14
 IFF_DYNAMIC = 1 << 15
 
+PCI_DEVICES_PATH = '/sys/bus/pci/devices'
+
+# Locations of the PCI ids database used by lspci
+PCI_IDS_PATHS = ['/usr/share/hwdata/pci.ids', '/usr/share/misc/pci.ids']
+
+
+class PCIIds(object):
+    '''Class to encapsulate the names of the PCI ids database'''
+
+    def __init__(self, path):
+        self.vendors = {}
+        self.devices = {}
+        self.subsystems = {}
+        self.classes = {}
+        self.subclasses = {}
+        self._load(path)
+
+    def _load(self, path):
+        vendor = device = pclass = None
+        with io.open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                line = line.rstrip('\n')
+                depth = len(line) - len(line.lstrip('\t'))
+                ids, _, name = line.strip().partition('  ')
+                ids = ids.split()
+                try:
+                    if depth == 0 and ids[0] == 'C':
+                        pclass = int(ids[1], 16)
+                        vendor = None
+                        self.classes[pclass] = name
+                    elif depth == 0:
+                        vendor = int(ids[0], 16)
+                        pclass = None
+                        self.vendors[vendor] = name
+                    elif depth == 1 and vendor is not None:
+                        device = int(ids[0], 16)
+                        self.devices[(vendor, device)] = name
+                    elif depth == 1 and pclass is not None:
+                        self.subclasses[(pclass, int(ids[0], 16))] = name
+                    elif depth == 2 and vendor is not None:
+                        self.subsystems[(vendor, device, int(ids[0], 16),
+                                         int(ids[1], 16))] = name
+                except (IndexError, ValueError):
+                    LOG.debug("Invalid PCI ids entry: %s" % line)
+
+    # The names of unknown ids are formatted the way lspci formats them
+    def vendor_name(self, vendor):
+        return self.vendors.get(vendor, 'Vendor %04x' % vendor)
+
+    def device_name(self, vendor, device):
+        return self.devices.get((vendor, device), 'Device %04x' % device)
+
+    def subsystem_name(self, vendor, device, subvendor, subdevice):
+        name = self.subsystems.get((vendor, device, subvendor, subdevice))
+        if name is None:
+            if (subvendor, subdevice) == (vendor, device):
+                return self.device_name(vendor, device)
+            return 'Device %04x' % subdevice
+        return name
+
+    def class_name(self, class_id):
+        pclass, subclass = class_id >> 8, class_id & 0xff
+        name = self.subclasses.get((pclass, subclass))
+        if name is None:
+            if pclass in self.classes:
+                return '%s [%04x]' % (self.classes[pclass], class_id)
+            return 'Class %04x' % class_id
+        return name
+
+
+_pci_ids = {}
+
+
+def get_pci_ids(paths=None):
+    '''Return the PCI ids database, loaded once, None if not available'''
+    for path in paths or PCI_IDS_PATHS:
+        if path not in _pci_ids and os.path.isfile(path):
+            try:
+                _pci_ids[path] = PCIIds(path)
+            except (IOError, OSError) as e:
+                LOG.warning("Could not load PCI ids from %s: %s" % (path, e))
+                continue
+        if path in _pci_ids:
+            return _pci_ids[path]
+    return None
+
 
 class PCI:
     '''Class to encapsulate PCI data for System Inventory'''
@@ -169,6 +258,11 @@ class PCIDevice:
 class PCIOperator(object):
     '''Class to encapsulate PCI operations for System Inventory'''
 
+    def __init__(self):
+        # DPDK support and SR-IOV VF driver by PCI vendor and device ids
+        self._dpdk_support = {}
+        self._vf_drivers = {}
+
     def format_lspci_output(self, device):
         # hack for now
         if device[prevision].strip() == device[pvendor].strip():
@@ -238,6 +332,11 @@ class PCIOperator(object):
     def get_pci_sriov_vf_driver_name(self, pciaddr, sriov_vfs_pci_address):
         vf_driver = None
         for addr in sriov_vfs_pci_address:
+            # The VF driver does not change for a VF model
+            vf_id = (self._read_pci_attr(addr, 'vendor'),
+                     self._read_pci_attr(addr, 'device'))
+            if vf_id in self._vf_drivers:
+                return self._vf_drivers[vf_id]
 
             try:
                 with open(os.devnull, "w") as fnull:
@@ -256,6 +355,8 @@ class PCIOperator(object):
 
             # All VFs have the same driver per device.
             if vf_driver:
+                if None not in vf_id:
+                    self._vf_drivers[vf_id] = vf_driver
                 break
 
         return vf_driver
@@ -275,66 +376,111 @@ class PCIOperator(object):
         LOG.debug("driver: %s" % driver)
         return driver
 
-    def pci_devices_get(self):
+    def _read_pci_attr(self, pciaddr, attr):
+        '''Read a hexadecimal sysfs attribute of a PCI device'''
+        try:
+            with open(os.path.join(PCI_DEVICES_PATH, pciaddr, attr), 'r') as f:
+                return int(f.readline().strip(), 16)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _get_pci_addresses(self, pciaddr):
+        '''Return the sysfs addresses matching a PCI address'''
+        return [a for a in (pciaddr, "0000:" + pciaddr)
+                if os.path.isdir(os.path.join(PCI_DEVICES_PATH, a))]
+
+    def pci_scan(self):
+        '''Scan the PCI devices from sysfs in a single pass.
+
+        The devices are described the same way as by lspci -Dm, with their
+        names taken from the PCI ids database.
+
+        :returns: list of PCI objects, None if the PCI ids are not available
+        '''
+        pci_ids = get_pci_ids()
+        if pci_ids is None:
+            return None
+
+        pci_devices = []
+        for a in sorted(os.listdir(PCI_DEVICES_PATH)):
+            vendor = self._read_pci_attr(a, 'vendor')
+            device = self._read_pci_attr(a, 'device')
+            class_id = self._read_pci_attr(a, 'class')
+            if None in (vendor, device, class_id):
+                LOG.debug("PCI ids unknown for: %s " % a)
+                continue
+
+            fields = [a, pci_ids.class_name(class_id >> 8),
+                      pci_ids.vendor_name(vendor),
+                      pci_ids.device_name(vendor, device)]
+            revision = self._read_pci_attr(a, 'revision')
+            if revision:
+                fields.append('-r%02x' % revision)
+            if class_id & 0xff:
+                fields.append('-p%02x' % (class_id & 0xff))
+            subvendor = self._read_pci_attr(a, 'subsystem_vendor')
+            subdevice = self._read_pci_attr(a, 'subsystem_device')
+            if subvendor and subvendor != 0xffff:
+                fields.extend([pci_ids.vendor_name(subvendor),
+                               pci_ids.subsystem_name(vendor, device,
+                                                      subvendor, subdevice)])
+            else:
+                fields.extend(['', ''])
+
+            pci_devices.append(PCI(*self.format_lspci_output(fields)[:7]))
 
+        return pci_devices
+
+    def lspci_devices(self):
+        '''List the PCI devices reported by lspci -Dm'''
         p = subprocess.Popen(["lspci", "-Dm"], stdout=subprocess.PIPE)
 
         pci_devices = []
         for line in p.stdout:
             pci_device = shlex.split(line.strip())
             pci_device = self.format_lspci_output(pci_device)
-
-            if any(x in pci_device[pclass].lower() for x in
-                   IGNORE_PCI_CLASSES):
-                continue
-
-            dirpcidev = '/sys/bus/pci/devices/'
-            physfn = dirpcidev + pci_device[pciaddr] + '/physfn'
-            if not os.path.isdir(physfn):
-                # Do not report VFs
-                pci_devices.append(PCI(pci_device[pciaddr],
-                                       pci_device[pclass],
-                                       pci_device[pvendor],
-                                       pci_device[pdevice],
-                                       pci_device[prevision],
-                                       pci_device[psvendor],
-                                       pci_device[psdevice]))
+            pci_devices.append(PCI(*pci_device[:7]))
 
         p.wait()
 
         return pci_devices
 
-    def inics_get(self):
+    def pci_devices_list(self):
+        '''List the PCI devices, from sysfs or else from lspci'''
+        pci_devices = self.pci_scan()
+        if pci_devices is None:
+            pci_devices = self.lspci_devices()
+        return pci_devices
 
-        p = subprocess.Popen(["lspci", "-Dm"], stdout=subprocess.PIPE)
+    def _is_pci_vf(self, pciaddr):
+        return os.path.isdir(os.path.join(PCI_DEVICES_PATH, pciaddr,
+                                          'physfn'))
 
-        pci_inics = []
-        for line in p.stdout:
-            inic = shlex.split(line.strip())
-            if any(x in inic[pclass].lower() for x in ETHERNET_PCI_CLASSES):
-                # hack for now
-                if inic[prevision].strip() == inic[pvendor].strip():
-                    # no revision info
-                    inic.append(inic[psvendor])
-                    inic[psvendor] = inic[prevision]
-                    inic[prevision] = "0"
-                elif len(inic) <= 6:  # one less entry, no revision
-                    LOG.debug("update psdevice length=%s" % len(inic))
-                    inic.append(inic[psvendor])
-
-                dirpcidev = '/sys/bus/pci/devices/'
-                physfn = dirpcidev + inic[pciaddr] + '/physfn'
-                if os.path.isdir(physfn):
-                    # Do not report VFs
-                    continue
-                pci_inics.append(PCI(inic[pciaddr], inic[pclass],
-                                     inic[pvendor], inic[pdevice],
-                                     inic[prevision], inic[psvendor],
-                                     inic[psdevice]))
+    def pci_devices_get(self, pci_devices=None):
+        '''Return the PCI devices to inventory, excluding the NICs
 
-        p.wait()
+        :param pci_devices: list of PCI devices, see pci_devices_list
+        '''
+        if pci_devices is None:
+            pci_devices = self.pci_devices_list()
+
+        # Do not report VFs
+        return [d for d in pci_devices
+                if not any(x in d.pclass.lower() for x in IGNORE_PCI_CLASSES)
+                and not self._is_pci_vf(d.pciaddr)]
+
+    def inics_get(self, pci_devices=None):
+        '''Return the network PCI devices
+
+        :param pci_devices: list of PCI devices, see pci_devices_list
+        '''
+        if pci_devices is None:
+            pci_devices = self.pci_devices_list()
 
-        return pci_inics
+        # Do not report VFs
+        return [d for d in pci_devices
+                if any(x in d.pclass.lower() for x in ETHERNET_PCI_CLASSES)
+                and not self._is_pci_vf(d.pciaddr)]
 
     def pci_get_enabled_attr(self, class_id, vendor_id, product_id):
         for known_device in KNOWN_PCI_DEVICES:
@@ -349,7 +495,7 @@ class PCIOperator(object):
         pci_attrs_array = []
 
         dirpcidev = '/sys/bus/pci/devices/'
-        pciaddrs = os.listdir(dirpcidev)
+        pciaddrs = self._get_pci_addresses(pciaddr)
 
         for a in pciaddrs:
             if ((a == pciaddr) or (a == ("0000:" + pciaddr))):
@@ -409,6 +555,38 @@ class PCIOperator(object):
 
         return pci_attrs_array
 
+    def get_dpdk_support(self, vendor, device):
+        ''' Determine whether DPDK supports a NIC model, caching the result
+        of query_pci_id '''
+        if (vendor, device) in self._dpdk_support:
+            return self._dpdk_support[(vendor, device)]
+
+        try:
+            with open(os.devnull, "w") as fnull:
+                subprocess.check_call(["query_pci_id", "-v " + str(vendor),
+                                       "-d " + str(device)],
+                                      stdout=fnull, stderr=fnull)
+                dpdksupport = True
+                LOG.debug("DPDK does support NIC "
+                          "(vendor: %s device: %s)",
+                          vendor, device)
+        except subprocess.CalledProcessError as e:
+            dpdksupport = False
+            if e.returncode == 1:
+                # NIC is not supprted
+                LOG.debug("DPDK does not support NIC "
+                          "(vendor: %s device: %s)",
+                          vendor, device)
+            else:
+                # command failed, default to DPDK support to False
+                LOG.info("Could not determine DPDK support for "
+                         "NIC (vendor %s device: %s), defaulting "
+                         "to False", vendor, device)
+                return dpdksupport
+
+        self._dpdk_support[(vendor, device)] = dpdksupport
+        return dpdksupport
+
     def get_pci_net_directory(self, pciaddr):
         device_directory = '/sys/bus/pci/devices/' + pciaddr
         # Look for the standard device 'net' directory
@@ -455,7 +633,7 @@ class PCIOperator(object):
         pci_attrs_array = []
 
         dirpcidev = '/sys/bus/pci/devices/'
-        pciaddrs = os.listdir(dirpcidev)
+        pciaddrs = self._get_pci_addresses(pciaddr)
 
         for a in pciaddrs:
             if ((a == pciaddr) or (a == ("0000:" + pciaddr))):
@@ -490,27 +668,7 @@ class PCIOperator(object):
                     LOG.debug("ATTR device unknown for: %s " % a)
                     device = None
 
-                try:
-                    with open(os.devnull, "w") as fnull:
-                        subprocess.check_call(["query_pci_id", "-v " + str(vendor),
-                                               "-d " + str(device)],
-                                              stdout=fnull, stderr=fnull)
-                        dpdksupport = True
-                        LOG.debug("DPDK does support NIC "
-                                  "(vendor: %s device: %s)",
-                                  vendor, device)
-                except subprocess.CalledProcessError as e:
-                    dpdksupport = False
-                    if e.returncode == 1:
-                        # NIC is not supprted
-                        LOG.debug("DPDK does not support NIC "
-                                  "(vendor: %s device: %s)",
-                                  vendor, device)
-                    else:
-                        # command failed, default to DPDK support to False
-                        LOG.info("Could not determine DPDK support for "
-                                 "NIC (vendor %s device: %s), defaulting "
-                                 "to False", vendor, device)
+                dpdksupport = self.get_dpdk_support(vendor, device)
 
                 # determine the net directory for this device
                 dirpcinet = self.get_pci_net_directory(a)
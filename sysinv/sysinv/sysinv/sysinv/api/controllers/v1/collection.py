@@ -53,3 +53,19 @@ class Collection(base.APIBase):
 
         return link.Link.make_link('next', pecan.request.host_url,
                                    resource_url, next_args).href
+
+    def get_next_cursor(self, limit, cursor, url=None, **kwargs):
+        """Return a link to the next subset of the collection, positioned
+        with a pagination cursor instead of a marker.
+        """
+        if not self.has_next(limit):
+            return wtypes.Unset
+
+        resource_url = url or self._type
+        q_args = ''.join(['%s=%s&' % (key, kwargs[key]) for key in kwargs])
+        next_args = '?%(args)slimit=%(limit)d&cursor=%(cursor)s' % {
+                                            'args': q_args, 'limit': limit,
+                                            'cursor': cursor}
+
+        return link.Link.make_link('next', pecan.request.host_url,
+                                   resource_url, next_args).href
@@ -22,6 +22,7 @@
 
 import ast
 import cgi
+import collections
 import copy
 import json
 import math
@@ -100,6 +101,12 @@ LOG = log.getLogger(__name__)
 KEYRING_BM_SERVICE = "BM"
 ERR_CODE_LOCK_SOLE_SERVICE_PROVIDER = "-1003"
 
+# Host attributes stored in the i_host table, which can be selected with the
+# fields parameter of the host list
+HOST_PROJECTION_FIELDS = (
+    set(objects.host.fields) - set(objects.host._foreign_fields) -
+    set(['vsc_controllers'])) | set(['created_at', 'updated_at'])
+
 
 def _get_controller_address(hostname):
     return utils.lookup_static_ip_address(hostname,
@@ -790,6 +797,16 @@ class Host(base.APIBase):
 
         return uhost
 
+    @classmethod
+    def convert_with_fields(cls, host, fields):
+        """Convert the selected columns of a host, without any links."""
+        uhost = Host(**dict((k, wtypes.Unset) for k in
+                            list(objects.host.fields) +
+                            ['iprofile_uuid', 'peers']))
+        for k in set(fields) | set(['uuid']):
+            setattr(uhost, k, host[k])
+        return uhost
+
 
 class HostCollection(collection.Collection):
     """API representation of a collection of ihosts."""
@@ -802,11 +819,26 @@ class HostCollection(collection.Collection):
 
     @classmethod
     def convert_with_links(cls, ihosts, limit, url=None,
-                           expand=False, **kwargs):
+                           expand=False, cursor=None, **kwargs):
         collection = HostCollection()
         collection.ihosts = [
             Host.convert_with_links(n, expand) for n in ihosts]
-        collection.next = collection.get_next(limit, url=url, **kwargs)
+        if cursor:
+            collection.next = collection.get_next_cursor(limit, cursor,
+                                                         url=url, **kwargs)
+        else:
+            collection.next = collection.get_next(limit, url=url, **kwargs)
+        return collection
+
+    @classmethod
+    def convert_with_fields(cls, ihosts, fields, limit, url=None,
+                            cursor=None, **kwargs):
+        collection = HostCollection()
+        collection.ihosts = [
+            Host.convert_with_fields(n, fields) for n in ihosts]
+        kwargs['fields'] = ','.join(fields)
+        collection.next = collection.get_next_cursor(limit, cursor,
+                                                     url=url, **kwargs)
         return collection
 
 
@@ -995,6 +1027,11 @@ class HostUpdate(object):
 LOCK_NAME = 'HostController'
 LOCK_NAME_SYS = 'HostControllerSys'
 
+# Number of new hosts of a bulk add configured by each conductor request,
+# and the time in seconds allowed to configure each of them
+BULK_ADD_CONFIGURE_HOSTS = 10
+BULK_ADD_CONFIGURE_TIMEOUT = 30
+
 
 class HostController(rest.RestController):
     """REST controller for ihosts."""
@@ -1093,8 +1130,23 @@ class HostController(rest.RestController):
         self._api_token = None
         # self._name = 'api-host'
 
+    def _get_marker(self, marker, cursor, sort_key):
+        if cursor:
+            # the cursor already holds the values needed to select the next
+            # page, which avoids looking up the marker host
+            return utils.decode_cursor(cursor, sort_key)
+        if marker:
+            return objects.host.get_by_uuid(pecan.request.context, marker)
+        return None
+
+    @staticmethod
+    def _get_next_cursor(ihosts, sort_key):
+        if ihosts:
+            return utils.encode_cursor(sort_key, ihosts[-1])
+        return None
+
     def _ihosts_get(self, isystem_id, marker, limit, personality,
-                    sort_key, sort_dir):
+                    sort_key, sort_dir, cursor=None):
         if self._from_isystem and not isystem_id:  # TODO: check uuid
             raise exception.InvalidParameterValue(_(
                 "System id not specified."))
@@ -1102,10 +1154,7 @@ class HostController(rest.RestController):
         limit = utils.validate_limit(limit)
         sort_dir = utils.validate_sort_dir(sort_dir)
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.host.get_by_uuid(pecan.request.context,
-                                                  marker)
+        marker_obj = self._get_marker(marker, cursor, sort_key)
 
         if isystem_id:
             ihosts = pecan.request.dbapi.ihost_get_by_isystem(
@@ -1165,17 +1214,73 @@ class HostController(rest.RestController):
                 activity = 'Controller-Standby'
             host['capabilities'].update({'Personality': activity})
 
+    def _ihosts_get_fields(self, isystem_id, marker, limit, personality,
+                           sort_key, sort_dir, fields, cursor=None):
+        if self._from_isystem and not isystem_id:  # TODO: check uuid
+            raise exception.InvalidParameterValue(_(
+                "System id not specified."))
+
+        invalid = [f for f in fields + [sort_key]
+                   if f not in HOST_PROJECTION_FIELDS]
+        if invalid:
+            raise wsme.exc.ClientSideError(
+                _("Invalid host fields: %s") % ', '.join(invalid))
+
+        limit = utils.validate_limit(limit)
+        sort_dir = utils.validate_sort_dir(sort_dir)
+
+        marker_obj = self._get_marker(marker, cursor, sort_key)
+
+        columns = set(fields) | set(['id', 'uuid', sort_key])
+        if 'capabilities' in fields:
+            columns |= set(['hostname', 'personality'])
+
+        ihosts = pecan.request.dbapi.ihost_get_columns_list(
+            list(columns), limit, marker_obj,
+            sort_key=sort_key,
+            sort_dir=sort_dir,
+            isystem_id=isystem_id,
+            personality=personality)
+
+        if 'capabilities' in fields:
+            for h in ihosts:
+                h['capabilities'] = h['capabilities'] or {}
+                self._update_controller_personality(h)
+
+        return ihosts
+
     @wsme_pecan.wsexpose(HostCollection, six.text_type, six.text_type, int, six.text_type,
-                         six.text_type, six.text_type)
+                         six.text_type, six.text_type, six.text_type,
+                         six.text_type)
     def get_all(self, isystem_id=None, marker=None, limit=None,
                 personality=None,
-                sort_key='id', sort_dir='asc'):
-        """Retrieve a list of ihosts."""
+                sort_key='id', sort_dir='asc', fields=None, cursor=None):
+        """Retrieve a list of ihosts.
+
+        :param fields: comma separated list of the host attributes to
+                       return; the hosts are returned without links.
+        :param cursor: pagination cursor found in the next link of the
+                       previous page.
+        """
+        if fields:
+            fields = [f.strip() for f in fields.split(',') if f.strip()]
+            ihosts = self._ihosts_get_fields(
+                isystem_id, marker, limit, personality, sort_key, sort_dir,
+                fields, cursor)
+            return HostCollection.convert_with_fields(
+                ihosts, fields, limit,
+                cursor=self._get_next_cursor(ihosts, sort_key),
+                sort_key=sort_key,
+                sort_dir=sort_dir)
+
         ihosts = self._ihosts_get(
-            isystem_id, marker, limit, personality, sort_key, sort_dir)
-        return HostCollection.convert_with_links(ihosts, limit,
-                                                 sort_key=sort_key,
-                                                 sort_dir=sort_dir)
+            isystem_id, marker, limit, personality, sort_key, sort_dir,
+            cursor)
+        return HostCollection.convert_with_links(
+            ihosts, limit,
+            cursor=cursor and self._get_next_cursor(ihosts, sort_key),
+            sort_key=sort_key,
+            sort_dir=sort_dir)
 
     @wsme_pecan.wsexpose(six.text_type, six.text_type, body=six.text_type)
     def install_progress(self, uuid, install_state,
@@ -1196,10 +1301,10 @@ class HostController(rest.RestController):
                                           install_state_info})
 
     @wsme_pecan.wsexpose(HostCollection, six.text_type, six.text_type, int, six.text_type,
-                         six.text_type, six.text_type)
+                         six.text_type, six.text_type, six.text_type)
     def detail(self, isystem_id=None, marker=None, limit=None,
                personality=None,
-               sort_key='id', sort_dir='asc'):
+               sort_key='id', sort_dir='asc', cursor=None):
         """Retrieve a list of ihosts with detail."""
         # /detail should only work against collections
         parent = pecan.request.path.split('/')[:-1][-1]
@@ -1207,13 +1312,16 @@ class HostController(rest.RestController):
             raise exception.HTTPNotFound
 
         ihosts = self._ihosts_get(
-            isystem_id, marker, limit, personality, sort_key, sort_dir)
+            isystem_id, marker, limit, personality, sort_key, sort_dir,
+            cursor)
         resource_url = '/'.join(['ihosts', 'detail'])
-        return HostCollection.convert_with_links(ihosts, limit,
-                                                 url=resource_url,
-                                                 expand=True,
-                                                 sort_key=sort_key,
-                                                 sort_dir=sort_dir)
+        return HostCollection.convert_with_links(
+            ihosts, limit,
+            url=resource_url,
+            expand=True,
+            cursor=cursor and self._get_next_cursor(ihosts, sort_key),
+            sort_key=sort_key,
+            sort_dir=sort_dir)
 
     @wsme_pecan.wsexpose(Host, six.text_type)
     def get_one(self, uuid):
@@ -1354,43 +1462,7 @@ class HostController(rest.RestController):
         if not ihost_dict.get('uuid'):
             ihost_dict['uuid'] = uuidutils.generate_uuid()
 
-        ihost_dict['mgmt_mac'] = cutils.validate_and_normalize_mac(
-            ihost_dict['mgmt_mac'])
-
-        # BM handling
-        defaults = objects.host.get_defaults()
-        ihost_orig = copy.deepcopy(ihost_dict)
-
-        subfunctions = self._update_subfunctions(ihost_dict)
-        ihost_dict['subfunctions'] = subfunctions
-
-        changed_paths = []
-        delta = set()
-        for key in defaults:
-            # Internal values that aren't being modified
-            if key in ['id', 'updated_at', 'created_at']:
-                continue
-
-            # Update only the new fields
-            if key in ihost_dict and ihost_dict[key] != defaults[key]:
-                delta.add(key)
-                ihost_orig[key] = defaults[key]
-
-        bm_list = ['bm_type', 'bm_ip',
-                   'bm_username', 'bm_password']
-        for bmi in bm_list:
-            if bmi in ihost_dict:
-                delta.add(bmi)
-                changed_paths.append({'path': '/' + str(bmi),
-                                      'value': ihost_dict[bmi],
-                                      'op': 'replace'})
-
-        self._bm_semantic_check_and_update(ihost_orig, ihost_dict,
-                                           delta, changed_paths,
-                                           current_ihosts)
-
-        if ('capabilities' not in ihost_dict or not ihost_dict['capabilities']):
-            ihost_dict['capabilities'] = {}
+        subfunctions = self._new_host_prepare(ihost_dict, current_ihosts)
 
         # If this is the first controller being set up,
         # configure and return
@@ -1466,6 +1538,67 @@ class HostController(rest.RestController):
         # Notify maintenance about updated mgmt_ip
         ihost_obj['mgmt_ip'] = ihost_ret.mgmt_ip
 
+        self._new_host_notify(ihost_obj, power_on, subfunctions)
+
+        log_end = cutils.timestamped("ihost_post_end")
+        LOG.info("SYS_I host %s %s" % (ihost_obj.hostname, log_end))
+
+        return Host.convert_with_links(ihost_obj)
+
+    def _new_host_prepare(self, ihost_dict, current_ihosts):
+        """Set the attributes of a new ihost before it is created.
+
+        :param ihost_dict: the ihost attributes
+        :param current_ihosts: the existing ihosts
+        :returns: the subfunctions of the ihost
+        """
+        ihost_dict['mgmt_mac'] = cutils.validate_and_normalize_mac(
+            ihost_dict['mgmt_mac'])
+
+        # BM handling
+        defaults = objects.host.get_defaults()
+        ihost_orig = copy.deepcopy(ihost_dict)
+
+        subfunctions = self._update_subfunctions(ihost_dict)
+        ihost_dict['subfunctions'] = subfunctions
+
+        changed_paths = []
+        delta = set()
+        for key in defaults:
+            # Internal values that aren't being modified
+            if key in ['id', 'updated_at', 'created_at']:
+                continue
+
+            # Update only the new fields
+            if key in ihost_dict and ihost_dict[key] != defaults[key]:
+                delta.add(key)
+                ihost_orig[key] = defaults[key]
+
+        bm_list = ['bm_type', 'bm_ip',
+                   'bm_username', 'bm_password']
+        for bmi in bm_list:
+            if bmi in ihost_dict:
+                delta.add(bmi)
+                changed_paths.append({'path': '/' + str(bmi),
+                                      'value': ihost_dict[bmi],
+                                      'op': 'replace'})
+
+        self._bm_semantic_check_and_update(ihost_orig, ihost_dict,
+                                           delta, changed_paths,
+                                           current_ihosts)
+
+        if ('capabilities' not in ihost_dict or not ihost_dict['capabilities']):
+            ihost_dict['capabilities'] = {}
+
+        return subfunctions
+
+    def _new_host_notify(self, ihost_obj, power_on, subfunctions):
+        """Add a new ihost to maintenance and notify the VIM.
+
+        :param ihost_obj: the ihost object
+        :param power_on: whether to power on the ihost once it is added
+        :param subfunctions: the subfunctions of the ihost
+        """
         # Add ihost to mtc
         new_ihost_mtc = ihost_obj.as_dict()
         new_ihost_mtc.update({'operation': 'add'})
@@ -1533,10 +1666,165 @@ class HostController(rest.RestController):
             self._api_token = None
             pass  # VIM audit will pickup
 
-        log_end = cutils.timestamped("ihost_post_end")
-        LOG.info("SYS_I host %s %s" % (ihost_obj.hostname, log_end))
+    @staticmethod
+    def _bulk_add_index(ihosts):
+        """Index ihosts by hostname, mgmt_mac, mgmt_ip and bm_ip."""
+        host_index = dict((attr, {}) for attr in
+                          ('hostname', 'mgmt_mac', 'mgmt_ip', 'bm_ip'))
+        for ihost in ihosts:
+            for attr, values in host_index.items():
+                if ihost[attr]:
+                    values.setdefault(ihost[attr], ihost)
+        return host_index
+
+    def _bulk_add_check(self, ihost_dict, host_index, mgmt_network, my_macs):
+        """Check a host to be bulk added against the indexed hosts.
+
+        :param ihost_dict: the host attributes
+        :param host_index: the hosts, indexed by _bulk_add_index
+        :param mgmt_network: the management network
+        :param my_macs: the MAC addresses of the local network adapters
+        :returns: whether the host is a new worker, to be added together
+                  with the other new workers
+        """
+        if (ihost_dict['personality'] != constants.WORKER or
+                not ihost_dict['mgmt_mac'] or
+                ihost_dict['mgmt_mac'].lower() in my_macs):
+            return False
 
-        return Host.convert_with_links(ihost_obj)
+        mgmt_mac = cutils.validate_and_normalize_mac(ihost_dict['mgmt_mac'])
+        ihost = host_index['mgmt_mac'].get(mgmt_mac)
+        if ihost is not None:
+            if ihost['hostname'] or ihost['personality']:
+                raise wsme.exc.ClientSideError(
+                    _("Host-add Rejected: Host with mgmt_mac %s already "
+                      "exists") % ihost_dict['mgmt_mac'])
+            # The host has already been discovered, it is updated on its own
+            return False
+
+        hostname = ihost_dict['hostname']
+        if hostname in host_index['hostname']:
+            raise wsme.exc.ClientSideError(
+                _("Host-add Rejected: Hostname already exists"))
+
+        mgmt_ip = ihost_dict.get('mgmt_ip')
+        if mgmt_ip:
+            if mgmt_ip in host_index['mgmt_ip']:
+                raise wsme.exc.ClientSideError(
+                    _("Host-add Rejected: Host with mgmt_ip %s already "
+                      "exists") % mgmt_ip)
+            utils.validate_address_within_nework(mgmt_ip, mgmt_network)
+            self._validate_address_not_allocated(
+                cutils.format_address_name(hostname,
+                                           constants.NETWORK_TYPE_MGMT),
+                mgmt_ip)
+
+        bm_ip = ihost_dict.get('bm_ip')
+        if bm_ip and bm_ip in host_index['bm_ip']:
+            raise wsme.exc.ClientSideError(
+                _("Host-add Rejected: bm_ip %s already exists") % bm_ip)
+
+        # The hosts following this one must not reuse its hostname, MAC
+        # and IP addresses
+        for attr, value in (('hostname', hostname), ('mgmt_mac', mgmt_mac),
+                            ('mgmt_ip', mgmt_ip), ('bm_ip', bm_ip)):
+            if value:
+                host_index[attr][value] = ihost_dict
+        return True
+
+    def _bulk_post(self, new_hosts, current_ihosts):
+        """Add new worker hosts together.
+
+        The hosts are created in a single transaction and configured with a
+        conductor request per BULK_ADD_CONFIGURE_HOSTS hosts, before being
+        added to maintenance and the VIM one by one. If the transaction
+        fails, the hosts are created one by one.
+
+        :param new_hosts: the host attributes, by index in the file
+        :param current_ihosts: the existing ihosts
+        :returns: the exception raised adding a host, by index in the file
+        """
+        context = pecan.request.context
+        errors = {}
+
+        subfunctions = {}
+        for idx, ihost_dict in new_hosts.items():
+            try:
+                ihost_dict['uuid'] = uuidutils.generate_uuid()
+                subfunctions[idx] = self._new_host_prepare(ihost_dict,
+                                                           current_ihosts)
+            except Exception as e:
+                errors[idx] = e
+                continue
+            if not ihost_dict.get('mgmt_ip'):
+                ihost_dict.pop('mgmt_ip', None)
+
+            # Set host to reinstalling
+            ihost_dict.update({constants.HOST_ACTION_STATE:
+                               constants.HAS_REINSTALLING})
+
+        pending = [idx for idx in new_hosts if idx not in errors]
+        if not pending:
+            return errors
+
+        LOG.info("create_ihosts=%s" %
+                 [new_hosts[idx]['hostname'] for idx in pending])
+        try:
+            ihosts = collections.OrderedDict(zip(
+                pending, pecan.request.rpcapi.create_ihosts(
+                    context, [new_hosts[idx] for idx in pending])))
+        except Exception as e:
+            LOG.warn("Failed to create hosts in a single transaction, "
+                     "creating them one by one: %s" % e)
+            ihosts = collections.OrderedDict()
+            for idx in pending:
+                try:
+                    ihosts[idx] = pecan.request.rpcapi.create_ihost(
+                        context, new_hosts[idx])
+                except Exception as e:
+                    errors[idx] = e
+
+        # Configure the new ihosts, a few at a time so that each request
+        # completes within its timeout
+        mgmt_ips = {}
+        pending = list(ihosts.values())
+        while pending:
+            chunk = pending[:BULK_ADD_CONFIGURE_HOSTS]
+            del pending[:BULK_ADD_CONFIGURE_HOSTS]
+            try:
+                configured = pecan.request.rpcapi.configure_ihosts(
+                    context, chunk,
+                    timeout=BULK_ADD_CONFIGURE_TIMEOUT * len(chunk))
+            except Exception as e:
+                # Some of the hosts may have been configured, those with a
+                # mgmt_ip are added to maintenance
+                LOG.warn("Failed to configure hosts %s, checking their "
+                         "mgmt_ip: %s" % ([h.hostname for h in chunk], e))
+                configured = []
+                for ihost_obj in chunk:
+                    try:
+                        ihost_obj = objects.host.get_by_uuid(context,
+                                                             ihost_obj.uuid)
+                    except exception.NotFound:
+                        continue
+                    if ihost_obj.mgmt_ip:
+                        configured.append(ihost_obj)
+            mgmt_ips.update((h.uuid, h.mgmt_ip) for h in configured)
+
+        for idx, ihost_obj in ihosts.items():
+            if ihost_obj.uuid not in mgmt_ips:
+                errors[idx] = exception.SysinvException(
+                    _("Failed to configure host %s") % ihost_obj.hostname)
+                continue
+
+            # Notify maintenance about updated mgmt_ip
+            ihost_obj['mgmt_ip'] = mgmt_ips[ihost_obj.uuid]
+            try:
+                self._new_host_notify(ihost_obj, new_hosts[idx]['power_on'],
+                                      subfunctions[idx])
+            except Exception as e:
+                errors[idx] = e
+        return errors
 
     @cutils.synchronized(LOCK_NAME)
     @expose('json')
@@ -1622,11 +1910,37 @@ class HostController(rest.RestController):
                 if snic.family == psutil.AF_LINK:
                     my_macs.append(snic.address)
 
+        # Check the hosts against indexes of the existing hosts and of the
+        # hosts before them in the file. As when the hosts are added one by
+        # one, a host which fails the checks is not added, the others are.
+        current_ihosts = pecan.request.dbapi.ihost_get_list()
+        host_index = self._bulk_add_index(current_ihosts)
+        mgmt_network = pecan.request.dbapi.network_get_by_type(
+            constants.NETWORK_TYPE_MGMT)
+        bulk_hosts = collections.OrderedDict()
+        errors = {}
+        for idx, new_host in enumerate(pending_creation):
+            try:
+                if self._bulk_add_check(new_host, host_index, mgmt_network,
+                                        my_macs):
+                    bulk_hosts[idx] = new_host
+            except Exception as ex:
+                errors[idx] = ex
+
+        # Add the new workers together, then the other hosts one by one
+        if bulk_hosts:
+            errors.update(self._bulk_post(bulk_hosts, current_ihosts))
+
         # Perform the actual creations
-        for new_host in pending_creation:
+        for idx, new_host in enumerate(pending_creation):
             try:
+                if idx in errors:
+                    raise errors[idx]
+                elif idx in bulk_hosts:
+                    # Added together with the other new workers
+                    pass
                 # Configuring for the setup controller, only uses BMC fields
-                if new_host['mgmt_mac'].lower() in my_macs:
+                elif new_host['mgmt_mac'].lower() in my_macs:
                     changed_paths = list()
 
                     bm_list = ['bm_type', 'bm_ip',
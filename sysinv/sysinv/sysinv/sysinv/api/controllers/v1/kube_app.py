@@ -76,6 +76,9 @@ class KubeApp(base.APIBase):
     active = bool
     "Represents the application is active"
 
+    chart_durations = {wtypes.text: float}
+    "Represents the time in seconds spent on each chart by the last request"
+
     def __init__(self, **kwargs):
         self.fields = objects.kube_app.fields.keys()
         for k in self.fields:
@@ -93,6 +96,13 @@ class KubeApp(base.APIBase):
         # skip the id
         app.id = wtypes.Unset
 
+        if expand:
+            timeline = rpc_app.chart_timeline or {}
+            app.chart_durations = dict(
+                (c['chart'], c['duration'])
+                for c in timeline.get('charts', [])
+                if c.get('duration') is not None)
+
         return app
 
 
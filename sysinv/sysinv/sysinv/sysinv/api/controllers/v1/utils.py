@@ -19,6 +19,9 @@
 # Copyright (c) 2013-2018 Wind River Systems, Inc.
 #
 
+import base64
+import datetime
+import json
 import subprocess
 import socket
 import jsonpatch
@@ -69,6 +72,32 @@ def validate_sort_dir(sort_dir):
     return sort_dir
 
 
+def encode_cursor(sort_key, item):
+    """Return a pagination cursor positioned after the given item.
+
+    The cursor holds the sort key and id values of the item so that the
+    next page can be selected without looking up the item again.
+    """
+    value = item[sort_key]
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    cursor = json.dumps([sort_key, value, item['id']])
+    return base64.urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, sort_key):
+    """Return the pagination marker values held by a cursor."""
+    try:
+        key, value, item_id = json.loads(
+            base64.urlsafe_b64decode(str(cursor)).decode('utf-8'))
+    except (TypeError, ValueError):
+        raise wsme.exc.ClientSideError(_("Invalid cursor: %s") % cursor)
+    if key != sort_key:
+        raise wsme.exc.ClientSideError(_("Cursor does not match the sort "
+                                         "key %s") % sort_key)
+    return {sort_key: value, 'id': item_id}
+
+
 def validate_patch(patch):
     """Performs a basic validation on patch."""
 
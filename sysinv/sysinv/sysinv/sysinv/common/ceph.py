@@ -16,6 +16,7 @@ import subprocess
 import os
 import pecan
 import requests
+import time
 
 from cephclient import wrapper as ceph
 
@@ -29,6 +30,144 @@ from sysinv.api.controllers.v1.utils import is_aio_system
 
 LOG = logging.getLogger(__name__)
 
+# Number of seconds a snapshot of the cluster state is reused for
+CEPH_CLUSTER_STATE_TTL = 30
+
+
+class CephClusterState(object):
+    """Snapshot of the state of the Ceph cluster
+
+    Each of the osd dump, osd tree, df and status queries is sent to the
+    cluster at most once per snapshot, when first needed, and its output
+    is indexed for the lookups done by the audits and semantic checks.
+    A failed query is not retried for the lifetime of the snapshot.
+    """
+
+    def __init__(self, ceph_api, timeout=10):
+        self._ceph_api = ceph_api
+        self._timeout = timeout
+        self._outputs = {}
+        self._failures = {}
+        self._pools = None
+        self._osd_hosts = None
+        self._host_osds = None
+        self.created_at = time.time()
+
+    @property
+    def age(self):
+        return time.time() - self.created_at
+
+    def _output(self, query):
+        if query in self._failures:
+            raise self._failures[query]
+
+        if query not in self._outputs:
+            try:
+                response, body = getattr(self._ceph_api, query)(
+                    body='json', timeout=self._timeout)
+                reason = None if response.ok else response.reason
+            except Exception as e:
+                reason = str(e)
+            if reason is not None:
+                e = exception.CephGetClusterStateFailure(query=query,
+                                                         reason=reason)
+                LOG.error(e)
+                self._failures[query] = e
+                raise e
+            self._outputs[query] = body['output']
+
+        return self._outputs[query]
+
+    def health_ok(self):
+        """Return True if the cluster health is HEALTH_OK."""
+        try:
+            status = self._output('status')['health']['status']
+        except Exception as e:
+            LOG.warn("ceph status exception: %s " % e)
+            return False
+
+        if status != constants.CEPH_HEALTH_OK:
+            LOG.warn("ceph status=%s " % status)
+            return False
+        return True
+
+    def pool(self, pool_name):
+        """Get the parameters of an osd pool, None if it does not exist."""
+        if self._pools is None:
+            pools = {}
+            for pool in self._output('osd_dump')['pools']:
+                params = dict(pool)
+                params['pgp_num'] = pool['pg_placement_num']
+                pools[pool['pool_name']] = params
+            self._pools = pools
+        return self._pools.get(pool_name)
+
+    def osd_stats(self):
+        """Get the number of osds, and of those which are up and in."""
+        osds = self._output('osd_dump')['osds']
+        return {'num_osds': len(osds),
+                'num_up_osds': len([o for o in osds if o['up']]),
+                'num_in_osds': len([o for o in osds if o['in']])}
+
+    def _index_osd_tree(self):
+        if self._osd_hosts is not None:
+            return
+
+        nodes = self._output('osd_tree')['nodes']
+        nodes_by_id = dict((n['id'], n) for n in nodes)
+        osd_hosts = {}
+        host_osds = {}
+        for node in nodes:
+            if node['type'] != "host":
+                continue
+            osds = [nodes_by_id[c] for c in node.get('children', [])
+                    if c in nodes_by_id and
+                    nodes_by_id[c]['type'] == constants.STOR_FUNCTION_OSD]
+            host_osds.setdefault(node['name'], []).extend(osds)
+            for osd in osds:
+                osd_hosts.setdefault(osd['id'], node['name'])
+        self._osd_hosts = osd_hosts
+        self._host_osds = host_osds
+
+    def osd_host(self, osd_id):
+        """Get the name of the host of an osd, None if it is not found."""
+        self._index_osd_tree()
+        return self._osd_hosts.get(osd_id)
+
+    def host_osds(self, hostname):
+        """Get the osd tree nodes of the osds of a host.
+
+        Returns None if the host is not in the osd tree.
+        """
+        self._index_osd_tree()
+        return self._host_osds.get(hostname)
+
+    def df(self):
+        """Get the usage stats of the cluster and of its pools."""
+        return self._output('df')
+
+
+class CephClusterStateCache(object):
+    """Share a snapshot of the Ceph cluster state until it expires
+
+    Operations changing the cluster state must invalidate the snapshot.
+    """
+
+    def __init__(self, ceph_api, ttl=CEPH_CLUSTER_STATE_TTL):
+        self._ceph_api = ceph_api
+        self._ttl = ttl
+        self._state = None
+
+    def get(self, refresh=False, timeout=10):
+        state = self._state
+        if refresh or state is None or state.age >= self._ttl:
+            state = CephClusterState(self._ceph_api, timeout)
+            self._state = state
+        return state
+
+    def invalidate(self):
+        self._state = None
+
 
 class CephApiOperator(object):
     """Class to encapsulate Ceph operations for System Inventory API
@@ -40,6 +179,13 @@ class CephApiOperator(object):
                 endpoint='http://localhost:5001')
         self._default_tier = constants.SB_TIER_DEFAULT_NAMES[
             constants.SB_TIER_TYPE_CEPH]
+        self._cluster_state = CephClusterStateCache(self._ceph_api)
+
+    def get_cluster_state(self, refresh=False, timeout=10):
+        return self._cluster_state.get(refresh, timeout)
+
+    def invalidate_cluster_state(self):
+        self._cluster_state.invalidate()
 
     def _format_root_name(self, name):
         """Generate normalized crushmap root name. """
@@ -68,12 +214,14 @@ class CephApiOperator(object):
         response, body = self._ceph_api.osd_crush_add_bucket(bucket_name,
                                                              bucket_type,
                                                              body='json')
+        self.invalidate_cluster_state()
         LOG.info("CRUSH: %d :%s" % (response.status_code, body['status']))
 
     def _crush_bucket_remove(self, bucket_name):
         LOG.info("ceph osd crush remove %s" % bucket_name)
         response, body = self._ceph_api.osd_crush_remove(bucket_name,
                                                          body='json')
+        self.invalidate_cluster_state()
         LOG.info("CRUSH: %d :%s" % (response.status_code, body['status']))
 
     def _crush_bucket_move(self, bucket_name, ancestor_type, ancestor_name):
@@ -82,6 +230,7 @@ class CephApiOperator(object):
         response, body = self._ceph_api.osd_crush_move(
             bucket_name, "%s=%s" % (ancestor_type, ancestor_name),
             body='json')
+        self.invalidate_cluster_state()
         LOG.info("CRUSH: %d :%s" % (response.status_code, body['status']))
 
     def _crushmap_item_create(self, items, name, ancestor_name=None,
@@ -463,20 +612,8 @@ class CephApiOperator(object):
             returns rc bool. True if ceph ok, False otherwise
             :param timeout: ceph api timeout
         """
-        rc = True
-
-        try:
-            response, body = self._ceph_api.status(body='json',
-                                                   timeout=timeout)
-            ceph_status = body['output']['health']['status']
-            if ceph_status != constants.CEPH_HEALTH_OK:
-                LOG.warn("ceph status=%s " % ceph_status)
-                rc = False
-        except Exception as e:
-            rc = False
-            LOG.warn("ceph status exception: %s " % e)
-
-        return rc
+        return self.get_cluster_state(refresh=True,
+                                      timeout=timeout).health_ok()
 
     def _osd_quorum_names(self, timeout=10):
         quorum_names = []
@@ -500,52 +637,28 @@ class CephApiOperator(object):
                       osdid_str, response.reason)
 
     def osd_host_lookup(self, osd_id):
-        response, body = self._ceph_api.osd_crush_tree(body='json')
-        for i in range(0, len(body['output'])):
-            # there are 2 chassis lists - cache-tier and root-tier
-            # that can be seen in the output of 'ceph osd crush tree':
-            # [{"id": -2,"name": "cache-tier", "type": "root",
-            # "type_id": 10, "items": [...]},
-            # {"id": -1,"name": "storage-tier","type": "root",
-            # "type_id": 10, "items": [...]}]
-            chassis_list = body['output'][i]['items']
-            for chassis in chassis_list:
-                # extract storage list/per chassis
-                storage_list = chassis['items']
-                for storage in storage_list:
-                    # extract osd list/per storage
-                    storage_osd_list = storage['items']
-                    for osd in storage_osd_list:
-                        if osd['id'] == osd_id:
-                            # return storage name where osd is located
-                            return storage['name']
-        return None
+        # return storage name where osd is located
+        return self.get_cluster_state().osd_host(osd_id)
 
     def check_osds_down_up(self, hostname, upgrade):
         # check if osds from a storage are down/up
-        response, body = self._ceph_api.osd_tree(body='json')
-        osd_tree = body['output']['nodes']
-        size = len(osd_tree)
-        for i in range(1, size):
-            if osd_tree[i]['type'] != "host":
-                continue
-            children_list = osd_tree[i]['children']
-            children_num = len(children_list)
-            # when we do a storage upgrade, storage node must be locked
-            # and all the osds of that storage node must be down
-            if (osd_tree[i]['name'] == hostname):
-                for j in range(1, children_num + 1):
-                    if (osd_tree[i + j]['type'] == constants.STOR_FUNCTION_OSD and
-                       osd_tree[i + j]['status'] == "up"):
-                        # at least one osd is not down
-                        return False
-                # all osds are up
-                return True
+        osds = self.get_cluster_state(refresh=True).host_osds(hostname)
+        if osds is None:
+            return None
+        # when we do a storage upgrade, storage node must be locked
+        # and all the osds of that storage node must be down
+        for osd in osds:
+            if osd['status'] == "up":
+                # at least one osd is not down
+                return False
+        # all osds are down
+        return True
 
     def host_crush_remove(self, hostname):
         # remove host from crushmap when system host-delete is executed
         response, body = self._ceph_api.osd_crush_remove(
             hostname, body='json')
+        self.invalidate_cluster_state()
 
     def set_crushmap(self):
         if fix_crushmap():
@@ -595,8 +708,7 @@ class CephApiOperator(object):
             osd_id = int(osd[0])
             if osd_id in osd_list:
                 continue
-            # potential future optimization to cache all the
-            # osd to host lookups for the single call to host_osd_status().
+            # the osd to host lookups share a single osd tree query
             host_name = self.osd_host_lookup(osd_id)
             if (host_name is not None and
                host_name == hostname):
@@ -1544,6 +1544,11 @@ APP_PROGRESS_RECOVER_COMPLETED = 'application recover to version {} completed. '
 APP_PROGRESS_CLEANUP_FAILED = 'application files/helm release cleanup for version {} failed.'
 APP_PROGRESS_RECOVER_IN_PROGRESS = 'recovering version {} '
 APP_PROGRESS_RECOVER_CHARTS = 'recovering helm charts'
+APP_PROGRESS_DOWNLOAD_IMAGES_RATE = 'retrieving docker images, {} of {} done ({:.1f} MB/s)'
+
+# Image download status constants
+APP_IMAGE_DOWNLOADED = 'downloaded'
+APP_IMAGE_DOWNLOAD_FAILED = 'download-failed'
 
 # Node label operation constants
 LABEL_ASSIGN_OP = 'assign'
@@ -214,6 +214,10 @@ class CephGetOsdStatsFailure(CephFailure):
     message = _("Getting the osd stats information failed: %(reason)s")
 
 
+class CephGetClusterStateFailure(CephFailure):
+    message = _("Getting the Ceph %(query)s failed: %(reason)s")
+
+
 class CephPoolGetParamFailure(CephFailure):
     message = _("Cannot get Ceph OSD pool parameter: "
                 "pool_name=%(pool_name)s, param=%(param)s. "
@@ -572,6 +576,11 @@ class KubeAppChartReleaseAlreadyExists(Conflict):
                 "%(namespace)s for application %(app_id)s already exists.")
 
 
+class KubeAppImageAlreadyExists(Conflict):
+    message = _("An image %(image)s for application %(app_id)s "
+                "already exists.")
+
+
 class InstanceDeployFailure(Invalid):
     message = _("Failed to deploy instance: %(reason)s")
 
@@ -917,6 +926,10 @@ class KubeAppReleasesNotFound(NotFound):
     message = _("No releases found for application %(app_id)s")
 
 
+class KubeAppImageNotFound(NotFound):
+    message = _("No image %(image)s for application %(app_id)s")
+
+
 class DockerRegistryCredentialNotFound(NotFound):
     message = _("Credentials to access local docker registry "
                 "for user %(name)s could not be found.")
@@ -1308,6 +1321,10 @@ class LocalHostUUIDNotFound(NotFound):
     message = _("Local Host UUID not found")
 
 
+class InvalidHelmOverrides(Invalid):
+    message = _("Invalid helm overrides: %(reason)s")
+
+
 class InvalidHelmDockerImageSource(Invalid):
     message = _("Invalid docker image source: %(source)s. Must be one of %(valid_srcs)s")
 
@@ -12,10 +12,12 @@
 """ System Inventory Kubernetes Utilities and helper functions."""
 
 from __future__ import absolute_import
+import collections
 import json
 
 from kubernetes import config
 from kubernetes import client
+from kubernetes import watch
 from kubernetes.client import Configuration
 from kubernetes.client.rest import ApiException
 from six.moves import http_client as httplib
@@ -24,6 +26,9 @@ from sysinv.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+# Seconds a node watch waits for node changes
+KUBE_NODE_WATCH_TIMEOUT = 1
+
 
 class KubeOperator(object):
 
@@ -77,6 +82,28 @@ class KubeOperator(object):
             LOG.error("Kubernetes exception in kube_get_nodes: %s" % e)
             raise
 
+    def kube_list_nodes(self):
+        """Return the nodes and the resource version of the node list."""
+        try:
+            api_response = self._get_kubernetesclient_core().list_node()
+            LOG.debug("Response: %s" % api_response)
+            return (api_response.items,
+                    api_response.metadata.resource_version)
+        except Exception as e:
+            LOG.error("Kubernetes exception in kube_list_nodes: %s" % e)
+            raise
+
+    def kube_watch_nodes(self, resource_version, timeout_seconds):
+        """Return the node events following a resource version.
+
+        The events are streamed until there is no node change for
+        timeout_seconds.
+        """
+        w = watch.Watch()
+        return w.stream(self._get_kubernetesclient_core().list_node,
+                        resource_version=resource_version,
+                        timeout_seconds=timeout_seconds)
+
     def kube_create_namespace(self, namespace):
         body = {'metadata': {'name': namespace}}
 
@@ -264,3 +291,99 @@ class KubeOperator(object):
             LOG.error("Failed to delete Jobs with label %s under "
                       "Namespace %s: %s" % (label, namespace, e))
             raise
+
+
+class KubeNodeLabelReconciler(object):
+    """Create the host labels missing on the kubernetes nodes.
+
+    The labels of the nodes are listed once, then kept up to date from a
+    watch of the node changes since the resource version of the list. A
+    reconciliation therefore costs one watch request and one merged patch
+    per node with missing labels, rather than a node list and a patch per
+    missing label.
+    """
+
+    def __init__(self, kube_operator, watch_timeout=KUBE_NODE_WATCH_TIMEOUT):
+        self._kube = kube_operator
+        self._watch_timeout = watch_timeout
+        self._node_labels = {}
+        self._resource_version = None
+
+    def _list_nodes(self):
+        nodes, self._resource_version = self._kube.kube_list_nodes()
+        self._node_labels = dict(
+            (node.metadata.name, dict(node.metadata.labels or {}))
+            for node in nodes)
+
+    def _watch_nodes(self):
+        for event in self._kube.kube_watch_nodes(self._resource_version,
+                                                 self._watch_timeout):
+            if event['type'] == 'ERROR':
+                # e.g. the resource version is too old
+                LOG.info("Kubernetes node watch error: %s" %
+                         event.get('raw_object'))
+                return False
+            node = event['object']
+            if event['type'] == 'DELETED':
+                self._node_labels.pop(node.metadata.name, None)
+            else:
+                self._node_labels[node.metadata.name] = dict(
+                    node.metadata.labels or {})
+            self._resource_version = node.metadata.resource_version
+        return True
+
+    def refresh(self):
+        """Update the node labels with the changes since the last refresh,
+        or from a new node list when the changes cannot be watched.
+        """
+        if self._resource_version is not None:
+            try:
+                if self._watch_nodes():
+                    return
+            except Exception as e:
+                LOG.info("Kubernetes node watch failed: %s" % e)
+        self._list_nodes()
+
+    def reset(self):
+        """List the nodes again on the next reconciliation."""
+        self._resource_version = None
+
+    def reconcile(self, hosts, labels):
+        """Create the labels of the hosts missing on their nodes.
+
+        :param hosts: the hosts to reconcile
+        :param labels: the host labels
+        :returns: the number of nodes patched
+        """
+        self.refresh()
+
+        host_labels = collections.defaultdict(dict)
+        for label in labels:
+            host_labels[label.host_id][label.label_key] = label.label_value
+
+        patched = 0
+        for host in hosts:
+            node_labels = self._node_labels.get(host.hostname)
+            if node_labels is None:
+                continue
+            missing = dict((key, value) for key, value in
+                           host_labels.get(host.id, {}).items()
+                           if key not in node_labels)
+            if not missing:
+                continue
+
+            LOG.info("Label audit: creating %s on node %s" %
+                     (missing, host.hostname))
+            body = {'metadata': {'labels': missing}}
+            try:
+                self._kube.kube_patch_node(host.hostname, body)
+            except exception.K8sNodeNotFound:
+                self._node_labels.pop(host.hostname, None)
+                continue
+            except Exception as e:
+                LOG.warning("Failed to sync kubernetes label to host %s: %s" %
+                            (host.hostname, e))
+                continue
+            node_labels.update(missing)
+            patched += 1
+        return patched
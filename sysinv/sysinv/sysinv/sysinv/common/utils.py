@@ -616,6 +616,12 @@ def hash_file(file_like_object):
     return checksum.hexdigest()
 
 
+def hash_inventory(inventory):
+    """Generate a hash for the contents of an inventory report."""
+    content = json.dumps(inventory, sort_keys=True, default=str)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
 @contextlib.contextmanager
 def tempdir(**kwargs):
     tempfile.tempdir = CONF.tempdir
@@ -21,6 +21,7 @@ from requests.exceptions import ReadTimeout
 
 from cephclient import wrapper as ceph
 from fm_api import fm_api
+from sysinv.common import ceph as cceph
 from sysinv.common import constants
 from sysinv.common import exception
 from sysinv.common import utils as cutils
@@ -54,6 +55,7 @@ class CephOperator(object):
         self._db_api = db_api
         self._ceph_api = ceph.CephWrapper(
             endpoint='http://localhost:5001')
+        self._cluster_state = cceph.CephClusterStateCache(self._ceph_api)
         self._db_cluster = None
         self._db_primary_tier = None
         self._cluster_name = 'ceph_cluster'
@@ -89,24 +91,22 @@ class CephOperator(object):
         except AttributeError:
             return None
 
+    def get_cluster_state(self, refresh=False, timeout=10):
+        """Get the snapshot of the cluster state shared by the audits.
+
+        The snapshot is invalidated by the operations changing the cluster.
+        """
+        return self._cluster_state.get(refresh, timeout)
+
+    def invalidate_cluster_state(self):
+        self._cluster_state.invalidate()
+
     def ceph_status_ok(self, timeout=10):
         """
             returns rc bool. True if ceph ok, False otherwise
             :param timeout: ceph api timeout
         """
-        rc = True
-
-        try:
-            response, body = self._ceph_api.status(body='json',
-                                                   timeout=timeout)
-            if (body['output']['health']['status'] !=
-                    constants.CEPH_HEALTH_OK):
-                rc = False
-        except Exception as e:
-            rc = False
-            LOG.warn("ceph status exception: %s " % e)
-
-        return rc
+        return self.get_cluster_state(timeout=timeout).health_ok()
 
     def _get_fsid(self, timeout=10):
         try:
@@ -279,6 +279,7 @@ class CephOperator(object):
         response, body = self._ceph_api.osd_set_pool_param(
             pool_name, param, value,
             force=None, body='json')
+        self.invalidate_cluster_state()
         if response.ok:
             LOG.info('OSD set pool param: pool={}, name={}, value={}'.format(pool_name, param, value))
         else:
@@ -309,6 +310,7 @@ class CephOperator(object):
         :param stor_uuid: uuid of stor object
         """
         response, body = self._ceph_api.osd_create(stor_uuid, **kwargs)
+        self.invalidate_cluster_state()
         return response, body
 
     def rebuild_osdmap(self):
@@ -414,6 +416,7 @@ class CephOperator(object):
             response, body = self._ceph_api.osd_pool_create(
                 name, pg_num, pgp_num, pool_type="replicated",
                 ruleset=ruleset, body='json')
+            self.invalidate_cluster_state()
             if response.ok:
                 LOG.info(_("Created OSD pool: pool_name={}, pg_num={}, "
                            "pgp_num={}, pool_type=replicated, ruleset={}, "
@@ -444,6 +447,7 @@ class CephOperator(object):
                 # ignored in the create call
                 response, body = self._ceph_api.osd_set_pool_param(
                     name, "crush_ruleset", ruleset, body='json')
+                self.invalidate_cluster_state()
 
             if response.ok:
                 LOG.info(_("Assigned crush ruleset to OSD pool: "
@@ -557,6 +561,7 @@ class CephOperator(object):
             pool_name, pool_name,
             sure='--yes-i-really-really-mean-it',
             body='json')
+        self.invalidate_cluster_state()
         if response.ok:
             LOG.info(_("Deleted OSD pool {}").format(pool_name))
         else:
@@ -606,6 +611,7 @@ class CephOperator(object):
         if prev_quota["max_bytes"] != max_bytes:
             resp, b = self._ceph_api.osd_set_pool_quota(pool, 'max_bytes',
                                                         max_bytes, body='json')
+            self.invalidate_cluster_state()
             if resp.ok:
                 LOG.info(_("Set OSD pool quota: "
                            "pool={}, max_bytes={}").format(pool, max_bytes))
@@ -618,6 +624,7 @@ class CephOperator(object):
             resp, b = self._ceph_api.osd_set_pool_quota(pool, 'max_objects',
                                                         max_objects,
                                                         body='json')
+            self.invalidate_cluster_state()
             if resp.ok:
                 LOG.info(_("Set OSD pool quota: "
                            "pool={}, max_objects={}").format(pool, max_objects))
@@ -682,22 +689,11 @@ class CephOperator(object):
         return quota_gib_value
 
     def get_ceph_object_pool_name(self):
-        response, body = self._ceph_api.osd_pool_get(
-            constants.CEPH_POOL_OBJECT_GATEWAY_NAME_JEWEL,
-            "pg_num",
-            body='json')
-
-        if response.ok:
-            return constants.CEPH_POOL_OBJECT_GATEWAY_NAME_JEWEL
-
-        response, body = self._ceph_api.osd_pool_get(
-            constants.CEPH_POOL_OBJECT_GATEWAY_NAME_HAMMER,
-            "pg_num",
-            body='json')
-
-        if response.ok:
-            return constants.CEPH_POOL_OBJECT_GATEWAY_NAME_HAMMER
-
+        state = self.get_cluster_state()
+        for pool_name in [constants.CEPH_POOL_OBJECT_GATEWAY_NAME_JEWEL,
+                          constants.CEPH_POOL_OBJECT_GATEWAY_NAME_HAMMER]:
+            if state.pool(pool_name) is not None:
+                return pool_name
         return None
 
     def update_ceph_object_pool_name(self, pool):
@@ -870,6 +866,7 @@ class CephOperator(object):
 
         response, body = self._ceph_api.osd_down(
             osdid, body='json')
+        self.invalidate_cluster_state()
         if response.ok:
             LOG.info("Set OSD %d to down state.", osdid)
         else:
@@ -909,6 +906,7 @@ class CephOperator(object):
         # Remove the OSD from the crush map
         response, body = self._ceph_api.osd_crush_remove(
             osdid_str, body='json')
+        self.invalidate_cluster_state()
         if not response.ok:
             LOG.error("OSD crush remove failed for OSD %s: %s",
                       osdid_str, response.reason)
@@ -923,31 +921,29 @@ class CephOperator(object):
             response.raise_for_status()
 
     def osd_remove(self, *args, **kwargs):
-        return self._ceph_api.osd_remove(*args, **kwargs)
+        response = self._ceph_api.osd_remove(*args, **kwargs)
+        self.invalidate_cluster_state()
+        return response
 
     def get_cluster_df_stats(self, timeout=10):
         """Get the usage information for the ceph cluster.
         :param timeout:
         """
 
-        resp, body = self._ceph_api.df(body='json',
-                                       timeout=timeout)
-        if not resp.ok:
-            e = exception.CephGetClusterUsageFailure(reason=resp.reason)
-            LOG.error(e)
-            raise e
-        else:
-            return body["output"]["stats"]
+        try:
+            df = self.get_cluster_state(timeout=timeout).df()
+        except exception.CephGetClusterStateFailure as e:
+            raise exception.CephGetClusterUsageFailure(
+                reason=e.kwargs['reason'])
+        return df["stats"]
 
     def get_pools_df_stats(self, timeout=10):
-        resp, body = self._ceph_api.df(body='json',
-                                       timeout=timeout)
-        if not resp.ok:
-            e = exception.CephGetPoolsUsageFailure(reason=resp.reason)
-            LOG.error(e)
-            raise e
-        else:
-            return body["output"]["pools"]
+        try:
+            df = self.get_cluster_state(timeout=timeout).df()
+        except exception.CephGetClusterStateFailure as e:
+            raise exception.CephGetPoolsUsageFailure(
+                reason=e.kwargs['reason'])
+        return df["pools"]
 
     def get_osd_stats(self, timeout=30):
         try:
@@ -1087,15 +1083,49 @@ class CephOperator(object):
 
         return storage_hosts_upgraded
 
+    # TODO(CephPoolsDecouple): remove
+    # TIER SUPPORT
+    def _count_tier_osds(self, tiers_obj, storage_hosts, replication):
+        """
+        Count the OSDs of a tier on the storage hosts
+
+        returns osds_raw  actual osds
+                osds      osds adjusted for a number of storage hosts which
+                          is not a multiple of the replication factor
+        """
+        osds = 0
+        stors = None
+        last_storage = storage_hosts[0]
+        for i in storage_hosts:
+            if i.hostname > last_storage.hostname:
+                last_storage = i
+
+            # either cinder or ceph
+            stors = self._db_api.istor_get_by_ihost(i.uuid)
+            osds += len([s for s in stors if s.tier_name == tiers_obj.name])
+
+        osds_raw = osds
+        stors = self._db_api.istor_get_by_ihost(last_storage.uuid)
+        storage_gap = len(storage_hosts) % replication
+        stors_number = len([s for s in stors if s.tier_name == tiers_obj.name])
+        if storage_gap != 0 and stors_number != 0:
+            osds_adjust = (replication - storage_gap) * stors_number
+            osds += osds_adjust
+            LOG.debug("OSD - number of storage hosts is not a multiple of replication factor, "
+                     "adjusting osds by %d to osds=%d" % (osds_adjust, osds))
+
+        return osds_raw, osds
+
     # TODO(CephPoolsDecouple): remove
     # TIER SUPPORT
     def _calculate_target_pg_num_for_tier_pool(self, tiers_obj, pool_name,
-                                               storage_hosts):
+                                               storage_hosts, tier_osds=None):
         """
         Calculate target pg_num based upon storage hosts, OSDs, and tier
 
         storage_hosts: storage host objects
         tier_obj: storage tier object
+        tier_osds: OSD counts of the tier, as returned by _count_tier_osds()
         returns target_pg_num  calculated target policy group number
                 osds_raw       actual osds
 
@@ -1154,26 +1184,10 @@ class CephOperator(object):
 
         target_pg_num = None
 
-        osds = 0
-        stors = None
-        last_storage = storage_hosts[0]
-        for i in storage_hosts:
-            if i.hostname > last_storage.hostname:
-                last_storage = i
-
-            # either cinder or ceph
-            stors = self._db_api.istor_get_by_ihost(i.uuid)
-            osds += len([s for s in stors if s.tier_name == tiers_obj.name])
-
-        osds_raw = osds
-        stors = self._db_api.istor_get_by_ihost(last_storage.uuid)
-        storage_gap = len(storage_hosts) % replication
-        stors_number = len([s for s in stors if s.tier_name == tiers_obj.name])
-        if storage_gap != 0 and stors_number != 0:
-            osds_adjust = (replication - storage_gap) * stors_number
-            osds += osds_adjust
-            LOG.debug("OSD - number of storage hosts is not a multiple of replication factor, "
-                     "adjusting osds by %d to osds=%d" % (osds_adjust, osds))
+        if tier_osds is None:
+            tier_osds = self._count_tier_osds(tiers_obj, storage_hosts,
+                                              replication)
+        osds_raw, osds = tier_osds
 
         data_pt = None
 
@@ -1204,37 +1218,26 @@ class CephOperator(object):
         return target_pg_num, osds_raw
 
     # TODO(CephPoolsDecouple): remove
-    def audit_osd_pool_on_tier(self, tier_obj, storage_hosts, pool_name):
+    def audit_osd_pool_on_tier(self, tier_obj, storage_hosts, pool_name,
+                               tier_osds=None):
         """ Audit an osd pool and update pg_num, pgp_num accordingly.
             storage_hosts; list of known storage host objects
             :param storage_hosts: list of storage host objects
             :param pool_name:
+            :param tier_osds: OSD counts of the tier, as returned by
+                              _count_tier_osds()
         """
 
         tier_pool_name = pool_name
 
         # Check if the pool exists
-        response, body = self._ceph_api.osd_pool_get(
-            tier_pool_name, "pg_num", body='json')
-        if not response.ok:
+        pool = self.get_cluster_state().pool(tier_pool_name)
+        if pool is None:
             # Pool does not exist, log error
-            LOG.error("OSD pool %(name)s get failed: %(reason)s, "
-                      "details %(details)s" %
-                      {"name": tier_pool_name, "reason": response.reason,
-                       "details": body})
+            LOG.error("OSD pool %s does not exist" % tier_pool_name)
             return
-        cur_pg_num = body['output']['pg_num']
-
-        response, body = self._ceph_api.osd_pool_get(
-            tier_pool_name, "pgp_num", body='json')
-        if not response.ok:
-            # Pool does not exist, log error
-            LOG.error("OSD pool %(name)s get "
-                      "failed: %(reason)s, details: %(details)s" %
-                      {"name": tier_pool_name, "reason": response.reason,
-                       "details": body})
-            return
-        cur_pgp_num = body['output']['pgp_num']
+        cur_pg_num = pool['pg_num']
+        cur_pgp_num = pool['pgp_num']
 
         LOG.info("OSD pool name %s, cur_pg_num=%s, cur_pgp_num=%s" %
                  (tier_pool_name, cur_pg_num, cur_pgp_num))
@@ -1247,6 +1250,7 @@ class CephOperator(object):
                                                         target_pgp_num))
             response, body = self._ceph_api.osd_set_pool_param(
                 tier_pool_name, 'pgp_num', target_pgp_num, force=None, body='text')
+            self.invalidate_cluster_state()
             if not response.ok:
                 # Do not fail the operation - just log it
                 LOG.error("OSD pool %(name)s set pgp_num "
@@ -1262,7 +1266,7 @@ class CephOperator(object):
                 return
 
         target_pg_num, osds = self._calculate_target_pg_num_for_tier_pool(
-            tier_obj, tier_pool_name, storage_hosts)
+            tier_obj, tier_pool_name, storage_hosts, tier_osds)
 
         # Check whether the number of pgs needs to be increased
         if cur_pg_num < target_pg_num:
@@ -1279,6 +1283,7 @@ class CephOperator(object):
                                                           target_pg_num))
             response, body = self._ceph_api.osd_set_pool_param(
                 tier_pool_name, 'pg_num', target_pg_num, body='text')
+            self.invalidate_cluster_state()
             # Add: force='--yes-i-really-mean-it' for cached pools
             # once changing PGs is considered stable
             if not response.ok:
@@ -1299,7 +1304,7 @@ class CephOperator(object):
         # TODO(rchurch): Make this smarter.Just look at the OSD for the tier to
         # determine if we can continue. For now making sure all are up/in is ok
         try:
-            osd_stats = self.get_osd_stats()
+            osd_stats = self.get_cluster_state().osd_stats()
             if not ((int(osd_stats['num_osds']) > 0) and
                     (int(osd_stats['num_osds']) ==
                      int(osd_stats['num_up_osds'])) and
@@ -1487,6 +1492,9 @@ class CephOperator(object):
             on cluster size.
         """
 
+        # Take a new snapshot of the cluster state for this audit cycle
+        self.get_cluster_state(refresh=True)
+
         tiers = self._db_api.storage_tier_get_by_cluster(self.cluster_db_uuid)
         ceph_tiers = [t for t in tiers if t.type == constants.SB_TIER_TYPE_CEPH]
         for t in ceph_tiers:
@@ -1521,6 +1529,10 @@ class CephOperator(object):
                                 LOG.warn(_('Failed to retrieve rados gateway object data pool. '
                                            'Reason: %(reason)s') % {'reason': str(e.message)})
                                 break
+                            except exception.CephFailure as e:
+                                LOG.warn(_('Failed to retrieve rados gateway object data pool. '
+                                           'Reason: %(reason)s') % {'reason': str(e)})
+                                break
 
                     audit = [(pools_snapshot, storage_hosts)]
 
@@ -1533,13 +1545,26 @@ class CephOperator(object):
 
                 if audit is not None:
                     for pools, storage_hosts in audit:
+                        # The OSDs of the tier are counted once for all its
+                        # pools
+                        replication, min_replication = \
+                            StorageBackendConfig.get_ceph_pool_replication(
+                                self._db_api, t)
+                        tier_osds = self._count_tier_osds(t, storage_hosts,
+                                                          replication)
                         for pool in pools:
                             try:
                                 self.audit_osd_pool_on_tier(t,
                                                             storage_hosts,
-                                                            pool['pool_name'])
+                                                            pool['pool_name'],
+                                                            tier_osds)
                             except RequestException as e:
                                 LOG.warn(_('OSD pool %(pool_name)s audit failed. '
                                            'Reason: %(reason)s') % {
                                                'pool_name': pool['pool_name'],
                                                'reason': str(e.message)})
+                            except exception.CephFailure as e:
+                                LOG.warn(_('OSD pool %(pool_name)s audit failed. '
+                                           'Reason: %(reason)s') % {
+                                               'pool_name': pool['pool_name'],
+                                               'reason': str(e)})
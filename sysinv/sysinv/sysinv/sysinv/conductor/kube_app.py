@@ -10,6 +10,7 @@
 """ System Inventory Kubernetes Application Operator."""
 
 import base64
+import datetime
 import docker
 import grp
 import keyring
@@ -62,6 +63,7 @@ DELETE_SEARCH_PATTERN = 'Deleting release'
 ROLLBACK_SEARCH_PATTERN = 'Helm rollback of release'
 INSTALLATION_TIMEOUT = 3600
 MAX_DOWNLOAD_THREAD = 5
+IMAGE_DOWNLOAD_PROGRESS_INTERVAL = 10
 TARFILE_DOWNLOAD_CONNECTION_TIMEOUT = 60
 TARFILE_TRANSFER_CHUNK_SIZE = 1024 * 512
 DOCKER_REGISTRY_USER = 'admin'
@@ -95,6 +97,10 @@ def generate_images_filename_abs(armada_mfile_dir, app_name):
     return os.path.join(armada_mfile_dir, app_name + '-images.yaml')
 
 
+def generate_images_index_filename_abs(armada_mfile_dir, app_name):
+    return os.path.join(armada_mfile_dir, app_name + '-images-index.yaml')
+
+
 def generate_overrides_dir(app_name, app_version):
     return os.path.join(common.HELM_OVERRIDES_PATH, app_name, app_version)
 
@@ -131,6 +137,163 @@ def get_local_docker_registry_auth():
 Chart = namedtuple('Chart', 'name namespace location release labels sequenced')
 
 
+def order_image_tags(image_tags, chart_order=None):
+    """Return the unique image tags ordered by the install order of the
+    charts using them.
+
+    :param image_tags: list of (chart name, image tag) tuples
+    :param chart_order: list of chart names in install order
+    :return: list of image tags
+    """
+    rank = {}
+    for index, name in enumerate(chart_order or []):
+        rank.setdefault(name, index)
+
+    ordered = []
+    for _, tag in sorted(image_tags,
+                         key=lambda t: rank.get(t[0], len(rank))):
+        if tag not in ordered:
+            ordered.append(tag)
+    return ordered
+
+
+class ArmadaLogFollower(object):
+    """ Incremental reader of the chart events of an armada log
+
+    TODO(tngo): In the absence of an Armada API that provides the current
+    status of an apply/delete manifest operation, the progress is derived
+    from specific log entries extracted from the execution logs. This
+    class is to be replaced with an official API call when it becomes
+    available.
+
+    The log is read from the offset reached by the previous poll, so each
+    poll only parses the lines appended in the meantime. Every log entry
+    matching the search pattern starts the processing of a chart, which
+    ends when the next chart starts or when the request completes.
+
+    The log left by a previous request is skipped. Armada rewrites the log
+    for each request, which is detected from the beginning of the log no
+    longer matching the one previously read, even if the new log has
+    already grown past the previous offset.
+    """
+
+    ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-9;]*m')
+    TIMESTAMP_RE = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})')
+    TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+    HEAD_SIZE = 256
+
+    def __init__(self, logfile, pattern):
+        self._logfile = logfile
+        self._pattern = pattern
+        self._reset()
+        try:
+            with open(self._logfile, 'rb') as f:
+                self._head = f.read(self.HEAD_SIZE)
+                f.seek(0, os.SEEK_END)
+                self._offset = f.tell()
+        except (IOError, OSError):
+            pass
+
+    def _reset(self):
+        self._offset = 0
+        self._head = b''
+        self._partial = b''
+        self.charts = []
+
+    def _parse_chart(self, line):
+        fields = self.ANSI_ESCAPE_RE.sub('', line).replace(',', '').split()
+        if self._pattern == ROLLBACK_SEARCH_PATTERN:
+            chart = fields[9] if len(fields) > 9 else None
+        else:
+            chart = fields[-1] if fields else None
+        if chart and '=' in chart:
+            chart = chart.split('=')[1]
+        return chart
+
+    def _parse_time(self, line):
+        match = self.TIMESTAMP_RE.match(line)
+        if match:
+            try:
+                return datetime.datetime.strptime(match.group(1),
+                                                  self.TIMESTAMP_FORMAT)
+            except ValueError:
+                pass
+        return datetime.datetime.utcnow().replace(microsecond=0)
+
+    def _start_chart(self, chart, start):
+        if self.charts and self.charts[-1]['end'] is None:
+            self._end_chart(start)
+        self.charts.append({'chart': chart,
+                            'start': start,
+                            'end': None})
+
+    def _end_chart(self, end):
+        self.charts[-1]['end'] = max(end, self.charts[-1]['start'])
+
+    def poll(self):
+        """ Parse the log lines appended since the last poll
+
+        :return: the number of charts started by the new lines
+        """
+        try:
+            with open(self._logfile, 'rb') as f:
+                head = f.read(self.HEAD_SIZE)
+                f.seek(0, os.SEEK_END)
+                common = min(len(head), len(self._head))
+                if (f.tell() < self._offset or
+                        head[:common] != self._head[:common]):
+                    # the log was rewritten by a new request
+                    self._reset()
+                if len(head) > len(self._head):
+                    self._head = head
+                f.seek(self._offset)
+                data = f.read()
+                self._offset = f.tell()
+        except (IOError, OSError):
+            return 0
+
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+
+        started = 0
+        for line in lines:
+            line = line.decode('utf-8', 'replace')
+            if self._pattern not in line:
+                continue
+            chart = self._parse_chart(line)
+            if chart:
+                self._start_chart(chart, self._parse_time(line))
+                started += 1
+        return started
+
+    def finish(self):
+        """ Parse the remaining log lines and end the last chart """
+        self.poll()
+        if self.charts and self.charts[-1]['end'] is None:
+            self._end_chart(datetime.datetime.utcnow().replace(microsecond=0))
+
+    @property
+    def last_chart(self):
+        return self.charts[-1]['chart'] if self.charts else None
+
+    def completion(self, num_charts):
+        """ Return the percentage of the charts whose processing started """
+        return round(float(len(self.charts)) / num_charts * 100)
+
+    def timeline(self, request):
+        """ Return the chart timeline, as stored with the application """
+        charts = []
+        for c in self.charts:
+            duration = None
+            if c['end'] is not None:
+                duration = (c['end'] - c['start']).total_seconds()
+            charts.append({'chart': c['chart'],
+                           'start': c['start'].isoformat(),
+                           'end': c['end'] and c['end'].isoformat(),
+                           'duration': duration})
+        return {'request': request, 'charts': charts}
+
+
 class AppOperator(object):
     """Class to encapsulate Kubernetes App operations for System Inventory"""
 
@@ -309,31 +472,190 @@ class AppOperator(object):
         finally:
             os.chown(constants.APP_INSTALL_ROOT_PATH, orig_uid, orig_gid)
 
-    def _get_image_tags_by_path(self, path):
+    @staticmethod
+    def _get_file_hash(path):
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return cutils.hash_file(f)
+
+    @staticmethod
+    def _load_images_index(images_index_file):
+        if not images_index_file or not os.path.exists(images_index_file):
+            return {}
+        try:
+            with open(images_index_file, 'r') as f:
+                return yaml.safe_load(f) or {}
+        except Exception as e:
+            LOG.warn("Images index %s could not be loaded, rebuilding it: "
+                     "%s" % (images_index_file, e))
+            return {}
+
+    @staticmethod
+    def _save_images_index(images_index_file, index):
+        if not images_index_file:
+            return
+        with open(images_index_file, 'w') as f:
+            yaml.safe_dump(index, f, default_flow_style=False)
+
+    def _get_image_tags_by_path(self, path, images_index_file=None):
         """ Mine the image tags from values.yaml files in the chart directory,
             intended for custom apps.
 
+            The image tags found in each values.yaml file are saved in the
+            images index, and a file is parsed again only if its modification
+            time or size changed.
+
             TODO(awang): Support custom apps to pull images from local registry
         """
 
+        index = self._load_images_index(images_index_file)
+        values_index = index.get('values', {})
+        updated_index = {}
+
         image_tags = []
-        ids = []
         for r, f in cutils.get_files_matching(path, 'values.yaml'):
-            with open(os.path.join(r, f), 'r') as value_f:
-                try:
-                    y = yaml.safe_load(value_f)
-                    ids = y["images"]["tags"].values()
-                except (TypeError, KeyError):
-                    pass
-            image_tags.extend(ids)
+            values_file = os.path.join(r, f)
+            stat = os.stat(values_file)
+            entry = values_index.get(values_file)
+            if (not entry or entry['mtime'] != stat.st_mtime or
+                    entry['size'] != stat.st_size):
+                ids = []
+                with open(values_file, 'r') as value_f:
+                    try:
+                        y = yaml.safe_load(value_f)
+                        ids = list(y["images"]["tags"].values())
+                    except (TypeError, KeyError):
+                        pass
+                entry = {'mtime': stat.st_mtime,
+                         'size': stat.st_size,
+                         'tags': ids}
+            updated_index[values_file] = entry
+            image_tags.extend(entry['tags'])
+
+        if updated_index != values_index:
+            index['values'] = updated_index
+            self._save_images_index(images_index_file, index)
         return list(set(image_tags))
 
-    def _get_image_tags_by_charts(self, app_images_file, app_manifest_file, overrides_dir):
+    @staticmethod
+    def _get_overrides_image_tags(app_overrides_file):
+        """ Return the overrides of a chart and their image tags """
+        overrides_file = None
+        images_overrides = {}
+        if os.path.exists(app_overrides_file):
+            try:
+                with open(app_overrides_file, 'r') as f:
+                    overrides_file = yaml.safe_load(f)
+                    images_overrides = overrides_file['data']['values']['images']['tags']
+            except (TypeError, KeyError):
+                pass
+        return overrides_file, images_overrides
+
+    @staticmethod
+    def _save_overrides_image_tags(app_overrides_file, overrides_file,
+                                   images_overrides):
+        with open(app_overrides_file, 'w') as f:
+            try:
+                overrides_file["data"]["values"]["images"] = {"tags": images_overrides}
+                yaml.safe_dump(overrides_file, f, default_flow_style=False)
+                LOG.info("Overrides file %s updated with new image tags" %
+                         app_overrides_file)
+            except (TypeError, KeyError):
+                LOG.error("Overrides file %s fails to update" %
+                          app_overrides_file)
+
+    @staticmethod
+    def _resolve_chart_image_tags(images_charts, images_overrides,
+                                  images_manifest):
+        """ Resolve the image tags required by a chart
+
+        For the image tags from the chart path which do not exist in the
+        overrides and manifest file, add to manifest file. Convert the image
+        tags in the overrides and manifest file with local docker registry
+        address.
+
+        :return: tuple of the list of required image tags, whether the
+                 manifest image tags and whether the overrides image tags
+                 were updated
+        """
+        image_tags = []
+        chart_image_tags_updated = False
+        overrides_image_tags_updated = False
+        for key in images_charts:
+            if key not in images_overrides:
+                if key not in images_manifest:
+                    images_manifest.update({key: images_charts[key]})
+                if not re.match(r'^.+:.+/', images_manifest[key]):
+                    images_manifest.update(
+                        {key: '{}/{}'.format(constants.DOCKER_REGISTRY_SERVER,
+                                             images_manifest[key])})
+                    chart_image_tags_updated = True
+                image_tags.append(images_manifest[key])
+            else:
+                if not re.match(r'^.+:.+/', images_overrides[key]):
+                    images_overrides.update(
+                        {key: '{}/{}'.format(constants.DOCKER_REGISTRY_SERVER,
+                                             images_overrides[key])})
+                    overrides_image_tags_updated = True
+                image_tags.append(images_overrides[key])
+        return (image_tags, chart_image_tags_updated,
+                overrides_image_tags_updated)
+
+    def _get_indexed_image_tags(self, index, images_file, overrides_dir):
+        """ Get the image tags for charts from the images index
+
+        Only the overrides of the charts whose overrides file changed since
+        the index was saved are parsed again.
+
+        :return: list of (chart name, image tag) tuples, or None if the
+                 index is out of date and the manifest must be parsed again
+        """
+        image_tags = []
+        for entry in index['charts']:
+            if images_file.get(entry['name'], {}) != entry['images']:
+                return None
+
+            app_overrides_file = os.path.join(overrides_dir,
+                                              entry['overrides'])
+            overrides_hash = self._get_file_hash(app_overrides_file)
+            if overrides_hash != entry['overrides_hash']:
+                overrides_file, images_overrides = \
+                    self._get_overrides_image_tags(app_overrides_file)
+                tags, chart_updated, overrides_updated = \
+                    self._resolve_chart_image_tags(
+                        entry['images'], images_overrides,
+                        dict(entry['manifest']))
+                if chart_updated:
+                    # the manifest needs new image tags
+                    return None
+                if overrides_updated:
+                    self._save_overrides_image_tags(
+                        app_overrides_file, overrides_file, images_overrides)
+                    overrides_hash = self._get_file_hash(app_overrides_file)
+                entry['overrides_hash'] = overrides_hash
+                entry['tags'] = tags
+
+            image_tags.extend((entry['name'], tag) for tag in entry['tags'])
+        return image_tags
+
+    def _get_image_tags_by_charts(self, app_images_file, app_manifest_file,
+                                  overrides_dir, chart_order=None,
+                                  images_index_file=None):
         """ Mine the image tags for charts from the images file. Add the
             image tags to the manifest file if the image tags from the charts
             do not exist in both overrides file and manifest file. Convert
             the image tags in the manifest file. Intended for system app.
 
+            The image tags are returned in the install order of the charts
+            given by chart_order, so that the images of the charts installed
+            first are downloaded first.
+
+            The resolved image tags of each chart are saved in the images
+            index. As long as the manifest is unchanged, the image tags are
+            taken from the index and only the overrides files that changed
+            are parsed again.
+
             The image tagging conversion(local docker registry address prepended):
             ${LOCAL_REGISTRY_SERVER}:${REGISTRY_PORT}/<image-name>
             (ie..registry.local:9001/docker.io/mariadb:10.2.13)
@@ -341,23 +663,33 @@ class AppOperator(object):
 
         manifest_image_tags_updated = False
         image_tags = []
+        images_file = {}
 
         if os.path.exists(app_images_file):
             with open(app_images_file, 'r') as f:
-                images_file = yaml.safe_load(f)
+                images_file = yaml.safe_load(f) or {}
+
+        index = self._load_images_index(images_index_file)
+        manifest_hash = self._get_file_hash(app_manifest_file)
+        if index.get('manifest') == manifest_hash and 'charts' in index:
+            image_tags = self._get_indexed_image_tags(index, images_file,
+                                                      overrides_dir)
+            if image_tags is not None:
+                self._save_images_index(images_index_file, index)
+                return order_image_tags(image_tags, chart_order)
+            image_tags = []
 
+        charts = []
         if os.path.exists(app_manifest_file):
             with open(app_manifest_file, 'r') as f:
                 charts = list(yaml.load_all(f, Loader=yaml.RoundTripLoader))
 
+        index_charts = []
         for chart in charts:
             images_charts = {}
             images_overrides = {}
             images_manifest = {}
 
-            overrides_image_tags_updated = False
-            chart_image_tags_updated = False
-
             if "armada/Chart/" in chart['schema']:
                 chart_data = chart['data']
                 chart_name = chart_data['chart_name']
@@ -370,13 +702,8 @@ class AppOperator(object):
                 # Get the image tags from the overrides file
                 overrides = chart_namespace + '-' + chart_name + '.yaml'
                 app_overrides_file = os.path.join(overrides_dir, overrides)
-                if os.path.exists(app_overrides_file):
-                    try:
-                        with open(app_overrides_file, 'r') as f:
-                            overrides_file = yaml.safe_load(f)
-                            images_overrides = overrides_file['data']['values']['images']['tags']
-                    except (TypeError, KeyError):
-                        pass
+                overrides_file, images_overrides = \
+                    self._get_overrides_image_tags(app_overrides_file)
 
                 # Get the image tags from the armada manifest file
                 try:
@@ -386,39 +713,15 @@ class AppOperator(object):
                              "chart %s" % chart_name)
                     pass
 
-                # For the image tags from the chart path which do not exist
-                # in the overrides and manifest file, add to manifest file.
-                # Convert the image tags in the overrides and manifest file
-                # with local docker registry address.
                 # Append the required images to the image_tags list.
-                for key in images_charts:
-                    if key not in images_overrides:
-                        if key not in images_manifest:
-                            images_manifest.update({key: images_charts[key]})
-                        if not re.match(r'^.+:.+/', images_manifest[key]):
-                            images_manifest.update(
-                                {key: '{}/{}'.format(constants.DOCKER_REGISTRY_SERVER,
-                                                     images_manifest[key])})
-                            chart_image_tags_updated = True
-                        image_tags.append(images_manifest[key])
-                    else:
-                        if not re.match(r'^.+:.+/', images_overrides[key]):
-                            images_overrides.update(
-                                {key: '{}/{}'.format(constants.DOCKER_REGISTRY_SERVER,
-                                                     images_overrides[key])})
-                            overrides_image_tags_updated = True
-                        image_tags.append(images_overrides[key])
+                tags, chart_image_tags_updated, overrides_image_tags_updated = \
+                    self._resolve_chart_image_tags(
+                        images_charts, images_overrides, images_manifest)
+                image_tags.extend((chart_name, tag) for tag in tags)
 
                 if overrides_image_tags_updated:
-                    with open(app_overrides_file, 'w') as f:
-                        try:
-                            overrides_file["data"]["values"]["images"] = {"tags": images_overrides}
-                            yaml.safe_dump(overrides_file, f, default_flow_style=False)
-                            LOG.info("Overrides file %s updated with new image tags" %
-                                     app_overrides_file)
-                        except (TypeError, KeyError):
-                            LOG.error("Overrides file %s fails to update" %
-                                      app_overrides_file)
+                    self._save_overrides_image_tags(
+                        app_overrides_file, overrides_file, images_overrides)
 
                 if chart_image_tags_updated:
                     if 'values' in chart_data:
@@ -427,6 +730,15 @@ class AppOperator(object):
                         chart_data["values"] = {"images": {"tags": images_manifest}}
                     manifest_image_tags_updated = True
 
+                index_charts.append({
+                    'name': chart_name,
+                    'overrides': overrides,
+                    'overrides_hash': self._get_file_hash(app_overrides_file),
+                    'images': dict(images_charts),
+                    'manifest': dict((str(k), str(v)) for k, v in
+                                     images_manifest.items()),
+                    'tags': [str(t) for t in tags]})
+
         if manifest_image_tags_updated:
             with open(app_manifest_file, 'w') as f:
                 try:
@@ -438,7 +750,11 @@ class AppOperator(object):
                     LOG.error("Manifest file %s fails to update with "
                               "new image tags: %s" % (app_manifest_file, e))
 
-        return list(set(image_tags))
+        self._save_images_index(images_index_file, {
+            'manifest': self._get_file_hash(app_manifest_file),
+            'charts': index_charts})
+
+        return order_image_tags(image_tags, chart_order)
 
     def _register_embedded_images(self, app):
         """
@@ -470,10 +786,12 @@ class AppOperator(object):
             self._save_images_list_by_charts(app)
             # Get the list of images from the updated images overrides
             images_to_download = self._get_image_tags_by_charts(
-                app.imgfile_abs, app.armada_mfile_abs, app.overrides_dir)
+                app.imgfile_abs, app.armada_mfile_abs, app.overrides_dir,
+                [c.name for c in app.charts], app.imgindex_abs)
         else:
             # For custom apps, mine image tags from application path
-            images_to_download = self._get_image_tags_by_path(app.path)
+            images_to_download = self._get_image_tags_by_path(
+                app.path, app.imgindex_abs)
 
         if not images_to_download:
             # TODO(tngo): We may want to support the deployment of apps that
@@ -516,6 +834,16 @@ class AppOperator(object):
             images_list = yaml.safe_load(f)
         return images_list
 
+    def _set_image_status(self, app, image, status):
+        """ Persist the download status of an application image """
+        try:
+            self._dbapi.kube_app_image_update(app.id, image,
+                                              {'status': status})
+        except exception.KubeAppImageNotFound:
+            self._dbapi.kube_app_image_create({'app_id': app.id,
+                                               'image': image,
+                                               'status': status})
+
     def _download_images(self, app):
         if os.path.isdir(app.images_dir):
             return self._register_embedded_images(app)
@@ -527,7 +855,8 @@ class AppOperator(object):
             saved_images_list = self._retrieve_images_list(app.imgfile_abs)
             saved_download_images_list = list(saved_images_list.get("download_images"))
             images_to_download = self._get_image_tags_by_charts(
-                app.imgfile_abs, app.armada_mfile_abs, app.overrides_dir)
+                app.imgfile_abs, app.armada_mfile_abs, app.overrides_dir,
+                [c.name for c in app.charts], app.imgindex_abs)
             if set(saved_download_images_list) != set(images_to_download):
                 saved_images_list.update({"download_images": images_to_download})
                 with open(app.imgfile_abs, 'wb') as f:
@@ -537,16 +866,48 @@ class AppOperator(object):
             images_to_download = self._retrieve_images_list(
                 app.imgfile_abs).get("download_images")
 
+        # The images pushed to the local registry by a previous apply are
+        # not downloaded again. Images pulled directly from a public or
+        # private registry only live in the docker daemon of the active
+        # controller and are always pulled.
+        downloaded = set(image.image for image in
+                         self._dbapi.kube_app_image_get_all(
+                             app.id, status=constants.APP_IMAGE_DOWNLOADED))
+        images_to_download = [
+            tag for tag in order_image_tags(
+                [(None, image) for image in images_to_download])
+            if not (tag in downloaded and
+                    tag.startswith(constants.DOCKER_REGISTRY_HOST))]
+        if not images_to_download:
+            LOG.info("All docker images for application %s were already "
+                     "downloaded" % app.name)
+            return
+
         total_count = len(images_to_download)
         threads = min(MAX_DOWNLOAD_THREAD, total_count)
         failed_downloads = []
+        progress = ImageDownloadProgress(total_count)
+
+        def _pull_progress(event):
+            if progress.update(event):
+                self._update_app_status(app, new_progress=str(progress))
+
+        def _download_an_image(img_tag):
+            return self._docker.download_an_image(img_tag,
+                                                  progress=_pull_progress)
 
         start = time.time()
         pool = greenpool.GreenPool(size=threads)
-        for tag, rc in pool.imap(self._docker.download_an_image,
-                                images_to_download):
-            if not rc:
+        for tag, rc in pool.imap(_download_an_image, images_to_download):
+            if rc:
+                self._set_image_status(app, tag,
+                                       constants.APP_IMAGE_DOWNLOADED)
+            else:
+                self._set_image_status(app, tag,
+                                       constants.APP_IMAGE_DOWNLOAD_FAILED)
                 failed_downloads.append(tag)
+            progress.image_done()
+            self._update_app_status(app, new_progress=str(progress))
         elapsed = time.time() - start
         failed_count = len(failed_downloads)
         if failed_count > 0:
@@ -556,7 +917,8 @@ class AppOperator(object):
                 reason="failed to download one or more image(s).")
         else:
             LOG.info("All docker images for application %s were successfully "
-                     "downloaded in %d seconds" % (app.name, elapsed))
+                     "downloaded in %d seconds (%.1f MB/s)" %
+                     (app.name, elapsed, progress.rate))
 
     def _validate_helm_charts(self, app):
         failed_charts = []
@@ -1079,39 +1441,7 @@ class AppOperator(object):
         :param overrides_str: list of overrides in string format to be applied
         """
 
-        def _get_armada_log_stats(pattern, logfile):
-            """
-            TODO(tngo): In the absence of an Armada API that provides the current
-            status of an apply/delete manifest operation, the progress is derived
-            from specific log entries extracted from the execution logs. This
-            inner method is to be replaced with an official API call when
-            it becomes available.
-            """
-            if pattern == ROLLBACK_SEARCH_PATTERN:
-                print_chart = '{print $10}'
-            else:
-                print_chart = '{print $NF}'
-            p1 = subprocess.Popen(['docker', 'exec', ARMADA_CONTAINER_NAME,
-                                   'grep', pattern, logfile],
-                                   stdout=subprocess.PIPE)
-            p2 = subprocess.Popen(['awk', print_chart], stdin=p1.stdout,
-                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            p1.stdout.close()
-            result, err = p2.communicate()
-            if result:
-                # Strip out ANSI color code that might be in the text stream
-                r = re.compile("\x1b\[[0-9;]*m")
-                result = r.sub('', result).replace(',', '')
-                matches = result.split()
-                num_chart_processed = len(matches)
-                last_chart_processed = matches[num_chart_processed - 1]
-                if '=' in last_chart_processed:
-                    last_chart_processed = last_chart_processed.split('=')[1]
-                return last_chart_processed, num_chart_processed
-
-            return None, None
-
-        def _check_progress(monitor_flag, app, pattern, logfile):
+        def _check_progress(monitor_flag, app, follower):
             """ Progress monitoring task, to be run in a separate thread """
             LOG.info("Starting progress monitoring thread for app %s" % app.name)
             try:
@@ -1124,15 +1454,16 @@ class AppOperator(object):
                             monitor_flag.task_done()
                             break
                         except queue.Empty:
-                            last, num = _get_armada_log_stats(pattern, logfile)
-                            if last:
+                            if follower.poll():
                                 if app.system_app:
                                     # helm-toolkit doesn't count
-                                    percent = \
-                                        round(float(num) / (len(app.charts) - 1) * 100)
+                                    percent = follower.completion(
+                                        len(app.charts) - 1)
                                 else:
-                                    percent = round(float(num) / len(app.charts) * 100)
-                                progress_str = 'processing chart: ' + last +\
+                                    percent = follower.completion(
+                                        len(app.charts))
+                                progress_str = 'processing chart: ' + \
+                                    follower.last_chart + \
                                     ', overall completion: ' + str(percent) + '%'
                                 if app.progress != progress_str:
                                     LOG.info("%s" % progress_str)
@@ -1140,7 +1471,7 @@ class AppOperator(object):
                                         app, new_progress=progress_str)
                             greenthread.sleep(1)
             except Exception as e:
-                # timeout or subprocess error
+                # timeout or log parsing error
                 LOG.exception(e)
             finally:
                 LOG.info("Exiting progress monitoring thread for app %s" % app.name)
@@ -1148,7 +1479,8 @@ class AppOperator(object):
         # Body of the outer method
         mqueue = queue.Queue()
         rc = True
-        logfile = ARMADA_CONTAINER_LOG_LOCATION + '/' + app.name + '-' + request + '.log'
+        logname = app.name + '-' + request + '.log'
+        logfile = ARMADA_CONTAINER_LOG_LOCATION + '/' + logname
         if request == constants.APP_APPLY_OP:
             pattern = APPLY_SEARCH_PATTERN
         elif request == constants.APP_DELETE_OP:
@@ -1156,14 +1488,33 @@ class AppOperator(object):
         else:
             pattern = ROLLBACK_SEARCH_PATTERN
 
+        # The armada container logs directory is mounted from the host, so
+        # the log is followed from the host instead of the container.
+        follower = ArmadaLogFollower(
+            os.path.join(ARMADA_HOST_LOG_LOCATION, logname), pattern)
         monitor = greenthread.spawn_after(1, _check_progress, mqueue, app,
-                                          pattern, logfile)
+                                          follower)
         rc = self._docker.make_armada_request(request, app.armada_mfile,
                                               overrides_str, app.releases, logfile)
         mqueue.put('done')
         monitor.kill()
+
+        follower.finish()
+        timeline = follower.timeline(request)
+        self._update_app_chart_timeline(app, timeline)
+        slowest = sorted([c for c in timeline['charts'] if c['duration']],
+                         key=lambda c: c['duration'], reverse=True)
+        if slowest:
+            LOG.info("Application %s %s chart durations: %s" % (
+                app.name, request, ', '.join(
+                    '%s %ds' % (c['chart'], c['duration']) for c in slowest)))
         return rc
 
+    def _update_app_chart_timeline(self, app, timeline):
+        """ Persist the chart timeline of the last armada request """
+        with self._lock:
+            app.update_chart_timeline(timeline)
+
     def _create_app_specific_resources(self, app_name):
         """Add application specific k8s resources.
 
@@ -1789,11 +2140,18 @@ class AppOperator(object):
             self.imgfile_abs = generate_images_filename_abs(
                 self.armada_mfile_dir,
                 self._kube_app.get('name'))
+            self.imgindex_abs = generate_images_index_filename_abs(
+                self.armada_mfile_dir,
+                self._kube_app.get('name'))
 
             self.patch_dependencies = []
             self.charts = []
             self.releases = []
 
+        @property
+        def id(self):
+            return self._kube_app.get('id')
+
         @property
         def name(self):
             return self._kube_app.get('name')
@@ -1820,6 +2178,10 @@ class AppOperator(object):
                 self._kube_app.progress = new_progress
             self._kube_app.save()
 
+        def update_chart_timeline(self, timeline):
+            self._kube_app.chart_timeline = timeline
+            self._kube_app.save()
+
         def update_active(self, active):
             was_active = self.active
             if active != self.active:
@@ -1859,10 +2221,63 @@ class AppOperator(object):
             self.images_dir = os.path.join(self.path, 'images')
             self.imgfile_abs = \
                 generate_images_filename_abs(self.armada_mfile_dir, self.name)
+            self.imgindex_abs = \
+                generate_images_index_filename_abs(self.armada_mfile_dir, self.name)
             self.overrides_dir = generate_overrides_dir(self.name, self.version)
             self.patch_dependencies = new_patch_dependencies
 
 
+class ImageDownloadProgress(object):
+    """ Aggregated progress of concurrent docker image downloads
+
+    The docker daemon pulls the layers shared by several images only once,
+    so the progress events of the pulls are accounted by layer id.
+    """
+
+    def __init__(self, total, interval=IMAGE_DOWNLOAD_PROGRESS_INTERVAL):
+        self.total = total
+        self.done = 0
+        self._interval = interval
+        self._layers = {}
+        self._start = time.time()
+        self._reported = self._start
+
+    def update(self, event):
+        """ Account the progress event of an image pull
+
+        :param event: decoded progress event of the docker pull
+        :return: whether the progress is due to be reported
+        """
+        layer = event.get('id')
+        detail = event.get('progressDetail') or {}
+        if (layer and event.get('status') == 'Downloading' and
+                detail.get('current')):
+            self._layers[layer] = max(self._layers.get(layer, 0),
+                                      detail['current'])
+
+        now = time.time()
+        if now - self._reported >= self._interval:
+            self._reported = now
+            return True
+        return False
+
+    def image_done(self):
+        self.done += 1
+        self._reported = time.time()
+
+    @property
+    def rate(self):
+        """ Download rate in MB/s """
+        elapsed = time.time() - self._start
+        if elapsed <= 0:
+            return 0.0
+        return sum(self._layers.values()) / elapsed / (1024 * 1024)
+
+    def __str__(self):
+        return constants.APP_PROGRESS_DOWNLOAD_IMAGES_RATE.format(
+            self.done, self.total, self.rate)
+
+
 class DockerHelper(object):
     """ Utility class to encapsulate Docker related operations """
 
@@ -2116,7 +2531,17 @@ class DockerHelper(object):
             else:
                 return pub_img_tag
 
-    def download_an_image(self, img_tag):
+    @staticmethod
+    def _pull_image(client, img_tag, auth_config=None, progress=None):
+        """ Pull an image, passing the progress events to progress """
+        for event in client.pull(img_tag, auth_config=auth_config,
+                                 stream=True, decode=True):
+            if 'error' in event:
+                raise docker.errors.DockerException(event['error'])
+            if progress:
+                progress(event)
+
+    def download_an_image(self, img_tag, progress=None):
 
         rc = True
         # retrieve user specified registries first
@@ -2128,7 +2553,9 @@ class DockerHelper(object):
                 LOG.info("Image %s download started from local registry" % img_tag)
                 local_registry_auth = get_local_docker_registry_auth()
                 client = docker.APIClient(timeout=INSTALLATION_TIMEOUT)
-                client.pull(img_tag, auth_config=local_registry_auth)
+                self._pull_image(client, img_tag,
+                                 auth_config=local_registry_auth,
+                                 progress=progress)
             except docker.errors.NotFound:
                 try:
                     # Pull the image from the public registry
@@ -2138,7 +2565,8 @@ class DockerHelper(object):
                     pub_img_tag = img_tag.replace(
                         constants.DOCKER_REGISTRY_SERVER + "/", "")
                     target_img_tag = self._get_img_tag_with_registry(pub_img_tag)
-                    client.pull(target_img_tag)
+                    self._pull_image(client, target_img_tag,
+                                     progress=progress)
                 except Exception as e:
                     rc = False
                     LOG.error("Image %s download failed from public/private"
@@ -2161,7 +2589,7 @@ class DockerHelper(object):
                 LOG.info("Image %s download started from public/private registry" % img_tag)
                 client = docker.APIClient(timeout=INSTALLATION_TIMEOUT)
                 target_img_tag = self._get_img_tag_with_registry(img_tag)
-                client.pull(target_img_tag)
+                self._pull_image(client, target_img_tag, progress=progress)
                 client.tag(target_img_tag, img_tag)
             except Exception as e:
                 rc = False
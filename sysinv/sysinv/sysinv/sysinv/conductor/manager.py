@@ -29,10 +29,13 @@ collection of inventory data for each host.
 
 """
 
+import collections
 import errno
 import filecmp
 import fnmatch
+import functools
 import glob
+import inspect
 import math
 import os
 import re
@@ -86,6 +89,7 @@ from sysinv.conductor import ceph as iceph
 from sysinv.conductor import kube_app
 from sysinv.conductor import openstack
 from sysinv.conductor import docker_registry
+from sysinv.conductor import reconcile
 from sysinv.db import api as dbapi
 from sysinv.objects import base as objects_base
 from sysinv.objects import kube_app as kubeapp_obj
@@ -121,8 +125,26 @@ conductor_opts = [
        cfg.IntOpt('osd_remove_retry_interval',
                   default=5,
                   help='Interval in seconds between retries to remove Ceph OSD.'),
+       cfg.IntOpt('inventory_full_sync_interval',
+                  default=600,
+                  help=('Interval in seconds after which an agent inventory '
+                        'report identical to the last one applied is '
+                        'applied again.')),
+       cfg.IntOpt('audit_timeout',
+                  default=600,
+                  help=('Time in seconds after which a periodic audit task '
+                        'that is still running is aborted.')),
+       cfg.FloatOpt('dnsmasq_reload_delay',
+                    default=1.0,
+                    help=('Time in seconds during which updates of the '
+                          'dnsmasq host files are coalesced before the '
+                          'files are written and dnsmasq is reloaded.')),
                   ]
 
+# Fraction of the audit interval by which each run of an audit is randomly
+# delayed, so that audits sharing the same interval do not start together.
+AUDIT_JITTER = 0.1
+
 CONF = cfg.CONF
 CONF.register_opts(conductor_opts, 'conductor')
 
@@ -146,13 +168,60 @@ CONFIG_REBOOT_REQUIRED = (1 << 127)
 
 LOCK_NAME_UPDATE_CONFIG = 'update_config_'
 
+# inventory categories refreshed by the agent audit requests
+AUDIT_REQUEST_INVENTORY = {
+    constants.DISK_AUDIT_REQUEST: 'idisk',
+    constants.LVG_AUDIT_REQUEST: 'ilvg',
+    constants.PV_AUDIT_REQUEST: 'ipv',
+    constants.PARTITION_AUDIT_REQUEST: 'ipartition',
+}
+
+
+def inventory_report(category, inventory_arg):
+    """Skip agent inventory reports which did not change.
+
+    The decorated method is not called when the inventory reported for a
+    host is identical to the last one applied for that host, unless it was
+    applied more than inventory_full_sync_interval seconds ago.
+
+    :param category: the inventory category of the report
+    :param inventory_arg: the name of the argument holding the inventory
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            callargs = inspect.getcallargs(func, self, *args, **kwargs)
+            key = (callargs['ihost_uuid'], category)
+            digest = cutils.hash_inventory(callargs[inventory_arg])
+
+            last = self._inventory_reports.get(key)
+            if (last and last[0] == digest and time.time() - last[1] <
+                    CONF.conductor.inventory_full_sync_interval):
+                self._inventory_report_counts[(category, 'skipped')] += 1
+                return
+
+            self._inventory_reports[key] = (digest, time.time())
+            try:
+                result = func(self, *args, **kwargs)
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    self._inventory_reports.pop(key, None)
+            self._inventory_report_counts[(category, 'applied')] += 1
+            return result
+        return wrapper
+    return decorator
+
 
 class ConductorManager(service.PeriodicService):
     """Sysinv Conductor service main class."""
 
-    RPC_API_VERSION = '1.1'
+    RPC_API_VERSION = '1.5'
     my_host_id = None
 
+    # Run each audit in its own green thread so that a slow audit (e.g.
+    # waiting on the Ceph REST API) does not hold back the others.
+    _periodic_concurrent = True
+
     def __init__(self, host, topic):
         serializer = objects_base.SysinvObjectSerializer()
         super(ConductorManager, self).__init__(host, topic,
@@ -165,6 +234,7 @@ class ConductorManager(service.PeriodicService):
         self._ceph_api = ceph.CephWrapper(
             endpoint='http://localhost:5001')
         self._kube = None
+        self._kube_labels = None
         self._fernet = None
 
         self._openstack = None
@@ -176,6 +246,22 @@ class ConductorManager(service.PeriodicService):
         self._pv_op_timeouts = {}
         self._stor_bck_op_timeouts = {}
 
+        # Last inventory reports applied, by host and category
+        self._inventory_reports = {}
+        self._inventory_report_counts = collections.Counter()
+
+        # Agent requests deferred until the inventory report transaction of
+        # a greenthread is committed, by greenthread
+        self._inventory_deferred = {}
+
+        # dnsmasq host entries of the mgmt addresses, by hostname, and the
+        # updates pending until the dnsmasq host files are next written
+        self._dnsmasq_hosts = None
+        self._dnsmasq_addn_hosts = None
+        self._dnsmasq_updates = collections.OrderedDict()
+        self._dnsmasq_resync = False
+        self._dnsmasq_flush = None
+
     def start(self):
         self._start()
         # accept API calls and run periodic tasks after
@@ -207,6 +293,7 @@ class ConductorManager(service.PeriodicService):
         self._ceph = iceph.CephOperator(self.dbapi)
         self._helm = helm.HelmOperator(self.dbapi)
         self._kube = kubernetes.KubeOperator(self.dbapi)
+        self._kube_labels = kubernetes.KubeNodeLabelReconciler(self._kube)
         self._kube_app_helper = kube_api.KubeAppHelper(self.dbapi)
         self._fernet = fernet.FernetOperator()
 
@@ -224,6 +311,33 @@ class ConductorManager(service.PeriodicService):
         """ Periodic tasks are run at pre-specified intervals. """
         return self.run_periodic_tasks(context, raise_on_error=raise_on_error)
 
+    def get_periodic_task_stats(self, context):
+        """Return the run statistics of the conductor periodic tasks.
+
+        :param context: an admin context
+        :returns: dict of task name to its number of runs, failures,
+                  timeouts, skipped runs and overruns, and its last, max
+                  and total run durations in seconds
+        """
+        return self.periodic_task_stats()
+
+    def get_inventory_report_stats(self, context):
+        """Return the number of agent inventory reports applied and skipped.
+
+        A report is skipped when the inventory of its category is unchanged
+        since the last report applied for the host.
+
+        :param context: an admin context
+        :returns: dict of inventory category to its number of applied and
+                  skipped reports
+        """
+        stats = {}
+        for (category, result), count in \
+                self._inventory_report_counts.items():
+            stats.setdefault(category, {'applied': 0, 'skipped': 0})
+            stats[category][result] = count
+        return stats
+
     @contextmanager
     def session(self):
         session = dbapi.get_instance().get_session(autocommit=True)
@@ -719,10 +833,25 @@ class ConductorManager(service.PeriodicService):
             if clone_host:
                 return clone_host
 
+        defaults, software_load = self._get_new_ihost_defaults()
+        values.update(defaults)
+
+        ihost = self.dbapi.ihost_create(values, software_load=software_load)
+
+        # A host is being created, generate discovery log.
+        self._log_host_create(ihost, reason)
+
+        ihost_id = ihost.get('uuid')
+        LOG.debug("RPC create_ihost called and created ihost %s." % ihost_id)
+
+        return ihost
+
+    def _get_new_ihost_defaults(self):
+        """Return the initial values and the software load of new ihosts."""
         # assign default system
         system = self.dbapi.isystem_get_one()
-        values.update({'forisystemid': system.id})
-        values.update({constants.HOST_ACTION_STATE: constants.HAS_REINSTALLING})
+        values = {'forisystemid': system.id,
+                  constants.HOST_ACTION_STATE: constants.HAS_REINSTALLING}
 
         # get tboot value from the active controller
         active_controller = None
@@ -738,16 +867,41 @@ class ConductorManager(service.PeriodicService):
                 values.update({'tboot': tboot_value})
             software_load = active_controller.software_load
             LOG.info("create_ihost software_load=%s" % software_load)
+        return values, software_load
 
-        ihost = self.dbapi.ihost_create(values, software_load=software_load)
+    def create_ihosts(self, context, values_list, reason=None):
+        """Create ihosts with the supplied data in a single transaction.
 
-        # A host is being created, generate discovery log.
-        self._log_host_create(ihost, reason)
+        Unlike create_ihost, the ihosts must not exist yet: if creating any
+        of them fails, none of them is created.
 
-        ihost_id = ihost.get('uuid')
-        LOG.debug("RPC create_ihost called and created ihost %s." % ihost_id)
+        :param context: an admin context
+        :param values_list: list of initial values for the new ihost objects
+        :returns: list of the created ihost objects, including all fields.
+        """
+        for values in values_list:
+            if 'mgmt_mac' not in values:
+                raise exception.SysinvException(_(
+                    "Invalid method call: create_ihosts requires mgmt_mac."))
 
-        return ihost
+        defaults, software_load = self._get_new_ihost_defaults()
+
+        ihosts = []
+        with self.dbapi.transaction():
+            for values in values_list:
+                values['mgmt_mac'] = cutils.validate_and_normalize_mac(
+                    values['mgmt_mac'].rstrip())
+                values.update(defaults)
+                ihosts.append(self.dbapi.ihost_create(
+                    values, software_load=software_load))
+
+        for ihost in ihosts:
+            # A host is being created, generate discovery log.
+            self._log_host_create(ihost, reason)
+
+        LOG.info("RPC create_ihosts called and created %d ihosts." %
+                 len(ihosts))
+        return ihosts
 
     def update_ihost(self, context, ihost_obj):
         """Update an ihost with the supplied data.
@@ -790,113 +944,175 @@ class ConductorManager(service.PeriodicService):
         line = "%s\n" % line
         return line
 
-    def _generate_dnsmasq_hosts_file(self, existing_host=None,
-                                     deleted_host=None):
-        """Regenerates the dnsmasq host and addn_hosts files from database.
-
-        :param existing_host: Include this host in list of hosts.
-        :param deleted_host: Skip over writing MAC address for this host.
-        """
-        if (self.topic == 'test-topic'):
-            dnsmasq_hosts_file = '/tmp/dnsmasq.hosts'
-        else:
-            dnsmasq_hosts_file = tsc.CONFIG_PATH + 'dnsmasq.hosts'
-
+    def _dnsmasq_hosts_files(self):
         if (self.topic == 'test-topic'):
-            dnsmasq_addn_hosts_file = '/tmp/dnsmasq.addn_hosts'
-        else:
-            dnsmasq_addn_hosts_file = tsc.CONFIG_PATH + 'dnsmasq.addn_hosts'
+            return '/tmp/dnsmasq.hosts', '/tmp/dnsmasq.addn_hosts'
+        return (tsc.CONFIG_PATH + 'dnsmasq.hosts',
+                tsc.CONFIG_PATH + 'dnsmasq.addn_hosts')
 
-        if deleted_host:
-            deleted_hostname = deleted_host.hostname
-        else:
-            deleted_hostname = None
-
-        temp_dnsmasq_hosts_file = dnsmasq_hosts_file + '.temp'
-        temp_dnsmasq_addn_hosts_file = dnsmasq_addn_hosts_file + '.temp'
+    def _load_dnsmasq_hosts(self):
+        """Load the dnsmasq host and addn_hosts entries from database."""
         mgmt_network = self.dbapi.network_get_by_type(
             constants.NETWORK_TYPE_MGMT
         )
 
-        with open(temp_dnsmasq_hosts_file, 'w') as f_out,\
-                open(temp_dnsmasq_addn_hosts_file, 'w') as f_out_addn:
-
-            # Write entry for pxecontroller into addn_hosts file
-            try:
-                self.dbapi.network_get_by_type(
-                    constants.NETWORK_TYPE_PXEBOOT
-                )
-                address = self.dbapi.address_get_by_name(
-                    cutils.format_address_name(constants.CONTROLLER_HOSTNAME,
-                                               constants.NETWORK_TYPE_PXEBOOT)
-                )
-            except exception.NetworkTypeNotFound:
-                address = self.dbapi.address_get_by_name(
-                    cutils.format_address_name(constants.CONTROLLER_HOSTNAME,
-                                               constants.NETWORK_TYPE_MGMT)
-                )
-            addn_line = self._dnsmasq_addn_host_entry_to_string(
-                address.address, constants.PXECONTROLLER_HOSTNAME
+        # Entry for pxecontroller in the addn_hosts file
+        try:
+            self.dbapi.network_get_by_type(
+                constants.NETWORK_TYPE_PXEBOOT
+            )
+            address = self.dbapi.address_get_by_name(
+                cutils.format_address_name(constants.CONTROLLER_HOSTNAME,
+                                           constants.NETWORK_TYPE_PXEBOOT)
+            )
+        except exception.NetworkTypeNotFound:
+            address = self.dbapi.address_get_by_name(
+                cutils.format_address_name(constants.CONTROLLER_HOSTNAME,
+                                           constants.NETWORK_TYPE_MGMT)
             )
-            f_out_addn.write(addn_line)
-
-            # Loop through mgmt addresses to write to file
-            for address in self.dbapi._addresses_get_by_pool_uuid(
-                    mgmt_network.pool_uuid):
-                line = None
-                hostname = re.sub("-%s$" % constants.NETWORK_TYPE_MGMT,
-                                  '', str(address.name))
-
-                if address.interface:
-                    mac_address = address.interface.imac
-                    # For cloning scenario, controller-1 MAC address will
-                    # be updated in ethernet_interfaces table only later
-                    # when sysinv-agent is initialized on controller-1.
-                    # So, use the mac_address passed in (got from PXE request).
-                    if (existing_host and
-                            constants.CLONE_ISO_MAC in mac_address and
-                            hostname == existing_host.hostname):
-                        LOG.info("gen dnsmasq (clone):{}:{}->{}"
-                                 .format(hostname, mac_address,
-                                         existing_host.mgmt_mac))
-                        mac_address = existing_host.mgmt_mac
-                # If host is being deleted, don't check ihost
-                elif deleted_hostname and deleted_hostname == hostname:
-                    mac_address = None
+        addn_hosts = [(address.address, constants.PXECONTROLLER_HOSTNAME)]
+
+        # Index the host MAC addresses by hostname rather than looking up
+        # the host of each mgmt address
+        host_macs = dict((h.hostname, h.mgmt_mac)
+                         for h in self.dbapi.ihost_get_list() if h.hostname)
+
+        # Entries of the mgmt addresses, by hostname
+        hosts = collections.OrderedDict()
+        for address in self.dbapi._addresses_get_by_pool_uuid(
+                mgmt_network.pool_uuid):
+            hostname = re.sub("-%s$" % constants.NETWORK_TYPE_MGMT,
+                              '', str(address.name))
+            if address.interface:
+                mac_address = address.interface.imac
+            else:
+                mac_address = host_macs.get(hostname)
+            hosts[hostname] = (address.address, mac_address)
+
+        self._dnsmasq_addn_hosts = addn_hosts
+        self._dnsmasq_hosts = hosts
+
+    def _update_dnsmasq_host(self, host, deleted=False):
+        """Updates the dnsmasq host entry of the mgmt address of a host.
+
+        The dnsmasq host files are rewritten once the pending updates have
+        been coalesced.
+
+        :param host: host object.
+        :param deleted: host is being deleted, skip writing its MAC address.
+        """
+        hostname = host.hostname
+        try:
+            address = self.dbapi.address_get_by_name(
+                cutils.format_address_name(hostname,
+                                           constants.NETWORK_TYPE_MGMT))
+        except exception.AddressNotFoundByName:
+            entry = None
+        else:
+            mac_address = None
+            if address.interface_uuid:
+                mac_address = self.dbapi.iinterface_get(
+                    address.interface_uuid).imac
+                # For cloning scenario, controller-1 MAC address will
+                # be updated in ethernet_interfaces table only later
+                # when sysinv-agent is initialized on controller-1.
+                # So, use the mac_address passed in (got from PXE request).
+                if constants.CLONE_ISO_MAC in mac_address:
+                    LOG.info("gen dnsmasq (clone):{}:{}->{}"
+                             .format(hostname, mac_address, host.mgmt_mac))
+                    mac_address = host.mgmt_mac
+            elif not deleted:
+                mac_address = host.mgmt_mac
+            entry = (address.address, mac_address)
+
+        self._dnsmasq_updates[hostname] = entry
+        self._schedule_dnsmasq_hosts_file()
+
+    def _generate_dnsmasq_hosts_file(self):
+        """Regenerates the dnsmasq host and addn_hosts files from database.
+
+        The dnsmasq host files are rewritten once the pending updates have
+        been coalesced.
+        """
+        # The reload supersedes the updates of single hosts requested so far
+        self._dnsmasq_resync = True
+        self._dnsmasq_updates.clear()
+        self._schedule_dnsmasq_hosts_file()
+
+    def _schedule_dnsmasq_hosts_file(self):
+        if self._dnsmasq_flush is not None:
+            # Already scheduled, coalesce with the pending updates
+            return
+
+        delay = CONF.conductor.dnsmasq_reload_delay
+        if delay > 0:
+            self._dnsmasq_flush = greenthread.spawn_after(
+                delay, self._write_dnsmasq_hosts_file)
+        else:
+            self._write_dnsmasq_hosts_file()
+
+    def _write_dnsmasq_hosts_file(self):
+        """Writes the dnsmasq host and addn_hosts files and reloads dnsmasq.
+        """
+        # Updates requested from now on are written by the next run
+        self._dnsmasq_flush = None
+        try:
+            if self._dnsmasq_resync or self._dnsmasq_hosts is None:
+                self._dnsmasq_resync = False
+                self._load_dnsmasq_hosts()
+            updates = self._dnsmasq_updates
+            self._dnsmasq_updates = collections.OrderedDict()
+            for hostname, entry in updates.items():
+                if entry is None:
+                    self._dnsmasq_hosts.pop(hostname, None)
                 else:
-                    try:
-                        ihost = self.dbapi.ihost_get_by_hostname(hostname)
-                        mac_address = ihost.mgmt_mac
-                    except exception.NodeNotFound:
-                        if existing_host and existing_host.hostname == hostname:
-                            mac_address = existing_host.mgmt_mac
-                        else:
-                            mac_address = None
-                line = self._dnsmasq_host_entry_to_string(address.address,
-                                                          hostname,
-                                                          mac_address)
-                f_out.write(line)
-
-        # Update host files atomically and reload dnsmasq
-        if (not os.path.isfile(dnsmasq_hosts_file) or
-                not filecmp.cmp(temp_dnsmasq_hosts_file, dnsmasq_hosts_file)):
-            os.rename(temp_dnsmasq_hosts_file, dnsmasq_hosts_file)
-        if (not os.path.isfile(dnsmasq_addn_hosts_file) or
-                not filecmp.cmp(temp_dnsmasq_addn_hosts_file,
-                                dnsmasq_addn_hosts_file)):
-            os.rename(temp_dnsmasq_addn_hosts_file, dnsmasq_addn_hosts_file)
-
-        # If there is no distributed cloud addn_hosts file, create an empty one
-        # so dnsmasq will not complain.
-        dnsmasq_addn_hosts_dc_file = os.path.join(tsc.CONFIG_PATH, 'dnsmasq.addn_hosts_dc')
-        temp_dnsmasq_addn_hosts_dc_file = os.path.join(tsc.CONFIG_PATH, 'dnsmasq.addn_hosts_dc.temp')
-
-        if not os.path.isfile(dnsmasq_addn_hosts_dc_file):
-            with open(temp_dnsmasq_addn_hosts_dc_file, 'w') as f_out_addn_dc:
-                f_out_addn_dc.write(' ')
-            os.rename(temp_dnsmasq_addn_hosts_dc_file, dnsmasq_addn_hosts_dc_file)
-
-        os.system("pkill -HUP dnsmasq")
+                    self._dnsmasq_hosts[hostname] = entry
+
+            dnsmasq_hosts_file, dnsmasq_addn_hosts_file = \
+                self._dnsmasq_hosts_files()
+            temp_dnsmasq_hosts_file = dnsmasq_hosts_file + '.temp'
+            temp_dnsmasq_addn_hosts_file = dnsmasq_addn_hosts_file + '.temp'
+
+            with open(temp_dnsmasq_hosts_file, 'w') as f_out,\
+                    open(temp_dnsmasq_addn_hosts_file, 'w') as f_out_addn:
+                for ip_addr, hostname in self._dnsmasq_addn_hosts:
+                    f_out_addn.write(self._dnsmasq_addn_host_entry_to_string(
+                        ip_addr, hostname))
+                for hostname, (ip_addr, mac_address) in \
+                        self._dnsmasq_hosts.items():
+                    f_out.write(self._dnsmasq_host_entry_to_string(
+                        ip_addr, hostname, mac_address))
+
+            # Update host files atomically and reload dnsmasq
+            if (not os.path.isfile(dnsmasq_hosts_file) or
+                    not filecmp.cmp(temp_dnsmasq_hosts_file,
+                                    dnsmasq_hosts_file)):
+                os.rename(temp_dnsmasq_hosts_file, dnsmasq_hosts_file)
+            if (not os.path.isfile(dnsmasq_addn_hosts_file) or
+                    not filecmp.cmp(temp_dnsmasq_addn_hosts_file,
+                                    dnsmasq_addn_hosts_file)):
+                os.rename(temp_dnsmasq_addn_hosts_file,
+                          dnsmasq_addn_hosts_file)
+
+            # If there is no distributed cloud addn_hosts file, create an
+            # empty one so dnsmasq will not complain.
+            dnsmasq_addn_hosts_dc_file = os.path.join(
+                tsc.CONFIG_PATH, 'dnsmasq.addn_hosts_dc')
+            temp_dnsmasq_addn_hosts_dc_file = os.path.join(
+                tsc.CONFIG_PATH, 'dnsmasq.addn_hosts_dc.temp')
+
+            if not os.path.isfile(dnsmasq_addn_hosts_dc_file):
+                with open(temp_dnsmasq_addn_hosts_dc_file, 'w') as \
+                        f_out_addn_dc:
+                    f_out_addn_dc.write(' ')
+                os.rename(temp_dnsmasq_addn_hosts_dc_file,
+                          dnsmasq_addn_hosts_dc_file)
+
+            os.system("pkill -HUP dnsmasq")
+        except Exception as e:
+            LOG.exception("Failed to update the dnsmasq hosts files: %s" % e)
+            # Reload everything from database on the next update
+            self._dnsmasq_resync = True
 
     def _update_pxe_config(self, host, load=None):
         """Set up the PXE config file for this host so it can run
@@ -1143,7 +1359,7 @@ class ConductorManager(service.PeriodicService):
                 host.mgmt_ip = mgmt_ip
                 self.update_ihost(context, host)
 
-        self._generate_dnsmasq_hosts_file(existing_host=host)
+        self._update_dnsmasq_host(host)
 
     def get_my_host_id(self):
         if not ConductorManager.my_host_id:
@@ -1300,7 +1516,7 @@ class ConductorManager(service.PeriodicService):
             self._unallocate_address(hostname, constants.NETWORK_TYPE_OAM)
             self._unallocate_address(hostname, constants.NETWORK_TYPE_PXEBOOT)
         self._remove_leases_by_mac_address(host.mgmt_mac)
-        self._generate_dnsmasq_hosts_file(deleted_host=host)
+        self._update_dnsmasq_host(host, deleted=True)
 
     def _remove_addresses_for_host(self, host):
         """Removes management addresses for a given host.
@@ -1310,7 +1526,7 @@ class ConductorManager(service.PeriodicService):
         hostname = host.hostname
         self._remove_address(hostname, constants.NETWORK_TYPE_MGMT)
         self._remove_leases_by_mac_address(host.mgmt_mac)
-        self._generate_dnsmasq_hosts_file(deleted_host=host)
+        self._update_dnsmasq_host(host, deleted=True)
 
     def _configure_controller_host(self, context, host):
         """Configure a controller host with the supplied data.
@@ -1687,6 +1903,43 @@ class ConductorManager(service.PeriodicService):
         self._puppet.update_system_config()
         self._puppet.update_secure_system_config()
 
+        self._configure_host(context, host)
+
+        if do_worker_apply:
+            # Apply the manifests immediately
+            puppet_common.puppet_apply_manifest(host.mgmt_ip,
+                                                       constants.WORKER,
+                                                       do_reboot=True)
+        return host
+
+    def configure_ihosts(self, context, hosts):
+        """Configure hosts.
+
+        The system configuration files are generated once for all the
+        hosts, and the dnsmasq host files are written once the updates of
+        all the hosts have been coalesced.
+
+        :param context: an admin context.
+        :param hosts: a list of host objects.
+        :returns: the list of the hosts configured.
+        """
+        LOG.debug("configure_ihosts %s" % [h.hostname for h in hosts])
+
+        self._puppet.update_system_config()
+        self._puppet.update_secure_system_config()
+
+        configured = []
+        for host in hosts:
+            try:
+                self._configure_host(context, host)
+            except Exception as e:
+                LOG.exception("Failed to configure host %s: %s" %
+                              (host.hostname, e))
+                continue
+            configured.append(host)
+        return configured
+
+    def _configure_host(self, context, host):
         if host.personality == constants.CONTROLLER:
             self._configure_controller_host(context, host)
         elif host.personality == constants.WORKER:
@@ -1698,13 +1951,6 @@ class ConductorManager(service.PeriodicService):
                 "Invalid method call: unsupported personality: %s") %
                                             host.personality)
 
-        if do_worker_apply:
-            # Apply the manifests immediately
-            puppet_common.puppet_apply_manifest(host.mgmt_ip,
-                                                       constants.WORKER,
-                                                       do_reboot=True)
-        return host
-
     def unconfigure_ihost(self, context, ihost_obj):
         """Unconfigure a host.
 
@@ -1830,6 +2076,11 @@ class ConductorManager(service.PeriodicService):
             if i.networktype == constants.NETWORK_TYPE_MGMT:
                 break
 
+        # Index the interfaces by MAC address, with their position
+        interfaces_by_mac = collections.defaultdict(list)
+        for position, interface in enumerate(iinterfaces):
+            interfaces_by_mac[interface['imac']].append((position, interface))
+
         cloning = False
         for inic in inic_dict_array:
             LOG.debug("Processing inic %s" % inic)
@@ -1869,54 +2120,60 @@ class ConductorManager(service.PeriodicService):
                         bootp = 'True'
 
                 clone_mac_updated = False
-                for interface in iinterfaces:
-                    LOG.debug("Checking interface %s" % interface)
-                    if interface['imac'] == inic['mac']:
-                        # append to port attributes as well
-                        inic_dict.update({
-                            'interface_id': interface['id'], 'bootp': bootp
-                        })
-
-                        # interface already exists so don't create another
-                        interface_exists = True
-                        LOG.debug("interface mac match inic mac %s, inic_dict "
-                                  "%s, interface_exists %s" %
-                                  (interface['imac'], inic_dict,
-                                   interface_exists))
+                # If there are interfaces with clone labels as MAC addresses,
+                # listed before any interface with the MAC address of the
+                # port, this is a install-from-clone scenario. Update MAC
+                # addresses.
+                clone_mac = (constants.CLONE_ISO_MAC + ihost['hostname'] +
+                             inic['pname'])
+                mac_interfaces = interfaces_by_mac.get(inic['mac'])
+                clone_interfaces = interfaces_by_mac.get(clone_mac, [])
+                last = mac_interfaces[0][0] if mac_interfaces else None
+                for position, interface in clone_interfaces:
+                    if last is not None and position > last:
                         break
-                    # If there are interfaces with clone labels as MAC addresses,
-                    # this is a install-from-clone scenario. Update MAC addresses.
-                    elif ((constants.CLONE_ISO_MAC + ihost['hostname'] + inic['pname']) ==
-                          interface['imac']):
-                        # Not checking for "interface['ifname'] == ifname",
-                        # as it could be data0, bond0.100
-                        updates = {'imac': inic['mac']}
-                        self.dbapi.iinterface_update(interface['uuid'], updates)
-                        LOG.info("clone_mac_update: updated if mac {} {} --> {}"
-                            .format(ifname, interface['imac'], inic['mac']))
-                        ports = self.dbapi.ethernet_port_get_by_interface(
-                                                              interface['uuid'])
-                        for p in ports:
-                            # Update the corresponding ports too
-                            LOG.debug("clone_mac_update: port={} mac={} for intf: {}"
-                                .format(p['id'], p['mac'], interface['uuid']))
-                            if constants.CLONE_ISO_MAC in p['mac']:
-                                updates = {'mac': inic['mac']}
-                                self.dbapi.ethernet_port_update(p['id'], updates)
-                                LOG.info("clone_mac_update: updated port: {} {}-->{}"
-                                    .format(p['id'], p['mac'], inic['mac']))
-                        # See if there are dependent interfaces.
-                        # If yes, update them too.
-                        self._update_dependent_interfaces(interface, ihost,
-                                                          ifname, inic['mac'])
-                        clone_mac_updated = True
-
-                        if ((constants.CLONE_ISO_MAC + ihost['hostname'] + inic['pname'])
-                                in ihost['mgmt_mac']):
-                            LOG.info("clone_mac_update: mgmt_mac {}:{}"
-                                     .format(ihost['mgmt_mac'], inic['mac']))
-                            values = {'mgmt_mac': inic['mac']}
-                            self.dbapi.ihost_update(ihost['uuid'], values)
+                    # Not checking for "interface['ifname'] == ifname",
+                    # as it could be data0, bond0.100
+                    updates = {'imac': inic['mac']}
+                    self.dbapi.iinterface_update(interface['uuid'], updates)
+                    LOG.info("clone_mac_update: updated if mac {} {} --> {}"
+                        .format(ifname, interface['imac'], inic['mac']))
+                    ports = self.dbapi.ethernet_port_get_by_interface(
+                                                          interface['uuid'])
+                    for p in ports:
+                        # Update the corresponding ports too
+                        LOG.debug("clone_mac_update: port={} mac={} for intf: {}"
+                            .format(p['id'], p['mac'], interface['uuid']))
+                        if constants.CLONE_ISO_MAC in p['mac']:
+                            updates = {'mac': inic['mac']}
+                            self.dbapi.ethernet_port_update(p['id'], updates)
+                            LOG.info("clone_mac_update: updated port: {} {}-->{}"
+                                .format(p['id'], p['mac'], inic['mac']))
+                    # See if there are dependent interfaces.
+                    # If yes, update them too.
+                    self._update_dependent_interfaces(interface, ihost,
+                                                      ifname, inic['mac'])
+                    clone_mac_updated = True
+
+                    if clone_mac in ihost['mgmt_mac']:
+                        LOG.info("clone_mac_update: mgmt_mac {}:{}"
+                                 .format(ihost['mgmt_mac'], inic['mac']))
+                        values = {'mgmt_mac': inic['mac']}
+                        self.dbapi.ihost_update(ihost['uuid'], values)
+
+                if mac_interfaces:
+                    interface = mac_interfaces[0][1]
+                    # append to port attributes as well
+                    inic_dict.update({
+                        'interface_id': interface['id'], 'bootp': bootp
+                    })
+
+                    # interface already exists so don't create another
+                    interface_exists = True
+                    LOG.debug("interface mac match inic mac %s, inic_dict "
+                              "%s, interface_exists %s" %
+                              (interface['imac'], inic_dict,
+                               interface_exists))
 
                 if clone_mac_updated:
                     # no need create any interfaces or ports for cloning scenario
@@ -2444,56 +2701,98 @@ class ConductorManager(service.PeriodicService):
         except exception.ServerNotFound:
             LOG.exception("Invalid host_uuid %s" % host_uuid)
             return
-        for pci_dev in pci_device_dict_array:
-            LOG.debug("Processing dev %s" % pci_dev)
-            try:
-                pci_dev_dict = {'host_id': host['id']}
-                pci_dev_dict.update(pci_dev)
-                dev_found = None
-                try:
-                    dev = self.dbapi.pci_device_get(pci_dev['pciaddr'],
-                                                    hostid=host['id'])
-                    dev_found = dev
-                    if not dev:
-                        LOG.info("Attempting to create new device "
-                                 "%s on host %s" % (pci_dev_dict, host['id']))
-                        dev = self.dbapi.pci_device_create(host['id'],
-                                                           pci_dev_dict)
-                except Exception:
-                    LOG.info("Attempting to create new device "
-                             "%s on host %s" % (pci_dev_dict, host['id']))
-                    dev = self.dbapi.pci_device_create(host['id'],
-                                                       pci_dev_dict)
 
-                # If the device exists, try to update some of the fields
-                if dev_found:
-                    try:
-                        attr = {
-                            'pclass_id': pci_dev['pclass_id'],
-                            'pvendor_id': pci_dev['pvendor_id'],
-                            'pdevice_id': pci_dev['pdevice_id'],
-                            'pclass': pci_dev['pclass'],
-                            'pvendor': pci_dev['pvendor'],
-                            'psvendor': pci_dev['psvendor'],
-                            'psdevice': pci_dev['psdevice'],
-                            'sriov_totalvfs': pci_dev['sriov_totalvfs'],
-                            'sriov_numvfs': pci_dev['sriov_numvfs'],
-                            'sriov_vfs_pci_address':
-                                pci_dev['sriov_vfs_pci_address'],
-                            'driver': pci_dev['driver']}
-                        LOG.info("attr: %s" % attr)
-                        dev = self.dbapi.pci_device_update(dev['uuid'], attr)
-                    except Exception:
-                        LOG.exception("Failed to update port %s" %
-                                      dev['pciaddr'])
-                        pass
+        reconciler = reconcile.InventoryReconciler(
+            'pci_device', 'pciaddr',
+            fields=['pclass_id', 'pvendor_id', 'pdevice_id', 'pclass',
+                    'pvendor', 'psvendor', 'psdevice', 'sriov_totalvfs',
+                    'sriov_numvfs', 'sriov_vfs_pci_address', 'driver'])
+        diff = reconciler.diff(
+            host_uuid, pci_device_dict_array,
+            self.dbapi.pci_device_get_all(hostid=host['id']))
 
-            except exception.NodeNotFound:
-                raise exception.SysinvException(_(
-                    "Invalid host_uuid: host not found: %s") %
-                    host_uuid)
+        for pci_dev in diff.create:
+            pci_dev['host_id'] = host['id']
+            LOG.info("Attempting to create new device "
+                     "%s on host %s" % (pci_dev, host['id']))
+
+        try:
+            reconciler.apply(
+                diff,
+                create=functools.partial(self._create_inventory_bulk,
+                                         self.dbapi.pci_device_create_bulk,
+                                         self.dbapi.pci_device_create,
+                                         host['id']),
+                update=functools.partial(
+                    self._update_inventory_bulk,
+                    functools.partial(self.dbapi.pci_device_update_bulk,
+                                      hostid=host['id']),
+                    self.dbapi.pci_device_update, host['id']))
+        except Exception:
+            LOG.exception("Failed to update the devices of host %s" %
+                          host_uuid)
+
+    def _create_inventory_bulk(self, create_bulk, create, host_id, values):
+        """Create inventory records of a host in a single transaction.
+
+        If that fails, e.g. because some of the records were posted
+        previously, the records are created one at a time and those that
+        cannot be created are skipped.
+
+        :param create_bulk: dbapi method creating a list of records
+        :param create: dbapi method creating a single record
+        :param host_id: id of the host the records belong to
+        :param values: list of dicts of the record values
+        :returns: the list of created records
+        """
+        if not values:
+            return []
+        try:
+            return create_bulk(host_id, values)
+        except Exception as e:
+            LOG.warn("Failed to create %d inventory records of host %s in "
+                     "a single transaction, creating them one at a time: %s" %
+                     (len(values), host_id, e))
+
+        records = []
+        for value in values:
+            try:
+                records.append(create(host_id, value))
             except Exception:
+                # info may have already been posted
                 pass
+        return records
+
+    def _update_inventory_bulk(self, update_bulk, update, host_id, values):
+        """Update inventory records of a host in a single transaction.
+
+        If that fails, the records are updated one at a time and those that
+        cannot be updated are logged and skipped.
+
+        :param update_bulk: function updating a list of dicts of the record
+                            values, each including the uuid of its record
+        :param update: dbapi method updating a single record by uuid
+        :param host_id: id of the host the records belong to
+        :param values: list of dicts of the record values
+        """
+        if not values:
+            return
+        try:
+            update_bulk(values)
+            return
+        except Exception as e:
+            LOG.warn("Failed to update %d inventory records of host %s in "
+                     "a single transaction, updating them one at a time: %s" %
+                     (len(values), host_id, e))
+
+        for value in values:
+            value = dict(value)
+            uuid = value.pop('uuid')
+            try:
+                update(uuid, value)
+            except Exception:
+                LOG.exception("Failed to update inventory record %s of "
+                              "host %s" % (uuid, host_id))
 
     def inumas_update_by_ihost(self, context,
                                ihost_uuid, inuma_dict_array):
@@ -2524,36 +2823,38 @@ class ConductorManager(service.PeriodicService):
 
         mynuma_nodes = [n.numa_node for n in mynumas]
 
-        # perform update for ports
-        ports = self.dbapi.ethernet_port_get_by_host(ihost_uuid)
+        new_numas = []
         for i in inuma_dict_array:
             if 'numa_node' in i and i['numa_node'] in mynuma_nodes:
                 LOG.info("Already in db numa_node=%s mynuma_nodes=%s" %
                          (i['numa_node'], mynuma_nodes))
                 continue
 
-            try:
-                inuma_dict = {'forihostid': ihost['id']}
-
-                inuma_dict.update(i)
-
-                inuma = self.dbapi.inode_create(ihost['id'], inuma_dict)
+            inuma_dict = {'forihostid': ihost['id']}
+            inuma_dict.update(i)
+            new_numas.append(inuma_dict)
 
-                for port in ports:
-                    port_node = port['numa_node']
-                    if port_node == -1:
-                        port_node = 0  # special handling
+        inumas = self._create_inventory_bulk(self.dbapi.inode_create_bulk,
+                                             self.dbapi.inode_create,
+                                             ihost['id'], new_numas)
+        if not inumas:
+            return
 
-                    if port_node == inuma['numa_node']:
-                        attr = {'node_id': inuma['id']}
-                        self.dbapi.ethernet_port_update(port['uuid'], attr)
+        # perform update for ports
+        node_ids = dict((inuma['numa_node'], inuma['id']) for inuma in inumas)
+        ports = self.dbapi.ethernet_port_get_by_host(ihost_uuid)
+        for port in ports:
+            port_node = port['numa_node']
+            if port_node == -1:
+                port_node = 0  # special handling
 
-            except exception.NodeNotFound:
-                raise exception.SysinvException(_(
-                    "Invalid ihost_uuid: host not found: %s") %
-                    ihost_uuid)
-            except Exception:  # this info may have been posted previously, update ?
-                pass
+            if port_node in node_ids:
+                attr = {'node_id': node_ids[port_node]}
+                try:
+                    self.dbapi.ethernet_port_update(port['uuid'], attr)
+                except Exception:
+                    LOG.exception("Failed to update the node of port %s" %
+                                  port['uuid'])
 
     def _get_default_platform_cpu_count(self, ihost, node,
                                         cpu_count, hyperthreading):
@@ -2707,8 +3008,14 @@ class ConductorManager(service.PeriodicService):
 
         forihostid = ihost['id']
         ihost_inodes = self.dbapi.inode_get_by_ihost(ihost_uuid)
+        inode_ids = dict((int(n.numa_node), n['id']) for n in ihost_inodes)
+        inode_numa_nodes = dict((n['id'], n.get('numa_node'))
+                                for n in ihost_inodes)
 
         icpus = self.dbapi.icpu_get_by_ihost(ihost_uuid)
+        reconciler = reconcile.InventoryReconciler(
+            'icpu', 'cpu', fields=['numa_node', 'core', 'thread'])
+        diff = reconciler.diff(ihost_uuid, icpu_dict_array, icpus)
 
         num_cpus_dict = len(icpu_dict_array)
         num_cpus_db = len(icpus)
@@ -2731,17 +3038,9 @@ class ConductorManager(service.PeriodicService):
         if num_cpus_db > 0:
             for icpu in icpus:
                 cpu_id = icpu.get('cpu')
-                core_id = icpu.get('core')
-                thread_id = icpu.get('thread')
-                forinodeid = icpu.get('forinodeid')
-                socket_id = None
-                for inode in ihost_inodes:
-                    if forinodeid == inode.get('id'):
-                        socket_id = inode.get('numa_node')
-                        break
-                ps[cpu_id] = socket_id
-                pc[cpu_id] = core_id
-                pt[cpu_id] = thread_id
+                ps[cpu_id] = inode_numa_nodes.get(icpu.get('forinodeid'))
+                pc[cpu_id] = icpu.get('core')
+                pt[cpu_id] = icpu.get('thread')
 
         if num_cpus_dict > 0 and num_cpus_db == 0:
             self.print_cpu_topology(hostname=ihost.get('hostname'),
@@ -2755,13 +3054,15 @@ class ConductorManager(service.PeriodicService):
                       (num_cpus_dict, num_cpus_db, icpu_dict_array, icpus))
 
             # Skip update if topology has not changed
-            if ps == cs and pc == cc and pt == ct:
+            if not diff.changed:
                 self.print_cpu_topology(hostname=ihost.get('hostname'),
                                         subfunctions=ihost.get('subfunctions'),
                                         reference='current (unchanged)',
                                         sockets=cs, cores=cc, threads=ct)
                 if ihost.administrative == constants.ADMIN_LOCKED:
-                    self.update_cpu_config(context, ihost_uuid, force_grub_update)
+                    self._run_after_inventory_commit(
+                        self.update_cpu_config, context, ihost_uuid,
+                        force_grub_update)
                 return
 
             self.print_cpu_topology(hostname=ihost.get('hostname'),
@@ -2790,30 +3091,24 @@ class ConductorManager(service.PeriodicService):
             functions[numa_node] = self._get_default_cpu_functions(
                 ihost, numa_node, cpu_list, hyperthreading)
 
+        cpus = []
         for data in cpu_list:
             try:
-                forinodeid = None
-                for n in ihost_inodes:
-                    numa_node = int(n.numa_node)
-                    if numa_node == int(data['numa_node']):
-                        forinodeid = n['id']
-                        break
-
+                numa_node = int(data['numa_node'])
                 cpu_dict = {'forihostid': forihostid,
-                            'forinodeid': forinodeid,
+                            'forinodeid': inode_ids.get(numa_node),
                             'allocated_function': functions[numa_node].pop(0)}
+            except Exception:
+                LOG.exception("Failed to assign a function to cpu %s" %
+                              data.get('cpu'))
+                continue
 
-                cpu_dict.update(data)
-
-                self.dbapi.icpu_create(forihostid, cpu_dict)
+            cpu_dict.update(data)
+            cpus.append(cpu_dict)
 
-            except exception.NodeNotFound:
-                raise exception.SysinvException(_(
-                    "Invalid ihost_uuid: host not found: %s") %
-                    ihost_uuid)
-            except Exception:
-                # info may have already been posted
-                pass
+        self._create_inventory_bulk(self.dbapi.icpu_create_bulk,
+                                    self.dbapi.icpu_create,
+                                    forihostid, cpus)
 
         # if it is the first controller wait for the initial config to
         # be completed
@@ -2824,7 +3119,9 @@ class ConductorManager(service.PeriodicService):
                  ihost.administrative == constants.ADMIN_LOCKED)):
             LOG.info("Update CPU grub config, host_uuid (%s), name (%s)"
                      % (ihost_uuid, ihost.get('hostname')))
-            self.update_cpu_config(context, ihost_uuid, force_grub_update)
+            self._run_after_inventory_commit(
+                self.update_cpu_config, context, ihost_uuid,
+                force_grub_update)
 
         return
 
@@ -2864,17 +3161,16 @@ class ConductorManager(service.PeriodicService):
         forihostid = ihost['id']
         ihost_inodes = self.dbapi.inode_get_by_ihost(ihost_uuid)
 
+        node_imems = {}
+        for imem in self.dbapi.imemory_get_all(forihostid=forihostid):
+            node_imems.setdefault(imem.forinodeid, []).append(imem)
+
+        new_imems = []
+        updates = []
+        inode_ids = dict((int(n.numa_node), n['id']) for n in ihost_inodes)
         for i in imemory_dict_array:
-            forinodeid = None
-            inode_uuid = None
-            for n in ihost_inodes:
-                numa_node = int(n.numa_node)
-                if numa_node == int(i['numa_node']):
-                    forinodeid = n['id']
-                    inode_uuid = n['uuid']
-                    inode_uuid.strip()
-                    break
-            else:
+            forinodeid = inode_ids.get(int(i['numa_node']))
+            if forinodeid is None:
                 # not found in host_nodes, do not add memory element
                 continue
 
@@ -2895,31 +3191,30 @@ class ConductorManager(service.PeriodicService):
                 mem_dict['vm_hugepages_nr_1G_pending'] = None
                 mem_dict['vswitch_hugepages_reqd'] = None
 
-            try:
-                imems = self.dbapi.imemory_get_by_ihost_inode(ihost_uuid,
-                                                              inode_uuid)
-                if not imems:
-                    # Set the amount of memory reserved for platform use.
-                    mem_dict.update(self._get_platform_reserved_memory(
-                            ihost, i['numa_node']))
-                    self.dbapi.imemory_create(forihostid, mem_dict)
-                else:
-                    for imem in imems:
-                        # Include 4K pages in the displayed VM memtotal
-                        if imem.vm_hugepages_nr_4K is not None:
-                            vm_4K_mib = \
-                                (imem.vm_hugepages_nr_4K /
-                                 constants.NUM_4K_PER_MiB)
-                            mem_dict['memtotal_mib'] += vm_4K_mib
-                            mem_dict['memavail_mib'] += vm_4K_mib
-                        self.dbapi.imemory_update(imem['uuid'],
-                                                         mem_dict)
-            except Exception:
+            imems = node_imems.get(forinodeid)
+            if not imems:
                 # Set the amount of memory reserved for platform use.
                 mem_dict.update(self._get_platform_reserved_memory(
                         ihost, i['numa_node']))
-                self.dbapi.imemory_create(forihostid, mem_dict)
-                pass
+                new_imems.append(mem_dict)
+            else:
+                for imem in imems:
+                    # Include 4K pages in the displayed VM memtotal
+                    if imem.vm_hugepages_nr_4K is not None:
+                        vm_4K_mib = \
+                            (imem.vm_hugepages_nr_4K /
+                             constants.NUM_4K_PER_MiB)
+                        mem_dict['memtotal_mib'] += vm_4K_mib
+                        mem_dict['memavail_mib'] += vm_4K_mib
+                    updates.append(dict(mem_dict, uuid=imem['uuid']))
+
+        self._create_inventory_bulk(self.dbapi.imemory_create_bulk,
+                                    self.dbapi.imemory_create,
+                                    forihostid, new_imems)
+        self._update_inventory_bulk(
+            functools.partial(self.dbapi.imemory_update_bulk,
+                              forihostid=forihostid),
+            self.dbapi.imemory_update, forihostid, updates)
 
         return
 
@@ -3013,6 +3308,7 @@ class ConductorManager(service.PeriodicService):
 
         return host_version == tsc.SW_VERSION
 
+    @inventory_report('idisk', 'idisk_dict_array')
     def idisk_update_by_ihost(self, context,
                               ihost_uuid, idisk_dict_array):
         """Create or update idisk for an ihost with the supplied data.
@@ -3026,29 +3322,34 @@ class ConductorManager(service.PeriodicService):
         :returns: pass or fail
         """
 
-        def is_same_disk(i, idisk):
+        def match_disks(i):
+            """Return the stored disks matching a reported disk, in database
+            order, with whether they are the same disk or a disk without
+            device path matched on its device node.
+            """
+            node_disks = disks_by_node.get(i.get('device_node'), [])
             # Upgrades R3->R4: An update from an N-1 agent will be missing the
             # persistent naming fields.
-            if 'device_path' in i:
-                if i.get('device_path') is not None:
-                    if idisk.device_path == i.get('device_path'):
-                        # Update from R4 node: Use R4 disk identification logic
-                        return True
-                    elif not idisk.device_path:
-                        # TODO: remove R5. still need to compare device_node
-                        # because not inventoried for R3 node controller-0
-                        if idisk.device_node == i.get('device_node'):
-                            LOG.info("host_uuid=%s idisk.device_path not"
-                                     "set, match on device_node %s" %
-                                     (ihost_uuid, idisk.device_node))
-                            return True
-                else:
-                    return False
-            elif idisk.device_node == i.get('device_node'):
+            if 'device_path' not in i:
                 # Update from R3 node: Fall back to R3 disk identification
                 # logic.
-                return True
-            return False
+                return [(idisk, True) for _position, idisk in node_disks]
+            if i.get('device_path') is None:
+                return [(idisk, False) for _position, idisk in node_disks
+                        if not idisk.device_path]
+
+            # Update from R4 node: Use R4 disk identification logic
+            matches = list(disks_by_path.get(i['device_path'], []))
+            for position, idisk in node_disks:
+                # TODO: remove R5. still need to compare device_node
+                # because not inventoried for R3 node controller-0
+                if not idisk.device_path:
+                    LOG.info("host_uuid=%s idisk.device_path not"
+                             "set, match on device_node %s" %
+                             (ihost_uuid, idisk.device_node))
+                    matches.append((position, idisk))
+            return [(idisk, True) for _position, idisk in sorted(
+                matches, key=lambda m: m[0])]
 
         ihost_uuid.strip()
         try:
@@ -3077,6 +3378,15 @@ class ConductorManager(service.PeriodicService):
 
         idisks = self.dbapi.idisk_get_by_ihost(ihost_uuid)
 
+        # Index the disks by device path and by device node, with their
+        # position so that the matches are processed in database order
+        disks_by_path = collections.defaultdict(list)
+        disks_by_node = collections.defaultdict(list)
+        for position, idisk in enumerate(idisks):
+            if idisk.device_path:
+                disks_by_path[idisk.device_path].append((position, idisk))
+            disks_by_node[idisk.device_node].append((position, idisk))
+
         for i in idisk_dict_array:
             disk_dict = {'forihostid': forihostid}
             # this could overwrite capabilities - do not overwrite device_function?
@@ -3088,83 +3398,81 @@ class ConductorManager(service.PeriodicService):
                 disk = self.dbapi.idisk_create(forihostid, disk_dict)
             else:
                 found = False
-                for idisk in idisks:
+                for idisk, same_disk in match_disks(i):
                     LOG.debug("[DiskEnum] for - current idisk: %s - %s -%s" %
                              (idisk.uuid, idisk.device_node, idisk.device_id))
-
-                    if is_same_disk(i, idisk):
-                        found = True
-                        # The disk has been replaced?
-                        if idisk.serial_id != i.get('serial_id'):
-                            LOG.info("Disk uuid: %s changed serial_id from %s "
-                                     "to %s", idisk.uuid, idisk.serial_id,
-                                     i.get('serial_id'))
-                            # If the clone label is in the serial id, this is
-                            # install-from-clone scenario. Skip gpt formatting.
-                            if ((constants.CLONE_ISO_DISK_SID + ihost['hostname'] + i.get('device_node')) == idisk.serial_id):
-                                LOG.info("Install from clone. Update disk serial"
-                                         " id for disk %s. Skip gpt formatting."
-                                         % idisk.uuid)
-                            elif (ihost.rootfs_device == idisk.device_path or
-                                    ihost.rootfs_device in idisk.device_node):
-                                LOG.info("Disk uuid: %s is a root disk, "
-                                         "skipping gpt formatting."
-                                         % idisk.uuid)
-                            else:
-                                self.disk_format_gpt(context, i, forihostid)
-                            # Update the associated physical volume.
-                            if idisk.foripvid:
-                                self._ipv_replace_disk(idisk.foripvid)
-                        # The disk has been re-enumerated?
-                        # Re-enumeration can occur if:
-                        # 1) a new disk has been added to the host and the new
-                        #    disk is attached to a port that the kernel
-                        #    enumerates earlier than existing disks
-                        # 2) a new disk has been added to the host and the new
-                        #    disk is attached to a new disk controller that the
-                        #    kernel enumerates earlier than the existing disk
-                        #    controller
-                        if idisk.device_node != i.get('device_node'):
-                            LOG.info("Disk uuid: %s has been re-enumerated "
-                                     "from %s to %s.", idisk.uuid,
-                                     idisk.device_node, i.get('device_node'))
-                            disk_dict.update({
-                                'device_node': i.get('device_node')})
-
-                        LOG.debug("[DiskEnum] found disk: %s - %s - %s - %s -"
-                                  "%s" % (idisk.uuid, idisk.device_node,
-                                   idisk.device_id, idisk.capabilities,
-                                   disk_dict['capabilities']))
-
-                        # disk = self.dbapi.idisk_update(idisk['uuid'],
-                        #                                disk_dict)
-                        disk_dict_capabilities = disk_dict.get('capabilities')
-                        if (disk_dict_capabilities and
-                                ('device_function' not in
-                                    disk_dict_capabilities)):
-                            dev_function = idisk.capabilities.get(
-                                'device_function')
-                            if dev_function:
-                                disk_dict['capabilities'].update(
-                                    {'device_function': dev_function})
-                                LOG.debug("update disk_dict=%s" %
-                                          str(disk_dict))
-
-                        available_mib = self._get_disk_available_mib(
-                            idisk, disk_dict)
-                        disk_dict.update({'available_mib': available_mib})
-
-                        LOG.debug("[DiskEnum] updating disk uuid %s with"
-                                  "values: %s" %
-                                  (idisk['uuid'], str(disk_dict)))
+                    found = True
+                    if not same_disk:
                         disk = self.dbapi.idisk_update(idisk['uuid'],
                                                        disk_dict)
-                    elif not idisk.device_path:
-                        if idisk.device_node == i.get('device_node'):
-                            found = True
-                            disk = self.dbapi.idisk_update(idisk['uuid'],
-                                                           disk_dict)
-                            self.dbapi.journal_update_path(disk)
+                        self.dbapi.journal_update_path(disk)
+                        continue
+
+                    # The disk has been replaced?
+                    if idisk.serial_id != i.get('serial_id'):
+                        LOG.info("Disk uuid: %s changed serial_id from %s "
+                                 "to %s", idisk.uuid, idisk.serial_id,
+                                 i.get('serial_id'))
+                        # If the clone label is in the serial id, this is
+                        # install-from-clone scenario. Skip gpt formatting.
+                        if ((constants.CLONE_ISO_DISK_SID + ihost['hostname'] + i.get('device_node')) == idisk.serial_id):
+                            LOG.info("Install from clone. Update disk serial"
+                                     " id for disk %s. Skip gpt formatting."
+                                     % idisk.uuid)
+                        elif (ihost.rootfs_device == idisk.device_path or
+                                ihost.rootfs_device in idisk.device_node):
+                            LOG.info("Disk uuid: %s is a root disk, "
+                                     "skipping gpt formatting."
+                                     % idisk.uuid)
+                        else:
+                            self.disk_format_gpt(context, i, forihostid)
+                        # Update the associated physical volume.
+                        if idisk.foripvid:
+                            self._ipv_replace_disk(idisk.foripvid)
+                    # The disk has been re-enumerated?
+                    # Re-enumeration can occur if:
+                    # 1) a new disk has been added to the host and the new
+                    #    disk is attached to a port that the kernel
+                    #    enumerates earlier than existing disks
+                    # 2) a new disk has been added to the host and the new
+                    #    disk is attached to a new disk controller that the
+                    #    kernel enumerates earlier than the existing disk
+                    #    controller
+                    if idisk.device_node != i.get('device_node'):
+                        LOG.info("Disk uuid: %s has been re-enumerated "
+                                 "from %s to %s.", idisk.uuid,
+                                 idisk.device_node, i.get('device_node'))
+                        disk_dict.update({
+                            'device_node': i.get('device_node')})
+
+                    LOG.debug("[DiskEnum] found disk: %s - %s - %s - %s -"
+                              "%s" % (idisk.uuid, idisk.device_node,
+                               idisk.device_id, idisk.capabilities,
+                               disk_dict['capabilities']))
+
+                    # disk = self.dbapi.idisk_update(idisk['uuid'],
+                    #                                disk_dict)
+                    disk_dict_capabilities = disk_dict.get('capabilities')
+                    if (disk_dict_capabilities and
+                            ('device_function' not in
+                                disk_dict_capabilities)):
+                        dev_function = idisk.capabilities.get(
+                            'device_function')
+                        if dev_function:
+                            disk_dict['capabilities'].update(
+                                {'device_function': dev_function})
+                            LOG.debug("update disk_dict=%s" %
+                                      str(disk_dict))
+
+                    available_mib = self._get_disk_available_mib(
+                        idisk, disk_dict)
+                    disk_dict.update({'available_mib': available_mib})
+
+                    LOG.debug("[DiskEnum] updating disk uuid %s with"
+                              "values: %s" %
+                              (idisk['uuid'], str(disk_dict)))
+                    disk = self.dbapi.idisk_update(idisk['uuid'],
+                                                   disk_dict)
 
                 if not found:
                     disk = self.dbapi.idisk_create(forihostid, disk_dict)
@@ -3181,7 +3489,7 @@ class ConductorManager(service.PeriodicService):
                         idisk_capabilities.update(idisk_dict)
 
                         idisk_val = {'capabilities': idisk_capabilities}
-                        self.dbapi.idisk_update(idisk.uuid, idisk_val)
+                        self.dbapi.idisk_update(disk.uuid, idisk_val)
 
         # Check if this is the controller or storage-0, if so, autocreate.
         # Monitor stor entry if ceph is configured.
@@ -3202,15 +3510,10 @@ class ConductorManager(service.PeriodicService):
         if idisks and len(idisk_dict_array) > 0:
             if len(idisks) > len(idisk_dict_array):
                 # Compare tuples of device_path.
+                cur_device_paths = set(cur_disk.get('device_path') or ""
+                                       for cur_disk in idisk_dict_array)
                 for pre_disk in idisks:
-                    found = False
-                    for cur_disk in idisk_dict_array:
-                        cur_device_path = cur_disk.get('device_path') or ""
-                        if pre_disk.device_path == cur_device_path:
-                            found = True
-                            break
-
-                    if not found:
+                    if pre_disk.device_path not in cur_device_paths:
                         # remove if not associated with storage
                         if not pre_disk.foristorid:
                             LOG.warn("Disk removed: %s dev_node=%s "
@@ -3230,6 +3533,7 @@ class ConductorManager(service.PeriodicService):
 
         return
 
+    @inventory_report('ilvg', 'ilvg_dict_array')
     def ilvg_update_by_ihost(self, context,
                              ihost_uuid, ilvg_dict_array):
         """Create or update ilvg for an ihost with the supplied data.
@@ -3580,6 +3884,108 @@ class ConductorManager(service.PeriodicService):
                                             config_dict,
                                             force=force_apply)
 
+    def inventory_report_by_ihost(self, context, ihost_uuid, inventory):
+        """Create or update the inventory of an ihost with the supplied data.
+
+        The categories whose handlers only update the database are applied
+        in a single database transaction, in the order the agent reports
+        them individually. The CPU grub update is requested once that
+        transaction is committed. If applying a category fails, the
+        transaction is rolled back and these categories are applied again
+        one by one.
+
+        The storage categories, whose handlers request the agent to format
+        disks and wait for it, are then applied one by one.
+
+        :param context: an admin context
+        :param ihost_uuid: ihost uuid unique id
+        :param inventory: dict of the inventory categories
+        :returns: pass or fail
+        """
+        updates = [
+            ('iport', lambda v: self.iport_update_by_ihost(
+                context, ihost_uuid, v)),
+            ('pci_device', lambda v: self.pci_device_update_by_host(
+                context, ihost_uuid, v)),
+            ('inuma', lambda v: self.inumas_update_by_ihost(
+                context, ihost_uuid, v)),
+            ('icpu', lambda v: self.icpus_update_by_ihost(
+                context, ihost_uuid, v,
+                inventory.get('force_grub_update', False))),
+            ('imemory', lambda v: self.imemory_update_by_ihost(
+                context, ihost_uuid, v, False)),
+            ('lldp_agent', lambda v: self.lldp_agent_update_by_host(
+                context, ihost_uuid, v)),
+            ('lldp_neighbour', lambda v: self.lldp_neighbour_update_by_host(
+                context, ihost_uuid, v)),
+        ]
+        storage_updates = [
+            ('idisk', lambda v: self.idisk_update_by_ihost(
+                context, ihost_uuid, v)),
+            ('ipartition', lambda v: self.ipartition_update_by_ihost(
+                context, ihost_uuid, v)),
+            ('ipv', lambda v: self.ipv_update_by_ihost(
+                context, ihost_uuid, v)),
+            ('ilvg', lambda v: self.ilvg_update_by_ihost(
+                context, ihost_uuid, v)),
+        ]
+
+        thread = greenthread.getcurrent()
+        deferred = self._inventory_deferred[thread] = []
+        try:
+            with self.dbapi.transaction():
+                self._apply_inventory_report(ihost_uuid, inventory, updates)
+        except Exception as e:
+            LOG.warn("Failed to apply the inventory of host %s in a single "
+                     "transaction, applying it by category: %s" %
+                     (ihost_uuid, e))
+            # The requests of the rolled back updates are dropped, they are
+            # made again when the categories are applied one by one
+            deferred = None
+            for category, _update in updates:
+                self._inventory_reports.pop((ihost_uuid, category), None)
+        finally:
+            del self._inventory_deferred[thread]
+
+        if deferred is None:
+            self._apply_inventory_report(ihost_uuid, inventory, updates,
+                                         ignore_errors=True)
+        else:
+            for func, args in deferred:
+                try:
+                    func(*args)
+                except Exception:
+                    LOG.exception("Failed to update the configuration of "
+                                  "host %s" % ihost_uuid)
+
+        self._apply_inventory_report(ihost_uuid, inventory, storage_updates,
+                                     ignore_errors=True)
+
+    def _apply_inventory_report(self, ihost_uuid, inventory, updates,
+                                ignore_errors=False):
+        for category, update in updates:
+            if inventory.get(category) is None:
+                continue
+            try:
+                update(inventory[category])
+            except Exception:
+                if not ignore_errors:
+                    raise
+                LOG.exception("Failed to update the %s inventory of host %s" %
+                              (category, ihost_uuid))
+
+    def _run_after_inventory_commit(self, func, *args):
+        """Call func once the inventory report transaction of the current
+        greenthread is committed, or right away outside of such a
+        transaction.
+        """
+        deferred = self._inventory_deferred.get(greenthread.getcurrent())
+        if deferred is None:
+            func(*args)
+        else:
+            deferred.append((func, args))
+
+    @inventory_report('ipartition', 'ipart_dict_array')
     def ipartition_update_by_ihost(self, context,
                                    ihost_uuid, ipart_dict_array):
         """Update existing partition information based on information received
@@ -3757,6 +4163,7 @@ class ConductorManager(service.PeriodicService):
                     LOG.warn("Partition missing: %s - %s" %
                              (db_part.uuid, db_part.device_path))
 
+    @inventory_report('ipv', 'ipv_dict_array')
     def ipv_update_by_ihost(self, context,
                             ihost_uuid, ipv_dict_array):
         """Create or update ipv for an ihost with the supplied data.
@@ -3911,6 +4318,11 @@ class ConductorManager(service.PeriodicService):
         # Some of the PVs may have been updated, so get them again.
         ipvs = self.dbapi.ipv_get_by_ihost(ihost_uuid)
 
+        reconciler = reconcile.InventoryReconciler('ipv', 'lvm_pv_name')
+        ipvs_by_name = reconciler.index(ipvs)
+        ilvgs_by_name = dict((ilvg.lvm_vg_name, ilvg) for ilvg in ilvgs)
+        system_mode = self.dbapi.isystem_get_one().system_mode
+
         # Process the response from the agent
         regex = re.compile("^/dev/.*[a-z][1-9][0-9]?$")
         for i in ipv_dict_array:
@@ -3927,65 +4339,59 @@ class ConductorManager(service.PeriodicService):
             pv_dict.update(i)
 
             # get the LVG info
-            for ilvg in ilvgs:
-                if ilvg.lvm_vg_name == i['lvm_vg_name']:
-                    pv_dict['forilvgid'] = ilvg.id
-                    pv_dict['lvm_vg_name'] = ilvg.lvm_vg_name
+            ilvg = ilvgs_by_name.get(i['lvm_vg_name'])
+            if ilvg is not None:
+                pv_dict['forilvgid'] = ilvg.id
+                pv_dict['lvm_vg_name'] = ilvg.lvm_vg_name
 
             # Search the current pv to see if this one exists
-            found = False
-            for ipv in ipvs:
-                if ipv.lvm_pv_name == i['lvm_pv_name']:
-                    found = True
-                    if ipv.lvm_pv_uuid != i['lvm_pv_uuid']:
-                        # The physical volume has been replaced.
-                        LOG.info("PV uuid: %s changed UUID from %s to %s",
-                                 ipv.uuid, ipv.lvm_pv_uuid,
-                                 i['lvm_pv_uuid'])
-                        # May need to take some action => None for now
-
-                    system_mode = self.dbapi.isystem_get_one().system_mode
-                    if (ipv.pv_state == constants.PV_ADD and not
-                        (system_mode == constants.SYSTEM_MODE_SIMPLEX and
-                            pv_dict['lvm_vg_name'] == constants.LVG_CINDER_VOLUMES)):
-                        pv_dict.update({'pv_state': constants.PROVISIONED})
-
-                    # Update the database
-                    try:
-                        self.dbapi.ipv_update(ipv['uuid'], pv_dict)
-                        if ipv['pv_type'] == constants.PV_TYPE_PARTITION:
-                            self.dbapi.partition_update(
-                                ipv['disk_or_part_uuid'],
-                                {'status': constants.PARTITION_IN_USE_STATUS})
-                    except Exception:
-                        LOG.exception("Update ipv with latest info failed")
-
+            ipv = ipvs_by_name.get(i['lvm_pv_name'])
+            found = ipv is not None
+            if found:
+                if ipv.lvm_pv_uuid != i['lvm_pv_uuid']:
+                    # The physical volume has been replaced.
+                    LOG.info("PV uuid: %s changed UUID from %s to %s",
+                             ipv.uuid, ipv.lvm_pv_uuid,
+                             i['lvm_pv_uuid'])
+                    # May need to take some action => None for now
+
+                if (ipv.pv_state == constants.PV_ADD and not
+                    (system_mode == constants.SYSTEM_MODE_SIMPLEX and
+                        pv_dict['lvm_vg_name'] == constants.LVG_CINDER_VOLUMES)):
+                    pv_dict.update({'pv_state': constants.PROVISIONED})
+
+                # Update the database
+                try:
+                    self.dbapi.ipv_update(ipv['uuid'], pv_dict)
                     if ipv['pv_type'] == constants.PV_TYPE_PARTITION:
-                        continue
-
-                    # Handle the case where the disk has been removed/replaced
-                    idisk = self.dbapi.idisk_get_by_ihost(ihost_uuid)
-                    pv_disk_is_present = False
-                    for d in idisk:
-                        if ((d.device_node in ipv['lvm_pv_name']) or
-                            ((i['lvm_pv_name'] ==
-                                constants.CINDER_DRBD_DEVICE) and
-                             ((ipv['disk_or_part_device_node'] and
-                               (d.device_node in
-                                ipv['disk_or_part_device_node']))))):
-                            pv_disk_is_present = True
-                            if d.uuid != ipv['disk_or_part_uuid']:
-                                # UUID has changed
-                                pv_dict.update({'disk_or_part_uuid': d.uuid})
-                                try:
-                                    self.dbapi.ipv_update(ipv['uuid'], pv_dict)
-                                except Exception:
-                                    LOG.exception("Update ipv for changed "
-                                                  "idisk uuid failed")
-                            break
-                    if not pv_disk_is_present:
-                        self._ipv_handle_phys_storage_removal(ipv, 'idisk')
-                    break
+                        self.dbapi.partition_update(
+                            ipv['disk_or_part_uuid'],
+                            {'status': constants.PARTITION_IN_USE_STATUS})
+                except Exception:
+                    LOG.exception("Update ipv with latest info failed")
+
+            if found and ipv['pv_type'] != constants.PV_TYPE_PARTITION:
+                # Handle the case where the disk has been removed/replaced
+                pv_disk_is_present = False
+                for d in idisks:
+                    if ((d.device_node in ipv['lvm_pv_name']) or
+                        ((i['lvm_pv_name'] ==
+                            constants.CINDER_DRBD_DEVICE) and
+                         ((ipv['disk_or_part_device_node'] and
+                           (d.device_node in
+                            ipv['disk_or_part_device_node']))))):
+                        pv_disk_is_present = True
+                        if d.uuid != ipv['disk_or_part_uuid']:
+                            # UUID has changed
+                            pv_dict.update({'disk_or_part_uuid': d.uuid})
+                            try:
+                                self.dbapi.ipv_update(ipv['uuid'], pv_dict)
+                            except Exception:
+                                LOG.exception("Update ipv for changed "
+                                              "idisk uuid failed")
+                        break
+                if not pv_disk_is_present:
+                    self._ipv_handle_phys_storage_removal(ipv, 'idisk')
 
             # Special Case: DRBD has provisioned the cinder partition. Update the existing PV partition
             if not found and i['lvm_pv_name'] == constants.CINDER_DRBD_DEVICE:
@@ -4052,8 +4458,7 @@ class ConductorManager(service.PeriodicService):
                 pv_dict['disk_or_part_uuid'] = None
                 pv_dict['disk_or_part_device_node'] = None
 
-                idisk = self.dbapi.idisk_get_by_ihost(ihost_uuid)
-                for d in idisk:
+                for d in idisks:
                     if d.device_node in i['lvm_pv_name']:
                         if pv_dict['pv_type'] == constants.PV_TYPE_DISK:
                             pv_dict['disk_or_part_uuid'] = d.uuid
@@ -4110,17 +4515,14 @@ class ConductorManager(service.PeriodicService):
 
         # Purge the records that have been requested to be removed and
         # update the failed ones
+        agent_ipvs = reconciler.index(ipv_dict_array, stored=False)
         for ipv in ipvs:
             # Make sure that the agent hasn't reported that it is
             # still present on the host
-            found = False
-            for ipv_in_agent in ipv_dict_array:
-                if ipv.lvm_pv_name == ipv_in_agent['lvm_pv_name']:
-                    found = True
-                    break
+            ipv_in_agent = agent_ipvs.get(ipv.lvm_pv_name)
 
             update = {}
-            if not found:
+            if ipv_in_agent is None:
                 LOG.info("PV not found in Agent. uuid: %(ipv)s current state: "
                          "%(st)s" % {'ipv': ipv['uuid'],
                                      'st': ipv['pv_state']})
@@ -4162,7 +4564,9 @@ class ConductorManager(service.PeriodicService):
 
         return
 
-    @periodic_task.periodic_task(spacing=CONF.conductor.audit_interval)
+    @periodic_task.periodic_task(spacing=CONF.conductor.audit_interval,
+                                 jitter=AUDIT_JITTER,
+                                 timeout=CONF.conductor.audit_timeout)
     def _agent_update_request(self, context):
         """
         Check DB  for inventory objects with an inconsistent state and
@@ -4174,6 +4578,13 @@ class ConductorManager(service.PeriodicService):
         LOG.debug("Calling _agent_update_request")
         update_hosts = {}
 
+        def update_hosts_dict(host_id, val):
+            if host_id not in update_hosts:
+                update_hosts[host_id] = set()
+            update_hosts[host_id].add(val)
+
+        hosts = dict((h.id, h) for h in self.dbapi.ihost_get_list())
+
         # Check if the LVM backend is in flux. If so, skip the audit as we know
         # VG/PV states are going to be transitory. Otherwise, maintain the
         # audit for nova storage.
@@ -4183,83 +4594,75 @@ class ConductorManager(service.PeriodicService):
             skip_lvm_audit = True
 
         if not skip_lvm_audit:
-            ipvs = self.dbapi.ipv_get_all()
-            ilvgs = self.dbapi.ilvg_get_all()
-
-            def update_hosts_dict(host_id, val):
-                if host_id not in update_hosts:
-                    update_hosts[host_id] = set()
-                update_hosts[host_id].add(val)
-
             # Check LVGs
-            for ilvg in ilvgs:
-                if ilvg['vg_state'] != constants.PROVISIONED:
-                    host_id = ilvg['forihostid']
-                    update_hosts_dict(host_id, constants.LVG_AUDIT_REQUEST)
+            for host_id in self.dbapi.ilvg_get_ihost_ids_not_in_state(
+                    constants.PROVISIONED):
+                update_hosts_dict(host_id, constants.LVG_AUDIT_REQUEST)
 
             # Check PVs
-            for ipv in ipvs:
-                if ipv['pv_state'] != constants.PROVISIONED:
-                    host_id = ipv['forihostid']
-                    update_hosts_dict(host_id, constants.PV_AUDIT_REQUEST)
+            for host_id in self.dbapi.ipv_get_ihost_ids_not_in_state(
+                    constants.PROVISIONED):
+                update_hosts_dict(host_id, constants.PV_AUDIT_REQUEST)
 
             # Make sure we get at least one good report for PVs & LVGs
-            hosts = self.dbapi.ihost_get_list()
-            for host in hosts:
+            idisk_counts = self.dbapi.idisk_count_by_ihost()
+            ipv_counts = self.dbapi.ipv_count_by_ihost()
+            ilvg_counts = self.dbapi.ilvg_count_by_ihost()
+            for host in hosts.values():
                 if host.availability != constants.AVAILABILITY_OFFLINE:
-                    idisks = self.dbapi.idisk_get_by_ihost(host.uuid)
-                    if not idisks:
+                    if not idisk_counts.get(host.id):
                         update_hosts_dict(host.id, constants.DISK_AUDIT_REQUEST)
-                    ipvs = self.dbapi.ipv_get_by_ihost(host.uuid)
-                    if not ipvs:
+                    if not ipv_counts.get(host.id):
                         update_hosts_dict(host.id, constants.PARTITION_AUDIT_REQUEST)
                         update_hosts_dict(host.id, constants.PV_AUDIT_REQUEST)
-                    ilvgs = self.dbapi.ilvg_get_by_ihost(host.uuid)
-                    if not ilvgs:
+                    if not ilvg_counts.get(host.id):
                         update_hosts_dict(host.id, constants.LVG_AUDIT_REQUEST)
 
         # Check partitions.
-        partitions = self.dbapi.partition_get_all()
         # Transitory partition states.
         states = [constants.PARTITION_CREATE_IN_SVC_STATUS,
                   constants.PARTITION_CREATE_ON_UNLOCK_STATUS,
                   constants.PARTITION_DELETING_STATUS,
                   constants.PARTITION_MODIFYING_STATUS]
-        for part in partitions:
-            # TODO (rchurch):These mib checks cover an R4->R5 upgrade
-            # scenario.Remove after R5.
-            if ((part.status in states) or
-                    (not part.get('start_mib') or
-                     not part.get('end_mib'))):
-                host_id = part['forihostid']
-                update_hosts_dict(host_id, constants.PARTITION_AUDIT_REQUEST)
+        # TODO (rchurch):The mib checks done by the query cover an R4->R5
+        # upgrade scenario.Remove after R5.
+        for host_id in self.dbapi.partition_get_ihost_ids_to_audit(states):
+            update_hosts_dict(host_id, constants.PARTITION_AUDIT_REQUEST)
 
         # Send update request if required
         if update_hosts:
+            # Get the cinder devices to force detection even
+            # when filtered by LVM's global_filter.
+            cinder_devices = {}
+            for ipv in self.dbapi.ipv_get_all(
+                    lvm_vg_name=constants.LVG_CINDER_VOLUMES):
+                cinder_devices[ipv['forihostid']] = \
+                    ipv.get('disk_or_part_device_path')
+
             rpcapi = agent_rpcapi.AgentAPI()
             for host_id, update_set in update_hosts.items():
 
-                ihost = self.dbapi.ihost_get(host_id)
+                ihost = hosts.get(host_id)
+                if not ihost:
+                    LOG.error("Host: %s not found in database" % host_id)
+                    continue
                 if (ihost.invprovision != constants.PROVISIONED and
                         tsc.system_type != constants.TIS_AIO_BUILD):
                     continue
-                if ihost:
-                    LOG.info("Sending agent update request for host %s "
-                             "to update (%s)" %
-                             (host_id, (', '.join(update_set))))
-
-                    # Get the cinder device to force detection even
-                    # when filtered by LVM's global_filter.
-                    ipvs = self.dbapi.ipv_get_by_ihost(ihost['uuid'])
-                    cinder_device = None
-                    for ipv in ipvs:
-                        if ipv['lvm_vg_name'] == constants.LVG_CINDER_VOLUMES:
-                            cinder_device = ipv.get('disk_or_part_device_path')
-
-                    rpcapi.agent_update(context, ihost['uuid'],
-                                        list(update_set), cinder_device)
-                else:
-                    LOG.error("Host: %s not found in database" % host_id)
+
+                LOG.info("Sending agent update request for host %s "
+                         "to update (%s)" %
+                         (host_id, (', '.join(update_set))))
+
+                # apply the requested reports even if they did not change
+                for request in update_set:
+                    self._inventory_reports.pop(
+                        (ihost['uuid'], AUDIT_REQUEST_INVENTORY[request]),
+                        None)
+
+                rpcapi.agent_update(context, ihost['uuid'],
+                                    list(update_set),
+                                    cinder_devices.get(host_id))
 
     def _clear_ceph_stor_state(self, ihost_uuid):
         """ Once a node starts, clear status of OSD storage devices
@@ -4984,7 +5387,9 @@ class ConductorManager(service.PeriodicService):
                     self.dbapi.service_parameter_update(status.uuid,
                                                         {"value": "disabled"})
 
-    @periodic_task.periodic_task(spacing=CONF.conductor.audit_interval)
+    @periodic_task.periodic_task(spacing=CONF.conductor.audit_interval,
+                                 jitter=AUDIT_JITTER,
+                                 timeout=CONF.conductor.audit_timeout)
     def _conductor_audit(self, context):
         # periodically, perform audit of inventory
         LOG.debug("Sysinv Conductor running periodic audit task.")
@@ -5013,6 +5418,16 @@ class ConductorManager(service.PeriodicService):
                 continue
             self._audit_ihost_action(host)
 
+        self._audit_inventory_reports()
+
+    def _audit_inventory_reports(self):
+        """Log the number of agent inventory reports applied and skipped"""
+        if not self._inventory_report_counts:
+            return
+        LOG.info("Agent inventory reports: %s" % ', '.join(
+            "%s %s=%d" % (category, result, count) for (category, result), count
+            in sorted(self._inventory_report_counts.items())))
+
     def _audit_kubernetes_labels(self, hosts):
         if (not utils.is_kubernetes_config(self.dbapi) or
                 not cutils.is_initial_config_complete()):
@@ -5020,32 +5435,16 @@ class ConductorManager(service.PeriodicService):
             return
 
         LOG.debug("Starting kubernetes label audit")
-        sysinv_labels = self.dbapi.label_get_all()
-        nodes = self._kube.kube_get_nodes()
-
-        for host in hosts:
-            try:
-                for node in nodes:
-                    if host.hostname == node.metadata.name:
-                        node_labels = node.metadata.labels
-                        host_labels = [l for l in sysinv_labels if l.host_id == host.id]
-                        for host_label in host_labels:
-                            if host_label.label_key not in node_labels.keys():
-                                LOG.info("Label audit: creating %s=%s on node %s"
-                                         % (host_label.label_key,
-                                            host_label.label_value, host.hostname))
-                                body = {
-                                    'metadata': {
-                                        'labels': {host_label.label_key: host_label.label_value}
-                                    }
-                                }
-                                self._kube.kube_patch_node(host.hostname, body)
-            except Exception as e:
-                LOG.warning("Failed to sync kubernetes label to host %s: %s" %
-                            (host.hostname, e))
+        try:
+            self._kube_labels.reconcile(hosts, self.dbapi.label_get_all())
+        except Exception as e:
+            LOG.warning("Failed to sync kubernetes labels: %s" % e)
+            self._kube_labels.reset()
 
     # TODO(CephPoolsDecouple): remove
-    @periodic_task.periodic_task(spacing=60)
+    @periodic_task.periodic_task(spacing=60,
+                                 jitter=AUDIT_JITTER,
+                                 timeout=CONF.conductor.audit_timeout)
     def _osd_pool_audit(self, context):
         if utils.is_kubernetes_config(self.dbapi):
             LOG.debug("_osd_pool_audit skip")
@@ -5083,7 +5482,9 @@ class ConductorManager(service.PeriodicService):
                                            backend.backend,
                                            reason)
 
-    @periodic_task.periodic_task(spacing=CONF.conductor.audit_interval)
+    @periodic_task.periodic_task(spacing=CONF.conductor.audit_interval,
+                                 jitter=AUDIT_JITTER,
+                                 timeout=CONF.conductor.audit_timeout)
     def _storage_backend_failure_audit(self, context):
         """Check if storage backend is stuck in 'configuring'"""
 
@@ -5105,7 +5506,9 @@ class ConductorManager(service.PeriodicService):
                 del self._stor_bck_op_timeouts[bk.backend]
 
     @periodic_task.periodic_task(spacing=CONF.conductor.audit_interval,
-                                 run_immediately=True)
+                                 run_immediately=True,
+                                 jitter=AUDIT_JITTER,
+                                 timeout=CONF.conductor.audit_timeout)
     def _k8s_application_audit(self, context):
         """Make sure that the required k8s applications are running"""
 
@@ -8406,14 +8809,13 @@ class ConductorManager(service.PeriodicService):
            provisioned. If host_uuid is provided, only that host's puppet
            hiera data file will be regenerated.
         """
-        host_updated = False
-
         personalities = config_dict['personalities']
         if not host_uuids:
             hosts = self.dbapi.ihost_get_list()
         else:
             hosts = [self.dbapi.ihost_get(host_uuid) for host_uuid in host_uuids]
 
+        update_hosts = []
         for host in hosts:
             if host.personality in personalities:
                 # We will allow controller nodes to re-generate manifests
@@ -8425,8 +8827,7 @@ class ConductorManager(service.PeriodicService):
                     host.invprovision == constants.PROVISIONED or
                     (host.invprovision == constants.PROVISIONING and
                      host.personality == constants.CONTROLLER)):
-                    self._puppet.update_host_config(host, config_uuid)
-                    host_updated = True
+                    update_hosts.append(host)
                 else:
                     LOG.info(
                         "Cannot regenerate the configuration for %s, "
@@ -8435,7 +8836,8 @@ class ConductorManager(service.PeriodicService):
 
         # ensure the system configuration is also updated if hosts require
         # a reconfiguration
-        if host_updated:
+        if update_hosts:
+            self._puppet.update_hosts_config(update_hosts, config_uuid)
             self._puppet.update_system_config()
             self._puppet.update_secure_system_config()
 
@@ -0,0 +1,167 @@
+#
+# Copyright (c) 2019 Wind River Systems, Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+""" System Inventory reconciliation of the agent reported inventory."""
+
+import collections
+
+from sysinv.openstack.common import log
+
+LOG = log.getLogger(__name__)
+
+
+def _key_function(key):
+    """Return a function giving the key of an item, from a field name, a
+    tuple of field names or a function.
+    """
+    if callable(key):
+        return key
+    if isinstance(key, (tuple, list)):
+        return lambda item: tuple(item.get(k) for k in key)
+    return lambda item: item.get(key)
+
+
+class InventoryDiff(object):
+    """The changes reconciling the inventory items reported for a host
+    with the items stored in the database.
+
+    :ivar create: the reported items without a stored item
+    :ivar matched: (stored item, reported item, changed fields) tuples
+    :ivar delete: the stored items which were not reported
+    """
+
+    def __init__(self):
+        self.create = []
+        self.matched = []
+        self.delete = []
+
+    @property
+    def update(self):
+        """The (stored item, changed fields) tuples of the changed items."""
+        return [(stored, changes)
+                for stored, reported, changes in self.matched if changes]
+
+    @property
+    def changed(self):
+        return bool(self.create or self.delete or self.update)
+
+    def __str__(self):
+        return ("%d created, %d updated, %d unchanged, %d deleted" %
+                (len(self.create), len(self.update),
+                 len(self.matched) - len(self.update), len(self.delete)))
+
+
+class InventoryReconciler(object):
+    """Reconcile the inventory items reported by an agent with the items
+    stored for its host.
+
+    The reported and stored items are matched by their natural key through
+    an index of the stored items, so that a reconciliation is linear in the
+    number of items.
+
+    :param category: the inventory category, used in the logs
+    :param key: the field, tuple of fields or function giving the natural
+                key of a reported item
+    :param fields: the reported fields to update in the stored items, as a
+                   list or as a dict mapping the reported fields to the
+                   stored ones
+    :param stored_key: the natural key of a stored item, if it differs from
+                       the key of a reported item
+    """
+
+    def __init__(self, category, key, fields=None, stored_key=None):
+        self.category = category
+        self._key = _key_function(key)
+        self._stored_key = _key_function(stored_key or key)
+        if isinstance(fields, dict):
+            self._fields = list(fields.items())
+        else:
+            self._fields = [(f, f) for f in fields or []]
+
+    def index(self, items, stored=True):
+        """Index items by their natural key.
+
+        Items without a key are not indexed. The first item with a given
+        key is the one indexed.
+
+        :param items: the stored items, or the reported items
+        :param stored: whether the items are the stored items
+        :returns: an ordered dict of the items by key
+        """
+        key = self._stored_key if stored else self._key
+        index = collections.OrderedDict()
+        for item in items:
+            k = key(item)
+            if k is None:
+                continue
+            if k in index:
+                LOG.warn("Duplicate %s inventory item %s" %
+                         (self.category, k))
+                continue
+            index[k] = item
+        return index
+
+    def changes(self, stored, reported):
+        """Return the fields of a stored item that differ from the reported
+        item, with their reported values.
+        """
+        changes = {}
+        for field, stored_field in self._fields:
+            if field in reported and \
+                    stored.get(stored_field) != reported[field]:
+                changes[stored_field] = reported[field]
+        return changes
+
+    def diff(self, host, reported, stored):
+        """Compute the changes reconciling the inventory of a host.
+
+        :param host: the host name or uuid, used in the logs
+        :param reported: the items reported by the agent
+        :param stored: the items stored in the database
+        :returns: an InventoryDiff
+        """
+        index = self.index(stored)
+        diff = InventoryDiff()
+        matched = set()
+        for item in reported:
+            k = self._key(item)
+            current = index.get(k) if k is not None else None
+            if current is None:
+                diff.create.append(item)
+                continue
+            matched.add(k)
+            diff.matched.append((current, item, self.changes(current, item)))
+        diff.delete = [item for key, item in index.items()
+                       if key not in matched]
+
+        if diff.changed:
+            LOG.info("%s inventory of host %s: %s" %
+                     (self.category, host, diff))
+            for stored, changes in diff.update:
+                LOG.debug("%s %s changes: %s" %
+                          (self.category, self._stored_key(stored), changes))
+        else:
+            LOG.debug("%s inventory of host %s: %s" %
+                      (self.category, host, diff))
+        return diff
+
+    def apply(self, diff, create=None, update=None, delete=None):
+        """Apply the changes of a diff in bulk.
+
+        :param diff: an InventoryDiff
+        :param create: function creating a list of reported items
+        :param update: function updating a list of dicts of the changed
+                       fields, each including the uuid of the stored item
+        :param delete: function deleting a list of stored items
+        """
+        if create and diff.create:
+            create(diff.create)
+        updates = [dict(changes, uuid=stored['uuid'])
+                   for stored, changes in diff.update]
+        if update and updates:
+            update(updates)
+        if delete and diff.delete:
+            delete(diff.delete)
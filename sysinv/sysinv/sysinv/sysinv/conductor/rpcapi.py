@@ -39,9 +39,13 @@ class ConductorAPI(sysinv.openstack.common.rpc.proxy.RpcProxy):
 
         1.0 - Initial version.
         1.1 - Used for R5
+        1.2 - Added inventory_report_by_ihost
+        1.3 - Added get_periodic_task_stats
+        1.4 - Added create_ihosts and configure_ihosts
+        1.5 - Added get_inventory_report_stats
     """
 
-    RPC_API_VERSION = '1.1'
+    RPC_API_VERSION = '1.5'
 
     def __init__(self, topic=None):
         if topic is None:
@@ -85,6 +89,22 @@ class ConductorAPI(sysinv.openstack.common.rpc.proxy.RpcProxy):
                          self.make_msg('create_ihost',
                                        values=values))
 
+    def create_ihosts(self, context, values_list):
+        """Synchronously, have a conductor create ihosts.
+
+        Create the ihosts in the database in a single transaction and return
+        the objects.
+
+        :param context: request context.
+        :param values_list: list of dictionaries with initial values for the
+                            new ihost objects
+        :returns: list of the created ihost objects, including all fields.
+        """
+        return self.call(context,
+                         self.make_msg('create_ihosts',
+                                       values_list=values_list),
+                         version='1.4')
+
     def update_ihost(self, context, ihost_obj):
         """Synchronously, have a conductor update the ihosts's information.
 
@@ -116,6 +136,24 @@ class ConductorAPI(sysinv.openstack.common.rpc.proxy.RpcProxy):
                                        host=host,
                                        do_worker_apply=do_worker_apply))
 
+    def configure_ihosts(self, context, hosts, timeout=None):
+        """Synchronously, have a conductor configure ihosts.
+
+        Does the tasks of configure_ihost for each ihost, with the system
+        configuration files generated and the dnsmasq host files written
+        once for all of them.
+
+        :param context: request context.
+        :param hosts: a list of ihost objects.
+        :param timeout: time in seconds to wait for the ihosts to be
+                        configured, rpc_response_timeout by default.
+        :returns: the list of the ihost objects configured.
+        """
+        return self.call(context,
+                         self.make_msg('configure_ihosts',
+                                       hosts=hosts),
+                         version='1.4', timeout=timeout)
+
     # TODO(CephPoolsDecouple): remove
     def configure_osd_pools(self, context, ceph_backend=None, new_pool_size=None, new_pool_min_size=None):
         """Configure or update configuration of the OSD pools.
@@ -412,6 +450,51 @@ class ConductorAPI(sysinv.openstack.common.rpc.proxy.RpcProxy):
                                        ihost_uuid=ihost_uuid,
                                        ipart_dict_array=ipart_dict_array))
 
+    def inventory_report_by_ihost(self, context, ihost_uuid, inventory):
+        """Create or update the inventory of an ihost with the supplied
+        data.
+
+        This method allows the records of all the inventory categories of
+        an ihost to be created or updated with a single request.
+
+        :param context: an admin context
+        :param ihost_uuid: ihost uuid unique id
+        :param inventory: dict of the inventory categories, with keys
+                          iport, pci_device, inuma, icpu, imemory, idisk,
+                          ipartition, ipv, ilvg and optionally lldp_agent
+                          and lldp_neighbour, and the force_grub_update flag
+        :returns: pass or fail
+        """
+
+        return self.call(context,
+                         self.make_msg('inventory_report_by_ihost',
+                                       ihost_uuid=ihost_uuid,
+                                       inventory=inventory),
+                         version='1.2')
+
+    def get_periodic_task_stats(self, context):
+        """Synchronously, have a conductor return the run statistics of its
+        periodic tasks.
+
+        :param context: request context.
+        :returns: dict of task name to its run statistics
+        """
+        return self.call(context,
+                         self.make_msg('get_periodic_task_stats'),
+                         version='1.3')
+
+    def get_inventory_report_stats(self, context):
+        """Synchronously, have a conductor return the number of agent
+        inventory reports it applied and skipped.
+
+        :param context: request context.
+        :returns: dict of inventory category to its number of applied and
+                  skipped reports
+        """
+        return self.call(context,
+                         self.make_msg('get_inventory_report_stats'),
+                         version='1.5')
+
     def update_partition_config(self, context, partition):
         """Asynchronously, have a conductor configure the physical volume
         partitions.
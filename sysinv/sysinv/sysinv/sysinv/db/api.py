@@ -59,6 +59,16 @@ class Connection(object):
     # def get_session(self, autocommit):
     #     """Create a new database session instance."""
 
+    @abc.abstractmethod
+    def transaction(self):
+        """Return a context manager applying the database updates made
+        within it in a single transaction.
+
+        Each database API call made within it updates the database in its
+        own savepoint, so a caller may catch the error of a call, e.g.
+        a duplicate entry, and carry on with the transaction.
+        """
+
     @abc.abstractmethod
     def isystem_create(self, values):
         """Create a new isystem.
@@ -175,6 +185,24 @@ class Connection(object):
         :param recordtype: recordtype to filter, default="standard"
         """
 
+    @abc.abstractmethod
+    def ihost_get_columns_list(self, columns, limit=None, marker=None,
+                               sort_key=None, sort_dir=None,
+                               isystem_id=None, personality=None):
+        """Return a list of iHosts limited to the given columns.
+
+        :param columns: names of the columns to return.
+        :param limit: Maximum number of iHosts to return.
+        :param marker: dict of the sort_key and id values of the last item of
+                       the previous page; we return the next result set.
+        :param sort_key: Attribute by which results should be sorted.
+        :param sort_dir: direction in which results should be sorted.
+                         (asc, desc)
+        :param isystem_id: system to filter on.
+        :param personality: personality to filter on.
+        :returns: A list of dicts of the column values of each iHost.
+        """
+
     @abc.abstractmethod
     def ihost_get_by_hostname(self, hostname):
         """Return a server by hostname.
@@ -302,6 +330,15 @@ class Connection(object):
         :returns: An inode.
         """
 
+    @abc.abstractmethod
+    def inode_create_bulk(self, forihostid, values):
+        """Create inodes for a host in a single transaction.
+
+        :param forihostid: uuid or id of an ihost
+        :param values: List of dicts of inode values to create.
+        :returns: A list of inodes, in the order of the values.
+        """
+
     @abc.abstractmethod
     def inode_get(self, inode_id):
         """Return an inode.
@@ -389,6 +426,15 @@ class Connection(object):
         :returns: A cpu.
         """
 
+    @abc.abstractmethod
+    def icpu_create_bulk(self, forihostid, values):
+        """Create icpus for a server in a single transaction.
+
+        :param forihostid: cpus belong to this host
+        :param values: List of dicts of cpu values to create.
+        :returns: A list of cpus, in the order of the values.
+        """
+
     @abc.abstractmethod
     def icpu_get(self, cpu_id, forihostid=None):
         """Return a cpu.
@@ -510,6 +556,15 @@ class Connection(object):
         :returns: A memory.
         """
 
+    @abc.abstractmethod
+    def imemory_create_bulk(self, forihostid, values):
+        """Create imemory for a server in a single transaction.
+
+        :param forihostid: memory belongs to this host
+        :param values: List of dicts of memory values to create.
+        :returns: A list of memorys, in the order of the values.
+        """
+
     @abc.abstractmethod
     def imemory_get(self, memory_id, forihostid=None):
         """Return a memory.
@@ -608,6 +663,16 @@ class Connection(object):
         :returns: A memory.
         """
 
+    @abc.abstractmethod
+    def imemory_update_bulk(self, values, forihostid=None):
+        """Update properties of a list of memorys in a single transaction.
+
+        :param values: List of dicts of values to update. Each dict
+                       contains the uuid of the memory to update.
+        :param forihostid: The id of the host to which the memorys belong.
+        :returns: A list of memorys, in the order of the values.
+        """
+
     @abc.abstractmethod
     def imemory_destroy(self, memory_id):
         """Destroy a memory and all associated leaves.
@@ -1194,6 +1259,13 @@ class Connection(object):
         :returns:  disks.
         """
 
+    @abc.abstractmethod
+    def idisk_count_by_ihost(self):
+        """Return the number of disks of each host.
+
+        :returns: A dict of disk counts indexed by host id.
+        """
+
     @abc.abstractmethod
     def idisk_update(self, disk_id, values, forihostid=None):
         """Update properties of a disk.
@@ -1229,6 +1301,17 @@ class Connection(object):
         :returns:  partitions.
         """
 
+    @abc.abstractmethod
+    def partition_get_ihost_ids_to_audit(self, statuses):
+        """Return the ids of the hosts with partitions requiring an audit.
+
+        A partition requires an audit if its status is one of the supplied
+        statuses or if its start or end offset is unknown.
+
+        :param statuses: A list of partition statuses.
+        :returns: A set of host ids.
+        """
+
     @abc.abstractmethod
     def partition_get(self, partition_id, forihostid=None):
         """Return a partition.
@@ -1465,6 +1548,21 @@ class Connection(object):
         :returns:  ilvg.
         """
 
+    @abc.abstractmethod
+    def ilvg_count_by_ihost(self):
+        """Return the number of ilvgs of each host.
+
+        :returns: A dict of ilvg counts indexed by host id.
+        """
+
+    @abc.abstractmethod
+    def ilvg_get_ihost_ids_not_in_state(self, state):
+        """Return the ids of the hosts with an ilvg not in the given state.
+
+        :param state: The ilvg state.
+        :returns: A set of host ids.
+        """
+
     @abc.abstractmethod
     def ilvg_get_list(self, limit=None, marker=None,
                        sort_key=None, sort_dir=None):
@@ -1549,13 +1647,29 @@ class Connection(object):
         """
 
     @abc.abstractmethod
-    def ipv_get_all(self, forihostid=None):
+    def ipv_get_all(self, forihostid=None, lvm_vg_name=None):
         """Return ipvs.
 
         :param forihostid: The id or uuid of an ihost.
+        :param lvm_vg_name: (optional) the name of the volume group.
         :returns:  ipv.
         """
 
+    @abc.abstractmethod
+    def ipv_count_by_ihost(self):
+        """Return the number of ipvs of each host.
+
+        :returns: A dict of ipv counts indexed by host id.
+        """
+
+    @abc.abstractmethod
+    def ipv_get_ihost_ids_not_in_state(self, state):
+        """Return the ids of the hosts with an ipv not in the given state.
+
+        :param state: The ipv state.
+        :returns: A set of host ids.
+        """
+
     @abc.abstractmethod
     def ipv_get_list(self, limit=None, marker=None,
                        sort_key=None, sort_dir=None):
@@ -3493,6 +3607,16 @@ class Connection(object):
         :returns: A pci device
         """
 
+    @abc.abstractmethod
+    def pci_device_create_bulk(self, hostid, values):
+        """Create pci devices for a host in a single transaction.
+
+        :param hostid: The id, uuid or database object of the host to which
+                       the devices belong.
+        :param values: List of dicts of pci device values to create.
+        :returns: A list of pci devices, in the order of the values.
+        """
+
     @abc.abstractmethod
     def pci_device_get(self, deviceid, hostid=None):
         """Return a pci device
@@ -3556,6 +3680,17 @@ class Connection(object):
         :returns: A pci device
         """
 
+    @abc.abstractmethod
+    def pci_device_update_bulk(self, values, hostid=None):
+        """Update properties of a list of pci devices in a single
+        transaction.
+
+        :param values: List of dicts of values to update. Each dict
+                       contains the uuid of the pci device to update.
+        :param hostid: The id of the host to which the pci devices belong.
+        :returns: A list of pci devices, in the order of the values.
+        """
+
     @abc.abstractmethod
     def pci_device_destroy(self, deviceid):
         """Destroy a pci_device
@@ -4341,3 +4476,19 @@ class Connection(object):
 
         :param uuid: The uuid of an interface network association.
         """
+
+    @abc.abstractmethod
+    def table_fingerprints_get(self, tables, columns=None):
+        """Return a change fingerprint for each of the supplied tables.
+
+        The fingerprint of a table is derived from its row count and the
+        most recent creation and update timestamps of its rows; it changes
+        whenever a row is added, removed or updated. Tables without
+        timestamp columns, and tables for which columns are selected, are
+        fingerprinted by a digest of their content.
+
+        :param tables: A list of table names.
+        :param columns: (optional) A dict of the column names to fingerprint
+                        indexed by table name.
+        :returns: A dict of fingerprint tuples indexed by table name.
+        """
@@ -21,7 +21,9 @@
 """SQLAlchemy storage backend."""
 
 
+import collections
 import eventlet
+import hashlib
 import re
 
 from oslo_config import cfg
@@ -31,6 +33,8 @@ from oslo_db.sqlalchemy import enginefacade
 from oslo_db.sqlalchemy import utils as db_utils
 
 
+from sqlalchemy import DateTime
+from sqlalchemy import func
 from sqlalchemy import or_
 from sqlalchemy import inspect
 
@@ -42,6 +46,12 @@ from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import subqueryload
 from sqlalchemy.orm import contains_eager
 
+try:
+    from sqlalchemy.orm import selectinload
+except ImportError:
+    # selectin loading is not available before SQLAlchemy 1.2
+    selectinload = subqueryload
+
 
 from sysinv.common import constants
 from sysinv.common import exception
@@ -52,6 +62,7 @@ from sysinv import objects
 
 
 from sysinv.openstack.common import log
+from sysinv.openstack.common import timeutils
 from sysinv.openstack.common import uuidutils
 
 CONF = cfg.CONF
@@ -97,7 +108,27 @@ def _session_for_read():
 def _session_for_write():
     _context = eventlet.greenthread.getcurrent()
     LOG.debug("_session_for_write CONTEXT=%s" % _context)
-    return enginefacade.writer.using(_context)
+    # Within a transaction, the updates are made in a savepoint, so that a
+    # database error caught by the caller only rolls back these updates
+    # rather than aborting the whole transaction
+    return enginefacade.writer.savepoint.using(_context)
+
+
+class _PaginationMarker(object):
+    """Pagination marker built from the values of the last item of a page.
+
+    Allows paginating from the sort key values of the last item, as found
+    in a pagination cursor, without loading the item from the database.
+    """
+
+    def __init__(self, model, values):
+        columns = model.__table__.columns
+        for key, value in values.items():
+            if (value and key in columns and
+                    isinstance(columns[key].type, DateTime)):
+                value = timeutils.normalize_time(
+                    timeutils.parse_isotime(value))
+            setattr(self, key, value)
 
 
 def _paginate_query(model, limit=None, marker=None, sort_key=None,
@@ -105,6 +136,9 @@ def _paginate_query(model, limit=None, marker=None, sort_key=None,
     if not query:
         query = model_query(model)
 
+    if isinstance(marker, dict):
+        marker = _PaginationMarker(model, marker)
+
     if not sort_key:
         sort_keys = []
     elif not isinstance(sort_key, list):
@@ -135,6 +169,66 @@ def model_query(model, *args, **kwargs):
     return query
 
 
+def _count_by_ihost(model):
+    """Count the entries of an inventory table grouped by host id."""
+    query = model_query(model.forihostid, func.count(model.id),
+                        read_deleted="no")
+    query = query.group_by(model.forihostid)
+    return dict((host_id, count) for host_id, count in query.all())
+
+
+def _ihost_ids_not_in_state(model, column, state):
+    """Return the ids of the hosts with entries not in the given state."""
+    query = model_query(model.forihostid, read_deleted="no")
+    query = query.filter(or_(column != state, column.is_(None)))
+    return set(row[0] for row in query.distinct())
+
+
+def _create_bulk(model, values, session):
+    """Add the entries of a list of value dicts in the session and select
+    them back in a single query, in the order of the list.
+    """
+    uuids = []
+    for entry in values:
+        if not entry.get('uuid'):
+            entry['uuid'] = uuidutils.generate_uuid()
+        row = model()
+        row.update(entry)
+        session.add(row)
+        uuids.append(entry['uuid'])
+    session.flush()
+    return _get_bulk(model, uuids, session)
+
+
+def _get_bulk(model, uuids, session, **filters):
+    """Select the entries with the given uuids, in the order of the list."""
+    if not uuids:
+        return []
+    query = model_query(model, read_deleted="no", session=session)
+    query = query.filter_by(**filters).filter(model.uuid.in_(uuids))
+    rows = dict((row.uuid, row) for row in query.all())
+    return [rows[uuid] for uuid in uuids if uuid in rows]
+
+
+def _update_bulk(model, values, session, **filters):
+    """Update the entries identified by the uuid of each value dict, selected
+    in a single query.
+    """
+    updates = collections.OrderedDict()
+    for entry in values:
+        entry = dict(entry)
+        updates[entry.pop('uuid')] = entry
+    rows = _get_bulk(model, list(updates), session, **filters)
+    if len(rows) != len(updates):
+        missing = set(updates) - set(row.uuid for row in rows)
+        raise exception.ServerNotFound(server=', '.join(sorted(missing)))
+    for row in rows:
+        for k, v in updates[row.uuid].items():
+            setattr(row, k, v)
+    session.flush()
+    return rows
+
+
 def add_identity_filter(query, value,
                         use_ifname=False,
                         use_ipaddress=False,
@@ -215,13 +309,51 @@ def add_filter_by_many_identities(query, model, values):
         raise exception.InvalidIdentity(identity=value)
 
 
+# Eager loading profiles of the objects built from the query results.  Each
+# profile lists the relationship paths walked by the foreign fields of the
+# object, along with the loader used for the first relationship of the path,
+# so that converting a list of rows does not issue one query per row.
+LOAD_PROFILES = {
+    'host': [
+        (joinedload, ('system',)),
+        (joinedload, ('host_upgrade', 'load_software')),
+        (joinedload, ('host_upgrade', 'load_target')),
+    ],
+    'interface': [
+        (joinedload, ('host',)),
+        (joinedload, ('uses',)),
+        (joinedload, ('used_by',)),
+        (joinedload, ('address_modes', 'address_pool')),
+        (joinedload, ('interface_networks',)),
+        (selectinload, ('interface_datanetworks',)),
+    ],
+}
+
+
+def add_load_profile(query, profile, entity, exclude=None):
+    """Add the eager loading options of a profile to a query.
+
+    :param query: the query to update
+    :param profile: name of the profile in LOAD_PROFILES
+    :param entity: mapped class or alias being queried
+    :param exclude: relationships already loaded by the query, i.e. with
+                    contains_eager
+    :returns: the updated query
+    """
+    for loader, path in LOAD_PROFILES[profile]:
+        if exclude and path[0] in exclude:
+            continue
+        attribute = getattr(entity, path[0])
+        option = loader(attribute)
+        for name in path[1:]:
+            attribute = getattr(attribute.property.mapper.class_, name)
+            option = option.joinedload(attribute)
+        query = query.options(option)
+    return query
+
+
 def add_host_options(query):
-    return query. \
-        options(joinedload(models.ihost.system)). \
-        options(joinedload(models.ihost.host_upgrade).
-                joinedload(models.HostUpgrade.load_software)). \
-        options(joinedload(models.ihost.host_upgrade).
-                joinedload(models.HostUpgrade.load_target))
+    return add_load_profile(query, 'host', models.ihost)
 
 
 def add_inode_filter_by_ihost(query, value):
@@ -1130,6 +1262,11 @@ class Connection(api.Connection):
     def get_session(self, autocommit=True):
         return get_session(autocommit)
 
+    def transaction(self):
+        # the sessions of the calls made by the same greenthread join the
+        # transaction of the outermost writer
+        return _session_for_write()
+
     @objects.objectify(objects.system)
     def isystem_create(self, values):
         if not values.get('uuid'):
@@ -1249,6 +1386,21 @@ class Connection(api.Connection):
         return _paginate_query(models.ihost, limit, marker,
                                sort_key, sort_dir, query)
 
+    def ihost_get_columns_list(self, columns, limit=None, marker=None,
+                               sort_key=None, sort_dir=None,
+                               isystem_id=None, personality=None):
+        query = model_query(*[getattr(models.ihost, c) for c in columns])
+        if isystem_id:
+            query = query.filter(models.ihost.forisystemid == isystem_id)
+        else:
+            query = query.filter(models.ihost.recordtype == "standard")
+            if personality:
+                query = query.filter(models.ihost.personality == personality)
+
+        return [dict(zip(columns, row)) for row in
+                _paginate_query(models.ihost, limit, marker,
+                                sort_key, sort_dir, query)]
+
     @objects.objectify(objects.host)
     def ihost_get_by_hostname(self, hostname):
         query = model_query(models.ihost)
@@ -1446,6 +1598,17 @@ class Connection(api.Connection):
 
             return self._node_get(values['uuid'])
 
+    @objects.objectify(objects.node)
+    def inode_create_bulk(self, forihostid, values):
+        for entry in values:
+            entry['forihostid'] = int(forihostid)
+        with _session_for_write() as session:
+            try:
+                return _create_bulk(models.inode, values, session)
+            except db_exc.DBDuplicateEntry:
+                raise exception.NodeAlreadyExists(
+                    uuid=', '.join(v['uuid'] for v in values))
+
     @objects.objectify(objects.node)
     def inode_get_all(self, forihostid=None):
         query = model_query(models.inode, read_deleted="no")
@@ -1538,6 +1701,21 @@ class Connection(api.Connection):
                 raise exception.CPUAlreadyExists(cpu=values['cpu'])
             return self._cpu_get(values['uuid'])
 
+    @objects.objectify(objects.cpu)
+    def icpu_create_bulk(self, forihostid, values):
+        if not utils.is_int_like(forihostid):
+            forihostid = self.ihost_get(forihostid.strip())['id']
+
+        for entry in values:
+            entry['forihostid'] = int(forihostid)
+
+        with _session_for_write() as session:
+            try:
+                return _create_bulk(models.icpu, values, session)
+            except db_exc.DBDuplicateEntry:
+                raise exception.CPUAlreadyExists(
+                    cpu=', '.join(str(v['cpu']) for v in values))
+
     @objects.objectify(objects.cpu)
     def icpu_get_all(self, forihostid=None, forinodeid=None):
         query = model_query(models.icpu, read_deleted="no")
@@ -1655,6 +1833,22 @@ class Connection(api.Connection):
                 raise exception.MemoryAlreadyExists(uuid=values['uuid'])
             return self._memory_get(values['uuid'])
 
+    @objects.objectify(objects.memory)
+    def imemory_create_bulk(self, forihostid, values):
+        if not utils.is_int_like(forihostid):
+            forihostid = self.ihost_get(forihostid.strip())['id']
+
+        for entry in values:
+            entry['forihostid'] = int(forihostid)
+            entry.pop('numa_node', None)
+
+        with _session_for_write() as session:
+            try:
+                return _create_bulk(models.imemory, values, session)
+            except db_exc.DBDuplicateEntry:
+                raise exception.MemoryAlreadyExists(
+                    uuid=', '.join(v['uuid'] for v in values))
+
     @objects.objectify(objects.memory)
     def imemory_get_all(self, forihostid=None, forinodeid=None):
         query = model_query(models.imemory, read_deleted="no")
@@ -1722,6 +1916,15 @@ class Connection(api.Connection):
                 raise exception.ServerNotFound(server=memory_id)
             return query.one()
 
+    @objects.objectify(objects.memory)
+    def imemory_update_bulk(self, values, forihostid=None):
+        for entry in values:
+            entry.pop('numa_node', None)
+
+        filters = {'forihostid': forihostid} if forihostid else {}
+        with _session_for_write() as session:
+            return _update_bulk(models.imemory, values, session, **filters)
+
     def imemory_destroy(self, memory_id):
         with _session_for_write() as session:
             # Delete physically since it has unique columns
@@ -1770,6 +1973,31 @@ class Connection(api.Connection):
                 raise exception.PCIAddrAlreadyExists(pciaddr=values['pciaddr'],
                                                      host=values['host_id'])
 
+    @objects.objectify(objects.pci_device)
+    def pci_device_create_bulk(self, hostid, values):
+        if utils.is_int_like(hostid):
+            host = self.ihost_get(int(hostid))
+        elif utils.is_uuid_like(hostid):
+            host = self.ihost_get(hostid.strip())
+        elif isinstance(hostid, models.ihost):
+            host = hostid
+        else:
+            raise exception.NodeNotFound(node=hostid)
+
+        for entry in values:
+            entry['host_id'] = host['id']
+
+        with _session_for_write() as session:
+            try:
+                return _create_bulk(models.PciDevice, values, session)
+            except db_exc.DBDuplicateEntry:
+                LOG.error("Failed to add pci devices %s on host %s, a device "
+                          "with one of these PCI addresses already exists" %
+                          ([v['pciaddr'] for v in values], host['id']))
+                raise exception.PCIAddrAlreadyExists(
+                    pciaddr=', '.join(v['pciaddr'] for v in values),
+                    host=host['id'])
+
     @objects.objectify(objects.pci_device)
     def pci_device_get_all(self, hostid=None):
         query = model_query(models.PciDevice, read_deleted="no")
@@ -1828,6 +2056,12 @@ class Connection(api.Connection):
 
             return query.one()
 
+    @objects.objectify(objects.pci_device)
+    def pci_device_update_bulk(self, values, hostid=None):
+        filters = {'host_id': hostid} if hostid else {}
+        with _session_for_write() as session:
+            return _update_bulk(models.PciDevice, values, session, **filters)
+
     def pci_device_destroy(self, device_id):
         with _session_for_write() as session:
             if uuidutils.is_uuid_like(device_id):
@@ -2081,8 +2315,12 @@ class Connection(api.Connection):
             query = (query.join(models.ihost,
                                 models.ihost.id == models.Interfaces.forihostid))
             query = query.options(contains_eager(interfaces.host))
+            query = add_load_profile(query, 'interface', interfaces,
+                                     exclude=['host'])
             query, field = add_filter_by_many_identities(
                             query, models.ihost, [forihostid])
+        else:
+            query = add_load_profile(query, 'interface', interfaces)
         return query.all()
 
     def _iinterface_get(self, iinterface_id, ihost=None, network=None):
@@ -2114,6 +2352,7 @@ class Connection(api.Connection):
 
         entity = with_polymorphic(models.Interfaces, '*')
         query = model_query(entity)
+        query = add_load_profile(query, 'interface', entity)
         return _paginate_query(models.Interfaces, limit, marker,
                                sort_key, sort_dir, query)
 
@@ -2149,6 +2388,8 @@ class Connection(api.Connection):
         query = (query.join(models.ihost,
                             models.ihost.id == models.Interfaces.forihostid))
         query = query.options(contains_eager(interfaces.host))
+        query = add_load_profile(query, 'interface', interfaces,
+                                 exclude=['host'])
         query, field = add_filter_by_many_identities(
                             query, models.ihost, [ihost])
 
@@ -2161,6 +2402,7 @@ class Connection(api.Connection):
                                 sort_key=None, sort_dir=None):
         entity = with_polymorphic(models.Interfaces, '*')
         query = model_query(entity)
+        query = add_load_profile(query, 'interface', entity)
         query = query.filter_by(networktype=network)
         return _paginate_query(models.Interfaces, limit, marker,
                                sort_key, sort_dir, query)
@@ -2567,6 +2809,9 @@ class Connection(api.Connection):
             query = query.filter_by(foripvid=foripvid)
         return query.all()
 
+    def idisk_count_by_ihost(self):
+        return _count_by_ihost(models.idisk)
+
     @objects.objectify(objects.disk)
     def idisk_get(self, disk_id, forihostid=None):
         return self._disk_get(disk_id, forihostid)
@@ -2711,6 +2956,16 @@ class Connection(api.Connection):
             query = query.filter_by(foripvid=foripvid)
         return query.all()
 
+    def partition_get_ihost_ids_to_audit(self, statuses):
+        partition = models.partition
+        query = model_query(partition.forihostid, read_deleted="no")
+        query = query.filter(or_(partition.status.in_(statuses),
+                                 partition.start_mib.is_(None),
+                                 partition.start_mib == 0,
+                                 partition.end_mib.is_(None),
+                                 partition.end_mib == 0))
+        return set(row[0] for row in query.distinct())
+
     @objects.objectify(objects.partition)
     def partition_get(self, partition_id, forihostid=None):
         return self._partition_get(partition_id, forihostid)
@@ -3105,6 +3360,13 @@ class Connection(api.Connection):
             query = query.filter_by(forihostid=forihostid)
         return query.all()
 
+    def ilvg_count_by_ihost(self):
+        return _count_by_ihost(models.ilvg)
+
+    def ilvg_get_ihost_ids_not_in_state(self, state):
+        return _ihost_ids_not_in_state(models.ilvg, models.ilvg.vg_state,
+                                       state)
+
     @objects.objectify(objects.lvg)
     def ilvg_get(self, ilvg_id):
         return self._lvg_get(ilvg_id)
@@ -3179,12 +3441,20 @@ class Connection(api.Connection):
             return self._pv_get(values['uuid'])
 
     @objects.objectify(objects.pv)
-    def ipv_get_all(self, forihostid=None):
+    def ipv_get_all(self, forihostid=None, lvm_vg_name=None):
         query = model_query(models.ipv, read_deleted="no")
         if forihostid:
             query = query.filter_by(forihostid=forihostid)
+        if lvm_vg_name:
+            query = query.filter_by(lvm_vg_name=lvm_vg_name)
         return query.all()
 
+    def ipv_count_by_ihost(self):
+        return _count_by_ihost(models.ipv)
+
+    def ipv_get_ihost_ids_not_in_state(self, state):
+        return _ihost_ids_not_in_state(models.ipv, models.ipv.pv_state, state)
+
     @objects.objectify(objects.pv)
     def ipv_get(self, ipv_id):
         return self._pv_get(ipv_id)
@@ -7674,6 +7944,55 @@ class Connection(api.Connection):
         return _paginate_query(models.KubeAppReleases, limit, marker,
                                sort_key, sort_dir, query)
 
+    @objects.objectify(objects.kube_app_images)
+    def kube_app_image_get(self, app_id, image):
+        query = model_query(models.KubeAppImages)
+        query = query.filter(models.KubeAppImages.app_id == app_id,
+                             models.KubeAppImages.image == image)
+        try:
+            result = query.one()
+        except NoResultFound:
+            raise exception.KubeAppImageNotFound(image=image, app_id=app_id)
+        return result
+
+    @objects.objectify(objects.kube_app_images)
+    def kube_app_image_update(self, app_id, image, values):
+        with _session_for_write() as session:
+            query = model_query(models.KubeAppImages, session=session)
+            query = query.filter(models.KubeAppImages.app_id == app_id,
+                                 models.KubeAppImages.image == image)
+
+            count = query.update(values, synchronize_session='fetch')
+            if count == 0:
+                raise exception.KubeAppImageNotFound(image=image,
+                                                     app_id=app_id)
+            return query.one()
+
+    @objects.objectify(objects.kube_app_images)
+    def kube_app_image_create(self, values):
+        app_image = models.KubeAppImages()
+        app_image.update(values)
+        with _session_for_write() as session:
+            try:
+                session.add(app_image)
+                session.flush()
+            except db_exc.DBDuplicateEntry:
+                LOG.error("Failed to add image %s for application %s. "
+                          "Already exists" %
+                          (values['image'], values['app_id']))
+                raise exception.KubeAppImageAlreadyExists(
+                    image=values['image'], app_id=values['app_id'])
+
+            return self.kube_app_image_get(values['app_id'], values['image'])
+
+    @objects.objectify(objects.kube_app_images)
+    def kube_app_image_get_all(self, app_id, status=None):
+        query = model_query(models.KubeAppImages)
+        query = query.filter(models.KubeAppImages.app_id == app_id)
+        if status:
+            query = query.filter(models.KubeAppImages.status == status)
+        return query.all()
+
     def _datanetwork_get(self, model_class, datanetwork_id, obj=None):
         session = None
         if obj:
@@ -7933,3 +8252,37 @@ class Connection(api.Connection):
     @objects.objectify(objects.interface_datanetwork)
     def interface_datanetwork_query(self, values):
         return self._interface_datanetwork_query(values)
+
+    def table_fingerprints_get(self, tables, columns=None):
+        columns = columns or {}
+        fingerprints = {}
+        with _session_for_read() as session:
+            for name in tables:
+                table = models.Base.metadata.tables[name]
+                if name in columns:
+                    # Only the selected columns matter to the caller, so
+                    # updates to any other column must not change the
+                    # fingerprint.
+                    rows = session.query(
+                        *[table.c[c] for c in columns[name]]).order_by(
+                        *table.primary_key.columns).all()
+                    digest = hashlib.md5(
+                        repr([tuple(r) for r in rows]).encode('utf-8'))
+                    fingerprints[name] = (len(rows), digest.hexdigest())
+                    continue
+                if 'updated_at' in table.c:
+                    result = session.query(
+                        func.count(),
+                        func.max(table.c.created_at),
+                        func.max(table.c.updated_at)).select_from(table).one()
+                    fingerprints[name] = tuple(result)
+                    continue
+                # Subclass and association tables carry no timestamps of
+                # their own; an update to one of their columns does not
+                # touch the parent row, so fingerprint the content instead.
+                rows = session.query(table).order_by(
+                    *table.primary_key.columns).all()
+                digest = hashlib.md5(
+                    repr([tuple(r) for r in rows]).encode('utf-8'))
+                fingerprints[name] = (len(rows), digest.hexdigest())
+        return fingerprints
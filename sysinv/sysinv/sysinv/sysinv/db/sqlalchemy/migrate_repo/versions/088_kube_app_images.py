@@ -0,0 +1,53 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright (c) 2019 Wind River Systems, Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+from sqlalchemy import DateTime, String, Integer
+from sqlalchemy import Column, MetaData, Table, ForeignKey, UniqueConstraint
+
+ENGINE = 'InnoDB'
+CHARSET = 'utf8'
+
+
+def upgrade(migrate_engine):
+    """
+       This database upgrade creates a new table for storing the download
+       status of the docker images of kubernetes applications.
+    """
+
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    Table('kube_app', meta, autoload=True)
+
+    # Define and create the kube application images table.
+    kube_app_images = Table(
+        'kube_app_images',
+        meta,
+        Column('created_at', DateTime),
+        Column('updated_at', DateTime),
+        Column('id', Integer, primary_key=True),
+
+        Column('image', String(255), nullable=False),
+        Column('status', String(255), nullable=True),
+        Column('app_id', Integer,
+               ForeignKey('kube_app.id', ondelete='CASCADE')),
+
+        UniqueConstraint('image', 'app_id', name='u_app_image'),
+        mysql_engine=ENGINE,
+        mysql_charset=CHARSET,
+    )
+
+    kube_app_images.create()
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    # As per other openstack components, downgrade is
+    # unsupported in this release.
+    raise NotImplementedError('SysInv database downgrade is unsupported.')
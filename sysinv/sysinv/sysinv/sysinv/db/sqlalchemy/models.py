@@ -1708,6 +1708,7 @@ class KubeApp(Base):
     status = Column(String(255), nullable=False)
     progress = Column(String(255), nullable=True)
     active = Column(Boolean, nullable=False, default=False)
+    chart_timeline = Column(JSONEncodedDict, nullable=True)
     UniqueConstraint('name', 'app_version', name='u_app_name_version')
 
 
@@ -1721,3 +1722,14 @@ class KubeAppReleases(Base):
     app_id = Column(Integer, ForeignKey('kube_app.id', ondelete='CASCADE'))
     kube_app = relationship("KubeApp", lazy="joined", join_depth=1)
     UniqueConstraint('release', 'namespace', 'app_id', name='u_app_release_namespace')
+
+
+class KubeAppImages(Base):
+    __tablename__ = 'kube_app_images'
+
+    id = Column(Integer, primary_key=True)
+    image = Column(String(255), nullable=False)
+    status = Column(String(255), nullable=True)
+    app_id = Column(Integer, ForeignKey('kube_app.id', ondelete='CASCADE'))
+    kube_app = relationship("KubeApp", lazy="joined", join_depth=1)
+    UniqueConstraint('image', 'app_id', name='u_app_image')
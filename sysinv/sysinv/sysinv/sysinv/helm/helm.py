@@ -8,10 +8,10 @@
 
 from __future__ import absolute_import
 
+import copy
 import eventlet
 import os
 import re
-import subprocess
 import tempfile
 import yaml
 
@@ -21,6 +21,7 @@ from sysinv.common import constants
 from sysinv.common import exception
 from sysinv.openstack.common import log as logging
 from sysinv.helm import common
+from sysinv.helm import values
 
 
 LOG = logging.getLogger(__name__)
@@ -31,6 +32,43 @@ LOG = logging.getLogger(__name__)
 # The convention here is for the helm plugins to be named ###_PLUGINNAME.
 HELM_PLUGIN_PREFIX_LENGTH = 4
 
+# Database tables from which the chart plugins derive the system overrides.
+# The cached system overrides are discarded whenever any of these change.
+OVERRIDES_DEPENDENCIES = [
+    'address_pools',
+    'addresses',
+    'ceph_mon',
+    'certificate',
+    'datanetworks',
+    'ethernet_ports',
+    'helm_overrides',
+    'i_host',
+    'i_icpu',
+    'i_system',
+    'interface_datanetworks',
+    'interface_networks',
+    'interfaces',
+    'kube_app',
+    'label',
+    'networks',
+    'pci_devices',
+    'service_parameter',
+    'services',
+    'storage_backend',
+    'storage_ceph',
+    'storage_ceph_external',
+    'storage_tiers',
+]
+
+# The columns read by the chart plugins from tables whose other columns are
+# rewritten continuously (host status and uptime, application apply status,
+# progress and chart timeline), so that these updates keep the cache valid.
+OVERRIDES_DEPENDENCY_COLUMNS = {
+    'i_host': ['id', 'uuid', 'hostname', 'personality', 'subfunctions',
+               'invprovision', 'mgmt_ip'],
+    'kube_app': ['id', 'name', 'app_version', 'active'],
+}
+
 
 def helm_context(func):
     """Decorate to initialize the local threading context"""
@@ -64,6 +102,10 @@ class HelmOperator(object):
         # dict containing sequence of helm charts per app
         self.helm_applications = self.get_helm_applications()
 
+        # system overrides indexed by (app, chart, namespace), along with the
+        # generation of the database content they were computed from
+        self._overrides_cache = {}
+
     def get_helm_applications(self):
         """Build a dictionary of supported helm applications"""
 
@@ -127,13 +169,37 @@ class HelmOperator(object):
             namespaces = self.chart_operators[chart_name].get_namespaces()
         return namespaces
 
+    def invalidate_overrides_cache(self):
+        """Discard all the cached system overrides"""
+        self._overrides_cache = {}
+
+    def _get_overrides_generation(self):
+        """Get the generation of the database content used by the charts
+
+        The generation is read once per helm context and changes whenever a
+        row is added, removed or updated in any of the tables the chart
+        plugins depend on, ignoring the columns that the plugins do not read
+        from the frequently updated host and application tables.
+        """
+        generation = self.context.get('_overrides_generation')
+        if generation is None:
+            fingerprints = self.dbapi.table_fingerprints_get(
+                OVERRIDES_DEPENDENCIES, OVERRIDES_DEPENDENCY_COLUMNS)
+            generation = sorted(fingerprints.items())
+            self.context['_overrides_generation'] = generation
+        return generation
+
     @helm_context
     def get_helm_chart_overrides(self, chart_name, cnamespace=None):
         return self._get_helm_chart_overrides(chart_name, cnamespace)
 
-    def _get_helm_chart_overrides(self, chart_name, cnamespace=None):
+    def _get_helm_chart_overrides(self, chart_name, cnamespace=None,
+                                  app_name=None):
         """Get the overrides for a supported chart.
 
+        The overrides are cached and only recomputed by the chart plugin when
+        the database content they depend on has changed.
+
         This method retrieves overrides for a supported chart. Overrides for
         all supported namespaces will be returned unless a specific namespace
         is requested.
@@ -169,12 +235,26 @@ class HelmOperator(object):
         """
         overrides = {}
         if chart_name in self.chart_operators:
+            generation = None
+            key = (app_name, chart_name, cnamespace)
+            if self.dbapi is not None:
+                generation = self._get_overrides_generation()
+                cached = self._overrides_cache.get(key)
+                if cached and cached[0] == generation:
+                    LOG.debug("Using cached overrides for chart %s" %
+                              chart_name)
+                    return copy.deepcopy(cached[1])
+
             try:
                 overrides.update(
                     self.chart_operators[chart_name].get_overrides(
                         cnamespace))
             except exception.InvalidHelmNamespace:
                 raise
+
+            if generation is not None:
+                self._overrides_cache[key] = (generation,
+                                              copy.deepcopy(overrides))
         return overrides
 
     def get_helm_application_namespaces(self, app_name):
@@ -254,7 +334,8 @@ class HelmOperator(object):
                     overrides.update({chart_name:
                                       self._get_helm_chart_overrides(
                                           chart_name,
-                                          cnamespace)})
+                                          cnamespace,
+                                          app_name)})
                 except exception.InvalidHelmNamespace as e:
                     LOG.info(e)
         return overrides
@@ -327,63 +408,16 @@ class HelmOperator(object):
     def merge_overrides(self, file_overrides=[], set_overrides=[]):
         """ Merge helm overrides together.
 
-        :param values: A dict of different types of user override values,
-                       'files' (which generally specify many overrides) and
-                       'set' (which generally specify one override).
-        """
-
-        # At this point we have potentially two separate types of overrides
-        # specified by system or user, values from files and values passed in
-        # via --set .  We need to ensure that we call helm using the same
-        # mechanisms to ensure the same behaviour.
-        cmd = ['helm', 'install', '--dry-run', '--debug']
+        The values are merged in-process following the same semantics as
+        the helm client: values from files are deep merged in order and the
+        --set values are applied on top of the result.
 
-        # Process the newly-passed-in override values
-        tmpfiles = []
-
-        for value_file in file_overrides:
-            # For values passed in from files, write them back out to
-            # temporary files.
-            tmpfile = tempfile.NamedTemporaryFile(delete=False)
-            tmpfile.write(value_file)
-            tmpfile.close()
-            tmpfiles.append(tmpfile.name)
-            cmd.extend(['--values', tmpfile.name])
-
-        for value_set in set_overrides:
-            cmd.extend(['--set', value_set])
-
-        env = os.environ.copy()
-        env['KUBECONFIG'] = '/etc/kubernetes/admin.conf'
-
-        # Make a temporary directory with a fake chart in it
-        try:
-            tmpdir = tempfile.mkdtemp()
-            chartfile = tmpdir + '/Chart.yaml'
-            with open(chartfile, 'w') as tmpchart:
-                tmpchart.write('name: mychart\napiVersion: v1\n'
-                               'version: 0.1.0\n')
-            cmd.append(tmpdir)
-
-            # Apply changes by calling out to helm to do values merge
-            # using a dummy chart.
-            output = subprocess.check_output(cmd, env=env)
-
-            # Check output for failure
-
-            # Extract the info we want.
-            values = output.split('USER-SUPPLIED VALUES:\n')[1].split(
-                                  '\nCOMPUTED VALUES:')[0]
-        except Exception:
-            raise
-        finally:
-            os.remove(chartfile)
-            os.rmdir(tmpdir)
-
-        for tmpfile in tmpfiles:
-            os.remove(tmpfile)
-
-        return values
+        :param file_overrides: list of yaml documents, in increasing order of
+                               precedence
+        :param set_overrides: list of --set expressions
+        :returns: the merged overrides as a yaml document
+        """
+        return values.merge_overrides(file_overrides, set_overrides)
 
     @helm_context
     def generate_helm_chart_overrides(self, path, chart_name, cnamespace=None):
@@ -0,0 +1,286 @@
+#
+# Copyright (c) 2019 Wind River Systems, Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+"""Helm compatible values merging.
+
+This module reproduces the way the helm client combines the user supplied
+values of a release: the documents passed with --values are deep merged in
+order and the --set expressions are then applied on top of the result.
+Parsing of the --set expressions follows the helm strvals grammar:
+
+    name=value                  scalar value
+    outer.inner=value           nested maps
+    name={a,b,c}                list value
+    name[0]=value               list index
+    name[0].inner=value         map inside a list
+    a=1,b=2                     multiple assignments
+    name\\.with\\.dots=value      escaped key separators
+    name=a\\,b                   escaped value separator
+
+Values of --set expressions are typed: true/false become booleans, null
+becomes None and decimal integers not starting with 0 become integers.
+A null value is kept in the merged values, which makes helm remove the
+corresponding key from the chart defaults when the release is installed.
+"""
+
+import re
+import yaml
+
+from sysinv.common import exception
+
+INTEGER_RE = re.compile(r'^[+-]?[0-9]+$')
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+
+def merge_values(dest, src):
+    """Deep merge the src values into dest, preferring the src values.
+
+    Maps present on both sides are merged recursively; any other value from
+    src replaces the value found in dest.
+
+    :param dest: dict of values updated in place
+    :param src: dict of values to merge
+    :returns: the dest dict
+    """
+    for key, value in src.items():
+        if (key in dest and isinstance(value, dict) and
+                isinstance(dest[key], dict)):
+            dest[key] = merge_values(dest[key], value)
+        else:
+            dest[key] = value
+    return dest
+
+
+class _EndOfInput(Exception):
+    pass
+
+
+class _NotAList(Exception):
+    pass
+
+
+class _SetParser(object):
+    """Parser of a single helm --set expression."""
+
+    def __init__(self, expression):
+        self._data = expression
+        self._pos = 0
+
+    def _read(self):
+        if self._pos >= len(self._data):
+            raise _EndOfInput()
+        char = self._data[self._pos]
+        self._pos += 1
+        return char
+
+    def _unread(self):
+        self._pos -= 1
+
+    def _until(self, stop):
+        """Read up to one of the stop characters, handling escapes.
+
+        :returns: tuple of the characters read and the stop character, which
+                  is None if the end of the expression was reached.
+        """
+        chars = []
+        while True:
+            try:
+                char = self._read()
+            except _EndOfInput:
+                return ''.join(chars), None
+            if char in stop:
+                return ''.join(chars), char
+            if char == '\\':
+                try:
+                    chars.append(self._read())
+                except _EndOfInput:
+                    return ''.join(chars), None
+            else:
+                chars.append(char)
+
+    @staticmethod
+    def _typed(value):
+        lowered = value.lower()
+        if lowered == 'true':
+            return True
+        if lowered == 'false':
+            return False
+        if lowered == 'null':
+            return None
+        if value == '0':
+            return 0
+        if value and value[0] != '0' and INTEGER_RE.match(value):
+            number = int(value)
+            if INT64_MIN <= number <= INT64_MAX:
+                return number
+        return value
+
+    def _error(self, reason):
+        return exception.InvalidHelmOverrides(
+            reason="failed parsing --set data %s: %s" % (self._data, reason))
+
+    def parse(self, data):
+        while self._pos < len(self._data):
+            if not self._key(data):
+                break
+        return data
+
+    def _value_list(self):
+        char = self._read()
+        if char != '{':
+            self._unread()
+            raise _NotAList()
+
+        values = []
+        while True:
+            chars, last = self._until(',}')
+            if last is None:
+                raise self._error("list must terminate with '}'")
+            values.append(self._typed(chars))
+            if last == '}':
+                # consume the separator following the list, if any
+                try:
+                    if self._read() != ',':
+                        self._unread()
+                except _EndOfInput:
+                    pass
+                return values
+
+    def _assign(self):
+        """Read the value of an assignment.
+
+        :returns: tuple of the value and whether more input follows
+        """
+        try:
+            return self._value_list(), self._pos < len(self._data)
+        except _EndOfInput:
+            return '', False
+        except _NotAList:
+            chars, last = self._until(',')
+            return self._typed(chars), last is not None
+
+    def _index(self):
+        chars, last = self._until(']')
+        if last is None:
+            raise self._error("missing ']' in list index")
+        try:
+            index = int(chars)
+        except ValueError:
+            raise self._error("invalid list index %s" % chars)
+        if index < 0:
+            raise self._error("negative %d index not allowed" % index)
+        return index
+
+    @staticmethod
+    def _set_index(values, index, value):
+        if len(values) <= index:
+            values.extend([None] * (index + 1 - len(values)))
+        values[index] = value
+        return values
+
+    def _key(self, data):
+        """Parse one key path and its value into data.
+
+        :returns: whether more assignments follow
+        """
+        key, last = self._until('=[,.')
+        if last is None:
+            if key:
+                raise self._error("key %s has no value" % key)
+            return False
+
+        if last == '=':
+            value, more = self._assign()
+            if key:
+                data[key] = value
+            return more
+
+        if last == ',':
+            raise self._error("key %s has no value (cannot end with ,)" % key)
+
+        if last == '.':
+            inner = data.get(key)
+            if not isinstance(inner, dict):
+                inner = {}
+            more = self._key(inner)
+            if not inner:
+                raise self._error("key map %s has no value" % key)
+            data[key] = inner
+            return more
+
+        # list index
+        values = data.get(key)
+        if not isinstance(values, list):
+            values = []
+        values, more = self._list_item(values, self._index())
+        data[key] = values
+        return more
+
+    def _list_item(self, values, index):
+        chars, last = self._until('[.=')
+        if chars:
+            raise self._error("unexpected data at end of array index: %s" %
+                              chars)
+        if last is None:
+            raise self._error("list index %d has no value" % index)
+
+        if last == '=':
+            value, more = self._assign()
+            return self._set_index(values, index, value), more
+
+        if last == '[':
+            inner = values[index] if len(values) > index else None
+            if not isinstance(inner, list):
+                inner = []
+            inner, more = self._list_item(inner, self._index())
+            return self._set_index(values, index, inner), more
+
+        # nested map within the list
+        inner = values[index] if len(values) > index else None
+        if not isinstance(inner, dict):
+            inner = {}
+        more = self._key(inner)
+        return self._set_index(values, index, inner), more
+
+
+def parse_set_into(expression, data):
+    """Apply a helm --set expression to a dict of values.
+
+    :param expression: the --set expression
+    :param data: dict of values updated in place
+    :returns: the data dict
+    """
+    return _SetParser(expression).parse(data)
+
+
+def merge_overrides(file_overrides=None, set_overrides=None):
+    """Merge helm overrides the same way as the helm client.
+
+    :param file_overrides: list of yaml documents, as passed with --values,
+                           in increasing order of precedence
+    :param set_overrides: list of --set expressions
+    :returns: the merged values as a yaml document
+    """
+    values = {}
+    for content in file_overrides or []:
+        try:
+            document = yaml.safe_load(content) if content else None
+        except yaml.YAMLError as e:
+            raise exception.InvalidHelmOverrides(
+                reason="failed to parse values: %s" % e)
+        if document is None:
+            continue
+        if not isinstance(document, dict):
+            raise exception.InvalidHelmOverrides(
+                reason="values must be a map, got: %s" %
+                       type(document).__name__)
+        values = merge_values(values, document)
+
+    for expression in set_overrides or []:
+        parse_set_into(expression, values)
+
+    return yaml.safe_dump(values, default_flow_style=False)
@@ -38,6 +38,7 @@ from sysinv.objects import host
 from sysinv.objects import host_upgrade
 from sysinv.objects import kube_app
 from sysinv.objects import kube_app_releases
+from sysinv.objects import kube_app_images
 from sysinv.objects import interface
 from sysinv.objects import interface_ae
 from sysinv.objects import interface_ethernet
@@ -184,6 +185,7 @@ helm_overrides = helm_overrides.HelmOverrides
 label = label.Label
 kube_app = kube_app.KubeApp
 kube_app_releases = kube_app_releases.KubeAppReleases
+kube_app_images = kube_app_images.KubeAppImages
 datanetwork = datanetwork.DataNetwork
 
 __all__ = (system,
@@ -252,6 +254,7 @@ __all__ = (system,
            helm_overrides,
            kube_app,
            kube_app_releases,
+           kube_app_images,
            datanetwork,
            interface_network,
            # alias objects for RPC compatibility
@@ -33,6 +33,9 @@ from sysinv.openstack.common.rpc import serializer as rpc_serializer
 
 LOG = logging.getLogger('object')
 
+# Marker for an object field that has not been set
+_NOT_SET = object()
+
 
 def get_attrname(name):
     """Return the mangled name of the attribute's underlying storage."""
@@ -264,6 +267,26 @@ class SysinvObject(object):
         raise exception.IncompatibleObjectVersion(objname=objname,
                                                   objver=objver)
 
+    @classmethod
+    def _obj_field_codecs(cls):
+        """Return the (de)serialization codecs of the fields of this class.
+
+        The codecs are looked up once per class and map each field name to
+        a tuple of its storage attribute name, its type function and its
+        _attr_<field>_to_primitive and _attr_<field>_from_primitive
+        handlers, or None where the value is used as-is.
+        """
+        codecs = cls.__dict__.get('_obj_codecs')
+        if codecs is None:
+            codecs = {}
+            for name, typefn in cls.fields.items():
+                codecs[name] = (
+                    get_attrname(name), typefn,
+                    getattr(cls, '_attr_%s_to_primitive' % name, None),
+                    getattr(cls, '_attr_%s_from_primitive' % name, None))
+            cls._obj_codecs = codecs
+        return codecs
+
     _attr_created_at_from_primitive = obj_utils.dt_deserializer
     _attr_updated_at_from_primitive = obj_utils.dt_deserializer
 
@@ -297,10 +320,19 @@ class SysinvObject(object):
         objclass = cls.obj_class_from_name(objname, objver)
         self = objclass()
         self._context = context
-        for name in self.fields:
-            if name in objdata:
-                setattr(self, name,
-                        self._attr_from_primitive(name, objdata[name]))
+        codecs = objclass._obj_field_codecs()
+        for name, value in objdata.items():
+            codec = codecs.get(name)
+            if codec is None:
+                continue
+            attrname, typefn, _to_primitive, from_primitive = codec
+            if from_primitive is not None:
+                value = from_primitive(self, value)
+            try:
+                setattr(self, attrname, typefn(value))
+            except Exception:
+                # Go through the property setter to log the failure
+                setattr(self, name, value)
         changes = primitive.get('sysinv_object.changes', [])
         self._changed_fields = set([x for x in changes if x in self.fields])
         return self
@@ -327,9 +359,14 @@ class SysinvObject(object):
         This calls self._attr_to_primitive() for each item in fields.
         """
         primitive = dict()
-        for name in self.fields:
-            if hasattr(self, get_attrname(name)):
-                primitive[name] = self._attr_to_primitive(name)
+        for name, codec in self._obj_field_codecs().items():
+            attrname, _typefn, to_primitive, _from_primitive = codec
+            value = getattr(self, attrname, _NOT_SET)
+            if value is _NOT_SET:
+                continue
+            if to_primitive is not None:
+                value = to_primitive(self)
+            primitive[name] = value
         obj = {'sysinv_object.name': self.obj_name(),
                'sysinv_object.namespace': 'sysinv',
                'sysinv_object.version': self.version,
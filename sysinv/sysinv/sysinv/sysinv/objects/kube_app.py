@@ -13,7 +13,8 @@ from sysinv.objects import utils
 
 class KubeApp(base.SysinvObject):
     # VERSION 1.0: Initial version
-    VERSION = '1.0'
+    # VERSION 1.1: Added chart_timeline
+    VERSION = '1.1'
 
     dbapi = db_api.get_instance()
 
@@ -25,6 +26,7 @@ class KubeApp(base.SysinvObject):
               'status': utils.str_or_none,
               'progress': utils.str_or_none,
               'active': utils.bool_or_none,
+              'chart_timeline': utils.dict_or_none,
               }
 
     @base.remotable_classmethod
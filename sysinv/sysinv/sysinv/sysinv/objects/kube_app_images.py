@@ -0,0 +1,34 @@
+#
+# Copyright (c) 2019 Wind River Systems, Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# coding=utf-8
+#
+
+from sysinv.db import api as db_api
+from sysinv.objects import base
+from sysinv.objects import utils
+
+
+class KubeAppImages(base.SysinvObject):
+    # VERSION 1.0: Initial version
+    VERSION = '1.0'
+
+    dbapi = db_api.get_instance()
+
+    fields = {'id': int,
+              'image': utils.str_or_none,
+              'status': utils.str_or_none,
+
+              'app_id': int,
+              }
+
+    @base.remotable_classmethod
+    def get_by_id(cls, context, app_id, image):
+        return cls.dbapi.kube_app_image_get(app_id, image)
+
+    def save_changes(self, context, updates):
+        self.dbapi.kube_app_image_update(self.app_id, self.image, updates)
@@ -14,8 +14,11 @@
 #    under the License.
 
 import datetime
+import random
 import time
 
+import eventlet
+from eventlet import greenthread
 from oslo_config import cfg
 import six
 
@@ -60,6 +63,11 @@ def periodic_task(*args, **kwargs):
            run_immediately is omitted or set to 'False', the first time the
            task runs will be approximately N seconds after the task scheduler
            starts.
+
+        3. With the optional 'timeout=T' and 'jitter=J' arguments: a run is
+           aborted after T seconds and each interval is stretched by a random
+           amount of up to J times the spacing, so that tasks sharing the same
+           spacing drift apart.
     """
     def decorator(f):
         # Test for old style invocation
@@ -77,6 +85,8 @@ def periodic_task(*args, **kwargs):
         # Control frequency
         f._periodic_spacing = kwargs.pop('spacing', 0)
         f._periodic_immediate = kwargs.pop('run_immediately', False)
+        f._periodic_timeout = kwargs.pop('timeout', None)
+        f._periodic_jitter = kwargs.pop('jitter', 0)
         if f._periodic_immediate:
             f._periodic_last_run = None
         else:
@@ -125,6 +135,16 @@ class _PeriodicTasksMeta(type):
         except AttributeError:
             cls._periodic_spacing = {}
 
+        try:
+            cls._periodic_timeout = cls._periodic_timeout.copy()
+        except AttributeError:
+            cls._periodic_timeout = {}
+
+        try:
+            cls._periodic_jitter = cls._periodic_jitter.copy()
+        except AttributeError:
+            cls._periodic_jitter = {}
+
         for value in cls.__dict__.values():
             if getattr(value, '_periodic_task', False):
                 task = value
@@ -149,13 +169,104 @@ class _PeriodicTasksMeta(type):
                 cls._periodic_tasks.append((name, task))
                 cls._periodic_spacing[name] = task._periodic_spacing
                 cls._periodic_last_run[name] = task._periodic_last_run
+                cls._periodic_timeout[name] = task._periodic_timeout
+                cls._periodic_jitter[name] = task._periodic_jitter
 
 
 @six.add_metaclass(_PeriodicTasksMeta)
 class PeriodicTasks(object):
 
+    # When set, each due task is spawned in its own green thread instead of
+    # being run inline, so that a slow task does not delay the others.
+    _periodic_concurrent = False
+
+    def _periodic_task_state(self):
+        """Return the per-instance scheduler state, creating it on demand."""
+        try:
+            return self._periodic_state
+        except AttributeError:
+            self._periodic_state = {'running': {},
+                                    'jitter': {},
+                                    'stats': {}}
+            return self._periodic_state
+
+    def _periodic_task_stats(self, task_name):
+        stats = self._periodic_task_state()['stats']
+        if task_name not in stats:
+            stats[task_name] = {'runs': 0,
+                                'failures': 0,
+                                'timeouts': 0,
+                                'skipped': 0,
+                                'overruns': 0,
+                                'last_run': None,
+                                'last_duration': None,
+                                'max_duration': 0.0,
+                                'total_duration': 0.0}
+        return stats[task_name]
+
+    def periodic_task_stats(self):
+        """Return the run statistics of every periodic task, keyed by name.
+
+        'skipped' counts the runs dropped because the previous one was still
+        in progress and 'overruns' the runs that lasted longer than the task
+        spacing.
+        """
+        running = self._periodic_task_state()['running']
+        result = {}
+        for task_name, task in self._periodic_tasks:
+            stats = dict(self._periodic_task_stats(task_name))
+            if stats['last_run'] is not None:
+                stats['last_run'] = timeutils.isotime(stats['last_run'])
+            stats['running'] = task_name in running
+            stats['spacing'] = self._periodic_spacing[task_name]
+            stats['timeout'] = self._periodic_timeout[task_name]
+            result[task_name] = stats
+        return result
+
+    def _run_periodic_task(self, context, task_name, task, raise_on_error):
+        full_task_name = '.'.join([self.__class__.__name__, task_name])
+        stats = self._periodic_task_stats(task_name)
+        timeout = self._periodic_timeout[task_name]
+        start = time.time()
+        stats['last_run'] = timeutils.utcnow()
+        try:
+            with eventlet.Timeout(timeout):
+                task(self, context)
+        except eventlet.Timeout:
+            stats['timeouts'] += 1
+            LOG.error(_("Periodic task %(full_task_name)s timed out after "
+                        "%(timeout)s seconds"),
+                      {"full_task_name": full_task_name, "timeout": timeout})
+        except Exception as e:
+            stats['failures'] += 1
+            if raise_on_error:
+                raise
+            LOG.exception(_("Error during %(full_task_name)s: %(e)s"),
+                          {"full_task_name": full_task_name, "e": e})
+        finally:
+            duration = time.time() - start
+            stats['runs'] += 1
+            stats['last_duration'] = duration
+            stats['max_duration'] = max(stats['max_duration'], duration)
+            stats['total_duration'] += duration
+            spacing = self._periodic_spacing[task_name]
+            if spacing is not None and duration > spacing:
+                stats['overruns'] += 1
+                LOG.warning(_("Periodic task %(full_task_name)s took "
+                              "%(duration).1f seconds, longer than its "
+                              "%(spacing)s second spacing"),
+                            {"full_task_name": full_task_name,
+                             "duration": duration, "spacing": spacing})
+            self._periodic_task_state()['running'].pop(task_name, None)
+
     def run_periodic_tasks(self, context, raise_on_error=False):
-        """Tasks to be run at a periodic interval."""
+        """Tasks to be run at a periodic interval.
+
+        With a concurrent scheduler each due task is started in its own green
+        thread and a task whose previous run has not finished is skipped;
+        raise_on_error is then ignored since failures happen asynchronously.
+        """
+        state = self._periodic_task_state()
         idle_for = DEFAULT_INTERVAL
         for task_name, task in self._periodic_tasks:
             full_task_name = '.'.join([self.__class__.__name__, task_name])
@@ -166,7 +277,8 @@ class PeriodicTasks(object):
 
             # If a periodic task is _nearly_ due, then we'll run it early
             if spacing is not None and last_run is not None:
-                due = last_run + datetime.timedelta(seconds=spacing)
+                due = last_run + datetime.timedelta(
+                    seconds=spacing + state['jitter'].get(task_name, 0))
                 if not timeutils.is_soon(due, 0.2):
                     idle_for = min(idle_for, timeutils.delta_seconds(now, due))
                     continue
@@ -174,17 +286,27 @@ class PeriodicTasks(object):
             if spacing is not None:
                 idle_for = min(idle_for, spacing)
 
+            if self._periodic_concurrent and task_name in state['running']:
+                self._periodic_task_stats(task_name)['skipped'] += 1
+                LOG.warning(_("Skipping periodic task %(full_task_name)s "
+                              "because its previous run is still in "
+                              "progress"),
+                            {"full_task_name": full_task_name})
+                continue
+
             LOG.debug(_("Running periodic task %(full_task_name)s"),
                       {"full_task_name": full_task_name})
             self._periodic_last_run[task_name] = timeutils.utcnow()
-
-            try:
-                task(self, context)
-            except Exception as e:
-                if raise_on_error:
-                    raise
-                LOG.exception(_("Error during %(full_task_name)s: %(e)s"),
-                              {"full_task_name": full_task_name, "e": e})
+            if spacing is not None and self._periodic_jitter[task_name]:
+                state['jitter'][task_name] = random.uniform(
+                    0, spacing * self._periodic_jitter[task_name])
+
+            if self._periodic_concurrent:
+                state['running'][task_name] = greenthread.spawn(
+                    self._run_periodic_task, context, task_name, task, False)
+            else:
+                self._run_periodic_task(context, task_name, task,
+                                        raise_on_error)
             time.sleep(0)
 
         return idle_for
@@ -69,6 +69,13 @@ rpc_opts = [
     cfg.StrOpt('control_exchange',
                default='openstack',
                help='AMQP exchange to connect to if using RabbitMQ or Qpid'),
+    cfg.DictOpt('rpc_payload_codecs',
+                default={},
+                help='Payload codec, per topic, with which the servers of '
+                     'that topic are asked to encode their replies, e.g. '
+                     'sysinv.conductor_manager:msgpack. Requests are always '
+                     'JSON encoded and servers that do not support the codec '
+                     'reply in JSON.'),
 ]
 
 CONF = cfg.CONF
@@ -225,10 +225,11 @@ class ReplyProxy(ConnectionContext):
 
 
 def msg_reply(conf, msg_id, reply_q, connection_pool, reply=None,
-              failure=None, ending=False, log_failure=True):
+              failure=None, ending=False, log_failure=True, codec=None):
     """Sends a reply or an error on the channel signified by msg_id.
 
-    Failure should be a sys.exc_info() tuple.
+    Failure should be a sys.exc_info() tuple. The reply is encoded with
+    the payload codec requested by the caller, if any.
 
     """
     with ConnectionContext(conf, connection_pool) as conn:
@@ -250,9 +251,9 @@ def msg_reply(conf, msg_id, reply_q, connection_pool, reply=None,
         # Otherwise use the msg_id for backward compatibilty.
         if reply_q:
             msg['_msg_id'] = msg_id
-            conn.direct_send(reply_q, rpc_common.serialize_msg(msg))
+            conn.direct_send(reply_q, rpc_common.serialize_msg(msg, codec))
         else:
-            conn.direct_send(msg_id, rpc_common.serialize_msg(msg))
+            conn.direct_send(msg_id, rpc_common.serialize_msg(msg, codec))
 
 
 class RpcContext(rpc_common.CommonRpcContext):
@@ -260,6 +261,7 @@ class RpcContext(rpc_common.CommonRpcContext):
     def __init__(self, **kwargs):
         self.msg_id = kwargs.pop('msg_id', None)
         self.reply_q = kwargs.pop('reply_q', None)
+        self.reply_codec = kwargs.pop('reply_codec', None)
         self.conf = kwargs.pop('conf')
         super(RpcContext, self).__init__(**kwargs)
 
@@ -268,13 +270,14 @@ class RpcContext(rpc_common.CommonRpcContext):
         values['conf'] = self.conf
         values['msg_id'] = self.msg_id
         values['reply_q'] = self.reply_q
+        values['reply_codec'] = self.reply_codec
         return self.__class__(**values)
 
     def reply(self, reply=None, failure=None, ending=False,
               connection_pool=None, log_failure=True):
         if self.msg_id:
             msg_reply(self.conf, self.msg_id, self.reply_q, connection_pool,
-                      reply, failure, ending, log_failure)
+                      reply, failure, ending, log_failure, self.reply_codec)
             if ending:
                 self.msg_id = None
 
@@ -291,6 +294,9 @@ def unpack_context(conf, msg):
             context_dict[key[9:]] = value
     context_dict['msg_id'] = msg.pop('_msg_id', None)
     context_dict['reply_q'] = msg.pop('_reply_q', None)
+    reply_codec = msg.pop('_reply_codec', None)
+    if reply_codec and rpc_common.payload_codec_supported(reply_codec):
+        context_dict['reply_codec'] = reply_codec
     context_dict['conf'] = conf
     ctx = RpcContext.from_dict(context_dict)
     rpc_common._safe_log(LOG.debug, _('unpacked context: %s'), ctx.to_dict())
@@ -593,6 +599,12 @@ def multicall(conf, context, topic, msg, timeout, connection_pool):
     msg_id = uuid.uuid4().hex
     msg.update({'_msg_id': msg_id})
     LOG.debug(_('MSG_ID is %s') % (msg_id))
+    # Ask the server to reply with the codec configured for the topic.
+    # Older servers ignore the request and reply in JSON, which is always
+    # understood.
+    reply_codec = rpc_common.get_payload_codec(conf, topic)
+    if reply_codec:
+        msg['_reply_codec'] = reply_codec
     _add_unique_id(msg)
     pack_context(msg, context)
 
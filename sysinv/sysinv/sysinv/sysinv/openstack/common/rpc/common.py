@@ -17,6 +17,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
 import copy
 import sys
 import traceback
@@ -30,6 +31,11 @@ from sysinv.openstack.common import jsonutils
 from sysinv.openstack.common import local
 from sysinv.openstack.common import log as logging
 
+try:
+    from oslo_serialization import msgpackutils
+except ImportError:
+    msgpackutils = None
+
 
 CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
@@ -54,6 +60,18 @@ The current message format (version 2.0) is very simple.  It is:
         'oslo.message': <Application Message Payload, JSON encoded>
     }
 
+Version 2.1 adds an optional payload codec.  Messages encoded with a codec
+other than JSON are sent as:
+
+    {
+        'oslo.version': '2.1',
+        'oslo.codec': <Name of the payload codec, e.g. 'msgpack'>,
+        'oslo.message': <Application Message Payload, codec encoded>
+    }
+
+JSON encoded messages are still sent with version 2.0 so that they are
+understood by endpoints that only implement 2.0.
+
 Message format version '1.0' is just considered to be the messages we sent
 without a message envelope.
 
@@ -65,10 +83,12 @@ We will JSON encode the application message payload.  The message envelope,
 which includes the JSON encoded application message body, will be passed down
 to the messaging libraries as a dict.
 '''
-_RPC_ENVELOPE_VERSION = '2.0'
+_RPC_ENVELOPE_VERSION = '2.1'
+_RPC_ENVELOPE_JSON_VERSION = '2.0'
 
 _VERSION_KEY = 'oslo.version'
 _MESSAGE_KEY = 'oslo.message'
+_CODEC_KEY = 'oslo.codec'
 
 
 class RPCException(Exception):
@@ -158,6 +178,11 @@ class UnsupportedRpcEnvelopeVersion(RPCException):
                 "not supported by this endpoint.")
 
 
+class UnsupportedRpcPayloadCodec(RPCException):
+    message = _("Specified RPC payload codec, %(codec)s, "
+                "not supported by this endpoint.")
+
+
 class RpcVersionCapError(RPCException):
     message = _("Specified RPC version cap, %(version_cap)s, is too low")
 
@@ -472,10 +497,74 @@ def version_is_compatible(imp_version, version):
     return True
 
 
-def serialize_msg(raw_msg):
+def _msgpack_dumps(raw_msg):
+    # The envelope itself is JSON encoded by the messaging libraries, so the
+    # binary payload is carried as base64 text.
+    return base64.b64encode(msgpackutils.dumps(raw_msg)).decode('ascii')
+
+
+def _msgpack_loads(payload):
+    return msgpackutils.loads(base64.b64decode(payload))
+
+
+_PAYLOAD_CODECS = {'json': (jsonutils.dumps, jsonutils.loads)}
+if msgpackutils is not None:
+    # NOTE: msgpackutils preserves datetime, UUID and netaddr values instead
+    # of converting them to strings like the JSON codec does.
+    _PAYLOAD_CODECS['msgpack'] = (_msgpack_dumps, _msgpack_loads)
+
+
+def register_payload_codec(name, dumps, loads):
+    """Register a payload codec.
+
+    :param name: The name of the codec, as carried in the message envelope.
+    :param dumps: Function encoding a message payload to a string.
+    :param loads: Function decoding a string to a message payload.
+    """
+    _PAYLOAD_CODECS[name] = (dumps, loads)
+
+
+def payload_codec_supported(codec):
+    """Return whether the named payload codec is available."""
+    return codec in _PAYLOAD_CODECS
+
+
+def get_payload_codec(conf, topic):
+    """Return the payload codec configured for a topic, if available.
+
+    A topic directed at a specific server (<topic>.<host>) uses the codec
+    of its base topic.
+    """
+    codecs = conf.rpc_payload_codecs
+    if not codecs:
+        return None
+    codec = codecs.get(topic)
+    if codec is None and '.' in topic:
+        codec = codecs.get(topic.rsplit('.', 1)[0])
+    if codec is None or not payload_codec_supported(codec):
+        return None
+    return codec
+
+
+def serialize_msg(raw_msg, codec=None):
     # NOTE(russellb) See the docstring for _RPC_ENVELOPE_VERSION for more
     # information about this format.
-    msg = {_VERSION_KEY: _RPC_ENVELOPE_VERSION,
+    if codec is not None and codec != 'json':
+        try:
+            dumps = _PAYLOAD_CODECS[codec][0]
+        except KeyError:
+            raise UnsupportedRpcPayloadCodec(codec=codec)
+        try:
+            return {_VERSION_KEY: _RPC_ENVELOPE_VERSION,
+                    _CODEC_KEY: codec,
+                    _MESSAGE_KEY: dumps(raw_msg)}
+        except (TypeError, ValueError) as e:
+            # Values the codec cannot encode are left to the JSON codec,
+            # which falls back to their string representation.
+            LOG.debug(_('Falling back to JSON, payload not encodable with '
+                        '%(codec)s: %(e)s'), {'codec': codec, 'e': e})
+
+    msg = {_VERSION_KEY: _RPC_ENVELOPE_JSON_VERSION,
            _MESSAGE_KEY: jsonutils.dumps(raw_msg)}
 
     return msg
@@ -520,6 +609,11 @@ def deserialize_msg(msg):
     if not version_is_compatible(_RPC_ENVELOPE_VERSION, msg[_VERSION_KEY]):
         raise UnsupportedRpcEnvelopeVersion(version=msg[_VERSION_KEY])
 
-    raw_msg = jsonutils.loads(msg[_MESSAGE_KEY])
+    codec = msg.get(_CODEC_KEY, 'json')
+    try:
+        loads = _PAYLOAD_CODECS[codec][1]
+    except KeyError:
+        raise UnsupportedRpcPayloadCodec(codec=codec)
+    raw_msg = loads(msg[_MESSAGE_KEY])
 
     return raw_msg
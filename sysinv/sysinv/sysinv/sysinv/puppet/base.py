@@ -32,6 +32,12 @@ class BasePuppet(object):
         'dcorch'
     ]
 
+    # Database tables read by get_host_config() in addition to the host
+    # itself.  None indicates that the dependencies are not known and that
+    # the host configuration must always be regenerated.  Plugins that
+    # populate context data used by other plugins must leave this unset.
+    HOST_DEPENDENCIES = None
+
     def __init__(self, operator):
         self._operator = operator
 
@@ -161,6 +167,28 @@ class BasePuppet(object):
         system = self._get_system()
         return system.capabilities.get('shared_services', [])
 
+    def _get_network_by_type(self, networktype):
+        """
+        Retrieve a network entry by type, from the system snapshot if present
+        """
+        networks = self.context.get('_networks')
+        if networks is None:
+            return self.dbapi.network_get_by_type(networktype)
+
+        network = networks.get(networktype)
+        if network is None:
+            raise exception.NetworkTypeNotFound(type=networktype)
+        return network
+
+    def _get_address_pool(self, pool_uuid):
+        """
+        Retrieve an address pool entry, from the system snapshot if present
+        """
+        pools = self.context.get('_address_pools')
+        if pools is None or pool_uuid not in pools:
+            return self.dbapi.address_pool_get(pool_uuid)
+        return pools[pool_uuid]
+
     def _get_address_by_name(self, name, networktype):
         """
         Retrieve an address entry by name and scoped by network type
@@ -225,6 +253,11 @@ class BasePuppet(object):
         service_parameters = []
         if self.dbapi is None:
             return service_parameters
+
+        snapshot = self.context.get('_service_parameters')
+        if snapshot is not None:
+            return [p for p in snapshot
+                    if service is None or p['service'] == service]
         try:
             service_parameters = self.dbapi.service_parameter_get_all(
                 service=service)
@@ -13,6 +13,8 @@ from sysinv.puppet import base
 class DevicePuppet(base.BasePuppet):
     """Class to encapsulate puppet operations for device configuration"""
 
+    HOST_DEPENDENCIES = ('pci_devices',)
+
     def _get_device_id_index(self, host):
         """
         Builds a dictionary of device lists indexed by device id.
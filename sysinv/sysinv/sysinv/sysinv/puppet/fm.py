@@ -11,6 +11,8 @@ from sysinv.puppet import openstack
 class FmPuppet(openstack.OpenstackBasePuppet):
     """Class to encapsulate puppet operations for fm configuration"""
 
+    HOST_DEPENDENCIES = ()
+
     SERVICE_NAME = 'fm'
     SERVICE_PORT = 18002
     BOOTSTRAP_MGMT_IP = '127.0.0.1'
@@ -128,11 +128,11 @@ class KubernetesPuppet(base.BasePuppet):
 
     def _get_network_config(self, networktype):
         try:
-            network = self.dbapi.network_get_by_type(networktype)
+            network = self._get_network_by_type(networktype)
         except exception.NetworkTypeNotFound:
             # network not configured
             return {}
-        address_pool = self.dbapi.address_pool_get(network.pool_uuid)
+        address_pool = self._get_address_pool(network.pool_uuid)
         subnet = str(address_pool.network) + '/' + str(address_pool.prefix)
         return subnet
 
@@ -13,6 +13,9 @@ from sysinv.puppet import base
 
 class LdapPuppet(base.BasePuppet):
     """Class to encapsulate puppet operations for ldap configuration"""
+
+    HOST_DEPENDENCIES = ('i_system', 'services', 'networks', 'address_pools')
+
     SERVICE_NAME = 'open-ldap'
 
     def get_secure_static_config(self):
@@ -45,9 +48,9 @@ class LdapPuppet(base.BasePuppet):
             # Note: During bootstrap, sysinv db is not yet populated
             # and hence local ldapserver will be configured.
             # It will be then disabled when controller manifests are applied.
-            sys_controller_network = self.dbapi.network_get_by_type(
+            sys_controller_network = self._get_network_by_type(
                 constants.NETWORK_TYPE_SYSTEM_CONTROLLER)
-            sys_controller_network_addr_pool = self.dbapi.address_pool_get(
+            sys_controller_network_addr_pool = self._get_address_pool(
                 sys_controller_network.pool_uuid)
             ldapserver_remote = True
             ldapserver_addr = sys_controller_network_addr_pool.floating_address
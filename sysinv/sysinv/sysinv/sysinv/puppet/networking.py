@@ -16,6 +16,17 @@ from sysinv.puppet import interface
 class NetworkingPuppet(base.BasePuppet):
     """Class to encapsulate puppet operations for networking configuration"""
 
+    # Tables read by the interface context the host config is built from,
+    # including the interface subclass and association tables that are not
+    # reflected in the interfaces table timestamps.
+    HOST_DEPENDENCIES = (
+        'networks', 'address_pools', 'address_pool_ranges', 'addresses',
+        'address_modes', 'routes', 'interfaces', 'ethernet_interfaces',
+        'ae_interfaces', 'vlan_interfaces', 'virtual_interfaces',
+        'interfaces_to_interfaces', 'interface_networks',
+        'interface_datanetworks', 'datanetworks', 'datanetworks_flat',
+        'datanetworks_vlan', 'datanetworks_vxlan', 'ethernet_ports')
+
     def get_system_config(self):
         config = {}
         config.update(self._get_pxeboot_network_config())
@@ -92,12 +103,12 @@ class NetworkingPuppet(base.BasePuppet):
 
     def _get_network_config(self, networktype):
         try:
-            network = self.dbapi.network_get_by_type(networktype)
+            network = self._get_network_by_type(networktype)
         except exception.NetworkTypeNotFound:
             # network not configured
             return {}
 
-        address_pool = self.dbapi.address_pool_get(network.pool_uuid)
+        address_pool = self._get_address_pool(network.pool_uuid)
 
         subnet = netaddr.IPNetwork(
             str(address_pool.network) + '/' + str(address_pool.prefix))
@@ -14,6 +14,8 @@ from sysinv.puppet import openstack
 class NfvPuppet(openstack.OpenstackBasePuppet):
     """Class to encapsulate puppet operations for vim configuration"""
 
+    HOST_DEPENDENCIES = ()
+
     SERVICE_NAME = 'vim'
     SERVICE_PORT = 4545
     PLATFORM_KEYRING_SERVICE = 'CGCS'
@@ -202,9 +202,9 @@ class OpenstackBasePuppet(base.BasePuppet):
 
     # Get SystemController's address of DistributedCloud.
     def _get_system_controller_addr(self):
-        sys_controller_network = self.dbapi.network_get_by_type(
+        sys_controller_network = self._get_network_by_type(
             constants.NETWORK_TYPE_SYSTEM_CONTROLLER)
-        sys_controller_network_addr_pool = self.dbapi.address_pool_get(
+        sys_controller_network_addr_pool = self._get_address_pool(
             sys_controller_network.pool_uuid)
         addr = sys_controller_network_addr_pool.floating_address
         return addr
@@ -12,6 +12,9 @@ from sysinv.puppet import openstack
 
 class PciIrqAffinityPuppet(openstack.OpenstackBasePuppet):
     """Class to encapsulate puppet operations for PciIrqAffinity configuration"""
+
+    HOST_DEPENDENCIES = ()
+
     PLATFORM_KEYRING_SERVICE = 'CGCS'
 
     def get_secure_static_config(self):
@@ -721,7 +721,7 @@ class PlatformPuppet(base.BasePuppet):
         # Calculate the optimal NFS r/w size based on the network mtu based
         # on the configured network(s)
         mtu = constants.DEFAULT_MTU
-        mgmt_network = self.dbapi.network_get_by_type(
+        mgmt_network = self._get_network_by_type(
             constants.NETWORK_TYPE_MGMT)
         network_id = mgmt_network.id
         interfaces = self.dbapi.iinterface_get_by_ihost(host.uuid)
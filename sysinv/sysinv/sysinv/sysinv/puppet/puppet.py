@@ -8,11 +8,16 @@
 
 from __future__ import absolute_import
 
+import copy
 import eventlet
+import hashlib
+import itertools
 import os
 import tempfile
+import time
 import yaml
 
+from eventlet import greenpool
 from stevedore import extension
 
 from sysinv.openstack.common import log as logging
@@ -21,13 +26,39 @@ from sysinv.puppet import common
 
 LOG = logging.getLogger(__name__)
 
+# Maximum number of green threads used to render host hiera data
+MAX_HIERA_THREADS = 8
+
+# Host attributes that reflect runtime state rather than configuration and
+# are therefore ignored when determining if the host inputs have changed
+HOST_VOLATILE_FIELDS = [
+    'action',
+    'action_state',
+    'availability',
+    'config_applied',
+    'config_status',
+    'config_target',
+    'created_at',
+    'ihost_action',
+    'install_state',
+    'install_state_info',
+    'mtce_info',
+    'operational',
+    'subfunction_avail',
+    'subfunction_oper',
+    'task',
+    'updated_at',
+    'uptime',
+    'vim_progress_status',
+]
+
 
 def puppet_context(func):
     """Decorate to initialize the local threading context"""
     def _wrapper(self, *args, **kwargs):
         thread_context = eventlet.greenthread.getcurrent()
         setattr(thread_context, '_puppet_context', dict())
-        func(self, *args, **kwargs)
+        return func(self, *args, **kwargs)
     return _wrapper
 
 
@@ -41,6 +72,11 @@ class PuppetOperator(object):
         self.dbapi = dbapi
         self.path = path
 
+        # last generated plugin output per host, with the fingerprint of the
+        # inputs it was generated from, and the digest of each written file
+        self._host_config_cache = {}
+        self._host_config_digests = {}
+
         puppet_plugins = extension.ExtensionManager(
             namespace='systemconfig.puppet_plugins',
             invoke_on_load=True, invoke_args=(self,))
@@ -140,34 +176,156 @@ class PuppetOperator(object):
         """Update the host hiera configuration files for the supplied host"""
 
         self.config_uuid = config_uuid
-        self.context['config'] = config = {}
         LOG.info("Updating hiera for host: %s "
                  "with config_uuid: %s" % (host.hostname, config_uuid))
+        self._update_host_config(host)
+
+    def update_hosts_config(self, hosts, config_uuid=None):
+        """Update the host hiera configuration files for the supplied hosts
+
+        The system wide data shared by all hosts is read once into a snapshot
+        and the host configurations are then rendered concurrently.
+        """
+        if not hosts:
+            return
+
+        self.config_uuid = config_uuid
+        LOG.info("Updating hiera for hosts: %s "
+                 "with config_uuid: %s" %
+                 ([h.hostname for h in hosts], config_uuid))
+
+        snapshot = self._create_system_snapshot()
+
+        timings = {}
+        pool = greenpool.GreenPool(size=min(MAX_HIERA_THREADS, len(hosts)))
+        for elapsed in pool.imap(self._update_host_config_from_snapshot,
+                                 itertools.repeat(snapshot), hosts):
+            for name, duration in elapsed.items():
+                timings[name] = timings.get(name, 0) + duration
+
+        for name in sorted(timings, key=timings.get, reverse=True):
+            LOG.info("Puppet plugin %s took %.3f seconds for %d host(s)" %
+                     (name, timings[name], len(hosts)))
+
+    @puppet_context
+    def _update_host_config_from_snapshot(self, snapshot, host):
+        # Each green thread gets a private copy of the snapshot containers
+        # so that plugins may extend their cached data without affecting
+        # the hosts being rendered concurrently.
+        for key, value in snapshot.items():
+            self.context[key] = copy.copy(value)
+        return self._update_host_config(host)
+
+    def _update_host_config(self, host):
+        """Generate and write the hiera data within the current context
+
+        Plugins that declare their host dependencies are only invoked if the
+        fingerprint of their inputs changed since their output was last
+        generated for the host; their previous output is reused otherwise.
+        """
+        timings = {}
+        cache = self._host_config_cache.setdefault(host.uuid, {})
+        tables = self.context.get('_table_fingerprints')
+        host_fingerprint = self._get_host_fingerprint(host)
+
+        self.context['config'] = config = {}
         for puppet_plugin in self.puppet_plugins:
-            config.update(puppet_plugin.obj.get_host_config(host))
+            fingerprint = self._get_plugin_fingerprint(
+                puppet_plugin.obj, host_fingerprint, tables)
+            cached = cache.get(puppet_plugin.name)
+            if fingerprint is not None and cached and \
+                    cached[0] == fingerprint:
+                config.update(cached[1])
+                continue
+
+            start = time.time()
+            plugin_config = puppet_plugin.obj.get_host_config(host)
+            timings[puppet_plugin.name] = time.time() - start
+
+            cache[puppet_plugin.name] = (fingerprint, plugin_config)
+            config.update(plugin_config)
+
+        skipped = len(self.puppet_plugins) - len(timings)
+        if skipped:
+            LOG.info("Reused output of %d unchanged puppet plugin(s) "
+                     "for host %s" % (skipped, host.hostname))
 
         self._write_host_config(host, config)
+        return timings
+
+    def _create_system_snapshot(self):
+        """Read the system wide data shared by all host configurations"""
+        snapshot = {}
+        if self.dbapi is None:
+            return snapshot
+
+        snapshot['_system'] = self.dbapi.isystem_get_one()
+        snapshot['_networks'] = dict(
+            (n.type, n) for n in self.dbapi.networks_get_all())
+        snapshot['_address_pools'] = dict(
+            (p.uuid, p) for p in self.dbapi.address_pools_get_all())
+        snapshot['_address_names'] = dict(
+            (a.name, a) for a in self.dbapi.addresses_get_all() if a.name)
+        snapshot['_service_parameters'] = list(
+            self.dbapi.service_parameter_get_all())
+
+        tables = set()
+        for puppet_plugin in self.puppet_plugins:
+            tables.update(puppet_plugin.obj.HOST_DEPENDENCIES or [])
+        snapshot['_table_fingerprints'] = \
+            self.dbapi.table_fingerprints_get(sorted(tables))
+        return snapshot
+
+    @staticmethod
+    def _get_host_fingerprint(host):
+        return sorted((k, v) for k, v in host.as_dict().items()
+                      if k not in HOST_VOLATILE_FIELDS)
+
+    @staticmethod
+    def _get_plugin_fingerprint(plugin, host_fingerprint, tables):
+        dependencies = plugin.HOST_DEPENDENCIES
+        if dependencies is None or tables is None:
+            return None
+        return (host_fingerprint,
+                [(t, tables[t]) for t in sorted(dependencies)])
 
     def remove_host_config(self, host):
         """Remove the configuration for the supplied host"""
+        self._host_config_cache.pop(host.uuid, None)
         try:
             filename = "%s.yaml" % host.mgmt_ip
+            self._host_config_digests.pop(filename, None)
             self._remove_config(filename)
         except Exception:
             LOG.exception("failed to remove host config: %s" % host.uuid)
 
     def _write_host_config(self, host, config):
-        """Update the configuration for a specific host"""
+        """Update the configuration for a specific host
+
+        The file is left untouched if its content would not change.
+        """
         filename = "%s.yaml" % host.mgmt_ip
-        self._write_config(filename, config)
+        content = yaml.dump(config, default_flow_style=False)
+        digest = hashlib.md5(content.encode('utf-8')).hexdigest()
+        if (self._host_config_digests.get(filename) == digest and
+                os.path.exists(os.path.join(self.path, filename))):
+            LOG.info("Hiera data for host %s is unchanged" % host.hostname)
+            return
+
+        self._write_file(filename, content)
+        self._host_config_digests[filename] = digest
 
     def _write_config(self, filename, config):
+        self._write_file(filename,
+                         yaml.dump(config, default_flow_style=False))
+
+    def _write_file(self, filename, content):
         filepath = os.path.join(self.path, filename)
         try:
             fd, tmppath = tempfile.mkstemp(dir=self.path, prefix=filename,
                                            text=True)
             with open(tmppath, 'w') as f:
-                yaml.dump(config, f, default_flow_style=False)
+                f.write(content)
             os.close(fd)
             os.rename(tmppath, filepath)
         except Exception:
@@ -15,6 +15,8 @@ LOG = logging.getLogger(__name__)
 class ServiceParamPuppet(base.BasePuppet):
     """Class to encapsulate puppet operations for service parameters"""
 
+    HOST_DEPENDENCIES = ('service_parameter',)
+
     def _format_array_parameter(self, resource, value):
         parameter = {}
         if value != 'undef':
@@ -13,6 +13,8 @@ from sysinv.puppet import openstack
 class SmPuppet(openstack.OpenstackBasePuppet):
     """Class to encapsulate puppet operations for sm configuration"""
 
+    HOST_DEPENDENCIES = ()
+
     SERVICE_NAME = 'smapi'
     SERVICE_PORT = 7777
 
@@ -0,0 +1,176 @@
+# Copyright (c) 2019 Wind River Systems, Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+"""Test class for Sysinv Agent disk inventory."""
+
+import fixtures
+import mock
+import os
+import subprocess
+
+from sysinv.agent import disk
+from sysinv.tests import base
+
+GIB_SECTORS = 2 * 1024 * 1024
+
+
+class FakeDevice(dict):
+    """pyudev block device backed by a dict of udev properties"""
+
+    def __init__(self, device_node, **properties):
+        super(FakeDevice, self).__init__(properties)
+        self.device_node = device_node
+        self.device_number = 0
+        self.device_type = 'disk'
+        self.setdefault('DEVNAME', device_node)
+        self.setdefault('MAJOR', '8')
+        self.setdefault('ID_PATH', 'pci-0000:00:1f.2-ata-%s' %
+                        os.path.basename(device_node))
+        self.setdefault('ID_SERIAL_SHORT', 'serial')
+
+
+def _fork(output):
+    """Run a process printing the given output, as the commands would"""
+    return subprocess.Popen(['printf', '%s', output],
+                            stdout=subprocess.PIPE,
+                            universal_newlines=True)
+
+
+class DiskInventoryTestCase(base.TestCase):
+
+    def setUp(self):
+        super(DiskInventoryTestCase, self).setUp()
+        self.root = self.useFixture(fixtures.TempDir()).path
+        self.sys_block = os.path.join(self.root, 'sys', 'block')
+        os.makedirs(self.sys_block)
+        os.makedirs(os.path.join(self.root, 'dev'))
+        self.devices = []
+
+    def _write(self, path, content):
+        path = os.path.join(self.sys_block, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('%s\n' % content)
+
+    def _add_disk(self, name, sectors=GIB_SECTORS, partitions=None,
+                  **properties):
+        """Simulate the sysfs entries and udev properties of a disk"""
+        self._write(os.path.join(name, 'size'), sectors)
+        self._write(os.path.join(name, 'queue', 'logical_block_size'), 512)
+        self._write(os.path.join(name, 'queue', 'rotational'), 1)
+        self._write(os.path.join(name, 'device', 'model'), 'SIMULATED')
+        for index, size in enumerate(partitions or [], 1):
+            partition = '%s%d' % (name, index)
+            self._write(os.path.join(name, partition, 'size'), size)
+            self._write(os.path.join(name, partition, 'partition'), index)
+
+        device_node = os.path.join(self.root, 'dev', name)
+        open(device_node, 'w').close()
+        properties.setdefault('ID_PART_TABLE_TYPE', 'gpt')
+        device = FakeDevice(device_node, **properties)
+        self.devices.append(device)
+        return device
+
+    def _idisk_get(self, sys_block):
+        """Enumerate the simulated disks, counting the processes forked"""
+        outputs = {'pvs': '', 'blockdev': '512',
+                   'sgdisk': 'Total free space is 1048509 sectors',
+                   'hdparm': 'Model Number: SIMULATED'}
+
+        def fake_popen(command, **kwargs):
+            if not isinstance(command, str):
+                command = ' '.join(command)
+            return _fork(outputs[command.split()[0]])
+
+        def fake_disk_is_gpt(device_node):
+            return 'gpt' in _fork('Partition Table: gpt').communicate()[0]
+
+        def fake_get_disk_capacity_mib(device_node):
+            _fork('Disk %s: 1 GiB, 1073741824 bytes' %
+                  device_node).communicate()
+            return 1024
+
+        operator = disk.DiskOperator(sys_block=sys_block)
+        with mock.patch.object(disk.pyudev, 'Context') as context, \
+                mock.patch.object(disk.subprocess, 'Popen',
+                                  side_effect=fake_popen) as popen, \
+                mock.patch.object(disk.utils, 'disk_is_gpt',
+                                  side_effect=fake_disk_is_gpt) as gpt, \
+                mock.patch.object(disk.utils, 'get_disk_capacity_mib',
+                                  side_effect=fake_get_disk_capacity_mib
+                                  ) as capacity, \
+                mock.patch.object(operator, 'get_rootfs_node',
+                                  return_value=None):
+            context.return_value.list_devices.return_value = self.devices
+            idisk = operator.idisk_get()
+            forks = popen.call_count + gpt.call_count + capacity.call_count
+        return idisk, forks
+
+    def test_available_mib_from_sysfs(self):
+        operator = disk.DiskOperator(sys_block=self.sys_block)
+        # 1 GiB disk with a 512 MiB partition, the GPT structures using
+        # 67 sectors and 2 MiB being kept for the partition table
+        device = self._add_disk('sda', partitions=[GIB_SECTORS // 2])
+        self.assertEqual(509, operator.get_disk_available_mib_sysfs(
+            device, set()))
+
+    def test_available_mib_unusable_disks(self):
+        operator = disk.DiskOperator(sys_block=self.sys_block)
+        msdos = self._add_disk('sda', ID_PART_TABLE_TYPE='dos')
+        pv = self._add_disk('sdb')
+        self.assertEqual(0, operator.get_disk_available_mib_sysfs(
+            msdos, set()))
+        self.assertEqual(0, operator.get_disk_available_mib_sysfs(
+            pv, set([pv.device_node])))
+        self.assertIsNone(operator.get_disk_available_mib_sysfs(pv, None))
+
+    def test_model_from_udev(self):
+        operator = disk.DiskOperator(sys_block=self.sys_block)
+        device = self._add_disk(
+            'sda', ID_MODEL='LVM PV on /dev/sda',
+            ID_MODEL_ENC='Samsung\\x20SSD\\x20860\\x20EVO\\x20\\x20')
+        self.assertEqual('Samsung SSD 860 EVO',
+                         operator.get_disk_model(device))
+        del device['ID_MODEL_ENC']
+        self.assertEqual('SIMULATED', operator.get_disk_model(device))
+
+    def test_model_from_udev_non_ascii(self):
+        operator = disk.DiskOperator(sys_block=self.sys_block)
+        device = self._add_disk(
+            'sda', ID_MODEL_ENC=u'Caf\xe9\\x20Disk\\x20M\\xc3\\xa9ga')
+        self.assertEqual(u'Caf\xe9 Disk M\xe9ga',
+                         operator.get_disk_model(device))
+
+    def test_idisk_get_forks(self):
+        # Compare the sysfs backend with the command based fallback, used
+        # when the sysfs tree does not provide the disk attributes.
+        for index in range(24):
+            self._add_disk('sd%s' % chr(ord('a') + index),
+                           partitions=[GIB_SECTORS // 2])
+
+        # sysfs tree only providing the rotational attribute, as used
+        # before the sysfs backend
+        rotational_only = os.path.join(self.root, 'rotational')
+        for device in self.devices:
+            name = os.path.basename(device.device_node)
+            os.makedirs(os.path.join(rotational_only, name, 'queue'))
+            with open(os.path.join(rotational_only, name, 'queue',
+                                   'rotational'), 'w') as f:
+                f.write('1\n')
+
+        results = {}
+        for backend, sys_block in [('sysfs', self.sys_block),
+                                   ('commands', rotational_only)]:
+            results[backend] = self._idisk_get(sys_block)
+
+        sysfs, forks = results['sysfs']
+        commands = results['commands'][0]
+        # a single pvs call, regardless of the number of disks
+        self.assertEqual(1, forks)
+        for key in ['size_mib', 'available_mib', 'serial_id',
+                    'capabilities', 'device_type', 'rpm']:
+            self.assertEqual([d[key] for d in commands],
+                             [d[key] for d in sysfs])
@@ -0,0 +1,117 @@
+# Copyright (c) 2019 Wind River Systems, Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+"""Test class for Sysinv Agent PCI inventory."""
+
+import fixtures
+import mock
+import os
+
+from sysinv.agent import pci
+from sysinv.tests import base
+
+PCI_IDS = """# simulated pci.ids
+8086  Intel Corporation
+\t0c01  Xeon E3-1200 v2/3rd Gen Core processor DRAM Controller
+\t10ed  82599 Ethernet Controller Virtual Function
+\t10fb  82599ES 10-Gigabit SFI/SFP+ Network Connection
+\t\t8086 000c  Ethernet Server Adapter X520-2
+C 02  Network controller
+\t00  Ethernet controller
+C 06  Bridge
+\t00  Host bridge
+C 0b  Processor
+"""
+
+
+class PCIScanTestCase(base.TestCase):
+
+    def setUp(self):
+        super(PCIScanTestCase, self).setUp()
+        root = self.useFixture(fixtures.TempDir()).path
+        self.devices_path = os.path.join(root, 'devices')
+        os.makedirs(self.devices_path)
+        pci_ids = os.path.join(root, 'pci.ids')
+        with open(pci_ids, 'w') as f:
+            f.write(PCI_IDS)
+
+        p = mock.patch.object(pci, 'PCI_DEVICES_PATH', self.devices_path)
+        p.start()
+        self.addCleanup(p.stop)
+        p = mock.patch.object(pci, 'PCI_IDS_PATHS', [pci_ids])
+        p.start()
+        self.addCleanup(p.stop)
+        p = mock.patch.object(pci, '_pci_ids', {})
+        p.start()
+        self.addCleanup(p.stop)
+
+        self._add_device('0000:00:00.0', 0x8086, 0x0c01, 0x060000,
+                         revision=0x09, subsystem=(0x1028, 0x0000))
+        self._add_device('0000:03:00.0', 0x8086, 0x10fb, 0x020000,
+                         revision=0x01, subsystem=(0x8086, 0x000c))
+        self._add_device('0000:03:10.0', 0x8086, 0x10ed, 0x020000,
+                         revision=0x01, subsystem=(0x8086, 0x000c))
+        os.symlink(os.path.join(self.devices_path, '0000:03:00.0'),
+                   os.path.join(self.devices_path, '0000:03:10.0', 'physfn'))
+        self._add_device('0000:05:00.0', 0x1234, 0x5678, 0x0b4000)
+
+        self.operator = pci.PCIOperator()
+
+    def _add_device(self, pciaddr, vendor, device, class_id, revision=0,
+                    subsystem=(0, 0)):
+        path = os.path.join(self.devices_path, pciaddr)
+        os.makedirs(path)
+        attrs = {'vendor': '0x%04x' % vendor,
+                 'device': '0x%04x' % device,
+                 'class': '0x%06x' % class_id,
+                 'revision': '0x%02x' % revision,
+                 'subsystem_vendor': '0x%04x' % subsystem[0],
+                 'subsystem_device': '0x%04x' % subsystem[1]}
+        for attr, value in attrs.items():
+            with open(os.path.join(path, attr), 'w') as f:
+                f.write(value + '\n')
+
+    def _fields(self, device):
+        return [device.pciaddr, device.pclass, device.pvendor, device.pdevice,
+                device.prevision, device.psvendor, device.psdevice]
+
+    def test_pci_scan_as_lspci(self):
+        devices = self.operator.pci_scan()
+        self.assertEqual(
+            ['0000:00:00.0', 'Host bridge', 'Intel Corporation',
+             'Xeon E3-1200 v2/3rd Gen Core processor DRAM Controller',
+             '-r09', 'Vendor 1028', 'Device 0000'],
+            self._fields(devices[0]))
+        self.assertEqual(
+            ['0000:03:00.0', 'Ethernet controller', 'Intel Corporation',
+             '82599ES 10-Gigabit SFI/SFP+ Network Connection', '-r01',
+             'Intel Corporation', 'Ethernet Server Adapter X520-2'],
+            self._fields(devices[1]))
+        self.assertEqual(
+            ['0000:05:00.0', 'Processor [0b40]', 'Vendor 1234',
+             'Device 5678', '', '', ''],
+            self._fields(devices[3]))
+
+    def test_inventoried_devices(self):
+        devices = self.operator.pci_devices_list()
+        self.assertEqual(['0000:03:00.0'],
+                         [d.pciaddr for d in self.operator.inics_get(devices)])
+        self.assertEqual(['0000:05:00.0'],
+                         [d.pciaddr for d in
+                          self.operator.pci_devices_get(devices)])
+
+    def test_lspci_without_pci_ids(self):
+        with mock.patch.object(pci, 'PCI_IDS_PATHS', []), \
+                mock.patch.object(self.operator, 'lspci_devices',
+                                  return_value=[]) as lspci:
+            self.assertEqual([], self.operator.pci_devices_list())
+            self.assertTrue(lspci.called)
+
+    @mock.patch('subprocess.check_call')
+    def test_dpdk_support_cached(self, check_call):
+        for _ in range(2):
+            self.assertTrue(self.operator.get_dpdk_support('0x8086',
+                                                           '0x10fb'))
+        self.assertEqual(1, check_call.call_count)
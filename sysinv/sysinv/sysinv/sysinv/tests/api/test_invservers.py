@@ -12,9 +12,13 @@ Tests for the API /nodes/ methods.
 """
 
 # import mox
+import mock
 import webtest.app
+import wsme
 
-# from sysinv.common import exception
+from sysinv.api.controllers.v1 import host as api_host
+from sysinv.common import constants
+from sysinv.common import exception
 # from sysinv.common import states
 # from sysinv.conductor import rpcapi
 from sysinv.openstack.common import uuidutils
@@ -184,6 +188,51 @@ class TestListServers(base.FunctionalTest):
         next_marker = data['ihosts'][-1]['uuid']
         self.assertIn(next_marker, data['next'])
 
+    def _create_many_test_ihosts(self, count):
+        ihosts = []
+        for id in range(1, count + 1):
+            ndict = dbutils.get_test_ihost(id=id, hostname=id, mgmt_mac=id,
+                                           forisystemid=self.system.id,
+                                           mgmt_ip="%s.%s.%s.%s" % (id, id, id, id),
+                                           uuid=uuidutils.generate_uuid())
+            ihost = self.dbapi.ihost_create(ndict)
+            ihosts.append(ihost['uuid'])
+        return ihosts
+
+    def test_fields(self):
+        self._create_many_test_ihosts(2)
+        data = self.get_json('/ihosts?fields=hostname,personality')
+        self.assertEqual(2, len(data['ihosts']))
+        self.assertEqual(set(['uuid', 'hostname', 'personality']),
+                         set(data['ihosts'][0].keys()))
+
+    def test_fields_invalid(self):
+        response = self.get_json('/ihosts?fields=hostname,software_load',
+                                 expect_errors=True)
+        self.assertEqual(response.status_int, 400)
+
+    def test_fields_cursor_pagination(self):
+        ihosts = self._create_many_test_ihosts(5)
+        uuids = []
+        url = '/ihosts?fields=hostname&limit=2'
+        while url:
+            data = self.get_json(url)
+            uuids.extend(h['uuid'] for h in data['ihosts'])
+            url = data.get('next')
+            if url:
+                self.assertIn('cursor=', url)
+                url = url.replace('http://localhost/v1', '')
+        self.assertEqual(ihosts, uuids)
+
+    def test_cursor_sort_key_mismatch(self):
+        self._create_many_test_ihosts(3)
+        data = self.get_json('/ihosts?fields=hostname&limit=2')
+        cursor = data['next'].split('cursor=')[1]
+        response = self.get_json(
+            '/ihosts?sort_key=hostname&limit=2&cursor=%s' % cursor,
+            expect_errors=True)
+        self.assertEqual(response.status_int, 400)
+
     def test_ports_subresource_link(self):
         ndict = dbutils.get_test_ihost(forisystemid=self.system.id)
         self.dbapi.ihost_create(ndict)
@@ -409,3 +458,153 @@ class TestPut(base.FunctionalTest):
                           {'target': states.POWER_ON})
         self.mox.VerifyAll()
 '''
+
+
+class TestBulkAdd(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestBulkAdd, self).setUp()
+        self.system = dbutils.create_test_isystem()
+        self.load = dbutils.create_test_load()
+        p = mock.patch.object(api_host, 'pecan')
+        self.pecan = p.start()
+        self.addCleanup(p.stop)
+        self.pecan.request.dbapi = self.dbapi
+        self.pecan.request.context = self.context
+        self.rpcapi = self.pecan.request.rpcapi
+
+        self.controller = api_host.HostController()
+        self.controller._new_host_prepare = mock.Mock(
+            return_value=constants.WORKER)
+        self.controller._new_host_notify = mock.Mock()
+
+    def _create_test_ihost(self, index, **kw):
+        kw.setdefault('mgmt_ip', '192.168.204.%d' % (index + 10))
+        kw.setdefault('bm_ip', '10.10.10.%d' % (index + 10))
+        return dbutils.create_test_ihost(
+            id=index + 1, uuid=uuidutils.generate_uuid(),
+            forisystemid=self.system.id, hostname='worker-%d' % index,
+            personality=constants.WORKER,
+            mgmt_mac='08:00:27:00:00:%02x' % index, **kw)
+
+    def _new_hosts(self, count):
+        return dict((i, {'hostname': 'worker-%d' % i, 'power_on': None})
+                    for i in range(count))
+
+    def _new_host(self, hostname, mgmt_mac, mgmt_ip=None, bm_ip=None,
+                  personality=constants.WORKER):
+        return {'hostname': hostname, 'personality': personality,
+                'mgmt_mac': mgmt_mac, 'mgmt_ip': mgmt_ip, 'bm_ip': bm_ip}
+
+    def test_bulk_add_index(self):
+        ihost = self._create_test_ihost(0)
+        self._create_test_ihost(1, mgmt_ip=None, bm_ip=None)
+
+        host_index = self.controller._bulk_add_index(
+            self.dbapi.ihost_get_list())
+        self.assertEqual(ihost['uuid'],
+                         host_index['mgmt_mac']['08:00:27:00:00:00'].uuid)
+        self.assertEqual(['worker-0', 'worker-1'],
+                         sorted(host_index['hostname']))
+        self.assertEqual(['192.168.204.10'], list(host_index['mgmt_ip']))
+        self.assertEqual(['10.10.10.10'], list(host_index['bm_ip']))
+
+    @mock.patch.object(api_host.utils, 'validate_address_within_nework')
+    def test_bulk_add_check(self, mock_validate):
+        self._create_test_ihost(0)
+        host_index = self.controller._bulk_add_index(
+            self.dbapi.ihost_get_list())
+        check = self.controller._bulk_add_check
+
+        new_host = self._new_host('worker-1', '08:00:27:00:00:01',
+                                  mgmt_ip='192.168.204.11')
+        self.assertTrue(check(new_host, host_index, None, []))
+        self.assertIs(new_host, host_index['hostname']['worker-1'])
+
+        # duplicates of existing hosts and of the hosts before in the file
+        for new_host in (
+                self._new_host('worker-0', '08:00:27:00:00:02'),
+                self._new_host('worker-1', '08:00:27:00:00:02'),
+                self._new_host('worker-2', '08:00:27:00:00:00'),
+                self._new_host('worker-2', '08:00:27:00:00:01'),
+                self._new_host('worker-2', '08:00:27:00:00:02',
+                               mgmt_ip='192.168.204.10'),
+                self._new_host('worker-2', '08:00:27:00:00:02',
+                               mgmt_ip='192.168.204.11'),
+                self._new_host('worker-2', '08:00:27:00:00:02',
+                               bm_ip='10.10.10.10')):
+            self.assertRaises(wsme.exc.ClientSideError,
+                              check, new_host, host_index, None, [])
+        self.assertNotIn('worker-2', host_index['hostname'])
+
+        # the other hosts are added one by one
+        self.assertFalse(check(
+            self._new_host('storage-0', '08:00:27:00:00:03',
+                           personality=constants.STORAGE),
+            host_index, None, []))
+        self.assertFalse(check(
+            self._new_host('worker-3', '08:00:27:00:00:04'),
+            host_index, None, ['08:00:27:00:00:04']))
+
+    def test_bulk_post(self):
+        ihosts = [mock.MagicMock(uuid='uuid-%d' % i, hostname='worker-%d' % i)
+                  for i in range(3)]
+        self.rpcapi.create_ihosts.return_value = ihosts
+        self.rpcapi.configure_ihosts.side_effect = lambda c, h, timeout: h
+
+        errors = self.controller._bulk_post(self._new_hosts(3), [])
+        self.assertEqual({}, errors)
+        self.assertEqual(1, self.rpcapi.create_ihosts.call_count)
+        self.rpcapi.configure_ihosts.assert_called_once_with(
+            self.context, ihosts, timeout=90)
+        self.assertEqual(3, self.controller._new_host_notify.call_count)
+
+    def test_bulk_post_create_fallback(self):
+        ihosts = [mock.MagicMock(uuid='uuid-%d' % i, hostname='worker-%d' % i)
+                  for i in range(3)]
+        self.rpcapi.create_ihosts.side_effect = exception.NodeAlreadyExists(
+            uuid='uuid-1')
+        self.rpcapi.create_ihost.side_effect = [
+            ihosts[0], exception.NodeAlreadyExists(uuid='uuid-1'), ihosts[2]]
+        self.rpcapi.configure_ihosts.side_effect = lambda c, h, timeout: h
+
+        errors = self.controller._bulk_post(self._new_hosts(3), [])
+        self.assertEqual([1], list(errors))
+        self.assertEqual(3, self.rpcapi.create_ihost.call_count)
+        self.rpcapi.configure_ihosts.assert_called_once_with(
+            self.context, [ihosts[0], ihosts[2]], timeout=60)
+        self.assertEqual(2, self.controller._new_host_notify.call_count)
+
+    def test_bulk_post_partially_configured(self):
+        ihosts = [mock.MagicMock(uuid='uuid-%d' % i, hostname='worker-%d' % i)
+                  for i in range(3)]
+        self.rpcapi.create_ihosts.return_value = ihosts
+        self.rpcapi.configure_ihosts.return_value = [ihosts[0], ihosts[2]]
+
+        errors = self.controller._bulk_post(self._new_hosts(3), [])
+        self.assertEqual([1], list(errors))
+        self.assertIsInstance(errors[1], exception.SysinvException)
+        self.assertEqual(
+            [ihosts[0], ihosts[2]],
+            [c[0][0] for c in self.controller._new_host_notify.call_args_list])
+
+    @mock.patch.object(api_host, 'BULK_ADD_CONFIGURE_HOSTS', 2)
+    def test_bulk_post_configure_timeout(self):
+        ihosts = [self._create_test_ihost(0),
+                  self._create_test_ihost(1, mgmt_ip=None),
+                  self._create_test_ihost(2)]
+        self.rpcapi.create_ihosts.return_value = ihosts
+        self.rpcapi.configure_ihosts.side_effect = [
+            exception.SysinvException('timeout'), [ihosts[2]]]
+
+        errors = self.controller._bulk_post(self._new_hosts(3), [])
+        # the host of the timed out request with a mgmt_ip is configured
+        self.assertEqual([1], list(errors))
+        self.assertEqual(
+            [mock.call(self.context, ihosts[:2], timeout=60),
+             mock.call(self.context, ihosts[2:], timeout=30)],
+            self.rpcapi.configure_ihosts.call_args_list)
+        self.assertEqual(
+            ['worker-0', 'worker-2'],
+            [c[0][0]['hostname']
+             for c in self.controller._new_host_notify.call_args_list])
@@ -0,0 +1,242 @@
+# Copyright (c) 2019 Wind River Systems, Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+"""Test class for Sysinv Kube App Operator."""
+
+import fixtures
+import mock
+import os
+
+from sysinv.common import constants
+from sysinv.common import exception
+from sysinv.conductor import kube_app
+from sysinv.tests import base
+from sysinv.tests.db import base as dbbase
+
+
+class ImageDownloadOrderTestCase(base.TestCase):
+
+    def test_order_image_tags_by_charts(self):
+        image_tags = [('nova', 'nova-api'),
+                      ('mariadb', 'mariadb'),
+                      ('ingress', 'ingress'),
+                      ('nova', 'entrypoint'),
+                      ('mariadb', 'entrypoint')]
+        self.assertEqual(
+            ['ingress', 'mariadb', 'entrypoint', 'nova-api'],
+            kube_app.order_image_tags(image_tags,
+                                      ['ingress', 'mariadb', 'nova']))
+
+    def test_order_image_tags_unknown_charts_last(self):
+        image_tags = [('custom', 'custom'), ('nova', 'nova-api')]
+        self.assertEqual(['nova-api', 'custom'],
+                         kube_app.order_image_tags(image_tags, ['nova']))
+
+
+class ImageDownloadProgressTestCase(base.TestCase):
+
+    def test_shared_layers_accounted_once(self):
+        progress = kube_app.ImageDownloadProgress(2, interval=3600)
+        for current in (512, 1024):
+            # the same layer reported by the pulls of both images
+            for _ in range(2):
+                progress.update({'id': 'layer0',
+                                 'status': 'Downloading',
+                                 'progressDetail': {'current': current,
+                                                    'total': 1024}})
+        progress.update({'id': 'layer1', 'status': 'Already exists',
+                         'progressDetail': {}})
+        self.assertEqual(1024, sum(progress._layers.values()))
+
+    def test_progress_reported_at_interval(self):
+        progress = kube_app.ImageDownloadProgress(1, interval=0)
+        self.assertTrue(progress.update({'status': 'Pulling fs layer'}))
+        progress = kube_app.ImageDownloadProgress(1, interval=3600)
+        self.assertFalse(progress.update({'status': 'Pulling fs layer'}))
+
+
+class ArmadaLogFollowerTestCase(base.TestCase):
+
+    def setUp(self):
+        super(ArmadaLogFollowerTestCase, self).setUp()
+        self.logfile = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'app-apply.log')
+        self.follower = kube_app.ArmadaLogFollower(
+            self.logfile, kube_app.APPLY_SEARCH_PATTERN)
+
+    def _append(self, data):
+        with open(self.logfile, 'ab') as f:
+            f.write(data)
+
+    def test_missing_log(self):
+        self.assertEqual(0, self.follower.poll())
+
+    def test_incremental_timeline(self):
+        self._append(b'2019-06-10 19:58:30.185 75 INFO armada [-] '
+                     b'Processing Chart, release=osh-mariadb\n'
+                     b'2019-06-10 19:58:40.185 75 INFO armada [-] '
+                     b'Waiting for release\n'
+                     b'2019-06-10 19:59:45.185 75 INFO armada [-] '
+                     b'Processing Chart, rele')
+        self.assertEqual(1, self.follower.poll())
+        self.assertEqual('osh-mariadb', self.follower.last_chart)
+
+        self._append(b'ase=\x1b[0mosh-nova\x1b[0m\n')
+        self.assertEqual(1, self.follower.poll())
+        self.assertEqual('osh-nova', self.follower.last_chart)
+        self.assertEqual(0, self.follower.poll())
+
+        self.follower.finish()
+        timeline = self.follower.timeline('apply')
+        self.assertEqual('apply', timeline['request'])
+        self.assertEqual(['osh-mariadb', 'osh-nova'],
+                         [c['chart'] for c in timeline['charts']])
+        self.assertEqual(75.0, timeline['charts'][0]['duration'])
+        self.assertIsNotNone(timeline['charts'][1]['duration'])
+
+    def _chart_names(self):
+        return [c['chart'] for c in self.follower.charts]
+
+    def test_truncated_log(self):
+        self._append(b'2019-06-10 19:58:30 Processing Chart, release=osh-a\n'
+                     b'2019-06-10 19:58:40 Processing Chart, release=osh-b\n')
+        self.assertEqual(2, self.follower.poll())
+        with open(self.logfile, 'wb') as f:
+            f.write(b'2019-06-10 20:00:00 Processing Chart, release=c\n')
+        self.assertEqual(1, self.follower.poll())
+        self.assertEqual(['c'], self._chart_names())
+        self.assertEqual(50, self.follower.completion(2))
+
+    def test_previous_log_skipped_on_reapply(self):
+        self._append(b'2019-06-10 19:58:30 Processing Chart, release=osh-a\n'
+                     b'2019-06-10 19:58:40 Processing Chart, release=osh-b\n')
+        self.follower = kube_app.ArmadaLogFollower(
+            self.logfile, kube_app.APPLY_SEARCH_PATTERN)
+        self.assertEqual(0, self.follower.poll())
+        self.assertEqual([], self._chart_names())
+
+        # the new log has grown past the end of the previous one by the
+        # time it is polled
+        with open(self.logfile, 'wb') as f:
+            f.write(b'2019-06-11 08:00:00 Processing Chart, release=osh-a\n'
+                    b'2019-06-11 08:00:10 Waiting for release osh-a to be '
+                    b'deployed and ready\n'
+                    b'2019-06-11 08:01:00 Processing Chart, release=osh-b\n')
+        self.assertEqual(2, self.follower.poll())
+        self.assertEqual(['osh-a', 'osh-b'], self._chart_names())
+        self.assertEqual(100, self.follower.completion(2))
+
+        self.follower.finish()
+        self.assertEqual(['osh-a', 'osh-b'],
+                         [c['chart'] for c in
+                          self.follower.timeline('apply')['charts']])
+
+
+class ImageTagsIndexTestCase(base.TestCase):
+
+    MANIFEST = """---
+schema: armada/Chart/v1
+metadata:
+  schema: metadata/Document/v1
+  name: openstack-mariadb
+data:
+  chart_name: mariadb
+  namespace: openstack
+  values:
+    images:
+      tags:
+        mariadb: docker.io/mariadb:10.2.13
+"""
+
+    def setUp(self):
+        super(ImageTagsIndexTestCase, self).setUp()
+        self.path = self.useFixture(fixtures.TempDir()).path
+        self.app_operator = kube_app.AppOperator(mock.Mock())
+        self.images_file = os.path.join(self.path, 'images.yaml')
+        self.manifest_file = os.path.join(self.path, 'manifest.yaml')
+        self.index_file = os.path.join(self.path, 'images-index.yaml')
+        self.overrides_file = os.path.join(self.path,
+                                           'openstack-mariadb.yaml')
+        with open(self.images_file, 'w') as f:
+            f.write("mariadb:\n  mariadb: docker.io/mariadb:10.2.13\n"
+                    "  dep: quay.io/dep:1.0\n")
+        with open(self.manifest_file, 'w') as f:
+            f.write(self.MANIFEST)
+
+    def _get_image_tags(self):
+        return sorted(self.app_operator._get_image_tags_by_charts(
+            self.images_file, self.manifest_file, self.path,
+            images_index_file=self.index_file))
+
+    def test_index_reused_until_overrides_change(self):
+        expected = ['%s/docker.io/mariadb:10.2.13' %
+                    constants.DOCKER_REGISTRY_SERVER,
+                    '%s/quay.io/dep:1.0' % constants.DOCKER_REGISTRY_SERVER]
+        self.assertEqual(expected, self._get_image_tags())
+        self.assertTrue(os.path.exists(self.index_file))
+
+        with mock.patch.object(self.app_operator,
+                               '_resolve_chart_image_tags') as resolve:
+            self.assertEqual(expected, self._get_image_tags())
+            self.assertFalse(resolve.called)
+
+        with open(self.overrides_file, 'w') as f:
+            f.write("data:\n  values:\n    images:\n      tags:\n"
+                    "        dep: quay.io/dep:2.0\n")
+        self.assertEqual(
+            [expected[0],
+             '%s/quay.io/dep:2.0' % constants.DOCKER_REGISTRY_SERVER],
+            self._get_image_tags())
+
+    def test_index_rebuilt_on_manifest_change(self):
+        self._get_image_tags()
+        with open(self.manifest_file, 'w') as f:
+            f.write(self.MANIFEST.replace('10.2.13', '10.2.14'))
+        self.assertIn('%s/docker.io/mariadb:10.2.14' %
+                      constants.DOCKER_REGISTRY_SERVER,
+                      self._get_image_tags())
+
+
+class AppImageDownloadTestCase(dbbase.DbTestCase):
+
+    def setUp(self):
+        super(AppImageDownloadTestCase, self).setUp()
+        self.app_operator = kube_app.AppOperator(self.dbapi)
+        self.rpc_app = self.dbapi.kube_app_create({
+            'name': 'test-app',
+            'app_version': '1.0',
+            'manifest_name': 'manifest',
+            'manifest_file': 'manifest.yaml',
+            'status': constants.APP_APPLY_IN_PROGRESS})
+        self.app = kube_app.AppOperator.Application(self.rpc_app, False)
+        self.images = ['%s/docker.io/image%d:1.0' %
+                       (constants.DOCKER_REGISTRY_SERVER, i)
+                       for i in range(3)]
+
+        p = mock.patch.object(self.app_operator, '_retrieve_images_list',
+                              return_value={'download_images': self.images})
+        p.start()
+        self.addCleanup(p.stop)
+
+    def _download_images(self, failed=None):
+        def _download_an_image(img_tag, progress=None):
+            return img_tag, img_tag != failed
+
+        with mock.patch.object(self.app_operator._docker,
+                               'download_an_image',
+                               side_effect=_download_an_image) as download:
+            if failed:
+                self.assertRaises(exception.KubeAppApplyFailure,
+                                  self.app_operator._download_images,
+                                  self.app)
+            else:
+                self.app_operator._download_images(self.app)
+            return sorted(c[0][0] for c in download.call_args_list)
+
+    def test_reapply_only_downloads_missing_images(self):
+        self.assertEqual(self.images, self._download_images(
+            failed=self.images[1]))
+        self.assertEqual([self.images[1]], self._download_images())
+        self.assertEqual([], self._download_images())
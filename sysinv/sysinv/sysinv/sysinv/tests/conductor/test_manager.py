@@ -22,10 +22,17 @@
 
 """Test class for Sysinv ManagerService."""
 
+import collections
+import fixtures
+import mock
+import os
+
+from sysinv.common import constants
 from sysinv.common import exception
 from sysinv.conductor import manager
 from sysinv.db import api as dbapi
 from sysinv.openstack.common import context
+from sysinv.openstack.common import uuidutils
 from sysinv.tests.db import base
 from sysinv.tests.db import utils
 
@@ -119,6 +126,48 @@ class ManagerTestCase(base.DbTestCase):
         for k, v in ihost_dict.items():
             self.assertEqual(res[k], v)
 
+    def test_create_ihosts(self):
+        values_list = [{'mgmt_mac': '00:11:22:33:44:5%d' % i,
+                        'hostname': 'worker-%d' % i,
+                        'personality': 'worker'} for i in range(3)]
+
+        self.service.start()
+        res = self.service.create_ihosts(self.context, values_list)
+        self.assertEqual(['worker-0', 'worker-1', 'worker-2'],
+                         [h['hostname'] for h in res])
+        self.assertEqual(3, len(self.dbapi.ihost_get_list()))
+
+    def test_create_ihosts_duplicate(self):
+        values_list = [{'mgmt_mac': '00:11:22:33:44:5%d' % i,
+                        'hostname': 'worker-%d' % i,
+                        'personality': 'worker'} for i in range(2)]
+        values_list[1]['mgmt_mac'] = values_list[0]['mgmt_mac']
+
+        self.service.start()
+        self.assertRaises(exception.SysinvException,
+                          self.service.create_ihosts,
+                          self.context,
+                          values_list)
+
+        # verify none of the hosts was created
+        self.assertEqual(0, len(self.dbapi.ihost_get_list()))
+
+    @mock.patch.object(manager.ConductorManager, '_configure_host')
+    def test_configure_ihosts(self, configure_host):
+        hosts = [self._create_test_ihost(
+            id=i + 1, uuid=uuidutils.generate_uuid(),
+            hostname='worker-%d' % i, mgmt_mac='00:11:22:33:44:5%d' % i,
+            mgmt_ip='192.168.204.%d' % (i + 10)) for i in range(3)]
+        configure_host.side_effect = [None, exception.SysinvException(),
+                                      None]
+        self.service._puppet = mock.Mock()
+
+        res = self.service.configure_ihosts(self.context, hosts)
+        self.assertEqual(['worker-0', 'worker-2'],
+                         [h['hostname'] for h in res])
+        self.assertEqual(3, configure_host.call_count)
+        self.service._puppet.update_system_config.assert_called_once_with()
+
     def test_update_ihost(self):
         ihost = self._create_test_ihost()
 
@@ -256,3 +305,535 @@ class ManagerTestCase(base.DbTestCase):
                           self.service.configure_ihost,
                           self.context,
                           ihost)
+
+    def _create_test_ihosts(self, first, last):
+        for index in range(first, last):
+            self._create_test_ihost(
+                id=index + 1,
+                uuid=uuidutils.generate_uuid(),
+                hostname='worker-%d' % index,
+                personality=constants.WORKER,
+                mgmt_mac='02:00:00:%02x:%02x:%02x' % (
+                    (index >> 16) & 0xff, (index >> 8) & 0xff, index & 0xff),
+                mgmt_ip='192.168.%d.%d' % (index // 250, index % 250 + 2),
+                invprovision=constants.PROVISIONED,
+                availability=constants.AVAILABILITY_AVAILABLE)
+
+    @mock.patch('sysinv.agent.rpcapi.AgentAPI.agent_update')
+    def test_agent_update_request_scales_with_hosts(self, mock_agent_update):
+        # The audit must issue the same number of statements regardless of
+        # the number of hosts.
+        statements = {}
+        created = 0
+        for count in (10, 100, 500):
+            self._create_test_ihosts(created, count)
+            created = count
+
+            mock_agent_update.reset_mock()
+            with base.StatementCounter() as counter:
+                self.service._agent_update_request(self.context)
+            statements[count] = counter.count
+
+            # hosts without any disk, pv or lvg are asked to report them
+            self.assertEqual(count, mock_agent_update.call_count)
+
+        self.assertEqual(statements[10], statements[100])
+        self.assertEqual(statements[10], statements[500])
+
+    def test_unchanged_inventory_report_skipped(self):
+        ihost = self._create_test_ihost()
+        with mock.patch.object(self.dbapi, 'ilvg_get_by_ihost',
+                               wraps=self.dbapi.ilvg_get_by_ihost) as get:
+            for _ in range(2):
+                self.service.ilvg_update_by_ihost(self.context,
+                                                  ihost['uuid'], [])
+            self.assertEqual(1, get.call_count)
+
+            # a report from another host is applied
+            other = self._create_test_ihost(
+                id=2, uuid=uuidutils.generate_uuid(), hostname='worker-1',
+                mgmt_mac='02:00:00:00:00:01', mgmt_ip='192.168.24.2')
+            self.service.ilvg_update_by_ihost(self.context,
+                                              other['uuid'], [])
+            self.assertEqual(2, get.call_count)
+
+        self.assertEqual(
+            {'ilvg': {'applied': 2, 'skipped': 1}},
+            self.service.get_inventory_report_stats(self.context))
+
+    @mock.patch('sysinv.agent.rpcapi.AgentAPI.agent_update')
+    def test_agent_update_request_forces_inventory_report(self,
+                                                          mock_agent_update):
+        ihost = self._create_test_ihost(
+            invprovision=constants.PROVISIONED,
+            availability=constants.AVAILABILITY_AVAILABLE)
+        self.service.ilvg_update_by_ihost(self.context, ihost['uuid'], [])
+        self.service._agent_update_request(self.context)
+
+        with mock.patch.object(self.dbapi, 'ilvg_get_by_ihost') as get:
+            get.return_value = []
+            self.service.ilvg_update_by_ihost(self.context,
+                                              ihost['uuid'], [])
+            self.assertEqual(1, get.call_count)
+
+    def test_inventory_report_by_ihost(self):
+        ihost = self._create_test_ihost()
+        inventory = {'idisk': [], 'ipv': [], 'ilvg': [],
+                     'force_grub_update': False}
+        with mock.patch.object(self.service, 'ilvg_update_by_ihost') as lvg, \
+                mock.patch.object(self.service, 'ipv_update_by_ihost') as pv:
+            self.service.inventory_report_by_ihost(self.context,
+                                                   ihost['uuid'], inventory)
+            pv.assert_called_once_with(self.context, ihost['uuid'], [])
+            lvg.assert_called_once_with(self.context, ihost['uuid'], [])
+
+    def test_inventory_report_by_ihost_applied_by_category(self):
+        ihost = self._create_test_ihost()
+        inventory = {'inuma': [], 'imemory': [], 'ipv': []}
+        with mock.patch.object(self.service,
+                               'inumas_update_by_ihost') as numa, \
+                mock.patch.object(self.service,
+                                  'imemory_update_by_ihost') as mem, \
+                mock.patch.object(self.service, 'ipv_update_by_ihost') as pv:
+            numa.side_effect = exception.SysinvException()
+            self.service.inventory_report_by_ihost(self.context,
+                                                   ihost['uuid'], inventory)
+            # the categories following the failed one are still applied
+            self.assertEqual(2, numa.call_count)
+            mem.assert_called_once_with(self.context, ihost['uuid'], [],
+                                        False)
+            # the storage categories are applied once, out of the
+            # transaction
+            pv.assert_called_once_with(self.context, ihost['uuid'], [])
+
+    def test_inventory_report_by_ihost_rolled_back(self):
+        ihost = self._create_test_ihost()
+        inventory = {'inuma': [{'numa_node': 0, 'capabilities': {}},
+                               {'numa_node': 1, 'capabilities': {}}],
+                     'icpu': [], 'imemory': [], 'idisk': [],
+                     'force_grub_update': True}
+
+        def update_cpus(context, ihost_uuid, icpus, force_grub_update):
+            self.service._run_after_inventory_commit(
+                self.service.update_cpu_config, context, ihost_uuid,
+                force_grub_update)
+
+        def update_memory(*args):
+            if mem.call_count == 1:
+                # the nodes are created within the transaction
+                self.assertEqual(2, len(self.dbapi.inode_get_all(
+                    forihostid=ihost['id'])))
+                raise exception.SysinvException()
+
+        with mock.patch.object(self.service, 'update_cpu_config') as grub, \
+                mock.patch.object(self.service, 'icpus_update_by_ihost',
+                                  side_effect=update_cpus), \
+                mock.patch.object(self.service, 'imemory_update_by_ihost',
+                                  side_effect=update_memory) as mem, \
+                mock.patch.object(self.service,
+                                  'idisk_update_by_ihost') as disk, \
+                mock.patch.object(self.dbapi, 'inode_create_bulk',
+                                  wraps=self.dbapi.inode_create_bulk) as bulk:
+            self.service.inventory_report_by_ihost(self.context,
+                                                   ihost['uuid'], inventory)
+
+            # the nodes were rolled back, then created again by category
+            self.assertEqual(2, bulk.call_count)
+            self.assertEqual(2, len(self.dbapi.inode_get_all(
+                forihostid=ihost['id'])))
+            self.assertEqual(2, mem.call_count)
+
+            # the agent requests are sent once
+            grub.assert_called_once_with(self.context, ihost['uuid'], True)
+            disk.assert_called_once_with(self.context, ihost['uuid'], [])
+
+    def test_inventory_report_by_ihost_grub_after_commit(self):
+        ihost = self._create_test_ihost()
+        inventory = {'icpu': [], 'force_grub_update': True}
+
+        def update_cpus(context, ihost_uuid, icpus, force_grub_update):
+            self.service._run_after_inventory_commit(
+                self.service.update_cpu_config, context, ihost_uuid,
+                force_grub_update)
+            self.assertFalse(grub.called)
+
+        with mock.patch.object(self.service, 'update_cpu_config') as grub, \
+                mock.patch.object(self.service, 'icpus_update_by_ihost',
+                                  side_effect=update_cpus) as cpus:
+            self.service.inventory_report_by_ihost(self.context,
+                                                   ihost['uuid'], inventory)
+            cpus.assert_called_once_with(self.context, ihost['uuid'], [],
+                                         True)
+            grub.assert_called_once_with(self.context, ihost['uuid'], True)
+
+        # outside of an inventory report, the update is not deferred
+        with mock.patch.object(self.service, 'update_cpu_config') as grub:
+            self.service._run_after_inventory_commit(
+                self.service.update_cpu_config, self.context, ihost['uuid'],
+                False)
+            grub.assert_called_once_with(self.context, ihost['uuid'], False)
+
+    def _get_test_pci_devices(self, count, sriov_numvfs=0):
+        return [{'name': 'pci_0000_00_%02x_0' % i,
+                 'pciaddr': '0000:00:%02x.0' % i,
+                 'pclass_id': '020000',
+                 'pvendor_id': '8086',
+                 'pdevice_id': '154d',
+                 'pclass': 'Ethernet controller',
+                 'pvendor': 'Intel Corporation',
+                 'pdevice': '82599ES 10-Gigabit',
+                 'psvendor': 'Intel Corporation',
+                 'psdevice': 'Ethernet Server Adapter X520-2',
+                 'numa_node': 0,
+                 'sriov_totalvfs': 8,
+                 'sriov_numvfs': sriov_numvfs,
+                 'sriov_vfs_pci_address': '',
+                 'driver': 'ixgbe',
+                 'enabled': True,
+                 'extra_info': None} for i in range(count)]
+
+    def test_pci_device_update_by_host_bulk(self):
+        ihost = self._create_test_ihost()
+        with mock.patch.object(self.dbapi, 'pci_device_create') as create:
+            self.service.pci_device_update_by_host(
+                self.context, ihost['uuid'], self._get_test_pci_devices(3))
+            self.assertFalse(create.called)
+
+        self.service.pci_device_update_by_host(
+            self.context, ihost['uuid'],
+            self._get_test_pci_devices(4, sriov_numvfs=2))
+        devices = self.dbapi.pci_device_get_all(hostid=ihost['id'])
+        self.assertEqual(4, len(devices))
+        self.assertEqual([2] * 4, [d['sriov_numvfs'] for d in devices])
+
+    def test_pci_device_update_by_host_bulk_fallback(self):
+        ihost = self._create_test_ihost()
+        self.service.pci_device_update_by_host(
+            self.context, ihost['uuid'], self._get_test_pci_devices(3))
+        devices = self.dbapi.pci_device_get_all(hostid=ihost['id'])
+
+        # the devices are updated one at a time once the bulk update fails,
+        # a device that fails to update does not stop the others
+        update = self.dbapi.pci_device_update
+        failed = devices[0]['uuid']
+
+        def update_device(uuid, values):
+            if uuid == failed:
+                raise exception.SysinvException()
+            return update(uuid, values)
+
+        with mock.patch.object(self.dbapi, 'pci_device_update_bulk',
+                               side_effect=exception.SysinvException()), \
+                mock.patch.object(self.dbapi, 'pci_device_update',
+                                  side_effect=update_device) as single:
+            self.service.pci_device_update_by_host(
+                self.context, ihost['uuid'],
+                self._get_test_pci_devices(3, sriov_numvfs=2))
+            self.assertEqual(3, single.call_count)
+        numvfs = dict((d['uuid'], d['sriov_numvfs']) for d in
+                      self.dbapi.pci_device_get_all(hostid=ihost['id']))
+        self.assertEqual(0, numvfs.pop(failed))
+        self.assertEqual([2, 2], list(numvfs.values()))
+
+    def _create_test_disk(self, ihost, device_node, device_path):
+        return self.dbapi.idisk_create(ihost['id'], {
+            'device_node': device_node,
+            'device_path': device_path,
+            'device_type': constants.DEVICE_TYPE_HDD,
+            'serial_id': 'serial-%s' % device_node,
+            'size_mib': 10240,
+            'available_mib': 10240,
+            'capabilities': {}})
+
+    def _get_test_agent_disk(self, device_node, **kwargs):
+        disk = {'device_node': device_node,
+                'device_type': constants.DEVICE_TYPE_HDD,
+                'serial_id': 'serial-%s' % device_node,
+                'size_mib': 20480,
+                'available_mib': 20480,
+                'capabilities': {}}
+        disk.update(kwargs)
+        return disk
+
+    def test_idisk_update_by_ihost_r3_agent(self):
+        ihost = self._create_test_ihost()
+        disk = self._create_test_disk(ihost, '/dev/sda', '/dev/disk/by-path/a')
+
+        # an R3 agent does not report the device path
+        self.service.idisk_update_by_ihost(
+            self.context, ihost['uuid'],
+            [self._get_test_agent_disk('/dev/sda')])
+
+        disks = self.dbapi.idisk_get_by_ihost(ihost['uuid'])
+        self.assertEqual([disk['uuid']], [d['uuid'] for d in disks])
+        self.assertEqual(20480, disks[0]['size_mib'])
+
+    def test_idisk_update_by_ihost_without_device_path(self):
+        ihost = self._create_test_ihost()
+        disk = self._create_test_disk(ihost, '/dev/sda', None)
+
+        # an R4 agent which could not determine the device path only
+        # matches a stored disk without device path, on its device node
+        with mock.patch.object(self.dbapi, 'journal_update_path') as journal:
+            self.service.idisk_update_by_ihost(
+                self.context, ihost['uuid'],
+                [self._get_test_agent_disk('/dev/sda', device_path=None)])
+            self.assertEqual(1, journal.call_count)
+            self.assertEqual(disk['uuid'], journal.call_args[0][0]['uuid'])
+
+        disks = self.dbapi.idisk_get_by_ihost(ihost['uuid'])
+        self.assertEqual([disk['uuid']], [d['uuid'] for d in disks])
+        self.assertEqual(20480, disks[0]['size_mib'])
+
+    def test_idisk_update_by_ihost_stored_without_device_path(self):
+        ihost = self._create_test_ihost()
+        disk = self._create_test_disk(ihost, '/dev/sda', None)
+
+        self.service.idisk_update_by_ihost(
+            self.context, ihost['uuid'],
+            [self._get_test_agent_disk('/dev/sda',
+                                       device_path='/dev/disk/by-path/a')])
+
+        disks = self.dbapi.idisk_get_by_ihost(ihost['uuid'])
+        self.assertEqual([disk['uuid']], [d['uuid'] for d in disks])
+        self.assertEqual('/dev/disk/by-path/a', disks[0]['device_path'])
+
+    def test_idisk_update_by_ihost_matches_in_db_order(self):
+        ihost = self._create_test_ihost()
+        node_disk = self._create_test_disk(ihost, '/dev/sdb', None)
+        path_disk = self._create_test_disk(ihost, '/dev/sdc',
+                                           '/dev/disk/by-path/b')
+
+        with mock.patch.object(self.dbapi, 'idisk_update',
+                               wraps=self.dbapi.idisk_update) as update:
+            self.service.idisk_update_by_ihost(
+                self.context, ihost['uuid'],
+                [self._get_test_agent_disk(
+                    '/dev/sdb', device_path='/dev/disk/by-path/b')])
+            self.assertEqual([node_disk['uuid'], path_disk['uuid']],
+                             [c[0][0] for c in update.call_args_list])
+
+    def test_idisk_update_by_ihost_cinder_device(self):
+        ihost = self._create_test_ihost(
+            subfunctions=constants.CONTROLLER + ',' + constants.WORKER)
+        cinder_disk = self._create_test_disk(ihost, '/dev/sdb',
+                                             '/dev/disk/by-path/b')
+        other_disk = self._create_test_disk(ihost, '/dev/sdc',
+                                            '/dev/disk/by-path/c')
+
+        with mock.patch.object(manager.StorageBackendConfig,
+                               'get_configured_backend_conf'), \
+                mock.patch.object(manager.cutils, '_get_cinder_device',
+                                  return_value='/dev/disk/by-path/b'):
+            self.service.idisk_update_by_ihost(
+                self.context, ihost['uuid'],
+                [self._get_test_agent_disk(
+                    '/dev/sdb', device_path='/dev/disk/by-path/b'),
+                 self._get_test_agent_disk(
+                     '/dev/sdc', device_path='/dev/disk/by-path/c')])
+
+        # only the cinder disk is flagged
+        disk = self.dbapi.idisk_get(cinder_disk['uuid'])
+        self.assertEqual('cinder_device',
+                         disk['capabilities'].get('device_function'))
+        disk = self.dbapi.idisk_get(other_disk['uuid'])
+        self.assertNotIn('device_function', disk['capabilities'])
+
+    def _get_test_agent_port(self, pname, mac):
+        return {'pname': pname,
+                'pnamedisplay': pname,
+                'mac': mac,
+                'pciaddr': '0000:00:03.0',
+                'speed': 10000,
+                'mtu': 1500,
+                'driver': 'ixgbe',
+                'dpdksupport': True,
+                'sriov_totalvfs': 0,
+                'sriov_numvfs': 0,
+                'sriov_vfs_pci_address': '',
+                'sriov_vf_driver': None}
+
+    def _iport_update_by_ihost(self, ihost, ports):
+        with mock.patch.object(self.service,
+                               '_find_local_mgmt_interface_vlan_id',
+                               return_value=None), \
+                mock.patch.object(self.service,
+                                  '_update_dependent_interfaces') as deps, \
+                mock.patch.object(self.dbapi,
+                                  'ethernet_port_create') as create:
+            self.service.iport_update_by_ihost(self.context, ihost['uuid'],
+                                               ports)
+        return deps, create
+
+    def test_iport_update_by_ihost_clone_mac_before_port_mac(self):
+        ihost = self._create_test_ihost()
+        mac = '08:00:27:00:00:10'
+        clone_mac = constants.CLONE_ISO_MAC + ihost['hostname'] + 'eth1'
+        clone = utils.create_test_interface(
+            ifname='data0', imac=clone_mac, forihostid=ihost['id'],
+            ihost_uuid=ihost['uuid'])
+        utils.create_test_interface(
+            ifname='eth1', imac=mac, forihostid=ihost['id'],
+            ihost_uuid=ihost['uuid'])
+
+        deps, create = self._iport_update_by_ihost(
+            ihost, [self._get_test_agent_port('eth1', mac)])
+
+        # the clone interface takes the MAC of the port, no port is created
+        self.assertEqual(mac, self.dbapi.iinterface_get(clone['uuid'])['imac'])
+        self.assertEqual(1, deps.call_count)
+        self.assertFalse(create.called)
+
+    def test_iport_update_by_ihost_clone_mac_after_port_mac(self):
+        ihost = self._create_test_ihost()
+        mac = '08:00:27:00:00:10'
+        clone_mac = constants.CLONE_ISO_MAC + ihost['hostname'] + 'eth1'
+        interface = utils.create_test_interface(
+            ifname='eth1', imac=mac, forihostid=ihost['id'],
+            ihost_uuid=ihost['uuid'])
+        clone = utils.create_test_interface(
+            ifname='data0', imac=clone_mac, forihostid=ihost['id'],
+            ihost_uuid=ihost['uuid'])
+
+        deps, create = self._iport_update_by_ihost(
+            ihost, [self._get_test_agent_port('eth1', mac)])
+
+        # the clone interface is left alone, the port is created on the
+        # interface with the MAC of the port
+        self.assertEqual(clone_mac,
+                         self.dbapi.iinterface_get(clone['uuid'])['imac'])
+        self.assertFalse(deps.called)
+        self.assertEqual(1, create.call_count)
+        self.assertEqual(interface['id'],
+                         create.call_args[0][1]['interface_id'])
+
+    def test_icpus_update_by_ihost_topology_change(self):
+        ihost = self._create_test_ihost()
+        self.dbapi.inode_create(ihost['id'], {'numa_node': 0,
+                                              'capabilities': {}})
+        cpus = [{'cpu': i, 'numa_node': 0, 'core': i // 2, 'thread': i % 2,
+                 'capabilities': {}} for i in range(4)]
+
+        with mock.patch.object(self.service, 'update_cpu_config'), \
+                mock.patch.object(self.dbapi, 'icpu_destroy',
+                                  wraps=self.dbapi.icpu_destroy) as destroy:
+            self.service.icpus_update_by_ihost(self.context, ihost['uuid'],
+                                               cpus)
+            self.assertEqual(
+                4, len(self.dbapi.icpu_get_by_ihost(ihost['uuid'])))
+
+            # an unchanged topology is not recreated
+            self.service.icpus_update_by_ihost(self.context, ihost['uuid'],
+                                               [dict(c) for c in cpus])
+            self.assertFalse(destroy.called)
+
+            # a change of topology is detected from the cpu diff
+            cpus = [dict(c, core=c['cpu'], thread=0) for c in cpus]
+            self.service.icpus_update_by_ihost(self.context, ihost['uuid'],
+                                               cpus)
+            self.assertEqual(4, destroy.call_count)
+
+        icpus = self.dbapi.icpu_get_by_ihost(ihost['uuid'])
+        self.assertEqual([0, 1, 2, 3], sorted(c['core'] for c in icpus))
+
+    def test_inventory_create_bulk_fallback(self):
+        ihost = self._create_test_ihost()
+        cpus = [utils.get_test_icpu(id=i + 1, forinodeid=1, cpu=i)
+                for i in range(4)]
+        self.dbapi.icpu_create(ihost['id'], dict(cpus[1]))
+
+        # the cpus are created one at a time once the bulk create fails
+        records = self.service._create_inventory_bulk(
+            self.dbapi.icpu_create_bulk, self.dbapi.icpu_create,
+            ihost['id'], cpus)
+        self.assertEqual([0, 2, 3], [c['cpu'] for c in records])
+        self.assertEqual(
+            4, len(self.dbapi.icpu_get_all(forihostid=ihost['id'])))
+
+    def test_imemory_update_by_ihost_bulk_fallback(self):
+        ihost = self._create_test_ihost()
+        for numa_node in range(2):
+            self.dbapi.inode_create(ihost['id'], {'numa_node': numa_node,
+                                                  'capabilities': {}})
+        memory = [{'numa_node': n, 'memtotal_mib': 1000,
+                   'memavail_mib': 500, 'hugepages_configured': False}
+                  for n in range(2)]
+
+        # the memory is created one node at a time once the bulk create fails
+        with mock.patch.object(self.dbapi, 'imemory_create_bulk',
+                               side_effect=exception.SysinvException()):
+            self.service.imemory_update_by_ihost(
+                self.context, ihost['uuid'], [dict(m) for m in memory],
+                False)
+        imems = self.dbapi.imemory_get_all(forihostid=ihost['id'])
+        self.assertEqual(2, len(imems))
+
+        # the memory is updated one node at a time once the bulk update
+        # fails, a node that fails to update does not stop the others
+        update = self.dbapi.imemory_update
+        failed = imems[0]['uuid']
+
+        def update_memory(uuid, values):
+            if uuid == failed:
+                raise exception.SysinvException()
+            return update(uuid, values)
+
+        memory = [dict(m, memtotal_mib=2000) for m in memory]
+        with mock.patch.object(self.dbapi, 'imemory_update_bulk',
+                               side_effect=exception.SysinvException()), \
+                mock.patch.object(self.dbapi, 'imemory_update',
+                                  side_effect=update_memory) as single:
+            self.service.imemory_update_by_ihost(
+                self.context, ihost['uuid'], memory, False)
+            self.assertEqual(2, single.call_count)
+        memtotal = dict((m['uuid'], m['memtotal_mib']) for m in
+                        self.dbapi.imemory_get_all(forihostid=ihost['id']))
+        self.assertEqual(1000, memtotal.pop(failed))
+        self.assertEqual([2000], list(memtotal.values()))
+
+    def _set_test_dnsmasq_hosts(self):
+        self.service._dnsmasq_addn_hosts = [
+            ('192.168.202.2', constants.PXECONTROLLER_HOSTNAME)]
+        self.service._dnsmasq_hosts = collections.OrderedDict([
+            ('controller-0', ('192.168.204.3', '08:00:27:00:00:01')),
+            ('worker-0', ('192.168.204.10', '08:00:27:00:00:10'))])
+
+    @mock.patch('os.system')
+    def test_dnsmasq_hosts_updates_coalesced(self, mock_system):
+        path = self.useFixture(fixtures.TempDir()).path + '/'
+        hosts_file = path + 'dnsmasq.hosts'
+        self.service._dnsmasq_hosts_files = mock.Mock(
+            return_value=(hosts_file, path + 'dnsmasq.addn_hosts'))
+        self.service._load_dnsmasq_hosts = mock.Mock(
+            side_effect=self._set_test_dnsmasq_hosts)
+
+        ihost = self._create_test_ihost(hostname='worker-0')
+        with mock.patch.object(manager.greenthread,
+                               'spawn_after') as spawn_after:
+            self.service._generate_dnsmasq_hosts_file()
+            self.service._update_dnsmasq_host(ihost, deleted=True)
+            self.service._generate_dnsmasq_hosts_file()
+            self.service._update_dnsmasq_host(ihost, deleted=True)
+            spawn_after.assert_called_once_with(
+                manager.CONF.conductor.dnsmasq_reload_delay,
+                self.service._write_dnsmasq_hosts_file)
+
+        with mock.patch.object(manager.tsc, 'CONFIG_PATH', path):
+            self.service._write_dnsmasq_hosts_file()
+
+        # worker-0 has no mgmt address so its entry is removed
+        self.service._load_dnsmasq_hosts.assert_called_once_with()
+        mock_system.assert_called_once_with("pkill -HUP dnsmasq")
+        with open(hosts_file) as f:
+            self.assertEqual(
+                "08:00:27:00:00:01,controller-0,192.168.204.3,1d\n",
+                f.read())
+        self.assertTrue(os.path.isfile(path + 'dnsmasq.addn_hosts_dc'))
+
+        # The entries are kept in memory for the next updates, written
+        # right away without a reload delay
+        self.config(dnsmasq_reload_delay=0, group='conductor')
+        with mock.patch.object(manager.tsc, 'CONFIG_PATH', path):
+            self.service._update_dnsmasq_host(ihost)
+        self.service._load_dnsmasq_hosts.assert_called_once_with()
+        self.assertEqual(2, mock_system.call_count)
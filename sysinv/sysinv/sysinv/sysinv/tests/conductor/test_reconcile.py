@@ -0,0 +1,85 @@
+# Copyright (c) 2019 Wind River Systems, Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+"""Tests for the inventory reconciliation."""
+
+import mock
+
+from sysinv.conductor import reconcile
+from sysinv.tests import base
+
+
+class InventoryReconcilerTestCase(base.TestCase):
+
+    def setUp(self):
+        super(InventoryReconcilerTestCase, self).setUp()
+        self.reconciler = reconcile.InventoryReconciler(
+            'pci_device', 'pciaddr', fields=['driver', 'sriov_numvfs'])
+        self.stored = [
+            {'uuid': 'uuid-0', 'pciaddr': '0000:00:00.0', 'driver': 'ixgbe',
+             'sriov_numvfs': 0},
+            {'uuid': 'uuid-1', 'pciaddr': '0000:00:01.0', 'driver': 'ixgbe',
+             'sriov_numvfs': 0},
+            {'uuid': 'uuid-2', 'pciaddr': '0000:00:02.0', 'driver': 'i40e',
+             'sriov_numvfs': 0},
+        ]
+        self.reported = [
+            {'pciaddr': '0000:00:00.0', 'driver': 'ixgbe', 'sriov_numvfs': 0,
+             'name': 'pci_0000_00_00_0'},
+            {'pciaddr': '0000:00:01.0', 'driver': 'ixgbe', 'sriov_numvfs': 4},
+            {'pciaddr': '0000:00:03.0', 'driver': 'i40e', 'sriov_numvfs': 0},
+        ]
+
+    def test_diff(self):
+        diff = self.reconciler.diff('host', self.reported, self.stored)
+        self.assertEqual([self.reported[2]], diff.create)
+        self.assertEqual([self.stored[2]], diff.delete)
+        self.assertEqual([(self.stored[1], {'sriov_numvfs': 4})], diff.update)
+        self.assertEqual(2, len(diff.matched))
+        self.assertTrue(diff.changed)
+        self.assertEqual('1 created, 1 updated, 1 unchanged, 1 deleted',
+                         str(diff))
+
+    def test_diff_unchanged(self):
+        diff = self.reconciler.diff('host', self.stored, self.stored)
+        self.assertFalse(diff.changed)
+        self.assertEqual([], diff.update)
+
+    def test_diff_field_mapping(self):
+        reconciler = reconcile.InventoryReconciler(
+            'ethernet_port', ('pciaddr', 'driver'),
+            fields={'sriov_numvfs': 'numvfs'},
+            stored_key=lambda port: (port['pciaddr'], port['driver']))
+        stored = [{'uuid': 'uuid-0', 'pciaddr': '0000:00:00.0',
+                   'driver': 'ixgbe', 'numvfs': 2}]
+        diff = reconciler.diff('host', self.reported, stored)
+        self.assertEqual([(stored[0], {'numvfs': 0})], diff.update)
+        self.assertEqual(self.reported[1:], diff.create)
+
+    def test_index_first_item_wins(self):
+        stored = self.stored + [{'uuid': 'uuid-3', 'pciaddr': '0000:00:00.0'},
+                                {'uuid': 'uuid-4', 'pciaddr': None}]
+        index = self.reconciler.index(stored)
+        self.assertEqual(['0000:00:00.0', '0000:00:01.0', '0000:00:02.0'],
+                         list(index))
+        self.assertEqual('uuid-0', index['0000:00:00.0']['uuid'])
+
+    def test_apply(self):
+        diff = self.reconciler.diff('host', self.reported, self.stored)
+        create, update, delete = mock.Mock(), mock.Mock(), mock.Mock()
+        self.reconciler.apply(diff, create=create, update=update,
+                              delete=delete)
+        create.assert_called_once_with([self.reported[2]])
+        update.assert_called_once_with([{'uuid': 'uuid-1',
+                                         'sriov_numvfs': 4}])
+        delete.assert_called_once_with([self.stored[2]])
+
+        # Nothing is applied without changes
+        diff = self.reconciler.diff('host', self.stored, self.stored)
+        create.reset_mock()
+        update.reset_mock()
+        self.reconciler.apply(diff, create=create, update=update)
+        self.assertFalse(create.called)
+        self.assertFalse(update.called)
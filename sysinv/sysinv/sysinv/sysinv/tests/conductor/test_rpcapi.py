@@ -95,3 +95,32 @@ class RPCAPITestCase(base.DbTestCase):
                           'call',
                           host=self.fake_ihost,
                           do_worker_apply=False)
+
+    def test_inventory_report_by_ihost(self):
+        self._test_rpcapi('inventory_report_by_ihost',
+                          'call',
+                          ihost_uuid=self.fake_ihost['uuid'],
+                          inventory={'idisk': [], 'ilvg': []},
+                          version='1.2')
+
+    def test_get_periodic_task_stats(self):
+        self._test_rpcapi('get_periodic_task_stats',
+                          'call',
+                          version='1.3')
+
+    def test_get_inventory_report_stats(self):
+        self._test_rpcapi('get_inventory_report_stats',
+                          'call',
+                          version='1.5')
+
+    def test_create_ihosts(self):
+        self._test_rpcapi('create_ihosts',
+                          'call',
+                          values_list=[{'mgmt_mac': '00:11:22:33:44:55'}],
+                          version='1.4')
+
+    def test_configure_ihosts(self):
+        self._test_rpcapi('configure_ihosts',
+                          'call',
+                          hosts=[self.fake_ihost],
+                          version='1.4')
@@ -15,10 +15,34 @@
 
 """Sysinv DB test base class."""
 
+import fixtures
+import sqlalchemy
+
+from oslo_db.sqlalchemy import enginefacade
+
 from sysinv.openstack.common import context as sysinv_context
 from sysinv.tests import base
 
 
+class StatementCounter(fixtures.Fixture):
+    """Count the SQL statements executed while the fixture is in use."""
+
+    def setUp(self):
+        super(StatementCounter, self).setUp()
+        self.count = 0
+        self.statements = []
+        engine = enginefacade.get_legacy_facade().get_engine()
+        sqlalchemy.event.listen(engine, 'before_cursor_execute',
+                                self._count)
+        self.addCleanup(sqlalchemy.event.remove, engine,
+                        'before_cursor_execute', self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context,
+               executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+
 class DbTestCase(base.TestCase):
 
     def setUp(self):
@@ -127,6 +127,63 @@ class DbNodeTestCase(base.DbTestCase):
         self.assertEqual(n['id'], m['forihostid'])
         self.assertEqual(p['forinodeid'], m['forinodeid'])
 
+    def test_create_cpus_bulk(self):
+        n = self._create_test_ihost()
+        cpus = [utils.get_test_icpu(id=i + 1, forinodeid=1, cpu=i, core=i)
+                for i in range(8)]
+
+        res = self.dbapi.icpu_create_bulk(n['uuid'], cpus)
+        self.assertEqual(list(range(8)), [p['cpu'] for p in res])
+        self.assertEqual([n['id']] * 8, [p['forihostid'] for p in res])
+        self.assertEqual(8, len(self.dbapi.icpu_get_all(forihostid=n['id'])))
+
+        self.assertRaises(exception.CPUAlreadyExists,
+                          self.dbapi.icpu_create_bulk, n['id'], cpus[:1])
+
+    def test_update_memory_bulk(self):
+        n = self._create_test_ihost()
+        mems = self.dbapi.imemory_create_bulk(n['id'], [
+            utils.get_test_imemory(id=i + 1, forinodeid=i) for i in range(2)])
+
+        res = self.dbapi.imemory_update_bulk(
+            [{'uuid': m['uuid'], 'memtotal_mib': 1000 + i, 'numa_node': i}
+             for i, m in enumerate(mems)],
+            forihostid=n['id'])
+        self.assertEqual([mems[0]['uuid'], mems[1]['uuid']],
+                         [m['uuid'] for m in res])
+        self.assertEqual(
+            1001, self.dbapi.imemory_get(mems[1]['uuid'])['memtotal_mib'])
+
+        self.assertRaises(exception.ServerNotFound,
+                          self.dbapi.imemory_update_bulk,
+                          [{'uuid': mems[0]['uuid'], 'memtotal_mib': 0}],
+                          forihostid=n['id'] + 1)
+        self.assertEqual(
+            1000, self.dbapi.imemory_get(mems[0]['uuid'])['memtotal_mib'])
+
+    def test_transaction_caught_error(self):
+        n = self._create_test_ihost()
+        with self.dbapi.transaction():
+            self.dbapi.inode_create(n['id'], {'numa_node': 0})
+            # only the failed call is rolled back
+            self.assertRaises(exception.NodeAlreadyExists,
+                              self.dbapi.inode_create, n['id'],
+                              {'numa_node': 0})
+            self.dbapi.inode_create(n['id'], {'numa_node': 1})
+        self.assertEqual([0, 1], sorted(
+            node['numa_node'] for node in self.dbapi.inode_get_all(n['id'])))
+
+    def test_transaction_rolled_back(self):
+        n = self._create_test_ihost()
+
+        def create_nodes():
+            with self.dbapi.transaction():
+                self.dbapi.inode_create(n['id'], {'numa_node': 0})
+                raise exception.SysinvException()
+
+        self.assertRaises(exception.SysinvException, create_nodes)
+        self.assertEqual([], self.dbapi.inode_get_all(n['id']))
+
     def test_create_networkPort_on_a_server(self):
         n = self._create_test_ihost()
 
@@ -389,3 +446,67 @@ class DbNodeTestCase(base.DbTestCase):
 
         upd = self.dbapi.storage_ceph_update(res['id'], values)
         self.assertEqual(values['services'], upd['services'])
+
+
+class DbLoadProfileTestCase(base.DbTestCase):
+    """The list calls must not issue one query per returned row."""
+
+    def setUp(self):
+        super(DbLoadProfileTestCase, self).setUp()
+        self.dbapi = dbapi.get_instance()
+        self.system = utils.create_test_isystem()
+        self.load = utils.create_test_load()
+        self.network = utils.create_test_network(
+            type=constants.NETWORK_TYPE_MGMT)
+        self.datanetwork = utils.create_test_datanetwork(
+            name='physnet0', network_type=constants.DATANETWORK_TYPE_VLAN)
+        self.hosts = 0
+
+    def _create_test_ihosts(self, count):
+        for index in range(self.hosts, self.hosts + count):
+            host = utils.create_test_ihost(
+                id=index + 1,
+                uuid=uuidutils.generate_uuid(),
+                hostname='worker-%d' % index,
+                personality=constants.WORKER,
+                mgmt_mac='02:00:00:00:00:%02x' % index,
+                mgmt_ip='192.168.204.%d' % (index + 2),
+                forisystemid=self.system.id)
+            interface = utils.create_test_interface(
+                uuid=uuidutils.generate_uuid(),
+                forihostid=host.id,
+                ifname='data0',
+                ifclass=constants.INTERFACE_CLASS_DATA,
+                datanetworks='physnet0')
+            utils.create_test_interface_network(
+                interface_id=interface.id, network_id=self.network.id)
+        self.hosts += count
+
+    def _count_statements(self, function, *args, **kwargs):
+        counts = []
+        for count in (2, 10):
+            self._create_test_ihosts(count)
+            with base.StatementCounter() as counter:
+                result = function(*args, **kwargs)
+            self.assertEqual(self.hosts, len(result))
+            counts.append(counter.count)
+        return counts
+
+    def test_ihost_get_list_statements(self):
+        first, second = self._count_statements(self.dbapi.ihost_get_list)
+        self.assertEqual(first, second)
+
+    def test_iinterface_get_all_statements(self):
+        first, second = self._count_statements(self.dbapi.iinterface_get_all)
+        self.assertEqual(first, second)
+
+    def test_iinterface_get_list_statements(self):
+        first, second = self._count_statements(self.dbapi.iinterface_get_list)
+        self.assertEqual(first, second)
+
+    def test_iinterface_get_all_foreign_fields(self):
+        self._create_test_ihosts(1)
+        interface = self.dbapi.iinterface_get_all()[0]
+        self.assertEqual([str(self.network.id)], interface.networks)
+        self.assertEqual([str(self.datanetwork.id)], interface.datanetworks)
+        self.assertIsNotNone(interface.ihost_uuid)
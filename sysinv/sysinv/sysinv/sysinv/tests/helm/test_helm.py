@@ -0,0 +1,101 @@
+# Copyright (c) 2019 Wind River Systems, Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import mock
+
+from sysinv.common import constants
+from sysinv.helm import helm
+from sysinv.tests import base
+from sysinv.tests.db import base as dbbase
+from sysinv.tests.db import utils as dbutils
+
+
+class HelmOverridesCacheTestCase(base.TestCase):
+
+    def setUp(self):
+        super(HelmOverridesCacheTestCase, self).setUp()
+        self.dbapi = mock.Mock()
+        self.fingerprints = {'i_host': (1, None, None)}
+        self.dbapi.table_fingerprints_get.side_effect = \
+            lambda tables, columns=None: dict(self.fingerprints)
+
+        self.operator = helm.HelmOperator(self.dbapi)
+        self.chart = mock.Mock()
+        self.chart.get_overrides.side_effect = \
+            lambda namespace: {'openstack': {'pod': {'replicas': 1}}}
+        self.operator.chart_operators = {'chart': self.chart}
+
+    def test_overrides_cached(self):
+        first = self.operator.get_helm_chart_overrides('chart')
+        second = self.operator.get_helm_chart_overrides('chart')
+
+        self.assertEqual(first, second)
+        self.assertEqual(1, self.chart.get_overrides.call_count)
+
+    def test_cached_overrides_not_shared(self):
+        first = self.operator.get_helm_chart_overrides('chart')
+        first['openstack']['pod']['replicas'] = 3
+        second = self.operator.get_helm_chart_overrides('chart')
+
+        self.assertEqual(1, second['openstack']['pod']['replicas'])
+
+    def test_overrides_recomputed_on_change(self):
+        self.operator.get_helm_chart_overrides('chart')
+        self.fingerprints['i_host'] = (2, None, None)
+        self.operator.get_helm_chart_overrides('chart')
+
+        self.assertEqual(2, self.chart.get_overrides.call_count)
+
+    def test_overrides_cached_per_namespace(self):
+        self.operator.get_helm_chart_overrides('chart', 'openstack')
+        self.operator.get_helm_chart_overrides('chart')
+
+        self.assertEqual(2, self.chart.get_overrides.call_count)
+
+    def test_invalidate_overrides_cache(self):
+        self.operator.get_helm_chart_overrides('chart')
+        self.operator.invalidate_overrides_cache()
+        self.operator.get_helm_chart_overrides('chart')
+
+        self.assertEqual(2, self.chart.get_overrides.call_count)
+
+
+class HelmOverridesCacheDbTestCase(dbbase.DbTestCase):
+
+    def setUp(self):
+        super(HelmOverridesCacheDbTestCase, self).setUp()
+        self.host = dbutils.create_test_ihost()
+        self.app = self.dbapi.kube_app_create({
+            'name': 'test-app',
+            'app_version': '1.0',
+            'manifest_name': 'manifest',
+            'manifest_file': 'manifest.yaml',
+            'status': constants.APP_UPLOAD_SUCCESS})
+
+        self.operator = helm.HelmOperator(self.dbapi)
+        self.chart = mock.Mock()
+        self.chart.get_overrides.return_value = {}
+        self.operator.chart_operators = {'chart': self.chart}
+
+    def test_overrides_cached_across_apply_status_updates(self):
+        self.operator.get_helm_chart_overrides('chart')
+        self.dbapi.kube_app_update(self.app.id, {
+            'status': constants.APP_APPLY_IN_PROGRESS,
+            'progress': 'processing chart: chart',
+            'chart_timeline': {'chart': {'status': 'installed'}}})
+        self.dbapi.ihost_update(self.host.id, {
+            'availability': constants.AVAILABILITY_AVAILABLE,
+            'uptime': 1000})
+        self.operator.get_helm_chart_overrides('chart')
+
+        self.assertEqual(1, self.chart.get_overrides.call_count)
+
+    def test_overrides_recomputed_on_host_change(self):
+        self.operator.get_helm_chart_overrides('chart')
+        self.dbapi.ihost_update(self.host.id,
+                                {'invprovision': constants.PROVISIONED})
+        self.operator.get_helm_chart_overrides('chart')
+
+        self.assertEqual(2, self.chart.get_overrides.call_count)
@@ -0,0 +1,75 @@
+# Copyright (c) 2019 Wind River Systems, Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import os
+import yaml
+
+from sysinv.common import exception
+from sysinv.helm import values
+from sysinv.tests import base
+
+GOLDEN_CASES = os.path.join(os.path.dirname(__file__),
+                            'data', 'merge_overrides.yaml')
+
+
+class MergeOverridesGoldenTestCase(base.TestCase):
+    """Compare the merged overrides against recorded helm output"""
+
+    def setUp(self):
+        super(MergeOverridesGoldenTestCase, self).setUp()
+        with open(GOLDEN_CASES) as f:
+            self.cases = yaml.safe_load(f)
+
+    def test_golden_cases(self):
+        for case in self.cases:
+            merged = values.merge_overrides(file_overrides=case['files'],
+                                            set_overrides=case['set'])
+            self.assertEqual(yaml.safe_load(case['helm_output']),
+                             yaml.safe_load(merged),
+                             "golden case %s" % case['name'])
+
+
+class MergeOverridesTestCase(base.TestCase):
+
+    def test_merge_values_prefers_source(self):
+        dest = {'a': {'b': 1, 'c': [1, 2]}, 'd': 'x'}
+        src = {'a': {'c': [3]}, 'd': {'e': 'y'}}
+        self.assertEqual({'a': {'b': 1, 'c': [3]}, 'd': {'e': 'y'}},
+                         values.merge_values(dest, src))
+
+    def test_no_overrides(self):
+        self.assertEqual({}, yaml.safe_load(values.merge_overrides()))
+
+    def test_set_key_without_value(self):
+        for expression in ['name', 'outer.inner', 'a,b=1']:
+            self.assertRaises(exception.InvalidHelmOverrides,
+                              values.parse_set_into, expression, {})
+
+    def test_set_invalid_list(self):
+        for expression in ['list={a,b', 'list[x]=1', 'list[0]x=1']:
+            self.assertRaises(exception.InvalidHelmOverrides,
+                              values.parse_set_into, expression, {})
+
+    def test_invalid_values_document(self):
+        self.assertRaises(exception.InvalidHelmOverrides,
+                          values.merge_overrides,
+                          file_overrides=['- not\n- a map\n'])
+        self.assertRaises(exception.InvalidHelmOverrides,
+                          values.merge_overrides,
+                          file_overrides=['a: [unterminated\n'])
+
+    def test_unicode_values_are_plain_yaml(self):
+        merged = values.merge_overrides(
+            file_overrides=[u'image:\n  repository: caf\xe9\n'],
+            set_overrides=[u'image.tag=v1'])
+        self.assertNotIn('!!python', merged)
+        self.assertEqual({'image': {'repository': u'caf\xe9', 'tag': 'v1'}},
+                         yaml.safe_load(merged))
+
+    def test_python_tags_are_rejected(self):
+        self.assertRaises(exception.InvalidHelmOverrides,
+                          values.merge_overrides,
+                          file_overrides=[
+                              'a: !!python/object/apply:os.getcwd []\n'])
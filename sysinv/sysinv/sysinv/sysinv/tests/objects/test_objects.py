@@ -22,11 +22,15 @@ import six
 gettext.install('sysinv')
 
 from sysinv.common import exception
+from sysinv import objects
 from sysinv.objects import base
 from sysinv.objects import utils
 from sysinv.openstack.common import context
+from sysinv.openstack.common.rpc import common as rpc_common
 from sysinv.openstack.common import timeutils
+from sysinv.openstack.common import uuidutils
 from sysinv.tests import base as test_base
+from sysinv.tests.db import utils as dbutils
 
 
 class MyObj(base.SysinvObject):
@@ -519,3 +523,100 @@ class TestObjectSerializer(test_base.TestCase):
             self.assertEqual(1, len(thing2))
             for item in thing2:
                 self.assertTrue(isinstance(item, MyObj))
+
+
+class TestPrimitiveCodecs(test_base.TestCase):
+    """Check the serialization of host and interface objects."""
+
+    NUM_HOSTS = 50
+    NUM_INTERFACES = 20
+
+    def _make_object(self, objclass, values):
+        obj = objclass()
+        for name, value in values.items():
+            if name in obj.fields and value is not None:
+                obj[name] = value
+        obj.uuid = uuidutils.generate_uuid()
+        obj.created_at = datetime.datetime(2019, 6, 1, 10, 0, 0,
+                                           tzinfo=iso8601.UTC)
+        obj.obj_reset_changes()
+        return obj
+
+    def _make_payload(self):
+        hosts = []
+        interfaces = []
+        for i in range(self.NUM_HOSTS):
+            host = self._make_object(
+                objects.host,
+                dbutils.get_test_ihost(id=i, hostname='compute-%d' % i,
+                                       capabilities={'is_max_cpu_configurable':
+                                                     'configurable'}))
+            hosts.append(host)
+            for j in range(self.NUM_INTERFACES):
+                interfaces.append(self._make_object(
+                    objects.interface,
+                    dbutils.get_test_interface(
+                        id=i * self.NUM_INTERFACES + j, forihostid=i,
+                        ihost_uuid=host.uuid, ifname='eth%d' % j,
+                        ifclass='platform', networks=['1', '2'],
+                        uses=['eth0'], used_by=[])))
+        return hosts, interfaces
+
+    @staticmethod
+    def _to_primitive_by_attribute(obj):
+        # The per-attribute dispatch used before the field codecs
+        primitive = dict()
+        for name in obj.fields:
+            if hasattr(obj, base.get_attrname(name)):
+                primitive[name] = obj._attr_to_primitive(name)
+        return primitive
+
+    def test_field_codecs(self):
+        hosts, interfaces = self._make_payload()
+        for obj in hosts[:1] + interfaces[:1]:
+            primitive = obj.obj_to_primitive()
+            self.assertEqual(self._to_primitive_by_attribute(obj),
+                             primitive['sysinv_object.data'])
+
+            obj2 = base.SysinvObject.obj_from_primitive(primitive)
+            self.assertEqual(obj.__class__, obj2.__class__)
+            self.assertEqual(set(), obj2.obj_what_changed())
+            self.assertEqual(dict(obj.items()), dict(obj2.items()))
+
+    def test_rpc_envelope(self):
+        msg = {'result': [{'uuid': uuidutils.generate_uuid(),
+                           'created_at': '2019-06-01T10:00:00Z'}],
+               'failure': None}
+        envelope = rpc_common.serialize_msg(msg)
+        self.assertEqual('2.0', envelope['oslo.version'])
+        self.assertNotIn('oslo.codec', envelope)
+        self.assertEqual(msg, rpc_common.deserialize_msg(envelope))
+
+        self.assertRaises(rpc_common.UnsupportedRpcPayloadCodec,
+                          rpc_common.serialize_msg, msg, 'unknown')
+        envelope['oslo.codec'] = 'unknown'
+        self.assertRaises(rpc_common.UnsupportedRpcPayloadCodec,
+                          rpc_common.deserialize_msg, envelope)
+
+        if not rpc_common.payload_codec_supported('msgpack'):
+            self.skipTest('msgpack is not available')
+        envelope = rpc_common.serialize_msg(msg, 'msgpack')
+        self.assertEqual('2.1', envelope['oslo.version'])
+        self.assertEqual('msgpack', envelope['oslo.codec'])
+        self.assertEqual(msg, rpc_common.deserialize_msg(envelope))
+
+    def test_payload_codecs(self):
+        hosts, interfaces = self._make_payload()
+        primitives = [obj.obj_to_primitive() for obj in hosts + interfaces]
+        msg = {'result': primitives, 'failure': None}
+
+        envelope = rpc_common.serialize_msg(msg, 'json')
+        self.assertEqual(msg, rpc_common.deserialize_msg(envelope))
+        json_size = len(envelope['oslo.message'])
+
+        if not rpc_common.payload_codec_supported('msgpack'):
+            self.skipTest('msgpack is not available')
+        envelope = rpc_common.serialize_msg(msg, 'msgpack')
+        self.assertEqual('msgpack', envelope['oslo.codec'])
+        self.assertEqual(msg, rpc_common.deserialize_msg(envelope))
+        self.assertLess(len(envelope['oslo.message']), json_size)
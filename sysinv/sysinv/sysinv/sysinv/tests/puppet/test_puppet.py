@@ -0,0 +1,179 @@
+# Copyright (c) 2019 Wind River Systems, Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+import eventlet
+import fixtures
+import mock
+
+from sysinv.common import constants
+from sysinv.puppet import base
+from sysinv.puppet import networking
+from sysinv.puppet import puppet
+
+from sysinv.tests.db import base as dbbase
+from sysinv.tests.db import utils as dbutils
+
+
+class FakePlugin(object):
+    """Puppet plugin recording the number of host configuration requests"""
+
+    def __init__(self, dependencies, key):
+        self.HOST_DEPENDENCIES = dependencies
+        self.key = key
+        self.calls = 0
+
+    def get_host_config(self, host):
+        self.calls += 1
+        return {self.key: host.hostname}
+
+
+class SnapshotPlugin(base.BasePuppet):
+    """Puppet plugin reading the system wide data of the snapshot"""
+
+    def get_host_config(self, host):
+        system = self._get_system()
+        # cache a host specific entry, then let the other hosts run
+        self.context['_address_names'][host.hostname] = host.uuid
+        eventlet.sleep(0)
+        return {'%s::system' % host.hostname: system.uuid,
+                '%s::addresses' % host.hostname:
+                    sorted(self.context['_address_names'])}
+
+
+class FakeExtension(object):
+    def __init__(self, name, obj):
+        self.name = name
+        self.obj = obj
+
+
+class PuppetOperatorTestCase(dbbase.DbTestCase):
+
+    def setUp(self):
+        super(PuppetOperatorTestCase, self).setUp()
+        self.path = self.useFixture(fixtures.TempDir()).path
+        self.operator = puppet.PuppetOperator(self.dbapi, path=self.path)
+
+        self.tracked = FakePlugin(('service_parameter',), 'tracked')
+        self.untracked = FakePlugin(None, 'untracked')
+        self.operator.puppet_plugins = [
+            FakeExtension('001_untracked', self.untracked),
+            FakeExtension('002_tracked', self.tracked),
+        ]
+
+        self.system = dbutils.create_test_isystem()
+        self.load = dbutils.create_test_load()
+        self.host = dbutils.create_test_ihost(
+            personality=constants.CONTROLLER,
+            hostname='controller-0',
+            mgmt_ip='192.168.204.3',
+            forisystemid=self.system.id)
+
+    def test_update_hosts_config_reuses_unchanged_plugin_output(self):
+        self.operator.update_hosts_config([self.host])
+        self.operator.update_hosts_config([self.host])
+
+        self.assertEqual(2, self.untracked.calls)
+        self.assertEqual(1, self.tracked.calls)
+
+    def test_update_hosts_config_regenerates_on_dependency_change(self):
+        self.operator.update_hosts_config([self.host])
+        self.dbapi.service_parameter_create({
+            'service': constants.SERVICE_TYPE_HTTP,
+            'section': constants.SERVICE_PARAM_SECTION_HTTP_CONFIG,
+            'name': constants.SERVICE_PARAM_HTTP_PORT_HTTP,
+            'value': '8080'})
+        self.operator.update_hosts_config([self.host])
+
+        self.assertEqual(2, self.tracked.calls)
+
+    def test_update_host_config_always_regenerates(self):
+        self.operator.update_host_config(self.host)
+        self.operator.update_host_config(self.host)
+
+        self.assertEqual(2, self.untracked.calls)
+        self.assertEqual(2, self.tracked.calls)
+
+    def test_unchanged_host_config_not_rewritten(self):
+        with mock.patch.object(self.operator, '_write_file',
+                               wraps=self.operator._write_file) as write:
+            self.operator.update_hosts_config([self.host])
+            self.operator.update_hosts_config([self.host])
+            self.assertEqual(1, write.call_count)
+
+    def _setup_networking_plugin(self):
+        self.tracked.HOST_DEPENDENCIES = \
+            networking.NetworkingPuppet.HOST_DEPENDENCIES
+        return dbutils.create_test_interface(
+            ifname='eth0', forihostid=self.host.id,
+            ihost_uuid=self.host.uuid)
+
+    def test_update_hosts_config_regenerates_on_vlan_change(self):
+        port = self._setup_networking_plugin()
+        vlan = dbutils.create_test_interface(
+            ifname='vlan10', iftype=constants.INTERFACE_TYPE_VLAN,
+            vlan_id=10, uses=[port.ifname], forihostid=self.host.id,
+            ihost_uuid=self.host.uuid)
+        self.operator.update_hosts_config([self.host])
+
+        self.dbapi.iinterface_update(vlan.uuid, {'vlan_id': 20})
+        self.operator.update_hosts_config([self.host])
+
+        self.assertEqual(2, self.tracked.calls)
+
+    def test_update_hosts_config_regenerates_on_ae_change(self):
+        port = self._setup_networking_plugin()
+        ae = dbutils.create_test_interface(
+            ifname='bond0', iftype=constants.INTERFACE_TYPE_AE,
+            aemode='balanced', txhashpolicy='layer2', uses=[port.ifname],
+            forihostid=self.host.id, ihost_uuid=self.host.uuid)
+        self.operator.update_hosts_config([self.host])
+
+        self.dbapi.iinterface_update(ae.uuid, {'aemode': 'active_standby'})
+        self.operator.update_hosts_config([self.host])
+
+        self.assertEqual(2, self.tracked.calls)
+
+    def _create_test_hosts(self, count):
+        return [self.host] + [
+            dbutils.create_test_ihost(
+                personality=constants.WORKER,
+                hostname='worker-%d' % i,
+                mgmt_mac='08:00:27:00:00:%02x' % i,
+                mgmt_ip='192.168.204.%d' % (10 + i),
+                forisystemid=self.system.id)
+            for i in range(count - 1)]
+
+    def test_update_hosts_config_reads_snapshot_once(self):
+        hosts = self._create_test_hosts(3)
+        plugin = SnapshotPlugin(self.operator)
+        self.operator.puppet_plugins = [FakeExtension('001_snapshot', plugin)]
+
+        with mock.patch.object(self.dbapi, 'isystem_get_one',
+                               wraps=self.dbapi.isystem_get_one) as system, \
+                mock.patch.object(self.operator,
+                                  '_write_host_config') as write:
+            self.operator.update_hosts_config(hosts)
+
+            self.assertEqual(1, system.call_count)
+            self.assertEqual(3, write.call_count)
+            for host, config in (c[0] for c in write.call_args_list):
+                self.assertEqual(self.system.uuid,
+                                 config['%s::system' % host.hostname])
+
+    def test_update_hosts_config_isolates_host_contexts(self):
+        hosts = self._create_test_hosts(3)
+        plugin = SnapshotPlugin(self.operator)
+        self.operator.puppet_plugins = [FakeExtension('001_snapshot', plugin)]
+
+        with mock.patch.object(self.operator, '_write_host_config') as write:
+            self.operator.update_hosts_config(hosts)
+
+            # the entries cached while rendering the other hosts are not
+            # seen, although the hosts were rendered concurrently
+            hostnames = set(h.hostname for h in hosts)
+            for host, config in (c[0] for c in write.call_args_list):
+                addresses = config['%s::addresses' % host.hostname]
+                self.assertEqual([host.hostname],
+                                 [a for a in addresses if a in hostnames])
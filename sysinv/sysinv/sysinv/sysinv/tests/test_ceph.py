@@ -0,0 +1,116 @@
+# Copyright (c) 2019 Wind River Systems, Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+"""Tests for the Ceph cluster state snapshot."""
+
+import mock
+
+from sysinv.common import ceph
+from sysinv.common import constants
+from sysinv.common import exception
+from sysinv.tests import base
+
+
+OSD_DUMP = {
+    'pools': [{'pool': 1, 'pool_name': 'kube-rbd', 'size': 2,
+               'min_size': 1, 'pg_num': 64, 'pg_placement_num': 32}],
+    'osds': [{'osd': 0, 'up': 1, 'in': 1},
+             {'osd': 1, 'up': 0, 'in': 1},
+             {'osd': 2, 'up': 0, 'in': 0}],
+}
+
+OSD_TREE = {
+    'nodes': [
+        {'id': -1, 'name': 'storage-tier', 'type': 'root',
+         'children': [-2]},
+        {'id': -2, 'name': 'group-0', 'type': 'chassis',
+         'children': [-4, -3]},
+        {'id': -3, 'name': 'storage-0', 'type': 'host',
+         'children': [0]},
+        {'id': 0, 'name': 'osd.0', 'type': 'osd', 'status': 'up'},
+        {'id': -4, 'name': 'storage-1', 'type': 'host',
+         'children': [2, 1]},
+        {'id': 1, 'name': 'osd.1', 'type': 'osd', 'status': 'down'},
+        {'id': 2, 'name': 'osd.2', 'type': 'osd', 'status': 'down'},
+    ],
+    'stray': [],
+}
+
+
+def _response(output, ok=True):
+    return mock.MagicMock(ok=ok, reason='Bad Request'), {'output': output}
+
+
+class CephClusterStateTestCase(base.TestCase):
+
+    def setUp(self):
+        super(CephClusterStateTestCase, self).setUp()
+        self.ceph_api = mock.Mock()
+        self.ceph_api.osd_dump.return_value = _response(OSD_DUMP)
+        self.ceph_api.osd_tree.return_value = _response(OSD_TREE)
+        self.ceph_api.status.return_value = _response(
+            {'health': {'status': constants.CEPH_HEALTH_OK}})
+
+    def test_queries_are_sent_once(self):
+        state = ceph.CephClusterState(self.ceph_api)
+        self.assertEqual(64, state.pool('kube-rbd')['pg_num'])
+        self.assertEqual(32, state.pool('kube-rbd')['pgp_num'])
+        self.assertIsNone(state.pool('cinder-volumes'))
+        self.assertEqual({'num_osds': 3, 'num_up_osds': 1, 'num_in_osds': 2},
+                         state.osd_stats())
+        self.assertTrue(state.health_ok())
+        self.assertTrue(state.health_ok())
+
+        self.assertEqual(1, self.ceph_api.osd_dump.call_count)
+        self.assertEqual(1, self.ceph_api.status.call_count)
+        self.assertFalse(self.ceph_api.osd_tree.called)
+
+    def test_osd_tree_lookups(self):
+        state = ceph.CephClusterState(self.ceph_api)
+        self.assertEqual('storage-0', state.osd_host(0))
+        self.assertEqual('storage-1', state.osd_host(2))
+        self.assertIsNone(state.osd_host(5))
+        self.assertEqual(['osd.2', 'osd.1'],
+                         [o['name'] for o in state.host_osds('storage-1')])
+        self.assertIsNone(state.host_osds('storage-2'))
+        self.assertEqual(1, self.ceph_api.osd_tree.call_count)
+
+    def test_failed_query_is_not_retried(self):
+        self.ceph_api.osd_dump.return_value = _response(None, ok=False)
+        state = ceph.CephClusterState(self.ceph_api)
+        self.assertRaises(exception.CephGetClusterStateFailure,
+                          state.pool, 'kube-rbd')
+        self.assertRaises(exception.CephGetClusterStateFailure,
+                          state.osd_stats)
+        self.assertEqual(1, self.ceph_api.osd_dump.call_count)
+
+    def test_health_not_ok(self):
+        self.ceph_api.status.side_effect = Exception('timeout')
+        state = ceph.CephClusterState(self.ceph_api)
+        self.assertFalse(state.health_ok())
+
+    def test_cache_ttl_and_invalidate(self):
+        cache = ceph.CephClusterStateCache(self.ceph_api, ttl=30)
+        state = cache.get()
+        self.assertIs(state, cache.get())
+        self.assertIsNot(state, cache.get(refresh=True))
+
+        state = cache.get()
+        cache.invalidate()
+        self.assertIsNot(state, cache.get())
+
+        state = cache.get()
+        state.created_at -= 30
+        self.assertIsNot(state, cache.get())
+
+    def test_check_osds_down_up(self):
+        with mock.patch.object(ceph.ceph, 'CephWrapper',
+                               return_value=self.ceph_api):
+            operator = ceph.CephApiOperator()
+        self.assertFalse(operator.check_osds_down_up('storage-0', True))
+        self.assertTrue(operator.check_osds_down_up('storage-1', True))
+        self.assertIsNone(operator.check_osds_down_up('storage-2', True))
+        self.assertEqual('storage-1', operator.osd_host_lookup(1))
+        self.assertEqual(3, self.ceph_api.osd_tree.call_count)
@@ -0,0 +1,100 @@
+# Copyright (c) 2019 Wind River Systems, Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+"""Tests for the kubernetes node label reconciliation."""
+
+import mock
+
+from sysinv.common import exception
+from sysinv.common import kubernetes
+from sysinv.tests import base
+
+
+def _node(name, labels=None, resource_version='1'):
+    metadata = mock.Mock(labels=labels, resource_version=resource_version)
+    metadata.name = name
+    return mock.Mock(metadata=metadata)
+
+
+def _host(host_id, hostname):
+    return mock.Mock(id=host_id, hostname=hostname)
+
+
+def _label(host_id, key, value):
+    return mock.Mock(host_id=host_id, label_key=key, label_value=value)
+
+
+class KubeNodeLabelReconcilerTestCase(base.TestCase):
+
+    def setUp(self):
+        super(KubeNodeLabelReconcilerTestCase, self).setUp()
+        self.kube = mock.Mock()
+        self.kube.kube_list_nodes.return_value = (
+            [_node('controller-0', {'openstack-control-plane': 'enabled'}),
+             _node('compute-0')], '10')
+        self.kube.kube_watch_nodes.return_value = []
+        self.reconciler = kubernetes.KubeNodeLabelReconciler(self.kube)
+        self.hosts = [_host(1, 'controller-0'), _host(2, 'compute-0'),
+                      _host(3, 'compute-1')]
+        self.labels = [
+            _label(1, 'openstack-control-plane', 'enabled'),
+            _label(2, 'openstack-compute-node', 'enabled'),
+            _label(2, 'sriov', 'enabled'),
+            _label(3, 'sriov', 'enabled'),
+        ]
+
+    def test_one_patch_per_node(self):
+        self.assertEqual(1, self.reconciler.reconcile(self.hosts,
+                                                      self.labels))
+        self.kube.kube_patch_node.assert_called_once_with(
+            'compute-0', {'metadata': {'labels': {
+                'openstack-compute-node': 'enabled', 'sriov': 'enabled'}}})
+
+        # The patched labels are not sent again
+        self.kube.kube_patch_node.reset_mock()
+        self.assertEqual(0, self.reconciler.reconcile(self.hosts,
+                                                      self.labels))
+        self.assertFalse(self.kube.kube_patch_node.called)
+        self.assertEqual(1, self.kube.kube_list_nodes.call_count)
+        self.kube.kube_watch_nodes.assert_called_once_with(
+            '10', kubernetes.KUBE_NODE_WATCH_TIMEOUT)
+
+    def test_watch_updates_nodes(self):
+        self.reconciler.reconcile(self.hosts, self.labels)
+        self.kube.kube_patch_node.reset_mock()
+
+        self.kube.kube_watch_nodes.return_value = [
+            {'type': 'ADDED', 'object': _node('compute-1', None, '11')},
+            {'type': 'DELETED', 'object': _node('compute-0', None, '12')},
+        ]
+        self.assertEqual(1, self.reconciler.reconcile(self.hosts,
+                                                      self.labels))
+        self.kube.kube_patch_node.assert_called_once_with(
+            'compute-1', {'metadata': {'labels': {'sriov': 'enabled'}}})
+        self.kube.kube_watch_nodes.return_value = []
+        self.reconciler.reconcile(self.hosts, self.labels)
+        self.kube.kube_watch_nodes.assert_called_with(
+            '12', kubernetes.KUBE_NODE_WATCH_TIMEOUT)
+        self.assertEqual(1, self.kube.kube_list_nodes.call_count)
+
+    def test_watch_error_lists_nodes(self):
+        self.reconciler.refresh()
+        self.kube.kube_watch_nodes.return_value = [
+            {'type': 'ERROR', 'raw_object': {'code': 410}}]
+        self.reconciler.refresh()
+        self.assertEqual(2, self.kube.kube_list_nodes.call_count)
+
+        self.kube.kube_watch_nodes.side_effect = Exception('timeout')
+        self.reconciler.refresh()
+        self.assertEqual(3, self.kube.kube_list_nodes.call_count)
+
+    def test_patch_failures(self):
+        self.kube.kube_patch_node.side_effect = exception.K8sNodeNotFound(
+            name='compute-0')
+        self.assertEqual(0, self.reconciler.reconcile(self.hosts,
+                                                      self.labels))
+        self.kube.kube_patch_node.reset_mock()
+        self.reconciler.reconcile(self.hosts, self.labels)
+        self.assertFalse(self.kube.kube_patch_node.called)
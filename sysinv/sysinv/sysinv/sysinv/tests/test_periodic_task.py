@@ -0,0 +1,102 @@
+# Copyright (c) 2019 Wind River Systems, Inc.
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+
+"""Tests for the periodic task scheduler."""
+
+import eventlet
+from eventlet import event
+
+from sysinv.openstack.common import periodic_task
+from sysinv.tests import base
+
+
+class ConcurrentTasks(periodic_task.PeriodicTasks):
+
+    _periodic_concurrent = True
+
+    def __init__(self):
+        self.slow_event = event.Event()
+        self.calls = []
+
+    @periodic_task.periodic_task(spacing=60, run_immediately=True)
+    def _slow_task(self, context):
+        self.calls.append('slow')
+        self.slow_event.wait()
+
+    @periodic_task.periodic_task(spacing=60, run_immediately=True)
+    def _fast_task(self, context):
+        self.calls.append('fast')
+
+    @periodic_task.periodic_task(spacing=60, run_immediately=True,
+                                 timeout=0.01)
+    def _hung_task(self, context):
+        eventlet.sleep(10)
+
+    @periodic_task.periodic_task(spacing=60, run_immediately=True)
+    def _failing_task(self, context):
+        raise ValueError('audit failed')
+
+
+class SerialTasks(periodic_task.PeriodicTasks):
+
+    @periodic_task.periodic_task(run_immediately=True)
+    def _failing_task(self, context):
+        raise ValueError('audit failed')
+
+
+class PeriodicTaskTestCase(base.TestCase):
+
+    def _run_all(self, tasks):
+        # Make every task due again and run one scheduler pass
+        for task_name, task in tasks._periodic_tasks:
+            tasks._periodic_last_run[task_name] = None
+        tasks.run_periodic_tasks(None)
+        eventlet.sleep(0.05)
+
+    def test_slow_task_does_not_block_others(self):
+        tasks = ConcurrentTasks()
+        self._run_all(tasks)
+        self.assertEqual(['fast', 'slow'], sorted(tasks.calls))
+
+        stats = tasks.periodic_task_stats()
+        self.assertTrue(stats['_slow_task']['running'])
+        self.assertEqual(0, stats['_slow_task']['runs'])
+        self.assertEqual(1, stats['_fast_task']['runs'])
+        tasks.slow_event.send()
+
+    def test_running_task_is_skipped(self):
+        tasks = ConcurrentTasks()
+        self._run_all(tasks)
+        self._run_all(tasks)
+        self.assertEqual(['fast', 'fast', 'slow'], sorted(tasks.calls))
+
+        stats = tasks.periodic_task_stats()
+        self.assertEqual(1, stats['_slow_task']['skipped'])
+        self.assertEqual(0, stats['_fast_task']['skipped'])
+
+        tasks.slow_event.send()
+        eventlet.sleep(0)
+        stats = tasks.periodic_task_stats()
+        self.assertFalse(stats['_slow_task']['running'])
+        self.assertEqual(1, stats['_slow_task']['runs'])
+
+    def test_task_timeout_and_failure(self):
+        tasks = ConcurrentTasks()
+        self._run_all(tasks)
+        tasks.slow_event.send()
+
+        stats = tasks.periodic_task_stats()
+        self.assertEqual(1, stats['_hung_task']['timeouts'])
+        self.assertEqual(1, stats['_hung_task']['runs'])
+        self.assertFalse(stats['_hung_task']['running'])
+        self.assertEqual(1, stats['_failing_task']['failures'])
+        self.assertIsNotNone(stats['_failing_task']['last_run'])
+
+    def test_serial_raise_on_error(self):
+        tasks = SerialTasks()
+        self.assertRaises(ValueError, tasks.run_periodic_tasks, None,
+                          raise_on_error=True)
+        self.assertEqual(
+            1, tasks.periodic_task_stats()['_failing_task']['failures'])